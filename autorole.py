@@ -0,0 +1,161 @@
+from discord.ext import commands
+import asyncio
+import discord
+import logging
+import os
+import time
+
+from dashboard.autorole import applies_to, normalize
+from dashboard.role_queue import MemberGone, PermanentFailure, RetryAfter, RoleAssignmentQueue
+from webcog import cog_enabled, get_job_queue, get_telemetry, load_autorole_settings
+
+logger = logging.getLogger('discord_bot')
+
+# Role adds per second (and burst) per guild and across all guilds. Discord limits
+# the member routes per guild, so a raid is spread out instead of hammering one bucket
+GUILD_RATE = float(os.getenv("AUTOROLE_GUILD_RATE", 1.0))
+GUILD_BURST = float(os.getenv("AUTOROLE_GUILD_BURST", 5))
+GLOBAL_RATE = float(os.getenv("AUTOROLE_GLOBAL_RATE", 20.0))
+GLOBAL_BURST = float(os.getenv("AUTOROLE_GLOBAL_BURST", 20))
+MAX_ATTEMPTS = int(os.getenv("AUTOROLE_MAX_ATTEMPTS", 5))
+# Existing members a backfill keeps in the queue at once, so new joins aren't stuck behind thousands
+BACKFILL_WINDOW = int(os.getenv("AUTOROLE_BACKFILL_WINDOW", 100))
+
+class AutoRole(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.settings = {}
+        self.unloaded = False
+        self.queue = RoleAssignmentQueue(
+            self.assign, self.is_member,
+            guild_rate=GUILD_RATE, guild_burst=GUILD_BURST,
+            global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+            max_attempts=MAX_ATTEMPTS
+        )
+
+    async def cog_load(self):
+        self.reload_settings()
+        get_job_queue().register("autorole.backfill", self.run_backfill,
+                                 accepts=lambda guild_id: self.bot.get_guild(int(guild_id)) is not None)
+
+    async def cog_unload(self):
+        self.unloaded = True
+        get_job_queue().unregister("autorole.backfill")
+        await self.queue.close()
+
+    def reload_settings(self):
+        """Re-read data/autorole.json settings; called by the dashboard after a change"""
+        self.settings = load_autorole_settings()
+
+    def is_enabled(self, guild_id):
+        return cog_enabled(guild_id, "AutoRole")
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        config = normalize(self.settings.get(str(member.guild.id)))
+        if not config or not applies_to(config, member.bot) or not self.is_enabled(member.guild.id):
+            return
+        if not self.queue.enqueue(member.guild.id, member.id, config["roles"], config["delay"]):
+            logger.warning(f"AutoRole queue full, skipped {member} in {member.guild.name}")
+
+    async def members_missing_roles(self, guild_id, config):
+        """IDs of the members the config targets who lack one of its (assignable) roles"""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            raise ValueError("The bot is not in this server")
+        if not self.bot.intents.members:
+            raise ValueError("Giving roles to existing members needs the Server Members intent")
+        if not guild.chunked:
+            await guild.chunk()
+        roles = [guild.get_role(int(role_id)) for role_id in config["roles"]]
+        roles = {role for role in roles if role is not None and role < guild.me.top_role}
+        if not roles:
+            raise ValueError("None of the AutoRole roles exist or are below the bot's highest role")
+        return [member.id for member in guild.members
+                if applies_to(config, member.bot) and not roles.issubset(member.roles)]
+
+    async def enqueue_members(self, guild_id, member_ids, role_ids):
+        return sum(self.queue.enqueue(guild_id, member_id, role_ids) for member_id in member_ids)
+
+    def run_backfill(self, job):
+        """Job: give the configured roles to existing members, through the same paced queue as joins.
+
+        Runs on a job worker thread. A rerun lists the members again, and the
+        ones who got their roles in the meantime drop out of the list.
+        """
+        if not self.is_enabled(job.guild_id):
+            raise ValueError("AutoRole is disabled for this server")
+        config = normalize(self.settings.get(job.guild_id))
+        if not config:
+            return {"members": 0}
+        guild_id = int(job.guild_id)
+        loop = self.bot.loop
+        member_ids = asyncio.run_coroutine_threadsafe(self.members_missing_roles(guild_id, config), loop).result(300)
+        total = len(member_ids)
+        handed = 0
+        job.progress(0, total)
+        while handed < total:
+            self.check_loaded()
+            room = BACKFILL_WINDOW - self.queue.depth(guild_id)
+            if room <= 0:
+                time.sleep(1)
+                job.progress(max(0, handed - self.queue.depth(guild_id)), total)
+                continue
+            batch = member_ids[handed:handed + room]
+            queued = asyncio.run_coroutine_threadsafe(
+                self.enqueue_members(guild_id, batch, config["roles"]), loop).result(30)
+            if queued < len(batch):
+                # Raid in progress: leave the rest of the queue to the joins
+                raise RetryAfter(60)
+            handed += len(batch)
+            job.progress(max(0, handed - self.queue.depth(guild_id)), total)
+        while self.queue.depth(guild_id):
+            self.check_loaded()
+            time.sleep(1)
+            job.progress(max(0, total - self.queue.depth(guild_id)), total)
+        job.progress(total, total)
+        return {"members": total}
+
+    def check_loaded(self):
+        if self.unloaded:
+            # The queue is gone with the cog; the job runs again once the cog is back
+            raise RetryAfter(5)
+
+    def is_member(self, guild_id, member_id):
+        """Whether the member is still in the guild, judged from the member cache"""
+        if not self.bot.intents.members:
+            # No member cache to ask; a member who left shows up as NotFound instead
+            return True
+        guild = self.bot.get_guild(guild_id)
+        return guild is not None and guild.get_member(member_id) is not None
+
+    async def assign(self, guild_id, member_id, role_ids):
+        """Give a member all configured roles in one request"""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            raise MemberGone()
+        member = guild.get_member(member_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(member_id)
+            except discord.NotFound:
+                raise MemberGone()
+        roles = [guild.get_role(int(role_id)) for role_id in role_ids]
+        roles = [role for role in roles if role is not None and role < guild.me.top_role and role not in member.roles]
+        if not roles:
+            return
+        try:
+            # atomic=False sends one member edit instead of one request per role
+            await member.add_roles(*roles, reason="AutoRole", atomic=False)
+            get_telemetry().record(guild_id, "AutoRole")
+        except discord.NotFound:
+            raise MemberGone()
+        except discord.Forbidden as e:
+            raise PermanentFailure(str(e))
+        except discord.HTTPException as e:
+            if e.status == 429:
+                raise RetryAfter(float(e.response.headers.get("Retry-After", 1)))
+            raise
+
+async def setup(bot):
+    await bot.add_cog(AutoRole(bot))
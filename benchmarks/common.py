@@ -0,0 +1,73 @@
+"""Shared helpers for the dashboard benchmarks."""
+import json
+import math
+import os
+import platform
+import time
+
+# Synthetic guild IDs are plain snowflake-sized integers counted up from here
+BASE_GUILD_ID = 900000000000000000
+BASE_ROLE_ID = 800000000000000000
+
+def guild_id(index):
+    """Deterministic synthetic guild ID for an index"""
+    return str(BASE_GUILD_ID + index)
+
+def role_id(guild_index, role_index):
+    """Deterministic synthetic role ID for a guild/role index pair"""
+    return str(BASE_ROLE_ID + guild_index * 1000 + role_index)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+def summarize(latencies, errors, elapsed):
+    """Build the per-route summary dict written to the results file"""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if count else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if count else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if count else None,
+        "max_ms": round(values[-1] * 1000, 3) if count else None,
+    }
+
+def run_metadata(params):
+    """Environment details stored next to results so runs stay comparable"""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+    }
+
+def write_results(path, results):
+    """Write a results document as pretty JSON"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+
+def compare_routes(current, baseline):
+    """Return per-route p50/p95/p99 and throughput deltas (percent) against a baseline"""
+    deltas = {}
+    for route, stats in current.items():
+        old = baseline.get(route)
+        if not old:
+            continue
+        route_delta = {}
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "ttfb_p50_ms", "ttfb_p95_ms"):
+            if stats.get(key) is None or not old.get(key):
+                continue
+            route_delta[key] = round((stats[key] - old[key]) / old[key] * 100, 1)
+        deltas[route] = route_delta
+    return deltas
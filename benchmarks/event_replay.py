@@ -0,0 +1,494 @@
+"""Gateway event replay benchmark for the cogs' listeners.
+
+Builds a real discord.py bot without connecting it, loads the cogs into it
+and feeds it gateway DISPATCH frames ({"t": "MESSAGE_CREATE", "d": {...}}),
+one per loop iteration, like the gateway reader does:
+- GUILD_CREATE frames build the guild, channel and member cache.
+- Every other frame goes through discord.py's own parser, so listeners get
+  real Message and Member objects.
+- The bot's HTTP client is replaced by a stub that answers every REST call
+  after --http-latency-ms. Replies, reactions and role adds run through
+  discord.py as usual, but nothing leaves the process.
+
+The stream is either synthetic (guilds with chat channels, a counting
+channel and member joins) or a JSON-lines recording in the same frame
+format. A capture of on_socket_raw_receive with enable_debug_events,
+filtered to op 0, replays as-is. --save-stream writes the synthetic stream
+out, so later runs replay exactly the same events.
+
+Each frame is run twice:
+- Flat out with timed listeners. This gives the events per second the
+  process keeps up with, latency percentiles (frame fed until listener
+  done) and service time per listener, plus event-loop lag and the stalls
+  the loop watchdog attributed to a cog.
+- Again with the listeners awaited one at a time under tracemalloc. This
+  gives the peak and retained allocations of each listener per event.
+
+With --baseline the listener numbers are compared with an earlier results
+file, and --max-regression makes the run fail when p95 latency or
+throughput is worse by more than that many percent.
+
+    python -m benchmarks.event_replay --bot-dir "path/to/discord_bot" \
+        --extension autorole --extension cogs.level_system --extension cogs.counting_game \
+        --messages 20000 --joins 2000 --out bench_results/event_replay.json
+"""
+import argparse
+import asyncio
+import collections
+import contextvars
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import discord
+from discord.ext import commands
+
+from benchmarks.common import compare_routes, run_metadata, summarize, write_results
+from dashboard.giveaway import DISCORD_EPOCH_MS
+from dashboard.loopwatch import LoopWatchdog
+
+DEFAULT_EXTENSIONS = ["autorole", "automod", "giveaway"]
+BUNDLED_EXTENSIONS = ["cogs.level_system", "cogs.counting_game"]
+BOT_USER_ID = 1397289097009168454
+WORDS = ("hello", "gg", "anyone", "up", "for", "a", "game", "tonight", "lol", "nice", "server", "thanks")
+
+# When the frame that led to the current listener call was fed, for end-to-end latency
+fed_at = contextvars.ContextVar("fed_at", default=None)
+
+class Snowflakes:
+    def __init__(self):
+        self.counter = 0
+
+    def __call__(self):
+        self.counter += 1
+        return str(((int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22) | (self.counter & 0x3FFFFF))
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+def user_payload(user_id, bot=False):
+    return {"id": str(user_id), "username": f"user{user_id % 100000}", "discriminator": "0",
+            "global_name": None, "avatar": None, "bot": bot}
+
+def message_payload(message_id, guild_id, channel_id, author, content, embeds=None):
+    return {
+        "id": message_id, "channel_id": str(channel_id), "guild_id": str(guild_id),
+        "author": author, "member": {"roles": [], "joined_at": now_iso(), "deaf": False, "mute": False},
+        "content": content, "timestamp": now_iso(), "edited_timestamp": None, "tts": False,
+        "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": embeds or [], "pinned": False, "type": 0,
+    }
+
+def synthetic_stream(args):
+    """Gateway frames: the guilds first, then messages and joins in random order"""
+    rng = random.Random(args.seed)
+    snowflake = Snowflakes()
+    frames = []
+    guilds = []
+    for g in range(args.guilds):
+        guild_id = int(snowflake())
+        channels = [int(snowflake()) for _ in range(args.channels)]
+        members = [int(snowflake()) for _ in range(args.members)]
+        member_role = int(snowflake())
+        guilds.append({"id": guild_id, "channels": channels, "members": members, "member_role": member_role,
+                       "count": 0, "last_counter": None})
+        frames.append({"t": "GUILD_CREATE", "d": {
+            "id": str(guild_id), "name": f"Replay guild {g}", "owner_id": str(members[0]),
+            "member_count": len(members) + 1, "features": [], "emojis": [], "stickers": [],
+            "roles": [
+                {"id": str(guild_id), "name": "@everyone", "color": 0, "hoist": False, "position": 0,
+                 "permissions": "0", "managed": False, "mentionable": False},
+                {"id": str(member_role), "name": "Member", "color": 0, "hoist": False, "position": 1,
+                 "permissions": "0", "managed": False, "mentionable": False},
+            ],
+            "channels": [
+                {"id": str(channel_id), "type": 0, "name": "counting" if i == 0 else f"chat-{i}",
+                 "position": i, "guild_id": str(guild_id), "permission_overwrites": [], "nsfw": False,
+                 "parent_id": None, "topic": None, "last_message_id": None, "rate_limit_per_user": 0}
+                for i, channel_id in enumerate(channels)
+            ],
+            "members": [
+                {"user": user_payload(member_id), "roles": [], "joined_at": now_iso(), "deaf": False, "mute": False}
+                for member_id in members
+            ] + [{"user": user_payload(BOT_USER_ID, bot=True), "roles": [], "joined_at": now_iso(),
+                  "deaf": False, "mute": False}],
+        }})
+
+    events = ["message"] * args.messages + ["join"] * args.joins
+    rng.shuffle(events)
+    for kind in events:
+        guild = rng.choice(guilds)
+        if kind == "join":
+            member_id = int(snowflake())
+            guild["members"].append(member_id)
+            frames.append({"t": "GUILD_MEMBER_ADD", "d": {
+                "guild_id": str(guild["id"]), "user": user_payload(member_id), "roles": [],
+                "joined_at": now_iso(), "deaf": False, "mute": False}})
+            continue
+        channel_index = rng.randrange(args.channels)
+        author_id = rng.choice(guild["members"])
+        if channel_index == 0:
+            # Counting channel: the next number, never from the same member twice in a row
+            while author_id == guild["last_counter"] and len(guild["members"]) > 1:
+                author_id = rng.choice(guild["members"])
+            guild["count"] += 1
+            guild["last_counter"] = author_id
+            content = str(guild["count"])
+        else:
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        frames.append({"t": "MESSAGE_CREATE", "d": message_payload(
+            snowflake(), guild["id"], guild["channels"][channel_index], user_payload(author_id), content)})
+    return frames, guilds
+
+def load_stream(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_stream(path, frames):
+    with open(path, "w") as f:
+        for frame in frames:
+            f.write(json.dumps(frame, separators=(",", ":")) + "\n")
+
+def prepare_workdir(workdir, bot_dir, guilds):
+    """Copy the bundled bot's JSON config files in and register the synthetic counting channels"""
+    if bot_dir:
+        for path in glob.glob(os.path.join(bot_dir, "*.json")):
+            shutil.copy(path, workdir)
+    if guilds is None:
+        return
+    counting_path = os.path.join(workdir, "counting.json")
+    counting = {"channels": {}}
+    if os.path.exists(counting_path):
+        with open(counting_path, "r") as f:
+            counting = json.load(f)
+    for guild in guilds:
+        counting.setdefault("channels", {})[str(guild["channels"][0])] = {
+            "current_count": 0, "last_user_id": None, "high_score": 0}
+    with open(counting_path, "w") as f:
+        json.dump(counting, f)
+
+def seed_settings(guilds):
+    """AutoRole on for every synthetic guild, so joins go through the whole listener"""
+    from webcog import get_settings_store
+    store = get_settings_store()
+    for guild in guilds:
+        store.put("autorole", guild["id"], {"roles": [str(guild["member_role"])], "delay": 0, "target": "all"})
+
+class StubHTTP:
+    """Answers discord.py's REST calls locally after a fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self.snowflake = Snowflakes()
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if route.method == "POST" and route.path == "/channels/{channel_id}/messages":
+            payload = kwargs.get("json") or {}
+            channel_id = route.channel_id
+            return message_payload(self.snowflake(), route.guild_id or 0, channel_id,
+                                   user_payload(BOT_USER_ID, bot=True), payload.get("content") or "",
+                                   payload.get("embeds"))
+        if route.method == "GET" and route.path.startswith("/users/"):
+            return user_payload(BOT_USER_ID, bot=True)
+        return None
+
+class Listener:
+    """One listener function and what it cost"""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.latencies = []
+        self.service = []
+        self.errors = 0
+        self.first_error = None
+        self.alloc_peak = []
+        self.retained = 0
+
+    def record_error(self, error):
+        self.errors += 1
+        if self.first_error is None:
+            self.first_error = f"{type(error).__name__}: {error}"
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.http = StubHTTP(args.http_latency_ms / 1000)
+        self.listeners = {}  # "on_event" -> [Listener]
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.not_loaded = {}
+        self.bot = None
+
+    async def build(self, extensions):
+        intents = discord.Intents.default()
+        intents.members = True
+        intents.message_content = True
+        bot = commands.Bot(command_prefix="!", intents=intents, help_command=None,
+                           chunk_guilds_at_startup=False)
+        # What login() would do: bind the client to this loop
+        await bot._async_setup_hook()
+        bot.http.request = self.http.request
+        bot._connection.user = discord.ClientUser(state=bot._connection, data=user_payload(BOT_USER_ID, bot=True))
+        for extension in extensions:
+            try:
+                await bot.load_extension(extension)
+            except Exception as e:
+                self.not_loaded[extension] = f"{type(e).__name__}: {e}"
+        self.bot = bot
+        self.wrap_listeners()
+        return bot
+
+    def wrap_listeners(self):
+        """Replace every listener with a timed wrapper, keeping the originals for the allocation pass"""
+        for event, funcs in self.bot.extra_events.items():
+            wrapped = []
+            for func in funcs:
+                owner = getattr(func, "__self__", None)
+                cog = owner.qualified_name if isinstance(owner, commands.Cog) else "Bot"
+                listener = Listener(f"{cog}.{func.__name__}", func)
+                self.listeners.setdefault(event, []).append(listener)
+                wrapped.append(self.timed(listener))
+            funcs[:] = wrapped
+        # The bot's own on_message runs the command parser on every message
+        listener = Listener("Bot.process_commands", self.bot.on_message)
+        self.listeners.setdefault("on_message", []).append(listener)
+        self.bot.on_message = self.timed(listener)
+
+    def timed(self, listener):
+        async def run(*args):
+            started = time.perf_counter()
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                await listener.func(*args)
+            except Exception as e:
+                listener.record_error(e)
+            finally:
+                self.in_flight -= 1
+                done = time.perf_counter()
+                listener.service.append(done - started)
+                listener.latencies.append(done - (fed_at.get() or started))
+        return run
+
+    def feed(self, frame):
+        """Apply one frame the way the gateway reader would; listeners are scheduled, not awaited"""
+        data = frame["d"]
+        if frame["t"] == "GUILD_CREATE":
+            # Straight into the cache: the parser would try to chunk members over the (missing) websocket
+            self.bot._connection._add_guild_from_data(data)
+            return False
+        parser = self.bot._connection.parsers.get(frame["t"])
+        if parser is None:
+            return False
+        fed_at.set(time.perf_counter())
+        parser(data)
+        return True
+
+    def cog_files(self):
+        files = {}
+        for name, cog in list(self.bot.cogs.items()):
+            path = getattr(sys.modules.get(type(cog).__module__), "__file__", None)
+            if path:
+                files[os.path.abspath(path)] = name
+        return files
+
+    async def close(self):
+        for extension in list(self.bot.extensions):
+            try:
+                await self.bot.unload_extension(extension)
+            except Exception:
+                pass
+
+async def throughput_pass(args, extensions, raw_frames):
+    """Feed every frame as fast as the loop takes them; returns the harness and the run totals"""
+    harness = Harness(args)
+    await harness.build(extensions)
+    watchdog = LoopWatchdog(asyncio.get_running_loop(), interval=0.005, threshold=0.05,
+                            cog_files=harness.cog_files)
+    watchdog.start()
+    events = 0
+    started = time.perf_counter()
+    for index, raw in enumerate(raw_frames):
+        if args.rate:
+            delay = started + index / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        events += harness.feed(json.loads(raw))
+        # The gateway reader yields to the loop between frames
+        await asyncio.sleep(0)
+    fed = time.perf_counter() - started
+    deadline = time.monotonic() + args.drain_timeout
+    while harness.in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    watchdog.stop()
+    totals = {
+        "events": events,
+        "feed_s": round(fed, 3),
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(events / elapsed, 1) if elapsed else None,
+        "peak_in_flight": harness.peak_in_flight,
+        "still_running": harness.in_flight,
+        "event_loop": watchdog.stats(),
+    }
+    await harness.close()
+    return harness, totals
+
+async def allocation_pass(args, extensions, raw_frames, results):
+    """Await each listener on its own under tracemalloc and attribute allocations to it"""
+    harness = Harness(args)
+    await harness.build(extensions)
+    dispatched = []
+    harness.bot._connection.dispatch = lambda event, *event_args: dispatched.append((event, event_args))
+    tracemalloc.start()
+    for raw in raw_frames:
+        if not harness.feed(json.loads(raw)):
+            continue
+        for event, event_args in dispatched:
+            for listener in harness.listeners.get("on_" + event, []):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                try:
+                    await listener.func(*event_args)
+                except Exception as e:
+                    listener.record_error(e)
+                current, peak = tracemalloc.get_traced_memory()
+                listener.alloc_peak.append(peak - before)
+                listener.retained += current - before
+        dispatched.clear()
+    tracemalloc.stop()
+    for listeners in harness.listeners.values():
+        for listener in listeners:
+            stats = results.get(listener.name)
+            if stats is None or not listener.alloc_peak:
+                continue
+            stats["alloc_peak_kib_mean"] = round(sum(listener.alloc_peak) / len(listener.alloc_peak) / 1024, 2)
+            stats["alloc_peak_kib_max"] = round(max(listener.alloc_peak) / 1024, 2)
+            stats["retained_kib"] = round(listener.retained / 1024, 1)
+    await harness.close()
+
+def listener_results(harness):
+    results = {}
+    for listeners in harness.listeners.values():
+        for listener in listeners:
+            if not listener.latencies:
+                continue
+            busy = sum(listener.service)
+            # throughput_rps is what the listener alone could sustain: events / time spent in it
+            stats = summarize(listener.latencies, listener.errors, busy)
+            stats["service_mean_ms"] = round(busy / len(listener.service) * 1000, 3)
+            if listener.first_error:
+                stats["first_error"] = listener.first_error
+            results[listener.name] = stats
+    return results
+
+def regressions(deltas, limit):
+    """Listeners whose p95 latency grew or throughput fell by more than `limit` percent"""
+    failed = []
+    for name, delta in deltas.items():
+        if delta.get("p95_ms", 0) > limit or delta.get("throughput_rps", 0) < -limit:
+            failed.append(name)
+    return failed
+
+def print_table(listeners, deltas=None):
+    print(f"{'listener':<36} {'events':>7} {'err':>5} {'ev/s':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'alloc KiB':>10}")
+    for name, s in sorted(listeners.items()):
+        line = (f"{name:<36} {s['requests']:>7} {s['errors']:>5} {s['throughput_rps']:>10} "
+                f"{s['p50_ms'] or 0:>8} {s['p95_ms'] or 0:>8} {s['p99_ms'] or 0:>8} "
+                f"{s.get('alloc_peak_kib_mean', '-'):>10}")
+        if deltas and name in deltas:
+            line += "  " + " ".join(f"{k}:{v:+}%" for k, v in deltas[name].items())
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gateway event replay benchmark")
+    parser.add_argument("--extension", action="append", help="extension to load (repeatable)")
+    parser.add_argument("--bot-dir", help="bundled bot directory: importable cogs package and JSON config files")
+    parser.add_argument("--stream", help="JSON-lines gateway frames to replay instead of a synthetic stream")
+    parser.add_argument("--save-stream", help="write the synthetic stream here")
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--joins", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0.0, help="events per second to feed at; 0 = flat out")
+    parser.add_argument("--http-latency-ms", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--workdir", help="working directory for the cogs' data files (default: a temp dir)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/event_replay.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, help="fail if p95 or throughput is worse by this many percent")
+    args = parser.parse_args(argv)
+
+    out = os.path.abspath(args.out)
+    extensions = args.extension or DEFAULT_EXTENSIONS + (BUNDLED_EXTENSIONS if args.bot_dir else [])
+    if args.bot_dir:
+        sys.path.insert(0, os.path.abspath(args.bot_dir))
+    if args.stream:
+        frames, guilds = load_stream(args.stream), None
+    else:
+        frames, guilds = synthetic_stream(args)
+        if args.save_stream:
+            save_stream(args.save_stream, frames)
+    # Frames are decoded as they are fed, like the gateway reader does
+    raw_frames = [json.dumps(frame) for frame in frames]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="modway-replay-")
+    os.chdir(workdir)
+    prepare_workdir(workdir, args.bot_dir, guilds)
+    if guilds is not None and "autorole" in extensions:
+        seed_settings(guilds)
+
+    harness, totals = asyncio.run(throughput_pass(args, extensions, raw_frames))
+    listeners = listener_results(harness)
+    if not args.no_allocations:
+        # Start again from the same data files, so both passes see the same state
+        prepare_workdir(workdir, args.bot_dir, guilds)
+        asyncio.run(allocation_pass(args, extensions, raw_frames, listeners))
+
+    results = {
+        "meta": run_metadata(vars(args)),
+        "stream": dict(collections.Counter(frame["t"] for frame in frames)),
+        "loaded": sorted(set(extensions) - set(harness.not_loaded)),
+        "not_loaded": harness.not_loaded,
+        "totals": totals,
+        "listeners": listeners,
+        "rest_calls": dict(harness.http.calls),
+    }
+    deltas = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            deltas = compare_routes(listeners, json.load(f)["listeners"])
+        results["baseline_delta_percent"] = deltas
+
+    for extension, error in harness.not_loaded.items():
+        print(f"not loaded: {extension} ({error})")
+    print(f"{totals['events']} events in {totals['elapsed_s']} s = {totals['events_per_s']} events/s, "
+          f"peak {totals['peak_in_flight']} listeners in flight, "
+          f"loop lag max {totals['event_loop']['lag_max_ms']} ms, stalls {totals['event_loop']['stalls_by_cog']}")
+    print_table(listeners, deltas)
+    write_results(out, results)
+    print(f"Results written to {out}")
+
+    if deltas and args.max_regression is not None:
+        failed = regressions(deltas, args.max_regression)
+        if failed:
+            print(f"Regressed by more than {args.max_regression}%: {', '.join(failed)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Generate synthetic dashboard settings files for a given guild count.
+
+    python -m benchmarks.gen_settings --guilds 10000 --out bench_data/10000
+
+Writes data/cog_settings.json, data/autorole.json and data/automod.json
+below --out using the same guild IDs the stub API hands out.
+"""
+import argparse
+import json
+import os
+import random
+
+from benchmarks.common import guild_id, role_id
+
+COG_NAMES = [
+    "AutoMod", "AutoRole", "CountingGame", "DM", "EmbedColor", "Giveaway", "InviteTracker",
+    "LevelSystem", "Moderation", "PingRoles", "Embed", "SuggestionCog", "Ticket", "Verification",
+]
+
+def build_settings(guilds, seed=1, disabled_ratio=0.3, autorole_ratio=0.5, automod_ratio=0.4, roles_per_guild=50):
+    """Return (cog_settings, autorole, automod) dicts for `guilds` guilds"""
+    rnd = random.Random(seed)
+    cog_settings = {}
+    autorole = {}
+    automod = {}
+    for i in range(guilds):
+        gid = guild_id(i)
+        # Only store explicit toggles for a subset, like real installs do
+        toggles = {name: rnd.random() >= disabled_ratio for name in COG_NAMES if rnd.random() < 0.6}
+        if toggles:
+            cog_settings[gid] = toggles
+        if rnd.random() < autorole_ratio:
+            autorole[gid] = role_id(i, rnd.randint(1, max(1, roles_per_guild - 1)))
+        if rnd.random() < automod_ratio:
+            automod[gid] = {
+                "enabled": True,
+                "badwords": [f"word{w}" for w in range(rnd.randint(0, 20))],
+                "action": rnd.choice(["timeout", "kick", "warn"]),
+                "antispam": {
+                    "enabled": rnd.random() < 0.5,
+                    "max_messages": 5,
+                    "time_window": 8,
+                    "punishment": "timeout",
+                    "timeout_duration": 5
+                },
+                "whitelist_roles": [],
+                "whitelist_channels": [],
+                "log_channel": None
+            }
+    return cog_settings, autorole, automod
+
+def write_settings(out_dir, guilds, seed=1):
+    """Write the three settings files below out_dir/data and return their sizes"""
+    data_dir = os.path.join(out_dir, "data")
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    sizes = {}
+    names = ("cog_settings.json", "autorole.json", "automod.json")
+    for name, payload in zip(names, build_settings(guilds, seed)):
+        path = os.path.join(data_dir, name)
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=4)
+        sizes[name] = os.path.getsize(path)
+    return sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic dashboard settings files")
+    parser.add_argument("--guilds", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for count in args.guilds:
+        target = os.path.join(args.out, str(count)) if len(args.guilds) > 1 else args.out
+        sizes = write_settings(target, count, args.seed)
+        print(f"{count} guilds -> {target}: " + ", ".join(f"{k} {v // 1024} KiB" for k, v in sizes.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Giveaway winner-selection benchmark.
+
+Streams a synthetic reaction list through the giveaway engine page by page
+and, for comparison, materializes every entrant first and then filters and
+samples the list. Peak memory is measured with tracemalloc. Each draw is
+repeated with the pages in a different order to check that the winners only
+depend on the seed.
+
+    python -m benchmarks.giveaway_draw --entrants 200000 --winners 5 \
+        --out bench_results/giveaway_draw.json
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import run_metadata, write_results
+from dashboard.giveaway import DISCORD_EPOCH_MS, Entrant, draw_winners, make_check
+
+PAGE_SIZE = 100
+
+def user_id(index, age_days, now):
+    created_ms = int((now - age_days * 86400) * 1000) - DISCORD_EPOCH_MS
+    return (created_ms << 22) | (index & 0x3FFFFF)
+
+def make_entrant(index, now):
+    # 1 in 40 is a bot, account ages spread over 60 days, two thirds have role 1
+    return Entrant(user_id(index, 1 + index % 60, now), index % 40 == 0, [1] if index % 3 else [2])
+
+async def pages(count, now, shuffle_seed, latency):
+    """Reaction pages of PAGE_SIZE users, as the API returns them"""
+    order = list(range(0, count, PAGE_SIZE))
+    random.Random(shuffle_seed).shuffle(order)
+    for start in order:
+        if latency:
+            await asyncio.sleep(latency)
+        for index in range(start, min(start + PAGE_SIZE, count)):
+            yield make_entrant(index, now)
+
+async def materialized(entrants, k, seed, check):
+    """The naive approach: collect everyone, filter, then sample"""
+    everyone = [entrant async for entrant in entrants]
+    eligible = [entrant.user_id for entrant in everyone if check(entrant) is None]
+    rng = random.Random(seed)
+    return rng.sample(eligible, min(k, len(eligible)))
+
+def measure(make_coroutine):
+    """Time one run, then repeat it under tracemalloc (which slows it down) for peak memory"""
+    started = time.perf_counter()
+    result = asyncio.run(make_coroutine())
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    asyncio.run(make_coroutine())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {"elapsed_s": round(elapsed, 3), "peak_kib": peak // 1024}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Giveaway winner-selection benchmark")
+    parser.add_argument("--entrants", type=int, default=200000)
+    parser.add_argument("--winners", type=int, default=5)
+    parser.add_argument("--min-account-age-days", type=int, default=7)
+    parser.add_argument("--page-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", default="benchmark-seed")
+    parser.add_argument("--out", default="bench_results/giveaway_draw.json")
+    args = parser.parse_args(argv)
+
+    now = time.time()
+    check = make_check({"roles": ["1"], "min_account_age_days": args.min_account_age_days}, now)
+    latency = args.page_latency_ms / 1000
+    (winners, stats), streaming = measure(
+        lambda: draw_winners(pages(args.entrants, now, 1, latency), args.winners, args.seed, 0, check))
+    _, naive = measure(lambda: materialized(pages(args.entrants, now, 1, latency), args.winners, args.seed, check))
+    again, _ = asyncio.run(draw_winners(pages(args.entrants, now, 2, latency), args.winners, args.seed, 0, check))
+    reroll, _ = asyncio.run(draw_winners(pages(args.entrants, now, 3, latency), 1, args.seed, 1, check, exclude=winners))
+
+    results = {
+        "meta": run_metadata(vars(args)),
+        "streaming": dict(streaming, stats=stats, winners=winners),
+        "materialized": naive,
+        "deterministic": winners == again,
+        "reroll": reroll,
+    }
+    print(f"streaming     {streaming['elapsed_s']:>7}s  peak {streaming['peak_kib']:>8} KiB  {stats}")
+    print(f"materialized  {naive['elapsed_s']:>7}s  peak {naive['peak_kib']:>8} KiB")
+    print(f"same winners with pages reordered: {results['deterministic']}")
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Synthetic join-burst benchmark for the AutoRole assignment queue.
+
+A simulated Discord enforces a per-guild role-assignment bucket (answering
+429 with a retry-after when it's exceeded) and a global limit, adds some
+latency, and lets a fraction of the joining members leave again shortly
+after joining. The same burst is driven through the paced queue and, for
+comparison, through the naive one-request-per-join approach.
+
+    python -m benchmarks.join_burst --joins 600 --guilds 3 --burst-seconds 1 \
+        --out bench_results/join_burst.json
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import run_metadata, summarize, write_results
+from dashboard.role_queue import MemberGone, RetryAfter, RoleAssignmentQueue
+
+class SimulatedDiscord:
+    """Fixed-window per-guild bucket plus a global limit, like Discord's member routes"""
+
+    def __init__(self, route_limit, route_window, global_rate, latency, seed):
+        self.route_limit = route_limit
+        self.route_window = route_window
+        self.global_rate = global_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.windows = {}  # guild_id -> (window start, calls)
+        self.global_calls = []
+        self.members = set()
+        self.assigned = {}
+        self.calls = 0
+        self.rate_limited = 0
+        self.wasted = 0
+
+    def is_member(self, guild_id, member_id):
+        return (guild_id, member_id) in self.members
+
+    async def assign(self, guild_id, member_id, role_ids):
+        self.calls += 1
+        now = time.monotonic()
+        start, calls = self.windows.get(guild_id, (now, 0))
+        if now - start >= self.route_window:
+            start, calls = now, 0
+        self.global_calls = [t for t in self.global_calls if now - t < 1.0]
+        if calls >= self.route_limit or len(self.global_calls) >= self.global_rate:
+            self.rate_limited += 1
+            raise RetryAfter(max(0.001, start + self.route_window - now))
+        self.windows[guild_id] = (start, calls + 1)
+        self.global_calls.append(now)
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if (guild_id, member_id) not in self.members:
+            self.wasted += 1
+            raise MemberGone()
+        self.assigned[(guild_id, member_id)] = time.monotonic()
+
+async def burst(discord, args, on_join):
+    """Join `args.joins` members spread over the burst window; some leave again"""
+    rng = random.Random(args.seed)
+    joined = {}
+    leavers = []
+    interval = args.burst_seconds / args.joins
+    for i in range(args.joins):
+        key = (1000 + i % args.guilds, 5000 + i)
+        discord.members.add(key)
+        joined[key] = time.monotonic()
+        on_join(*key)
+        if rng.random() < args.leave_rate:
+            leavers.append((time.monotonic() + rng.uniform(0, args.burst_seconds), key))
+        await asyncio.sleep(interval)
+    for leave_at, key in sorted(leavers):
+        await asyncio.sleep(max(0.0, leave_at - time.monotonic()))
+        discord.members.discard(key)
+    return joined
+
+def report(discord, joined, started, left):
+    lags = [discord.assigned[key] - joined[key] for key in discord.assigned]
+    return {
+        "drain_s": round(time.monotonic() - started, 3),
+        "joins": len(joined),
+        "assigned": len(discord.assigned),
+        "left_before_assignment": left,
+        "rest_calls": discord.calls,
+        "rate_limited_calls": discord.rate_limited,
+        "calls_for_departed_members": discord.wasted,
+        "lag": summarize(lags, 0, 1.0),
+    }
+
+def make_discord(args):
+    return SimulatedDiscord(args.route_limit, args.route_window, args.global_rate, args.latency_ms / 1000, args.seed)
+
+async def run_queue(args):
+    discord = make_discord(args)
+    queue = RoleAssignmentQueue(
+        discord.assign, discord.is_member,
+        guild_rate=args.route_limit / args.route_window, guild_burst=args.route_limit,
+        global_rate=args.global_rate, global_burst=args.global_rate, base_backoff=0.05
+    )
+    started = time.monotonic()
+    joined = await burst(discord, args, lambda g, m: queue.enqueue(g, m, ["1"]))
+    await queue.join()
+    result = report(discord, joined, started, queue.counters["dropped_left"])
+    result["queue"] = queue.metrics()
+    return result
+
+async def run_naive(args):
+    discord = make_discord(args)
+    tasks = []
+
+    async def assign(guild_id, member_id):
+        for _ in range(5):
+            try:
+                return await discord.assign(guild_id, member_id, ["1"])
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except MemberGone:
+                return
+
+    started = time.monotonic()
+    joined = await burst(discord, args, lambda g, m: tasks.append(asyncio.ensure_future(assign(g, m))))
+    await asyncio.gather(*tasks)
+    return report(discord, joined, started, len(joined) - len(discord.assigned))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoRole join-burst benchmark")
+    parser.add_argument("--joins", type=int, default=600)
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument("--burst-seconds", type=float, default=1.0)
+    parser.add_argument("--leave-rate", type=float, default=0.1, help="fraction of members that leave again")
+    parser.add_argument("--route-limit", type=int, default=5, help="role adds per guild per window")
+    parser.add_argument("--route-window", type=float, default=0.1, help="seconds")
+    parser.add_argument("--global-rate", type=float, default=50.0, help="calls per second across guilds")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/join_burst.json")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": run_metadata(vars(args)),
+        "queue": asyncio.run(run_queue(args)),
+        "naive": asyncio.run(run_naive(args)),
+    }
+    for mode in ("queue", "naive"):
+        r = results[mode]
+        print(f"{mode:<6} drain {r['drain_s']:>7}s  assigned {r['assigned']:>5}  calls {r['rest_calls']:>6}  "
+              f"429s {r['rate_limited_calls']:>6}  departed calls {r['calls_for_departed_members']:>4}  "
+              f"lag p50 {r['lag']['p50_ms']}ms p95 {r['lag']['p95_ms']}ms")
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Closed-loop load driver for a running dashboard.
+
+Each virtual admin logs in through /discord-callback (answered by the stub
+API), then issues a weighted mix of dashboard requests until the duration
+elapses. Throughput, p50/p95/p99 latency and time to first byte are reported
+per route and written as JSON.
+
+    python -m benchmarks.load_driver --base http://127.0.0.1:5379 --admins 20 \
+        --duration 30 --out bench_results/run.json --baseline bench_results/prev.json
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import compare_routes, guild_id, role_id, run_metadata, summarize, write_results
+
+DEFAULT_MIX = "servers=4,manage=4,autorole=2,toggle=1,save=1"
+COGS = ["AutoMod", "CountingGame", "LevelSystem", "Ticket", "Giveaway"]
+
+def parse_mix(text):
+    """Parse 'route=weight,...' into a list of (route, weight)"""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+class VirtualAdmin(threading.Thread):
+    """One logged-in dashboard user issuing requests in a loop"""
+
+    def __init__(self, index, base, mix, guilds, deadline, think_time, seed):
+        super().__init__(daemon=True)
+        self.index = index
+        self.base = base.rstrip("/")
+        self.routes = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.guilds = guilds
+        self.deadline = deadline
+        self.think_time = think_time
+        self.random = random.Random(seed + index)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.latencies = {}
+        self.ttfb = {}
+        self.errors = {}
+        self.last_ttfb = None
+
+    def request(self, path, payload=None):
+        data = None
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.base + path, data=data, headers=headers,
+                                     method="POST" if data is not None else "GET")
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                # Headers go out with the first body chunk, so this is time to first byte
+                self.last_ttfb = time.perf_counter() - started
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            self.last_ttfb = time.perf_counter() - started
+            e.read()
+            return e.code
+
+    def login(self):
+        return self.request(f"/discord-callback?code=admin{self.index}") == 200
+
+    def issue(self, route):
+        g = self.random.randrange(self.guilds)
+        gid = guild_id(g)
+        if route == "home":
+            return self.request("/")
+        if route == "servers":
+            return self.request("/servers")
+        if route == "manage":
+            return self.request(f"/manage/{gid}")
+        if route == "autorole":
+            return self.request(f"/config/autorole/{gid}")
+        if route == "toggle":
+            return self.request(f"/api/toggle-cog/{gid}/{self.random.choice(COGS)}", payload={})
+        if route == "save":
+            return self.request(f"/api/autorole/save/{gid}", payload={"roleId": role_id(g, self.random.randint(1, 20))})
+        raise ValueError(f"Unknown route {route}")
+
+    def record(self, route, elapsed, ok):
+        self.latencies.setdefault(route, []).append(elapsed)
+        if self.last_ttfb is not None:
+            self.ttfb.setdefault(route, []).append(self.last_ttfb)
+            self.last_ttfb = None
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def run(self):
+        start = time.perf_counter()
+        ok = False
+        try:
+            ok = self.login()
+        except Exception:
+            pass
+        self.record("login", time.perf_counter() - start, ok)
+        while time.monotonic() < self.deadline:
+            route = self.random.choices(self.routes, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                status = self.issue(route)
+                ok = 200 <= status < 300
+            except Exception:
+                ok = False
+            self.record(route, time.perf_counter() - start, ok)
+            if self.think_time:
+                time.sleep(self.think_time)
+
+def run_load(base, admins, duration, mix, guilds, think_time=0.0, seed=1):
+    """Drive the dashboard and return per-route summaries"""
+    deadline = time.monotonic() + duration
+    workers = [VirtualAdmin(i, base, mix, guilds, deadline, think_time, seed) for i in range(admins)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = {}
+    ttfb = {}
+    errors = {}
+    for worker in workers:
+        for route, values in worker.latencies.items():
+            latencies.setdefault(route, []).extend(values)
+        for route, values in worker.ttfb.items():
+            ttfb.setdefault(route, []).extend(values)
+        for route, count in worker.errors.items():
+            errors[route] = errors.get(route, 0) + count
+
+    routes = {route: summarize(values, errors.get(route, 0), elapsed) for route, values in latencies.items()}
+    for route, values in ttfb.items():
+        first_byte = summarize(values, 0, elapsed)
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            routes[route]["ttfb_" + key] = first_byte[key]
+    everything = [v for route, values in latencies.items() if route != "login" for v in values]
+    routes["_all"] = summarize(everything, sum(c for r, c in errors.items() if r != "login"), elapsed)
+    return routes
+
+def print_table(routes, deltas=None):
+    print(f"{'route':<10} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'ttfb50':>9}")
+    for route, s in sorted(routes.items()):
+        line = (f"{route:<10} {s['requests']:>7} {s['errors']:>5} {s['throughput_rps']:>8} "
+                f"{s['p50_ms'] or 0:>9} {s['p95_ms'] or 0:>9} {s['p99_ms'] or 0:>9} {s.get('ttfb_p50_ms') or 0:>9}")
+        if deltas and route in deltas:
+            line += "  " + " ".join(f"{k}:{v:+}%" for k, v in deltas[route].items())
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard load driver")
+    parser.add_argument("--base", default="http://127.0.0.1:5379")
+    parser.add_argument("--admins", type=int, default=10, help="concurrent virtual admins")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--guilds", type=int, default=20, help="guild IDs to spread requests over")
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/load.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    routes = run_load(args.base, args.admins, args.duration, parse_mix(args.mix),
+                      args.guilds, args.think_time, args.seed)
+    results = {"meta": run_metadata(vars(args)), "routes": routes}
+
+    deltas = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            deltas = compare_routes(routes, json.load(f)["routes"])
+        results["baseline_delta_percent"] = deltas
+
+    print_table(routes, deltas)
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Mass-DM benchmark against a simulated Discord.
+
+The simulated API enforces bot-wide limits on DM channel creation and on
+message sends (answering 429 with a retry-after when they're exceeded), adds
+latency, and refuses DMs from a fraction of the members. The same recipient
+list is sent through the mass-DM dispatcher and, for comparison, one member
+at a time. Halfway through, the dispatcher run is stopped and resumed from
+its checkpoint, as after a restart.
+
+    python -m benchmarks.mass_dm --members 2000 --out bench_results/mass_dm.json
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import run_metadata, write_results
+from dashboard.mass_dm import DMClosed, MassDMDispatcher
+from dashboard.role_queue import RetryAfter
+
+class SimulatedDiscord:
+    """Sliding one-second windows for DM opens and sends, like Discord's global limits"""
+
+    def __init__(self, open_rate, send_rate, latency, closed_rate, seed):
+        self.open_rate = open_rate
+        self.send_rate = send_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.closed = set()
+        self.opens = []
+        self.sends = []
+        self.delivered = []
+        self.counters = {"open": 0, "send": 0, "429": 0, "closed": 0}
+        self.closed_rate = closed_rate
+
+    def add_members(self, member_ids):
+        for member_id in member_ids:
+            if self.random.random() < self.closed_rate:
+                self.closed.add(member_id)
+
+    def _limit(self, calls, rate):
+        now = time.monotonic()
+        calls[:] = [t for t in calls if now - t < 1.0]
+        if len(calls) >= rate:
+            self.counters["429"] += 1
+            raise RetryAfter(max(0.001, calls[0] + 1.0 - now))
+        calls.append(now)
+
+    async def open_channel(self, user_id):
+        self.counters["open"] += 1
+        self._limit(self.opens, self.open_rate)
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        return f"dm-{user_id}"
+
+    async def send(self, channel, guild_id, user_id, content):
+        self.counters["send"] += 1
+        self._limit(self.sends, self.send_rate)
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if user_id in self.closed:
+            self.counters["closed"] += 1
+            raise DMClosed()
+        self.delivered.append(user_id)
+
+def report(discord, started):
+    elapsed = time.monotonic() - started
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "delivered": len(discord.delivered),
+        "duplicates": len(discord.delivered) - len(set(discord.delivered)),
+        "per_second": round(len(discord.delivered) / elapsed, 2) if elapsed else 0.0,
+        "calls": dict(discord.counters),
+    }
+
+def make_discord(args, members):
+    discord = SimulatedDiscord(args.open_rate, args.send_rate, args.latency_ms / 1000, args.closed_rate, args.seed)
+    discord.add_members(members)
+    return discord
+
+async def run_dispatcher(args, members, directory):
+    discord = make_discord(args, members)
+
+    def make():
+        # Pace a little under the simulated limits, as the cog does with Discord's
+        return MassDMDispatcher(directory, discord.open_channel, discord.send, concurrency=args.concurrency,
+                                open_rate=args.open_rate * 0.9, open_burst=args.open_rate * 0.1,
+                                send_rate=args.send_rate * 0.9, send_burst=args.send_rate * 0.1,
+                                checkpoint_interval=0.25)
+
+    started = time.monotonic()
+    dispatcher = make()
+    dispatcher.load()
+    job = dispatcher.create("1", members, "Announcement")
+    while job.counts["pending"] > len(members) // 2:
+        await asyncio.sleep(0.05)
+    await dispatcher.close()
+
+    # Restart: a fresh dispatcher picks the job up from its checkpoint
+    dispatcher = make()
+    dispatcher.load()
+    dispatcher.start()
+    job = dispatcher.jobs[job.id]
+    while job.state != "done":
+        await asyncio.sleep(0.05)
+    result = report(discord, started)
+    result["job"] = job.progress()
+    result["dispatcher"] = dispatcher.metrics()
+    return result
+
+async def run_sequential(args, members):
+    discord = make_discord(args, members)
+    started = time.monotonic()
+    for member_id in members:
+        for _ in range(5):
+            try:
+                channel = await discord.open_channel(member_id)
+                await discord.send(channel, "1", member_id, "Announcement")
+                break
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except DMClosed:
+                break
+    return report(discord, started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mass-DM dispatcher benchmark")
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--closed-rate", type=float, default=0.15, help="fraction of members with closed DMs")
+    parser.add_argument("--open-rate", type=float, default=100.0, help="DM channel creations per second")
+    parser.add_argument("--send-rate", type=float, default=100.0, help="message sends per second")
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/mass_dm.json")
+    args = parser.parse_args(argv)
+
+    members = [str(100000 + i) for i in range(args.members)]
+    directory = tempfile.mkdtemp(prefix="mass_dm_bench_")
+    try:
+        results = {
+            "meta": run_metadata(vars(args)),
+            "dispatcher": asyncio.run(run_dispatcher(args, members, directory)),
+            "sequential": asyncio.run(run_sequential(args, members)),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    for mode in ("dispatcher", "sequential"):
+        r = results[mode]
+        print(f"{mode:<10} {r['elapsed_s']:>8}s  delivered {r['delivered']:>6}  duplicates {r['duplicates']:>3}  "
+              f"{r['per_second']:>7}/s  429s {r['calls']['429']:>5}")
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""Run the dashboard without a Discord connection, for benchmarking.
+
+Run from the settings directory (the one containing data/) with the repo
+root on PYTHONPATH and DISCORD_API_BASE pointing at the stub API.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import webcog
+
+def main():
+    app = webcog.create_app()
+    app.run(host="127.0.0.1", port=int(os.environ.get("PORT", 5379)), threaded=True)
+
+if __name__ == "__main__":
+    main()
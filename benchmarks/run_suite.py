@@ -0,0 +1,106 @@
+"""End-to-end dashboard benchmark across several settings sizes.
+
+For every guild count this generates synthetic settings, starts the stub
+Discord API and a standalone dashboard process, drives load against it and
+collects everything into one results file.
+
+    python -m benchmarks.run_suite --guild-counts 100 1000 10000 \
+        --admins 20 --duration 20 --out bench_results/suite.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import compare_routes, run_metadata, write_results
+from benchmarks.gen_settings import write_settings
+from benchmarks.load_driver import parse_mix, print_table, run_load, DEFAULT_MIX
+from benchmarks.stub_discord import StubConfig, make_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def start_dashboard(work_dir, port, api_base):
+    env = dict(os.environ)
+    env["PORT"] = str(port)
+    env["DISCORD_API_BASE"] = api_base
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("Token", "bench-bot-token")
+    return subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "run_dashboard.py")],
+        cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard benchmark suite")
+    parser.add_argument("--guild-counts", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--admins", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--user-guilds", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--port", type=int, default=5379)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/suite.json")
+    parser.add_argument("--baseline", help="previous suite results file to compare against")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.rate_429,
+                        user_guilds=args.user_guilds, seed=args.seed)
+    stub = make_server("127.0.0.1", args.stub_port, config)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    api_base = f"http://127.0.0.1:{args.stub_port}/api"
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["runs"]
+
+    runs = {}
+    try:
+        for count in args.guild_counts:
+            with tempfile.TemporaryDirectory(prefix=f"modway-bench-{count}-") as work_dir:
+                sizes = write_settings(work_dir, count, args.seed)
+                process = start_dashboard(work_dir, args.port, api_base)
+                try:
+                    if not wait_for_port(args.port):
+                        raise RuntimeError("Dashboard did not start listening")
+                    routes = run_load(f"http://127.0.0.1:{args.port}", args.admins, args.duration,
+                                      parse_mix(args.mix), args.user_guilds, seed=args.seed)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=10)
+                    # Give the OS a moment to release the port before the next size
+                    time.sleep(0.5)
+
+            run = {"guilds": count, "settings_bytes": sizes, "routes": routes}
+            if baseline and str(count) in baseline:
+                run["baseline_delta_percent"] = compare_routes(routes, baseline[str(count)]["routes"])
+            runs[str(count)] = run
+            print(f"\n== {count} guilds ==")
+            print_table(routes, run.get("baseline_delta_percent"))
+    finally:
+        stub.shutdown()
+
+    results = {"meta": run_metadata(vars(args)), "stub_calls": config.counters, "runs": runs}
+    write_results(args.out, results)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
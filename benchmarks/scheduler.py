@@ -0,0 +1,148 @@
+"""Periodic-task scheduling benchmark.
+
+Simulates the bundled bot's periodic work (stats channels, daily resets,
+leaderboards, creator checks) for many guilds, with time compressed so a
+five-minute period takes a few seconds. Per-guild work is a simulated REST
+call plus a little CPU. The same jobs run two ways:
+- one loop per job that walks every guild at the start of each period, as
+  the tasks.loop cogs do;
+- registered with the shared scheduler.
+
+For both it reports the peak number of runs started in any 100 ms window,
+the peak number of simulated REST calls in flight, event-loop lag and how
+late runs started.
+
+    python -m benchmarks.scheduler --guilds 500 --periods 4 \
+        --out bench_results/scheduler.json
+"""
+import argparse
+import asyncio
+import collections
+import time
+
+from benchmarks.common import percentile, run_metadata, write_results
+from dashboard.scheduler import Scheduler
+
+# Job name -> period in real seconds, scaled by --scale
+JOBS = {
+    "server_stats.update": 300,
+    "economy.daily_reset": 300,
+    "level_system.leaderboard": 300,
+    "content_announcer.creators": 1800,
+}
+
+class Workload:
+    def __init__(self, latency, cpu):
+        self.latency = latency
+        self.cpu = cpu
+        self.starts = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lag_max = 0.0
+
+    async def run(self, guild_id):
+        self.starts.append(time.monotonic())
+        deadline = time.perf_counter() + self.cpu
+        while time.perf_counter() < deadline:
+            pass
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def watch_lag(self, interval=0.01):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(interval)
+            self.lag_max = max(self.lag_max, time.monotonic() - before - interval)
+
+    def summary(self, elapsed):
+        windows = collections.Counter(int(start * 10) for start in self.starts)
+        return {
+            "runs": len(self.starts),
+            "elapsed_s": round(elapsed, 2),
+            "peak_starts_per_100ms": max(windows.values()) if windows else 0,
+            "mean_starts_per_100ms": round(len(self.starts) / (elapsed * 10), 1) if elapsed else 0,
+            "peak_in_flight": self.peak_in_flight,
+            "loop_lag_max_ms": round(self.lag_max * 1000, 1),
+        }
+
+async def per_job_loops(guild_ids, periods, duration, workload):
+    """One loop per job that walks every guild, sequentially, at the top of each period"""
+    lateness = []
+
+    async def loop(period):
+        start = time.monotonic()
+        tick = 0
+        while True:
+            due = start + tick * period
+            for guild_id in guild_ids:
+                lateness.append(time.monotonic() - due)
+                await workload.run(guild_id)
+            tick += 1
+            await asyncio.sleep(max(0.0, start + tick * period - time.monotonic()))
+
+    tasks = [asyncio.create_task(loop(period)) for period in periods.values()]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    return lateness
+
+async def scheduled(guild_ids, periods, duration, workload, concurrency, tick):
+    scheduler = Scheduler(concurrency=concurrency, tick=tick)
+    for name, period in periods.items():
+        scheduler.every(name, period, workload.run, guilds=lambda: guild_ids)
+    await asyncio.sleep(duration)
+    stats = scheduler.stats()
+    scheduler.close()
+    return stats
+
+async def measure(mode, args, periods, guild_ids):
+    workload = Workload(args.latency_ms / 1000, args.cpu_us / 1e6)
+    watcher = asyncio.create_task(workload.watch_lag())
+    duration = min(periods.values()) * args.periods
+    started = time.monotonic()
+    if mode == "loops":
+        lateness = sorted(await per_job_loops(guild_ids, periods, duration, workload))
+        result = workload.summary(time.monotonic() - started)
+        result["lateness_p95_ms"] = round(percentile(lateness, 95) * 1000, 1) if lateness else None
+        result["lateness_max_ms"] = round(lateness[-1] * 1000, 1) if lateness else None
+    else:
+        stats = await scheduled(guild_ids, periods, duration, workload, args.concurrency, args.tick_ms / 1000)
+        result = workload.summary(time.monotonic() - started)
+        jobs = stats["jobs"].values()
+        result["lateness_p95_ms"] = max(job["lateness_p95_ms"] or 0 for job in jobs)
+        result["lateness_max_ms"] = max(job["lateness_max_ms"] or 0 for job in jobs)
+        result["jobs"] = stats["jobs"]
+    watcher.cancel()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Periodic-task scheduling benchmark")
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--scale", type=float, default=0.02, help="Real seconds per simulated second")
+    parser.add_argument("--periods", type=float, default=4, help="How many of the shortest period to run")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--cpu-us", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tick-ms", type=float, default=20.0)
+    parser.add_argument("--out", default="bench_results/scheduler.json")
+    args = parser.parse_args(argv)
+
+    periods = {name: seconds * args.scale for name, seconds in JOBS.items()}
+    guild_ids = list(range(1, args.guilds + 1))
+    results = {"meta": run_metadata(vars(args))}
+    for mode in ("loops", "scheduler"):
+        results[mode] = asyncio.run(measure(mode, args, periods, guild_ids))
+        row = results[mode]
+        print(f"{mode:<10} runs {row['runs']:>7}  starts/100ms peak {row['peak_starts_per_100ms']:>4} "
+              f"mean {row['mean_starts_per_100ms']:>5}  "
+              f"in flight {row['peak_in_flight']:>3}  loop lag max {row['loop_lag_max_ms']:>7} ms  "
+              f"lateness p95 {row['lateness_p95_ms']:>8} ms")
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Settings export/import benchmark.
+
+Fills a settings store with synthetic cog toggles, autorole and automod
+settings for many guilds, then:
+- exports every guild as a streamed bundle, as the owner export does;
+- for comparison, builds the whole export in memory first (every namespace
+  loaded, dumped to one JSON text and compressed), as a one-shot download
+  would;
+- imports the bundle into an empty store with one put_many transaction.
+  The dashboard's per-record schema checks are not included.
+
+Peak memory is measured with tracemalloc.
+
+    python -m benchmarks.settings_bundle --guilds 50000 \
+        --out bench_results/settings_bundle.json
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import run_metadata, write_results
+from benchmarks.gen_settings import build_settings
+from dashboard import bundle
+from dashboard.store import SettingsStore
+
+NAMESPACES = ("cog_settings", "autorole", "automod")
+
+def measure(run):
+    """Time one run, then repeat it under tracemalloc (which slows it down) for peak memory"""
+    started = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {"elapsed_s": round(elapsed, 3), "peak_kib": peak // 1024}
+
+def streamed(path):
+    size = 0
+    for chunk in bundle.export(SettingsStore(path), NAMESPACES):
+        size += len(chunk)
+    return size
+
+def in_memory(path):
+    store = SettingsStore(path)
+    text = json.dumps({namespace: store.load(namespace) for namespace in NAMESPACES})
+    return len(gzip.compress(text.encode(), 6)), len(text)
+
+def imported(path, data):
+    reader = bundle.BundleReader(io.BytesIO(data))
+    if os.path.exists(path):
+        os.remove(path)
+    store = SettingsStore(path)
+    store.put_many((namespace, guild_id, document) for _, namespace, guild_id, document in reader)
+    return sum(1 for namespace in NAMESPACES for _ in store.iter_raw(namespace))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Settings export/import benchmark")
+    parser.add_argument("--guilds", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results/settings_bundle.json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "settings.db")
+        store = SettingsStore(source)
+        for namespace, documents in zip(NAMESPACES, build_settings(args.guilds, args.seed)):
+            store.replace_all(namespace, documents)
+        records = sum(len(store.load(namespace)) for namespace in NAMESPACES)
+
+        compressed, streaming = measure(lambda: streamed(source))
+        (_, raw), whole = measure(lambda: in_memory(source))
+        data = b"".join(bundle.export(store, NAMESPACES))
+        count, importing = measure(lambda: imported(os.path.join(tmp, "import.db"), data))
+        if count != records:
+            raise SystemExit(f"Imported {count} records, expected {records}")
+
+    results = {"meta": run_metadata(vars(args)), "records": records,
+               "raw_mb": round(raw / 1e6, 2), "compressed_mb": round(compressed / 1e6, 2)}
+    for mode, row in (("streamed_export", streaming), ("in_memory_export", whole), ("import", importing)):
+        row["records_per_s"] = round(records / row["elapsed_s"]) if row["elapsed_s"] else None
+        row["mb_per_s"] = round(raw / 1e6 / row["elapsed_s"], 1) if row["elapsed_s"] else None
+        results[mode] = row
+        print(f"{mode:<17} {row['elapsed_s']:>8.3f} s  {row['records_per_s']:>9} records/s  "
+              f"{row['mb_per_s']:>6} MB/s  peak {row['peak_kib']:>9} KiB")
+    print(f"{records} records, {results['raw_mb']} MB of JSON, {results['compressed_mb']} MB compressed")
+    write_results(args.out, results)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure dashboard extension load, unload and reload times.
+
+Imports webcog, then runs several cog_load/cog_unload cycles on the same
+port against a stand-in bot, which also checks that a reload can rebind it.
+
+    python -m benchmarks.startup --cycles 5 --out bench_results/startup.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import types
+
+from benchmarks.common import run_metadata, summarize, write_results
+
+async def cycle(webcog, bot):
+    cog = webcog.ModwayDashboard(bot)
+    started = time.perf_counter()
+    await cog.cog_load()
+    loaded = time.perf_counter()
+    await cog.cog_unload()
+    unloaded = time.perf_counter()
+    return loaded - started, unloaded - loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard extension startup benchmark")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5379)
+    parser.add_argument("--out", default="bench_results/startup.json")
+    args = parser.parse_args(argv)
+
+    out = os.path.abspath(args.out)
+    os.environ["PORT"] = str(args.port)
+    os.chdir(tempfile.mkdtemp(prefix="modway-startup-"))
+    started = time.perf_counter()
+    import webcog
+    import_time = time.perf_counter() - started
+
+    bot = types.SimpleNamespace(cogs={})
+    loads, unloads = [], []
+
+    async def run():
+        for _ in range(args.cycles):
+            load, unload = await cycle(webcog, bot)
+            loads.append(load)
+            unloads.append(unload)
+
+    asyncio.run(run())
+    results = {
+        "meta": run_metadata(vars(args)),
+        "import_ms": round(import_time * 1000, 3),
+        "heavy_modules_after_import": sorted(m for m in ("flask", "requests") if m in sys.modules),
+        "cog_load": summarize(loads, 0, sum(loads)),
+        "cog_unload": summarize(unloads, 0, sum(unloads)),
+    }
+    print(f"import webcog: {results['import_ms']} ms")
+    print(f"cog_load p50 {results['cog_load']['p50_ms']} ms, cog_unload p50 {results['cog_unload']['p50_ms']} ms "
+          f"over {args.cycles} reloads on port {args.port}")
+    write_results(out, results)
+
+if __name__ == "__main__":
+    main()
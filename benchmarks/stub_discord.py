@@ -0,0 +1,214 @@
+"""Local stand-in for the Discord REST endpoints the dashboard calls.
+
+Serves /api/oauth2/token, /api/users/@me, /api/users/@me/guilds,
+/api/guilds/<id>/roles and /api/guilds/<id>/channels with configurable
+latency and 429 injection.
+
+    python -m benchmarks.stub_discord --port 8765 --latency-ms 80 --rate-429 0.02
+
+Point the dashboard at it with DISCORD_API_BASE=http://127.0.0.1:8765/api
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from benchmarks.common import guild_id, role_id
+
+ROLES_PATH = re.compile(r"^/api/guilds/(\d+)/roles$")
+CHANNELS_PATH = re.compile(r"^/api/guilds/(\d+)/channels$")
+CHANNELS_PER_GUILD = 12
+
+class StubConfig:
+    """Tunable behaviour of the stub API"""
+
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, rate_429=0.0, retry_after=1.0,
+                 user_guilds=25, bot_guild_ratio=0.8, roles_per_guild=50, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.user_guilds = user_guilds
+        self.bot_guild_ratio = bot_guild_ratio
+        self.roles_per_guild = roles_per_guild
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def should_throttle(self):
+        if self.rate_429 <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < self.rate_429
+
+def build_user_guilds(config):
+    """Guild list returned for a user token, all with Manage Server permission"""
+    guilds = []
+    for i in range(config.user_guilds):
+        guilds.append({
+            "id": guild_id(i),
+            "name": f"Bench Guild {i}",
+            "icon": f"{i:032x}" if i % 3 else None,
+            "owner": i == 0,
+            "permissions": str(0x20 | 0x8),
+        })
+    return guilds
+
+def build_bot_guilds(config):
+    """Guild list returned for the bot token, a prefix of the user's guilds"""
+    count = int(config.user_guilds * config.bot_guild_ratio)
+    return [{"id": guild_id(i), "name": f"Bench Guild {i}", "icon": None} for i in range(count)]
+
+def build_roles(config, gid):
+    """Role list for a synthetic guild"""
+    index = int(gid) - int(guild_id(0))
+    roles = [{"id": gid, "name": "@everyone", "color": 0, "position": 0}]
+    for r in range(1, config.roles_per_guild):
+        roles.append({
+            "id": role_id(index, r),
+            "name": f"Role {r}",
+            "color": (r * 2654435761) & 0xFFFFFF,
+            "position": r,
+        })
+    return roles
+
+def build_channels(gid):
+    """Channel list for a synthetic guild: one category, the rest text channels"""
+    index = int(gid) - int(guild_id(0))
+    # Numbered above the guild's roles so the IDs never collide
+    base = int(role_id(index, 500))
+    channels = [{"id": str(base), "name": "Text Channels", "type": 4, "position": 0, "parent_id": None}]
+    for c in range(1, CHANNELS_PER_GUILD):
+        channels.append({"id": str(base + c), "name": f"channel-{c}", "type": 0, "position": c, "parent_id": str(base)})
+    return channels
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler; the server instance carries the StubConfig"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def begin(self, route):
+        """Apply latency and 429 injection; returns False when throttled"""
+        config = self.server.config
+        config.count(route)
+        time.sleep(config.delay())
+        if config.should_throttle():
+            config.count(route + ":429")
+            self.send_json(429, {
+                "message": "You are being rate limited.",
+                "retry_after": config.retry_after,
+                "global": False,
+            }, {"Retry-After": str(config.retry_after)})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode()) if length else {}
+        if self.path != "/api/oauth2/token":
+            return self.send_json(404, {"message": "404: Not Found"})
+        if not self.begin("oauth2/token"):
+            return
+        code = form.get("code", ["anon"])[0]
+        self.send_json(200, {
+            "access_token": f"stub-{code}",
+            "token_type": "Bearer",
+            "expires_in": 604800,
+            "scope": "identify guilds",
+        })
+
+    def do_GET(self):
+        auth = self.headers.get("Authorization", "")
+        config = self.server.config
+        if self.path == "/api/users/@me":
+            if not self.begin("users/@me"):
+                return
+            name = auth.split("stub-", 1)[-1] or "bench"
+            return self.send_json(200, {
+                "id": str(100000000000000000 + (zlib.crc32(name.encode()) & 0xFFFFFF)),
+                "username": name,
+                "discriminator": "0001",
+                "avatar": None,
+            })
+        if self.path == "/api/users/@me/guilds":
+            if auth.startswith("Bot "):
+                if not self.begin("users/@me/guilds:bot"):
+                    return
+                return self.send_json(200, build_bot_guilds(config))
+            if not self.begin("users/@me/guilds"):
+                return
+            return self.send_json(200, build_user_guilds(config))
+        match = ROLES_PATH.match(self.path)
+        if match:
+            if not self.begin("guilds/roles"):
+                return
+            return self.send_json(200, build_roles(config, match.group(1)))
+        match = CHANNELS_PATH.match(self.path)
+        if match:
+            if not self.begin("guilds/channels"):
+                return
+            return self.send_json(200, build_channels(match.group(1)))
+        self.send_json(404, {"message": "404: Not Found"})
+
+def make_server(host, port, config):
+    """Create (but do not start) a stub server bound to host:port"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub Discord REST API for dashboard benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--user-guilds", type=int, default=25)
+    parser.add_argument("--bot-guild-ratio", type=float, default=0.8)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after,
+                        args.user_guilds, args.bot_guild_ratio, args.roles, args.seed)
+    server = make_server(args.host, args.port, config)
+    print(f"Stub Discord API listening on http://{args.host}:{args.port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(config.counters, indent=4))
+
+if __name__ == "__main__":
+    main()
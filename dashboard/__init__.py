@@ -0,0 +1 @@
+"""Support modules for the Modway dashboard cog (webcog.py)."""
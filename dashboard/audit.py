@@ -0,0 +1,223 @@
+"""Append-only audit journal of dashboard configuration changes.
+
+Changes are appended as JSON lines to numbered segment files in one
+directory, starting a new segment once the current one reaches
+`segment_bytes`. Request threads only put the record on a queue; a writer
+thread batches them to disk under an exclusive file lock, so the bot process,
+shard processes and dashboard workers can all write to the same journal.
+
+The journal itself is the source of truth. Each process builds an in-memory
+per-guild index of (time, record ID) pairs on its first query and then only
+scans bytes appended since, so queries by guild and time range are binary
+searches plus one seek per returned record. A record ID is the segment
+number and byte offset packed into one integer, which also makes it a stable
+pagination cursor.
+"""
+import bisect
+import fcntl
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger("discord_bot")
+
+SEGMENT_NAME = re.compile(r"^segment-(\d{6})\.jsonl$")
+OFFSET_BITS = 40
+
+def record_id(segment, offset):
+    return (segment << OFFSET_BITS) | offset
+
+def split_record_id(rid):
+    return rid >> OFFSET_BITS, rid & ((1 << OFFSET_BITS) - 1)
+
+class GuildIndex:
+    """Record IDs of one guild in journal order, with non-decreasing timestamps"""
+
+    __slots__ = ("times", "ids")
+
+    def __init__(self):
+        self.times = []
+        self.ids = []
+
+    def add(self, ts, rid):
+        # Writers in other processes can interleave slightly out of time order
+        if self.times and ts < self.times[-1]:
+            ts = self.times[-1]
+        self.times.append(ts)
+        self.ids.append(rid)
+
+class AuditJournal:
+    """Non-blocking writer and indexed reader for the change journal"""
+
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, flush_interval=0.2):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self._queued_lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._index = {}
+        self._scanned = None  # (segment, offset) read up to
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, directory):
+        return cls(directory, segment_bytes=int(os.getenv("DASHBOARD_AUDIT_SEGMENT_BYTES", 8 * 1024 * 1024)))
+
+    # Writing
+
+    def append(self, guild_id, action, actor=None, **details):
+        """Queue a change record; never blocks on disk"""
+        record = {"ts": round(time.time(), 3), "guild_id": str(guild_id), "action": action, "actor": actor}
+        record.update(details)
+        with self._queued_lock:
+            self.queued += 1
+        self._queue.put(record)
+        if self._writer is None:
+            self._start_writer()
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None and not self._stop_event.is_set():
+                os.makedirs(self.directory, exist_ok=True)
+                self._writer = threading.Thread(target=self._run, name="AuditJournal", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return
+                continue
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error(f"Failed to write {len(batch)} audit records: {e}")
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.jsonl")
+
+    def segments(self):
+        """Segment numbers present on disk, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(m.group(1)) for m in map(SEGMENT_NAME.match, os.listdir(self.directory)) if m)
+
+    def _write_batch(self, batch):
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in batch).encode()
+        with open(os.path.join(self.directory, "journal.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = self.segments()
+            segment = segments[-1] if segments else 1
+            path = self._segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                segment += 1
+                path = self._segment_path(segment)
+            with open(path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        self.written += len(batch)
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far has been written (or dropped)"""
+        with self._queued_lock:
+            target = self.queued
+        deadline = time.monotonic() + timeout
+        # An empty queue isn't enough: the writer may still be writing the batch it took
+        while self.written + self.dropped < target and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        self._stop_event.set()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+
+    # Reading
+
+    def _catch_up(self):
+        """Index records appended since the last scan; caller holds the index lock"""
+        segments = self.segments()
+        if self._scanned is not None:
+            segments = [s for s in segments if s >= self._scanned[0]]
+        for segment in segments:
+            start = self._scanned[1] if self._scanned is not None and self._scanned[0] == segment else 0
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(start)
+                offset = start
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partially written; picked up on a later scan
+                        break
+                    try:
+                        record = json.loads(line)
+                        guild = self._index.get(record["guild_id"])
+                        if guild is None:
+                            guild = self._index[record["guild_id"]] = GuildIndex()
+                        guild.add(record["ts"], record_id(segment, offset))
+                    except (ValueError, KeyError):
+                        logger.warning(f"Skipping corrupt audit record in segment {segment} at {offset}")
+                    offset += len(line)
+            self._scanned = (segment, offset)
+
+    def _read(self, rids):
+        records = []
+        handles = {}
+        try:
+            for rid in rids:
+                segment, offset = split_record_id(rid)
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(self._segment_path(segment), "rb")
+                f.seek(offset)
+                record = json.loads(f.readline())
+                record["id"] = str(rid)
+                records.append(record)
+        finally:
+            for f in handles.values():
+                f.close()
+        return records
+
+    def history(self, guild_id, since=None, until=None, before=None, limit=50):
+        """Newest-first records of a guild within [since, until), starting below the `before` cursor.
+
+        Returns (records, next cursor or None).
+        """
+        with self._index_lock:
+            self._catch_up()
+            guild = self._index.get(str(guild_id))
+            if guild is None:
+                return [], None
+            low = bisect.bisect_left(guild.times, since) if since is not None else 0
+            high = bisect.bisect_left(guild.times, until) if until is not None else len(guild.ids)
+            if before is not None:
+                high = min(high, bisect.bisect_left(guild.ids, before))
+            start = max(low, high - limit)
+            rids = guild.ids[start:high][::-1]
+        records = self._read(rids)
+        return records, (str(rids[-1]) if rids and start > low else None)
+
+    def stats(self):
+        return {
+            "segments": len(self.segments()),
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,121 @@
+"""AutoRole settings format and the role search index behind its config page.
+
+A guild's entry in the "autorole" namespace is either a legacy single role
+ID string or a dict:
+
+    {"roles": ["123", "456"], "delay": 0, "target": "all"}
+
+`delay` is how many seconds after joining the roles are given, `target`
+limits them to "humans" or "bots". normalize() turns either form into the
+dict, so the AutoRole cog and the dashboard read old and new entries alike.
+"""
+import bisect
+import collections
+import threading
+
+TARGETS = ("all", "humans", "bots")
+MAX_ROLES = 10
+MAX_DELAY = 86400
+
+def normalize(entry):
+    """Settings dict for a stored entry, or None if AutoRole isn't configured"""
+    if not entry:
+        return None
+    if isinstance(entry, (str, int)):
+        return {"roles": [str(entry)], "delay": 0, "target": "all"}
+    roles = [str(role_id) for role_id in entry.get("roles", [])]
+    if not roles:
+        return None
+    return {"roles": roles, "delay": int(entry.get("delay", 0)), "target": entry.get("target", "all")}
+
+def applies_to(config, is_bot):
+    """Whether a joining member (bot or human) should get the configured roles"""
+    target = config.get("target", "all")
+    return target == "all" or (target == "bots") == is_bot
+
+def parse_request(data):
+    """Settings from a save request body; returns (settings or None to clear, error or None).
+
+    Accepts the old {"roleId": "..."} body as well as {"roleIds": [...], "delay": n, "target": "..."}.
+    """
+    if "roleIds" in data:
+        role_ids = data.get("roleIds") or []
+    else:
+        role_ids = [data["roleId"]] if data.get("roleId") else []
+    if not isinstance(role_ids, list) or not all(isinstance(r, (str, int)) for r in role_ids):
+        return None, "roleIds must be a list of role IDs"
+    role_ids = list(dict.fromkeys(str(r) for r in role_ids))
+    if len(role_ids) > MAX_ROLES:
+        return None, f"At most {MAX_ROLES} roles can be assigned automatically"
+    delay = data.get("delay") or 0
+    # int() would quietly turn true into 1 and 12.9 into 12
+    if isinstance(delay, bool) or (isinstance(delay, float) and not delay.is_integer()):
+        return None, "Delay must be a number of seconds"
+    try:
+        delay = int(delay)
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: Infinity, which JSON bodies may carry
+        return None, "Delay must be a number of seconds"
+    if not 0 <= delay <= MAX_DELAY:
+        return None, f"Delay must be between 0 and {MAX_DELAY} seconds"
+    target = data.get("target") or "all"
+    if target not in TARGETS:
+        return None, "Target must be all, humans or bots"
+    if not role_ids:
+        return None, None
+    return {"roles": role_ids, "delay": delay, "target": target}, None
+
+class RoleIndex:
+    """Assignable roles of one guild, position-sorted, with prefix and substring search"""
+
+    def __init__(self, guild_id, roles):
+        # @everyone shares the guild's ID and managed roles belong to integrations
+        assignable = [r for r in roles if str(r["id"]) != str(guild_id) and not r.get("managed")]
+        self.roles = sorted(assignable, key=lambda r: r.get("position", 0), reverse=True)
+        self.by_id = {str(r["id"]): r for r in self.roles}
+        self._names = [r["name"].casefold() for r in self.roles]
+        # (name, rank) pairs sorted by name, so a prefix is one contiguous slice
+        self._sorted = sorted((name, rank) for rank, name in enumerate(self._names))
+
+    def search(self, query, limit=20):
+        """Prefix matches first, then substring matches, each in position order"""
+        query = query.strip().casefold()
+        if not query:
+            return self.roles[:limit]
+        start = bisect.bisect_left(self._sorted, (query, -1))
+        prefix = set()
+        for name, rank in self._sorted[start:]:
+            if not name.startswith(query):
+                break
+            prefix.add(rank)
+        ranks = sorted(prefix)
+        if len(ranks) < limit:
+            ranks += [rank for rank, name in enumerate(self._names) if rank not in prefix and query in name]
+        return [self.roles[rank] for rank in ranks[:limit]]
+
+    def __len__(self):
+        return len(self.roles)
+
+class RoleIndexCache:
+    """Per-guild RoleIndex objects, rebuilt only when the role list they came from changes"""
+
+    def __init__(self, max_guilds=1024):
+        self.max_guilds = max_guilds
+        self._indexes = collections.OrderedDict()  # guild_id -> (roles list, RoleIndex)
+        self._lock = threading.Lock()
+
+    def get(self, guild_id, roles):
+        guild_id = str(guild_id)
+        with self._lock:
+            entry = self._indexes.get(guild_id)
+            # The Discord client hands out the same list object until it refetches
+            if entry is not None and entry[0] is roles:
+                self._indexes.move_to_end(guild_id)
+                return entry[1]
+        index = RoleIndex(guild_id, roles)
+        with self._lock:
+            self._indexes[guild_id] = (roles, index)
+            self._indexes.move_to_end(guild_id)
+            while len(self._indexes) > self.max_guilds:
+                self._indexes.popitem(last=False)
+        return index
@@ -0,0 +1,90 @@
+"""Circuit breaker for calls to an upstream endpoint family."""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one probe through
+    after `recovery_timeout` seconds; `success_threshold` probe successes close it again."""
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, success_threshold=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.success_threshold = success_threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.successes = 0
+        self.opened_at = None
+        self.total_failures = 0
+        self.total_successes = 0
+        self.times_opened = 0
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self.successes = 0
+            # Half-open: one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                self.successes += 1
+                if self.successes >= self.success_threshold:
+                    self.state = CLOSED
+                    self.failures = 0
+            else:
+                self.failures = 0
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.total_failures += 1
+            self.last_error = str(error) if error else None
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.failures += 1
+            if self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def snapshot(self):
+        """State for monitoring"""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "retry_in": retry_in,
+                "times_opened": self.times_opened,
+                "total_failures": self.total_failures,
+                "total_successes": self.total_successes,
+                "last_error": self.last_error,
+            }
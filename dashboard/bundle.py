@@ -0,0 +1,130 @@
+"""Settings bundles: a guild's (or every guild's) settings as one file.
+
+A bundle is gzip-compressed JSON lines:
+- a header first: {"format": "modway-settings", "version": 1, ...};
+- then one record per stored document: {"ns": namespace, "guild": guild ID,
+  "data": document};
+- and a trailer last: {"end": true, "records": count}. Without it, a bundle
+  is treated as cut short.
+
+Both directions stream. write() turns records into compressed chunks as it
+goes. BundleReader decompresses a bounded amount at a time and hands out
+one record per line. So exporting or importing 50k guilds takes no more
+memory than one.
+"""
+import json
+import time
+import zlib
+
+FORMAT = "modway-settings"
+VERSION = 1
+CHUNK = 64 * 1024
+# Longest record line accepted on import
+MAX_LINE = 1024 * 1024
+
+class BundleError(ValueError):
+    """A bundle that can't be read or holds an invalid record"""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}" if line else message)
+        self.line = line
+
+def write(records, **meta):
+    """Yield the compressed bundle for (namespace, guild_id, document JSON text) records"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    header = dict(meta, format=FORMAT, version=VERSION, created_at=round(time.time(), 3))
+    lines = [json.dumps(header) + "\n"]
+    size = 0
+    count = 0
+    for namespace, guild_id, raw in records:
+        # The document is already JSON; splice it in rather than decoding and encoding it again
+        line = f'{{"ns": {json.dumps(namespace)}, "guild": "{guild_id}", "data": {raw}}}\n'
+        lines.append(line)
+        size += len(line)
+        count += 1
+        if size >= CHUNK:
+            chunk = compressor.compress("".join(lines).encode())
+            lines = []
+            size = 0
+            if chunk:
+                yield chunk
+    lines.append(json.dumps({"end": True, "records": count}) + "\n")
+    yield compressor.compress("".join(lines).encode()) + compressor.flush()
+
+def export(store, namespaces, guild_id=None):
+    """Compressed bundle of one guild's documents in `namespaces`, or of every guild's"""
+    def records():
+        for namespace in namespaces:
+            if guild_id is not None:
+                document = store.get_versioned(namespace, guild_id)[0]
+                if document is not None:
+                    yield namespace, str(guild_id), json.dumps(document)
+                continue
+            for stored_guild_id, raw in store.iter_raw(namespace):
+                yield namespace, stored_guild_id, raw
+    return write(records(), guild=guild_id, namespaces=list(namespaces))
+
+class BundleReader:
+    """Reads a bundle from a binary file object; iterate for (line, namespace, guild_id, document)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lines = self._read_lines()
+        self.header = self._parse(1, next(self._lines, b""))
+        if self.header.get("format") != FORMAT:
+            raise BundleError(1, "not a settings bundle")
+        if self.header.get("version") != VERSION:
+            raise BundleError(1, f"bundle version {self.header.get('version')} is not supported")
+
+    def _read_lines(self):
+        decompressor = zlib.decompressobj(31)
+        pending = b""
+        try:
+            while not decompressor.eof:
+                data = self.stream.read(CHUNK)
+                if not data:
+                    break
+                while data:
+                    # Capped output per call, so a small upload can't inflate into gigabytes at once
+                    pending += decompressor.decompress(data, CHUNK)
+                    data = decompressor.unconsumed_tail
+                    *complete, pending = pending.split(b"\n")
+                    yield from complete
+                    if len(pending) > MAX_LINE:
+                        raise BundleError(None, f"a record is longer than {MAX_LINE} bytes")
+            pending += decompressor.flush()
+        except zlib.error as e:
+            raise BundleError(None, f"not a gzip-compressed bundle ({e})")
+        if not decompressor.eof:
+            raise BundleError(None, "the bundle is cut short")
+        yield from pending.split(b"\n")
+
+    def _parse(self, line, raw):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise BundleError(line, "not valid JSON")
+        if not isinstance(value, dict):
+            raise BundleError(line, "not a JSON object")
+        return value
+
+    def __iter__(self):
+        count = 0
+        for line, raw in enumerate(self._lines, 2):
+            if not raw.strip():
+                continue
+            record = self._parse(line, raw)
+            if record.get("end"):
+                if record.get("records") != count:
+                    raise BundleError(line, f"trailer counts {record.get('records')} records, found {count}")
+                # Read on to the end of the gzip stream, so a file missing its checksum is still caught
+                for extra in self._lines:
+                    if extra.strip():
+                        raise BundleError(line + 1, "data after the trailer")
+                return
+            namespace, guild_id = record.get("ns"), record.get("guild")
+            if not isinstance(namespace, str) or not isinstance(guild_id, str) or not guild_id.isdigit():
+                raise BundleError(line, "a record needs a namespace and a guild ID")
+            count += 1
+            yield line, namespace, guild_id, record.get("data")
+        raise BundleError(None, "the bundle is cut short (no trailer)")
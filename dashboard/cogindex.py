@@ -0,0 +1,125 @@
+"""Inverted index from cog to the guilds that have it enabled or disabled.
+
+The index follows the "cog_settings" namespace of the settings store through
+its change counter, so it only reads rows written since its last sync no
+matter which process wrote them. Guilds without a stored value for a cog
+count as enabled, matching get_cog_status. Each (cog, state) keeps its
+guild IDs in a sorted list, which gives counts in constant time and
+cursor-based pages with a binary search.
+"""
+import bisect
+import json
+import threading
+
+NAMESPACE = "cog_settings"
+
+class SortedIds:
+    """Sorted list of integer guild IDs"""
+
+    __slots__ = ("ids",)
+
+    def __init__(self):
+        self.ids = []
+
+    def add(self, guild_id):
+        i = bisect.bisect_left(self.ids, guild_id)
+        if i == len(self.ids) or self.ids[i] != guild_id:
+            self.ids.insert(i, guild_id)
+
+    def discard(self, guild_id):
+        i = bisect.bisect_left(self.ids, guild_id)
+        if i < len(self.ids) and self.ids[i] == guild_id:
+            del self.ids[i]
+
+    def page(self, after=None, limit=100):
+        """Up to `limit` IDs greater than `after`"""
+        start = 0 if after is None else bisect.bisect_right(self.ids, after)
+        return self.ids[start:start + limit]
+
+    def __contains__(self, guild_id):
+        i = bisect.bisect_left(self.ids, guild_id)
+        return i < len(self.ids) and self.ids[i] == guild_id
+
+    def __len__(self):
+        return len(self.ids)
+
+class CogIndex:
+    """Per-cog enabled/disabled guild sets, kept in step with the settings store"""
+
+    def __init__(self, store, cogs):
+        self.store = store
+        self.cogs = list(cogs)
+        self.enabled = {cog: SortedIds() for cog in self.cogs}
+        self.disabled = {cog: SortedIds() for cog in self.cogs}
+        self.guilds = set()
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def _set(self, guild_id, cog, enabled):
+        if enabled:
+            self.disabled[cog].discard(guild_id)
+            self.enabled[cog].add(guild_id)
+        else:
+            self.enabled[cog].discard(guild_id)
+            self.disabled[cog].add(guild_id)
+
+    def _apply(self, guild_id, settings):
+        guild_id = int(guild_id)
+        if settings is None:
+            # Settings deleted: back to every cog at its default
+            settings = {}
+        self.guilds.add(guild_id)
+        for cog in self.cogs:
+            self._set(guild_id, cog, settings.get(cog, True))
+
+    def set(self, guild_id, cog_name, enabled):
+        """Record a change made by this process right away, ahead of the next sync"""
+        if cog_name not in self.enabled:
+            return
+        with self._lock:
+            guild_id = int(guild_id)
+            if guild_id not in self.guilds:
+                self._apply(guild_id, {})
+            self._set(guild_id, cog_name, enabled)
+
+    def track(self, guild_ids):
+        """Add guilds the bot is in; guilds without stored settings have every cog enabled"""
+        with self._lock:
+            for guild_id in guild_ids:
+                guild_id = int(guild_id)
+                if guild_id not in self.guilds:
+                    self._apply(guild_id, {})
+
+    def sync(self):
+        """Apply rows written to the store since the last sync"""
+        current = self.store.change_counter(NAMESPACE)
+        if current == self.seq:
+            return
+        # Read outside the lock so is_enabled() never waits on SQLite; rows a
+        # concurrent sync already applied are skipped by their seq
+        rows = self.store.changes_since(NAMESPACE, self.seq)
+        with self._lock:
+            for guild_id, data, seq in rows:
+                if seq > self.seq:
+                    self._apply(guild_id, json.loads(data) if data is not None else None)
+                    self.seq = seq
+            self.seq = max(self.seq, current)
+
+    def is_enabled(self, guild_id, cog_name):
+        """Whether a cog is enabled for a guild, answered from memory; unknown guilds and cogs are enabled"""
+        disabled = self.disabled.get(cog_name)
+        if disabled is None:
+            return True
+        with self._lock:
+            return int(guild_id) not in disabled
+
+    def counts(self):
+        """{cog: {"enabled": n, "disabled": n}}"""
+        with self._lock:
+            return {cog: {"enabled": len(self.enabled[cog]), "disabled": len(self.disabled[cog])} for cog in self.cogs}
+
+    def page(self, cog_name, enabled, after=None, limit=100):
+        """(total, guild IDs) for one cog and state, starting after the `after` cursor"""
+        ids = (self.enabled if enabled else self.disabled)[cog_name]
+        with self._lock:
+            return len(ids), [str(guild_id) for guild_id in ids.page(after, limit)]
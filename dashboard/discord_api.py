@@ -0,0 +1,261 @@
+"""Discord REST client used by the dashboard routes.
+
+Calls are grouped into endpoint families, each behind its own circuit
+breaker. Guild, role and channel lists are cached: within `cache_ttl` they are
+served straight from memory. After that they are revalidated, and if
+Discord is slow (no answer within `slow_call` seconds), failing, or its
+breaker is open, the last known-good copy is served marked as stale while
+the refresh finishes in the background.
+"""
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+from dashboard.breaker import CLOSED, CircuitBreaker
+from dashboard.ratelimit import RateLimiter
+
+FAMILIES = ("oauth", "user_guilds", "bot_guilds", "guild_roles", "guild_channels")
+# Families called with the bot token; they spend the bot's own global rate limit
+BOT_FAMILIES = ("bot_guilds", "guild_roles", "guild_channels")
+
+class ApiResult:
+    """Outcome of a Discord call: payload, HTTP status and whether it came from a stale cache"""
+
+    __slots__ = ("data", "status", "stale", "age", "error")
+
+    def __init__(self, data=None, status=None, stale=False, age=None, error=None):
+        self.data = data
+        self.status = status
+        self.stale = stale
+        self.age = age
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == 200
+
+def is_upstream_failure(status):
+    """Statuses that say Discord can't serve us right now, as opposed to a real answer"""
+    return status is None or status == 429 or status >= 500
+
+class DiscordClient:
+    """Thread-safe Discord REST client with per-family breakers and a stale-while-revalidate cache"""
+
+    def __init__(self, base, bot_token, timeout=10.0, slow_call=2.0, cache_ttl=30.0, max_stale=900.0,
+                 failure_threshold=5, recovery_timeout=30.0, cache_size=4096, bot_limiter=None):
+        self.base = base
+        self.bot_token = bot_token
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.cache_ttl = cache_ttl
+        self.max_stale = max_stale
+        self.cache_size = cache_size
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, recovery_timeout) for name in FAMILIES}
+        # Caps what the dashboard spends of the bot token's budget, leaving the rest to the bot
+        self.bot_limiter = bot_limiter
+        self.stale_served = 0
+        self._cache = collections.OrderedDict()  # key -> (data, fetched_at)
+        # Optional callable(key) -> (data, age) consulted on a cache miss, e.g. a warm-start snapshot
+        self.fallback = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._refresher = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="DiscordRefresh")
+
+    @classmethod
+    def from_env(cls, base, bot_token, timeout):
+        return cls(
+            base, bot_token, timeout=timeout,
+            slow_call=float(os.getenv("DISCORD_SLOW_CALL", 2.0)),
+            cache_ttl=float(os.getenv("DISCORD_CACHE_TTL", 30.0)),
+            max_stale=float(os.getenv("DISCORD_MAX_STALE", 900.0)),
+            failure_threshold=int(os.getenv("DISCORD_BREAKER_FAILURES", 5)),
+            recovery_timeout=float(os.getenv("DISCORD_BREAKER_RECOVERY", 30.0)),
+            bot_limiter=RateLimiter(
+                "discord_bot_token",
+                float(os.getenv("DISCORD_BOT_RATE", 20.0)),
+                float(os.getenv("DISCORD_BOT_BURST", 20.0)),
+                max_keys=1,
+            ),
+        )
+
+    def close(self):
+        """Stop the refresh threads and the HTTP session; refreshes already running finish first"""
+        self._refresher.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
+
+    def _http(self):
+        # requests is only imported once the first call is made
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def _request(self, family, method, path, **kwargs):
+        """One upstream call through the family's breaker; returns (status, json or None)"""
+        if family in BOT_FAMILIES and self.bot_limiter is not None and self.bot_limiter.take():
+            # Out of budget: answer like Discord would, without counting against the breaker
+            return 429, None
+        breaker = self.breakers[family]
+        if not breaker.allow():
+            return None, None
+        try:
+            response = self._http().request(method, self.base + path, timeout=self.timeout, **kwargs)
+        except Exception as e:
+            breaker.record_failure(e)
+            return None, None
+        if is_upstream_failure(response.status_code):
+            breaker.record_failure(f"HTTP {response.status_code}")
+            return response.status_code, None
+        breaker.record_success()
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    # Cache
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[1] <= self.max_stale:
+                    self._cache.move_to_end(key)
+                    return entry
+                del self._cache[key]
+        if self.fallback is None:
+            return None
+        seeded = self.fallback(key)
+        if seeded is None or seeded[1] > self.max_stale:
+            return None
+        with self._lock:
+            return self._cache.setdefault(key, (seeded[0], time.monotonic() - seeded[1]))
+
+    def _store(self, key, data):
+        with self._lock:
+            self._cache[key] = (data, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, family, key, path, headers):
+        status, data = self._request(family, "GET", path, headers=headers)
+        if status == 200 and data is not None:
+            self._store(key, data)
+            return ApiResult(data, 200)
+        return ApiResult(status=status, error="Discord is unavailable" if is_upstream_failure(status) else f"HTTP {status}")
+
+    def _refresh(self, family, key, path, headers):
+        """Start a background fetch for key, or join the one already running"""
+        with self._lock:
+            future = self._inflight.get(key)
+            started = future is None
+            if started:
+                future = self._refresher.submit(self._fetch, family, key, path, headers)
+                self._inflight[key] = future
+        if started:
+            # Outside the lock: a fetch that already finished runs the callback right here
+            future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, *key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def export(self, families=BOT_FAMILIES):
+        """Cached entries of the given families as (key, data, age) tuples"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, data, now - fetched_at) for key, (data, fetched_at) in self._cache.items()
+                    if key[0] in families]
+
+    def is_fresh(self, *key):
+        """Whether a cached entry exists and is still within the TTL"""
+        entry = self._cached(key)
+        return entry is not None and time.monotonic() - entry[1] <= self.cache_ttl
+
+    def is_available(self, family):
+        """False while the family's breaker is refusing calls"""
+        return self.breakers[family].state == CLOSED
+
+    def _stale(self, entry):
+        self.stale_served += 1
+        return ApiResult(entry[0], 200, stale=True, age=round(time.monotonic() - entry[1], 1))
+
+    def _get(self, family, key, path, headers):
+        entry = self._cached(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.cache_ttl:
+            return ApiResult(entry[0], 200)
+        future = self._refresh(family, key, path, headers)
+        if entry is None:
+            # Nothing to fall back on, so wait for Discord
+            return future.result()
+        try:
+            result = future.result(timeout=self.slow_call)
+        except concurrent.futures.TimeoutError:
+            return self._stale(entry)
+        if is_upstream_failure(result.status):
+            return self._stale(entry)
+        return result
+
+    # Endpoints
+
+    def user_guilds(self, access_token):
+        """Guilds of the logged-in user (cached per access token)"""
+        return self._get("user_guilds", ("user_guilds", access_token), "/users/@me/guilds",
+                         {"Authorization": f"Bearer {access_token}"})
+
+    def bot_guilds(self, live=False):
+        """Guilds the bot is in; live=True skips the cache and waits for Discord"""
+        args = ("bot_guilds", ("bot_guilds",), "/users/@me/guilds", {"Authorization": f"Bot {self.bot_token}"})
+        if live:
+            return self._refresh(*args).result()
+        return self._get(*args)
+
+    def guild_roles(self, guild_id):
+        """Roles of a guild, fetched with the bot token"""
+        return self._get("guild_roles", ("guild_roles", str(guild_id)), f"/guilds/{guild_id}/roles",
+                         {"Authorization": f"Bot {self.bot_token}"})
+
+    def guild_channels(self, guild_id):
+        """Channels of a guild, fetched with the bot token"""
+        return self._get("guild_channels", ("guild_channels", str(guild_id)), f"/guilds/{guild_id}/channels",
+                         {"Authorization": f"Bot {self.bot_token}"})
+
+    def exchange_code(self, form):
+        """OAuth2 authorization code exchange (never cached)"""
+        status, data = self._request("oauth", "POST", "/oauth2/token", data=form,
+                                     headers={"Content-Type": "application/x-www-form-urlencoded"})
+        return ApiResult(data, status)
+
+    def current_user(self, access_token):
+        """The user an access token belongs to (never cached)"""
+        status, data = self._request("oauth", "GET", "/users/@me",
+                                     headers={"Authorization": f"Bearer {access_token}"})
+        return ApiResult(data, status)
+
+    def status(self):
+        """Breaker states and cache figures for monitoring"""
+        with self._lock:
+            cached = len(self._cache)
+            refreshing = len(self._inflight)
+        return {
+            "breakers": {name: breaker.snapshot() for name, breaker in self.breakers.items()},
+            "bot_rate_limit": self.bot_limiter.stats() if self.bot_limiter is not None else None,
+            "cache": {
+                "entries": cached,
+                "capacity": self.cache_size,
+                "refreshing": refreshing,
+                "stale_served": self.stale_served,
+                "ttl": self.cache_ttl,
+                "max_stale": self.max_stale,
+            },
+        }
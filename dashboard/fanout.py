@@ -0,0 +1,74 @@
+"""Run a request's independent lookups concurrently under one shared deadline.
+
+Flask request threads hand zero-argument callables to a bounded thread pool
+and wait for all of them, so a page costs roughly its slowest lookup rather
+than the sum of them. Callables run outside the Flask request context and
+must not touch `request` or `session`.
+"""
+import concurrent.futures
+import os
+import threading
+import time
+
+_executor = None
+_executor_lock = threading.Lock()
+
+class FanoutTimeout(Exception):
+    """A fanned-out call did not finish before the shared deadline"""
+
+def get_executor():
+    """Shared bounded pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("DASHBOARD_FANOUT_WORKERS", 16))
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DashboardFanout")
+        return _executor
+
+class Fanout:
+    """Calls already running on the pool, awaited against one shared deadline"""
+
+    def __init__(self, calls, timeout=None):
+        executor = get_executor()
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.futures = [executor.submit(call) for call in calls]
+
+    def result(self, index, return_exceptions=False):
+        """Wait for one call; later calls keep running in the meantime"""
+        future = self.futures[index]
+        remaining = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            error = FanoutTimeout(f"Call did not finish within {self.timeout}s")
+            if not return_exceptions:
+                self.cancel()
+                raise error
+            return error
+        except Exception as e:
+            if not return_exceptions:
+                self.cancel()
+                raise
+            return e
+
+    def results(self, return_exceptions=False):
+        return [self.result(i, return_exceptions) for i in range(len(self.futures))]
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+
+def start(*calls, timeout=None):
+    """Start callables concurrently and return a Fanout to collect their results from"""
+    return Fanout(calls, timeout)
+
+def gather(*calls, timeout=None, return_exceptions=False):
+    """Run callables concurrently and return their results in call order.
+
+    All calls share one deadline `timeout` seconds from now. With
+    return_exceptions=True, a failed or timed-out call yields its exception
+    in place of a result instead of raising.
+    """
+    return start(*calls, timeout=timeout).results(return_exceptions)
@@ -0,0 +1,148 @@
+"""Winner selection for the Giveaways module.
+
+Entrants arrive as an async stream (the cog pages through a giveaway
+message's reactions 100 users at a time), are checked against the
+giveaway's requirements one by one and are never collected into a list.
+Winners are picked by reservoir sampling in O(k) memory: every eligible
+entrant gets a pseudo-random tag derived from the giveaway's seed and their
+user ID, and the k entrants with the smallest tags win. Tags don't depend
+on the order entrants arrive in, so the same seed over the same entrants
+always gives the same winners, however the reaction pages came back.
+
+A reroll is draw number n over the same entrants: its tags come from the
+seed and n, and everyone who already won is excluded. Requirements are
+checked as of the time the giveaway ended, not the time of the reroll, so
+storing the seed and that time is enough to reproduce and audit every draw.
+
+Requirements are a dict:
+
+    {"roles": ["123"], "role_mode": "any", "min_account_age_days": 7, "allow_bots": False}
+
+Account age needs no API call: it comes from the timestamp in the user ID.
+"""
+import collections
+import hashlib
+import heapq
+import secrets
+import time
+
+DISCORD_EPOCH_MS = 1420070400000
+ROLE_MODES = ("any", "all")
+MAX_WINNERS = 50
+
+class Entrant(collections.namedtuple("Entrant", "user_id bot role_ids")):
+    """One entrant; role_ids is None when the member isn't known (e.g. left the server)"""
+
+def new_seed():
+    return secrets.token_hex(16)
+
+def normalize_requirements(data):
+    """Requirements from a request or stored giveaway; raises ValueError on bad input"""
+    data = data or {}
+    roles = [str(role_id) for role_id in data.get("roles") or []]
+    role_mode = data.get("role_mode") or "any"
+    if role_mode not in ROLE_MODES:
+        raise ValueError("role_mode must be any or all")
+    try:
+        min_age = int(data.get("min_account_age_days") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("min_account_age_days must be a number of days")
+    if min_age < 0:
+        raise ValueError("min_account_age_days can't be negative")
+    return {"roles": roles, "role_mode": role_mode, "min_account_age_days": min_age,
+            "allow_bots": bool(data.get("allow_bots", False))}
+
+def make_check(requirements, now=None):
+    """Function returning None for an eligible Entrant, else the reason it isn't"""
+    requirements = normalize_requirements(requirements)
+    allow_bots = requirements["allow_bots"]
+    roles = set(requirements["roles"])
+    need_all = requirements["role_mode"] == "all"
+    # Users created after the cutoff ID are too young; compare IDs instead of converting each one
+    cutoff_id = None
+    if requirements["min_account_age_days"]:
+        cutoff = (now or time.time()) - requirements["min_account_age_days"] * 86400
+        cutoff_id = max(0, int(cutoff * 1000) - DISCORD_EPOCH_MS) << 22
+
+    def check(entrant):
+        if entrant.bot and not allow_bots:
+            return "bot"
+        if cutoff_id is not None and int(entrant.user_id) >= cutoff_id:
+            return "account_age"
+        if roles:
+            if entrant.role_ids is None:
+                return "not_member"
+            member_roles = roles.intersection(map(str, entrant.role_ids))
+            if not member_roles or (need_all and len(member_roles) < len(roles)):
+                return "roles"
+        return None
+    return check
+
+def tagger(seed, draw):
+    """Function giving an entrant's pseudo-random sampling tag for one draw"""
+    base = hashlib.blake2b(f"{draw}:".encode(), digest_size=8, key=seed.encode()[:64])
+
+    def tag(user_id):
+        h = base.copy()
+        h.update(user_id.encode())
+        return int.from_bytes(h.digest(), "big")
+    return tag
+
+class Reservoir:
+    """Keeps the k entrants with the smallest tags seen so far"""
+
+    def __init__(self, k, seed, draw=0, exclude=()):
+        self.k = k
+        self.seed = seed
+        self.draw = draw
+        self.tag = tagger(seed, draw)
+        self.exclude = set(map(str, exclude))
+        self._heap = []  # (-tag, user_id): the root is the largest tag kept
+        self._kept = set()
+
+    def offer(self, user_id):
+        user_id = str(user_id)
+        if user_id in self.exclude or user_id in self._kept:
+            return
+        key = -self.tag(user_id)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (key, user_id))
+        elif key > self._heap[0][0]:
+            self._kept.discard(heapq.heapreplace(self._heap, (key, user_id))[1])
+        else:
+            return
+        self._kept.add(user_id)
+
+    def winners(self):
+        """Winning user IDs, best tag first"""
+        return [user_id for _, user_id in sorted(self._heap, reverse=True)]
+
+async def draw_winners(entrants, k, seed, draw=0, check=None, exclude=()):
+    """Pick k winners from an async iterable of Entrants; returns (winners, stats)"""
+    reservoir = Reservoir(k, seed, draw, exclude)
+    stats = collections.Counter()
+    async for entrant in entrants:
+        stats["seen"] += 1
+        reason = check(entrant) if check is not None else None
+        if reason is not None:
+            stats[f"rejected_{reason}"] += 1
+            continue
+        stats["eligible"] += 1
+        reservoir.offer(entrant.user_id)
+    return reservoir.winners(), dict(stats)
+
+def end_without_draw(message_id, error, ended_at):
+    """Store update ending a giveaway that can't be drawn, e.g. its message was deleted.
+
+    The scheduler skips ended giveaways, so this stops it retrying one every
+    check; `error` is kept on the entry to show why nobody won.
+    """
+    def update(document):
+        document = document or {}
+        entry = document.get(str(message_id))
+        if entry is not None and not entry.get("ended"):
+            entry["ended"] = True
+            entry["ended_at"] = ended_at
+            entry["error"] = error
+        return document
+    return update
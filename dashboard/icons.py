@@ -0,0 +1,220 @@
+"""Thumbnail proxy for Discord guild icons and user avatars.
+
+Each icon is fetched from the CDN once per hash and size, shrunk to the size
+the page displays it at and re-encoded as WebP, then kept in a size-bounded
+disk LRU. Discord gives an icon a new hash whenever it changes, so cached
+files never go stale and can be served with year-long cache headers.
+
+Resizing needs Pillow. Without it the original PNG is cached and served
+instead. The fetcher is any callable(url) -> bytes or None (None meaning the
+CDN has no such image), so a local stand-in can replace the CDN.
+"""
+import collections
+import io
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger("discord_bot")
+
+CDN = "https://cdn.discordapp.com"
+SIZES = (64, 96, 128, 160, 256)
+KINDS = {"icons", "avatars", "embed"}
+SAFE_PART = re.compile(r"^[A-Za-z0-9_]{1,64}$")
+MISSING_TTL = 300.0
+# Most "no such image" answers remembered at once
+MAX_MISSING = 4096
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without Pillow icons are cached unresized
+    Image = None
+
+def snap_size(size):
+    """Smallest supported size at least `size`, so the cache stays small"""
+    for candidate in SIZES:
+        if candidate >= size:
+            return candidate
+    return SIZES[-1]
+
+def http_fetcher(timeout=10.0):
+    """Default fetcher pulling images from the Discord CDN"""
+    session = {}
+
+    def fetch(url):
+        if "session" not in session:
+            import requests
+            session["session"] = requests.Session()
+        response = session["session"].get(url, timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+    return fetch
+
+class IconCache:
+    """Disk LRU of resized icons keyed by kind, owner, icon hash and size"""
+
+    def __init__(self, directory, fetcher, max_bytes=64 * 1024 * 1024, cdn=CDN, max_missing=MAX_MISSING):
+        self.directory = directory
+        self.fetcher = fetcher
+        self.max_bytes = max_bytes
+        self.max_missing = max_missing
+        self.cdn = cdn.rstrip("/")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._files = collections.OrderedDict()  # file name -> size, least recently used first
+        self._total = 0
+        self._missing = collections.OrderedDict()  # file name -> retry after, soonest first
+        self._inflight = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Rebuild LRU order from access times so it survives restarts
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith((".webp", ".png")):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._total += size
+
+    @classmethod
+    def from_env(cls, directory, fetcher=None):
+        return cls(
+            directory, fetcher or http_fetcher(),
+            max_bytes=int(os.getenv("DASHBOARD_ICON_CACHE_BYTES", 64 * 1024 * 1024)),
+            cdn=os.getenv("DISCORD_CDN_BASE", CDN),
+        )
+
+    def _name(self, kind, owner_id, icon_hash, size):
+        return f"{kind}-{owner_id}-{icon_hash}-{size}.{'webp' if Image is not None else 'png'}"
+
+    def _url(self, kind, owner_id, icon_hash):
+        if kind == "embed":
+            return f"{self.cdn}/embed/avatars/{icon_hash}.png"
+        extension = "gif" if icon_hash.startswith("a_") else "png"
+        return f"{self.cdn}/{kind}/{owner_id}/{icon_hash}.{extension}?size=256"
+
+    def get(self, kind, owner_id, icon_hash, size):
+        """(bytes, content type) of a thumbnail, or None if Discord has no such image"""
+        if kind not in KINDS or not SAFE_PART.match(str(owner_id)) or not SAFE_PART.match(str(icon_hash)):
+            return None
+        size = snap_size(size)
+        name = self._name(kind, owner_id, icon_hash, size)
+        content_type = "image/webp" if name.endswith(".webp") else "image/png"
+        data = self._read(name)
+        if data is not None:
+            self.hits += 1
+            return data, content_type
+
+        # One fetch per icon at a time; concurrent requests for it wait for that one
+        with self._lock:
+            missing_until = self._missing.get(name)
+            if missing_until is not None:
+                if missing_until > time.monotonic():
+                    return None
+                del self._missing[name]
+            event = self._inflight.get(name)
+            owner = event is None
+            if owner:
+                event = self._inflight[name] = threading.Event()
+        if not owner:
+            event.wait(30)
+            data = self._read(name)
+            return (data, content_type) if data is not None else None
+
+        try:
+            self.misses += 1
+            original = self.fetcher(self._url(kind, owner_id, icon_hash))
+            if original is None:
+                self._remember_missing(name)
+                return None
+            data = self._resize(original, size)
+            self._write(name, data)
+            return data, content_type
+        finally:
+            with self._lock:
+                del self._inflight[name]
+            event.set()
+
+    def _remember_missing(self, name):
+        now = time.monotonic()
+        with self._lock:
+            self._missing.pop(name, None)
+            self._missing[name] = now + MISSING_TTL
+            # Every entry lives MISSING_TTL, so the oldest are at the front: drop expired ones, then cap
+            while self._missing and (next(iter(self._missing.values())) <= now or len(self._missing) > self.max_missing):
+                self._missing.popitem(last=False)
+
+    def _resize(self, original, size):
+        if Image is None:
+            return original
+        with Image.open(io.BytesIO(original)) as image:
+            image.seek(0)  # First frame of animated icons
+            image = image.convert("RGBA")
+            image.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, "WEBP", quality=80, method=4)
+            return out.getvalue()
+
+    def _read(self, name):
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+            elif os.path.exists(path):
+                # Written by another worker process
+                size = os.path.getsize(path)
+                self._files[name] = size
+                self._total += size
+            else:
+                return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Keeps LRU order across restarts
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            # Evicted by another worker process
+            with self._lock:
+                self._total -= self._files.pop(name, 0)
+            return None
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        evict = []
+        with self._lock:
+            self._total += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old_name, old_size = self._files.popitem(last=False)
+                self._total -= old_size
+                evict.append(old_name)
+            self.evictions += len(evict)
+        for old_name in evict:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "missing": len(self._missing),
+                "webp": Image is not None,
+            }
@@ -0,0 +1,435 @@
+"""Persistent background jobs for long-running dashboard operations.
+
+A request handler only submits a job and returns at once; a bounded pool of
+worker threads runs it. Jobs live in a SQLite table, so they survive
+restarts and any process sharing the data directory can run them:
+- A worker claims a job by taking a lease on it. While the job runs, a
+  heartbeat thread keeps extending the lease.
+- If the process dies, the lease runs out and another worker (or this one
+  after a restart) claims the job again. Delivery is therefore at least
+  once, and handlers must be safe to run twice.
+- A handler can save a checkpoint along with its progress. The next attempt
+  starts from that checkpoint instead of from scratch.
+
+Cancellation is cooperative. A queued job is cancelled on the spot. A
+running job is flagged, and its handler stops at the next progress() call.
+A handler that raises RetryAfter is queued again after the delay. Any
+other exception fails the job.
+
+A process only claims kinds it registered a handler for, and only jobs the
+handler's `accepts(guild_id)` agrees to. So a job that needs the bot (and
+the shard owning its guild) waits until a process that has it picks it up.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from dashboard.role_queue import RetryAfter
+
+logger = logging.getLogger("discord_bot")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    guild_id TEXT,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_by TEXT,
+    created_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    message TEXT,
+    checkpoint TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (state, run_after);
+CREATE INDEX IF NOT EXISTS jobs_guild ON jobs (guild_id, created_at);
+"""
+
+ACTIVE_STATES = ("queued", "running")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+# Progress is written at most this often unless a checkpoint comes with it
+PROGRESS_INTERVAL = 0.5
+# Candidate jobs looked at per claim attempt
+CLAIM_BATCH = 20
+
+class Cancelled(Exception):
+    """Raised inside a handler when its job was cancelled or its lease was lost"""
+
+class AlreadyQueued(Exception):
+    """Raised by submit(unique=True) when the guild already has an active job of that kind"""
+
+    def __init__(self, job):
+        super().__init__(f"A {job['kind']} job is already {job['state']} for this server")
+        self.job = job
+
+class Job:
+    """What a handler sees of the job it runs"""
+
+    def __init__(self, queue, row, worker):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.guild_id = row["guild_id"]
+        self.params = json.loads(row["params"])
+        self.created_by = json.loads(row["created_by"]) if row["created_by"] else None
+        self.attempt = row["attempts"]
+        # Saved by an earlier attempt that didn't finish, or None
+        self.checkpoint = json.loads(row["checkpoint"]) if row["checkpoint"] else None
+        self.worker = worker
+        self.done = row["done"]
+        self.total = row["total"]
+        self.message = row["message"]
+        self.cancel_requested = bool(row["cancel_requested"])
+        self.lost = False
+        self._written = 0.0
+
+    def progress(self, done, total=None, message=None, checkpoint=None):
+        """Report progress; raises Cancelled once the job should stop"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if checkpoint is not None or now - self._written >= PROGRESS_INTERVAL:
+            self._written = now
+            self.queue._save_progress(self, checkpoint)
+        self.check()
+
+    def check(self):
+        """Raise Cancelled if the job was cancelled, taken over or the queue is shutting down"""
+        if self.lost:
+            raise Cancelled("Lease lost")
+        if self.cancel_requested:
+            raise Cancelled("Cancelled")
+        if self.queue._stopping.is_set():
+            raise Cancelled("Shutting down")
+
+class JobQueue:
+    """SQLite-backed job queue with a pool of worker threads"""
+
+    def __init__(self, path, workers=2, lease=60.0, max_attempts=5, poll=1.0, retention=7 * 86400):
+        self.path = path
+        self.workers = workers
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll = poll
+        self.retention = retention
+        self.handlers = {}  # kind -> (handler, accepts)
+        self.running = {}  # job id -> Job being run by this process
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pruned = 0.0
+
+    def register(self, kind, handler, accepts=None):
+        """Run jobs of `kind` in this process with `handler(job)`; its return value is the job's result"""
+        self.handlers[kind] = (handler, accepts or (lambda guild_id: True))
+        self.start()
+        self._wakeup.set()
+
+    def unregister(self, kind):
+        self.handlers.pop(kind, None)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+                         for n in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def close(self, timeout=5.0):
+        """Stop the workers; jobs still running are handed back to the queue for the next start"""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql, params=()):
+        """Run one statement; returns how many rows it changed"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def _transaction(self, body):
+        """Run body(conn) in a write transaction that other processes wait for"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = body(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Submitting and inspecting
+
+    def submit(self, kind, params=None, guild_id=None, created_by=None, unique=False, delay=0.0):
+        """Queue a job and return it as a dict; unique=True raises AlreadyQueued instead of queueing a second one"""
+        guild_id = str(guild_id) if guild_id is not None else None
+        now = time.time()
+        job_id = uuid.uuid4().hex[:12]
+
+        def insert(conn):
+            if unique:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? AND guild_id IS ? AND state IN ('queued', 'running') "
+                    "ORDER BY created_at LIMIT 1", (kind, guild_id)).fetchone()
+                if row is not None:
+                    raise AlreadyQueued(self._describe(row))
+            conn.execute(
+                "INSERT INTO jobs (id, kind, guild_id, params, state, created_by, created_at, run_after) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, guild_id, json.dumps(params or {}),
+                 json.dumps(created_by) if created_by is not None else None, now, now + delay))
+        self._transaction(insert)
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._describe(rows[0]) if rows else None
+
+    def list(self, guild_id=None, limit=20, kinds=None):
+        """Most recent jobs, of one guild if given"""
+        sql, params = "SELECT * FROM jobs", []
+        clauses = []
+        if guild_id is not None:
+            clauses.append("guild_id = ?")
+            params.append(str(guild_id))
+        if kinds:
+            clauses.append(f"kind IN ({', '.join('?' * len(kinds))})")
+            params += list(kinds)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [self._describe(row) for row in self._query(sql, params)]
+
+    def cancel(self, job_id):
+        """Cancel a job; returns it as a dict, or None if there is no such job"""
+        def flag(conn):
+            row = conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            if row["state"] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET state = 'cancelled', cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (time.time(), job_id))
+            elif row["state"] == "running":
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return True
+        if not self._transaction(flag):
+            return None
+        job = self.running.get(job_id)
+        if job is not None:
+            job.cancel_requested = True
+        return self.get(job_id)
+
+    def _describe(self, row):
+        total = row["total"]
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "guild_id": row["guild_id"],
+            "params": json.loads(row["params"]),
+            "state": row["state"],
+            "created_by": json.loads(row["created_by"]) if row["created_by"] else None,
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "attempts": row["attempts"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "done": row["done"],
+            "total": total,
+            "percent": round(row["done"] / total * 100, 1) if total else None,
+            "message": row["message"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    def stats(self):
+        counts = dict(self._query("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        return {
+            "workers": self.workers,
+            "busy": len(self.running),
+            "kinds": sorted(self.handlers),
+            "states": {state: counts.get(state, 0) for state in ACTIVE_STATES + FINISHED_STATES},
+        }
+
+    # Running
+
+    def _claim(self):
+        """Take the lease on the next job this process can run, or return None"""
+        kinds = list(self.handlers)
+        if not kinds:
+            return None
+        now = time.time()
+        worker = uuid.uuid4().hex
+
+        def take(conn):
+            rows = conn.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({', '.join('?' * len(kinds))}) AND "
+                "((state = 'queued' AND run_after <= ?) OR (state = 'running' AND lease_until < ?)) "
+                "ORDER BY run_after LIMIT ?", (*kinds, now, now, CLAIM_BATCH)).fetchall()
+            for row in rows:
+                handler = self.handlers.get(row["kind"])
+                if handler is None or not handler[1](row["guild_id"]):
+                    continue
+                if row["state"] == "running":
+                    # The process running it died or stalled past its lease
+                    logger.warning(f"Job {row['id']} ({row['kind']}) lost its worker, running it again")
+                    if row["cancel_requested"]:
+                        self._finish(conn, row["id"], row["worker"], "cancelled", error="Cancelled")
+                        continue
+                    if row["attempts"] >= self.max_attempts:
+                        self._finish(conn, row["id"], row["worker"], "failed",
+                                     error=f"Gave up after {row['attempts']} attempts")
+                        continue
+                conn.execute(
+                    "UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (worker, now + self.lease, now, row["id"]))
+                return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            return None
+        row = self._transaction(take)
+        return Job(self, row, worker) if row is not None else None
+
+    def _finish(self, conn, job_id, worker, state, result=None, error=None):
+        conn.execute(
+            "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ?, worker = NULL, lease_until = NULL "
+            "WHERE id = ? AND worker IS ?",
+            (state, json.dumps(result) if result is not None else None, error, time.time(), job_id, worker))
+
+    def _save_progress(self, job, checkpoint):
+        sql = "UPDATE jobs SET done = ?, total = ?, message = ?, lease_until = ?"
+        params = [job.done, job.total, job.message, time.time() + self.lease]
+        if checkpoint is not None:
+            sql += ", checkpoint = ?"
+            params.append(json.dumps(checkpoint))
+        sql += " WHERE id = ? AND worker = ?"
+        if self._execute(sql, params + [job.id, job.worker]) == 0:
+            job.lost = True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._prune()
+                self._wakeup.wait(self.poll)
+                self._wakeup.clear()
+                continue
+            self.running[job.id] = job
+            try:
+                self._run(job)
+            finally:
+                self.running.pop(job.id, None)
+            # Others may be waiting; look again right away
+            self._wakeup.set()
+
+    def _run(self, job):
+        handler = self.handlers.get(job.kind, (None,))[0]
+        state, result, error, retry_in = "succeeded", None, None, None
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for {job.kind}")
+            job.check()
+            result = handler(job)
+        except Cancelled as e:
+            if job.lost:
+                # Someone else holds the lease now; leave the row alone
+                logger.warning(f"Job {job.id} ({job.kind}) lost its lease and was stopped")
+                return
+            if job.cancel_requested:
+                state, error = "cancelled", str(e)
+            else:
+                # Shutting down: hand the job back without spending an attempt
+                self._execute(
+                    "UPDATE jobs SET state = 'queued', attempts = attempts - 1, worker = NULL, lease_until = NULL, "
+                    "done = ?, total = ?, message = ? WHERE id = ? AND worker = ?",
+                    (job.done, job.total, job.message, job.id, job.worker))
+                return
+        except RetryAfter as e:
+            retry_in = e.retry_after
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            state, error = "failed", str(e) or type(e).__name__
+        if retry_in is not None and job.attempt < self.max_attempts:
+            self._execute(
+                "UPDATE jobs SET state = 'queued', run_after = ?, worker = NULL, lease_until = NULL, "
+                "done = ?, total = ?, message = ? WHERE id = ? AND worker = ?",
+                (time.time() + retry_in, job.done, job.total, job.message, job.id, job.worker))
+            return
+        if retry_in is not None:
+            state, error = "failed", f"Still rate limited after {job.attempt} attempts"
+
+        def finish(conn):
+            conn.execute("UPDATE jobs SET done = ?, total = ?, message = ? WHERE id = ? AND worker = ?",
+                         (job.done, job.total, job.message, job.id, job.worker))
+            self._finish(conn, job.id, job.worker, state, result, error)
+        try:
+            self._transaction(finish)
+        except sqlite3.Error as e:
+            # The lease runs out and the job runs again, which handlers allow for
+            logger.error(f"Job {job.id} ({job.kind}) finished but could not be marked {state}: {e}")
+
+    def _heartbeat(self):
+        """Extend the leases of the jobs this process runs and pick up cancellations"""
+        while not self._stopping.wait(self.lease / 3):
+            for job in list(self.running.values()):
+                try:
+                    renewed = self._execute(
+                        "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ?",
+                        (time.time() + self.lease, job.id, job.worker))
+                    if not renewed:
+                        job.lost = True
+                        continue
+                    rows = self._query("SELECT cancel_requested FROM jobs WHERE id = ?", (job.id,))
+                    if rows and rows[0][0]:
+                        job.cancel_requested = True
+                except sqlite3.Error as e:
+                    logger.error(f"Job heartbeat failed for {job.id}: {e}")
+
+    def _prune(self):
+        """Forget finished jobs past the retention period, at most once an hour"""
+        now = time.time()
+        if now - self._pruned < 3600:
+            return
+        self._pruned = now
+        try:
+            self._execute(
+                "DELETE FROM jobs WHERE state IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+                (now - self.retention,))
+        except sqlite3.Error as e:
+            logger.error(f"Job queue could not prune old jobs: {e}")
@@ -0,0 +1,158 @@
+"""Event-loop lag watchdog.
+
+A heartbeat task on the watched loop sleeps for a fixed interval. How much
+later than asked it wakes up is the loop's lag, and it goes into a
+histogram. A monitor thread checks the heartbeat's age. Once the age passes
+the threshold, the loop is blocked right now, so the monitor grabs the loop
+thread's current stack from sys._current_frames(). The heartbeat can't do
+that itself, because it only runs again after the blocking call returns.
+
+The stack is attributed to the cog whose source file it passes through:
+- "function" is the innermost frame in the cog, usually the one making the
+  blocking call.
+- "entry" is the outermost frame in the cog, usually the listener or
+  command that was running.
+"""
+import asyncio
+import bisect
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("discord_bot")
+
+# Upper bounds of the lag histogram buckets, in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+STACK_LIMIT = 25
+
+class LoopWatchdog:
+    """Measures lag of one asyncio loop and captures what blocked it"""
+
+    def __init__(self, loop, interval=0.1, threshold=0.25, cog_files=None, max_stalls=50):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        # () -> {source file: cog name}; called from the monitor thread when a stall is caught
+        self.cog_files = cog_files or (lambda: {})
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self.samples = 0
+        self.stalls = collections.deque(maxlen=max_stalls)
+        self.stalls_by_cog = collections.Counter()
+        self._beat = None
+        self._loop_thread = None
+        self._current = None
+        self._task = None
+        self._monitor = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, loop, cog_files=None):
+        return cls(
+            loop,
+            interval=float(os.getenv("DASHBOARD_LOOP_WATCH_INTERVAL_MS", 100)) / 1000,
+            threshold=float(os.getenv("DASHBOARD_LOOP_LAG_THRESHOLD_MS", 250)) / 1000,
+            cog_files=cog_files,
+        )
+
+    def start(self):
+        """Start watching; call from the watched loop"""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self.loop.create_task(self._heartbeat())
+        self._monitor = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._record(max(0.0, now - before - self.interval))
+            self._beat = now
+            current = self._current
+            if current is not None:
+                # The blocking call has returned: the stall lasted until this wakeup
+                stall, since = current
+                stall["duration_ms"] = round((now - since) * 1000, 1)
+                self._current = None
+
+    def _record(self, lag):
+        self.histogram[bisect.bisect_left(BUCKETS_MS, lag * 1000)] += 1
+        self.lag_sum += lag
+        self.lag_max = max(self.lag_max, lag)
+        self.samples += 1
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            age = time.monotonic() - beat
+            if age < self.threshold + self.interval or self._current is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stall = self._capture(frame)
+            self._current = (stall, beat + self.interval)
+            self.stalls.append(stall)
+            self.stalls_by_cog[stall["cog"] or "unknown"] += 1
+            logger.warning(
+                f"Event loop blocked for over {age * 1000:.0f} ms in "
+                f"{stall['cog'] or 'unknown code'} ({stall['entry'] or '?'} -> {stall['function'] or '?'}):\n"
+                + "".join(stall["stack"][-8:]))
+
+    def _capture(self, frame):
+        stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+        try:
+            cog_files = self.cog_files()
+        except Exception:
+            cog_files = {}
+        cog = function = entry = None
+        for summary in reversed(stack):
+            name = cog_files.get(os.path.abspath(summary.filename))
+            if name is None:
+                continue
+            if cog is None:
+                cog, function = name, f"{summary.name} ({os.path.basename(summary.filename)}:{summary.lineno})"
+            if name == cog:
+                entry = summary.name
+        return {
+            "at": time.time(),
+            "cog": cog,
+            "function": function,
+            "entry": entry,
+            "duration_ms": None,  # Filled in once the loop runs again
+            "stack": traceback.format_list(stack),
+        }
+
+    def stats(self, stacks=False):
+        """Lag histogram and caught stalls; stacks are only included when asked for"""
+        stalls = []
+        for stall in list(self.stalls):
+            entry = dict(stall)
+            if not stacks:
+                entry.pop("stack")
+            stalls.append(entry)
+        histogram = {f"le_{bound}ms": count for bound, count in zip(BUCKETS_MS, self.histogram)}
+        histogram["over"] = self.histogram[-1]
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": self.samples,
+            "lag_mean_ms": round(self.lag_sum / self.samples * 1000, 2) if self.samples else None,
+            "lag_max_ms": round(self.lag_max * 1000, 1),
+            "histogram": histogram,
+            "stalls_by_cog": dict(self.stalls_by_cog),
+            "stalls": stalls[::-1],
+        }
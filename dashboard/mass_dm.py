@@ -0,0 +1,400 @@
+"""Mass-DM job engine for the DM System module.
+
+A job sends one message to every recipient in a list. Jobs share a bounded
+pool of in-flight sends and two global token buckets, one in front of DM
+channel creation and one in front of message sends, because Discord limits
+both routes bot-wide and treats bursts of new DM channels as spam. A 429
+pauses every job for its retry-after instead of only the send that hit it.
+
+DM channels are cached per user, so a second announcement to the same
+members skips channel creation. Members whose DMs are closed are remembered
+for a while and skipped without a request by later jobs.
+
+Each job lives in its own directory: job.json (guild, message, recipients;
+written once), progress.bin (one status byte per recipient) and state.json.
+progress.bin is rewritten every few seconds, so after a restart a job
+resumes where it stopped. Sends that were in flight or not yet checkpointed
+when the process died are repeated, so delivery is at least once.
+
+Like the AutoRole queue, the engine knows nothing about discord.py. The cog
+supplies `open_channel(user_id)` and `send(channel, guild_id, user_id,
+content)`, so the engine runs against a local stub API as well.
+"""
+import asyncio
+import collections
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from dashboard.ratelimit import RateLimiter
+from dashboard.role_queue import MemberGone, PermanentFailure, RetryAfter
+
+logger = logging.getLogger("discord_bot")
+
+PENDING, SENT, CLOSED, FAILED, GONE = range(5)
+OUTCOMES = {SENT: "sent", CLOSED: "closed", FAILED: "failed", GONE: "gone"}
+ACTIVE_STATES = ("queued", "running", "paused")
+MAX_CONTENT = 2000
+CLOSED_TTL = 6 * 3600.0
+THROUGHPUT_WINDOW = 60.0
+
+class DMClosed(Exception):
+    """Raised by `open_channel` or `send` when the member doesn't accept DMs from the bot"""
+
+class JobConflict(Exception):
+    """Raised when a guild already has a mass DM running"""
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class MassDMJob:
+    """One announcement to a fixed recipient list, with per-recipient status"""
+
+    def __init__(self, job_id, directory, guild_id, content, recipients, created_by=None, created_at=None,
+                 status=None, state="queued"):
+        self.id = job_id
+        self.directory = directory
+        self.guild_id = str(guild_id)
+        self.content = content
+        self.recipients = recipients
+        self.created_by = created_by
+        self.created_at = created_at or time.time()
+        self.status = status if status is not None else bytearray(len(recipients))
+        self.state = state
+        self.counts = collections.Counter(OUTCOMES.get(s, "pending") for s in self.status)
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.completions = collections.deque()  # monotonic times of recent completions
+        self.dirty = False
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "job.json")) as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "progress.bin"), "rb") as f:
+            status = bytearray(f.read())
+        state = "queued"
+        try:
+            with open(os.path.join(directory, "state.json")) as f:
+                saved = json.load(f)
+            state = saved.get("state", state)
+        except FileNotFoundError:
+            saved = {}
+        if len(status) != len(meta["recipients"]):
+            raise ValueError(f"progress.bin of job {meta['id']} doesn't match its recipients")
+        job = cls(meta["id"], directory, meta["guild_id"], meta["content"], meta["recipients"],
+                  meta.get("created_by"), meta.get("created_at"), status, state)
+        job.finished_at = saved.get("finished_at")
+        job.error = saved.get("error")
+        return job
+
+    def create(self):
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(os.path.join(self.directory, "job.json"), json.dumps({
+            "id": self.id,
+            "guild_id": self.guild_id,
+            "content": self.content,
+            "recipients": self.recipients,
+            "created_by": self.created_by,
+            "created_at": self.created_at,
+        }).encode())
+        self.checkpoint()
+        self.save_state()
+
+    def checkpoint(self):
+        """Persist per-recipient progress"""
+        self.dirty = False
+        _write_atomic(os.path.join(self.directory, "progress.bin"), bytes(self.status))
+
+    def save_state(self):
+        _write_atomic(os.path.join(self.directory, "state.json"), json.dumps({
+            "state": self.state,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }).encode())
+
+    def mark(self, index, outcome):
+        self.status[index] = outcome
+        self.counts["pending"] -= 1
+        self.counts[OUTCOMES[outcome]] += 1
+        self.dirty = True
+        now = time.monotonic()
+        self.completions.append(now)
+        while self.completions and self.completions[0] < now - THROUGHPUT_WINDOW:
+            self.completions.popleft()
+
+    def pending_indexes(self):
+        return [i for i, s in enumerate(self.status) if s == PENDING]
+
+    def progress(self):
+        """Counts, throughput over the last minute and ETA; safe to call from other threads"""
+        counts = self.counts.copy()
+        total = len(self.recipients)
+        remaining = counts["pending"]
+        now = time.monotonic()
+        recent = [t for t in list(self.completions) if t >= now - THROUGHPUT_WINDOW]
+        window = min(THROUGHPUT_WINDOW, now - self.started_at) if self.started_at else 0.0
+        rate = len(recent) / window if window > 1.0 else 0.0
+        eta = remaining / rate if rate and self.state == "running" else None
+        return {
+            "id": self.id,
+            "guild_id": self.guild_id,
+            "state": self.state,
+            "total": total,
+            "done": total - remaining,
+            "remaining": remaining,
+            "sent": counts["sent"],
+            "closed": counts["closed"],
+            "failed": counts["failed"],
+            "gone": counts["gone"],
+            "per_second": round(rate, 2),
+            "eta_s": round(eta) if eta is not None else None,
+            "created_by": self.created_by,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+class MassDMDispatcher:
+    """Runs mass-DM jobs with shared pacing, checkpoints and a closed-DM skip list"""
+
+    def __init__(self, directory, open_channel, send, concurrency=8, open_rate=1.0, open_burst=5,
+                 send_rate=5.0, send_burst=10, max_attempts=3, max_rate_limited=10, base_backoff=1.0,
+                 checkpoint_interval=2.0, max_channels=100000, keep_finished=20):
+        self.directory = directory
+        self.open_channel = open_channel
+        self.send = send
+        self.concurrency = concurrency
+        self.open_limiter = RateLimiter("dm_open", open_rate, open_burst, max_keys=1)
+        self.send_limiter = RateLimiter("dm_send", send_rate, send_burst, max_keys=1)
+        self.max_attempts = max_attempts
+        # 429s for one recipient before giving up on them; Discord normally clears well before
+        self.max_rate_limited = max_rate_limited
+        self.base_backoff = base_backoff
+        self.checkpoint_interval = checkpoint_interval
+        self.max_channels = max_channels
+        self.keep_finished = keep_finished
+        self.counters = collections.Counter()
+        self.jobs = collections.OrderedDict()  # job_id -> MassDMJob, oldest first
+        self._channels = collections.OrderedDict()  # user_id -> DM channel, least recently used first
+        self._closed = {}  # user_id -> monotonic time until which their DMs count as closed
+        self._blocked_until = 0.0
+        self._tasks = {}
+        self._slots = None
+
+    def load(self):
+        """Pick up jobs from a previous run; unfinished ones resume once started"""
+        os.makedirs(self.directory, exist_ok=True)
+        jobs = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                jobs.append(MassDMJob.load(path))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable mass DM job {name}: {e}")
+        for job in sorted(jobs, key=lambda job: job.created_at):
+            self.jobs[job.id] = job
+        return len(jobs)
+
+    def start(self):
+        """Resume unfinished jobs; call on the event loop after load()"""
+        for job in list(self.jobs.values()):
+            if job.state in ("queued", "running"):
+                self._run(job)
+
+    def create(self, guild_id, recipients, content, created_by=None):
+        """Create and start a job; raises JobConflict if the guild already has one going"""
+        guild_id = str(guild_id)
+        if not content or len(content) > MAX_CONTENT:
+            raise ValueError(f"The message must be between 1 and {MAX_CONTENT} characters")
+        if any(job.guild_id == guild_id and job.state in ACTIVE_STATES for job in self.jobs.values()):
+            raise JobConflict("A mass DM is already running for this server")
+        job_id = uuid.uuid4().hex[:12]
+        recipients = list(dict.fromkeys(str(user_id) for user_id in recipients))
+        job = MassDMJob(job_id, os.path.join(self.directory, job_id), guild_id, content, recipients, created_by)
+        job.create()
+        self.jobs[job_id] = job
+        self._prune()
+        self._run(job)
+        return job
+
+    def pause(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in ("queued", "running"):
+            return False
+        self._stop(job, "paused")
+        return True
+
+    def resume(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != "paused":
+            return False
+        job.state = "queued"
+        job.save_state()
+        self._run(job)
+        return True
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in ACTIVE_STATES:
+            return False
+        self._stop(job, "cancelled")
+        return True
+
+    def _stop(self, job, state):
+        job.state = state
+        if state == "cancelled":
+            job.finished_at = time.time()
+        job.save_state()
+        task = self._tasks.pop(job.id, None)
+        if task is not None:
+            task.cancel()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond keep_finished"""
+        finished = [job for job in self.jobs.values() if job.state not in ACTIVE_STATES]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def _run(self, job):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._drive(job))
+
+    async def _drive(self, job):
+        job.state = "running"
+        job.save_state()
+        job.started_at = time.monotonic()
+        pending = collections.deque(job.pending_indexes())
+        flusher = asyncio.get_running_loop().create_task(self._flush_periodically(job))
+        try:
+            workers = [self._worker(job, pending) for _ in range(min(self.concurrency, len(pending)))]
+            await asyncio.gather(*workers)
+            job.state = "done"
+            job.finished_at = time.time()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Mass DM job {job.id} for guild {job.guild_id} failed")
+            job.state = "failed"
+            job.error = str(e)
+            job.finished_at = time.time()
+        finally:
+            flusher.cancel()
+            job.checkpoint()
+            job.save_state()
+            if self._tasks.get(job.id) is asyncio.current_task():
+                del self._tasks[job.id]
+        logger.info(f"Mass DM job {job.id} for guild {job.guild_id} finished: {dict(job.counts)}")
+
+    async def _flush_periodically(self, job):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            if job.dirty:
+                job.checkpoint()
+
+    async def _worker(self, job, pending):
+        while pending:
+            index = pending.popleft()
+            async with self._slots:
+                outcome = await self._deliver(job, job.recipients[index])
+            job.mark(index, outcome)
+            self.counters[OUTCOMES[outcome]] += 1
+
+    async def _wait(self, limiter):
+        while True:
+            blocked = self._blocked_until - time.monotonic()
+            if blocked > 0:
+                await asyncio.sleep(blocked)
+                continue
+            wait = limiter.take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, job, user_id):
+        closed_until = self._closed.get(user_id)
+        if closed_until is not None:
+            if closed_until > time.monotonic():
+                self.counters["skipped_closed"] += 1
+                return CLOSED
+            del self._closed[user_id]
+        attempts = 0
+        rate_limited = 0
+        while True:
+            try:
+                channel = self._channels.get(user_id)
+                if channel is None:
+                    await self._wait(self.open_limiter)
+                    channel = await self.open_channel(user_id)
+                    self.counters["channels_opened"] += 1
+                    self._channels[user_id] = channel
+                    while len(self._channels) > self.max_channels:
+                        self._channels.popitem(last=False)
+                else:
+                    self._channels.move_to_end(user_id)
+                await self._wait(self.send_limiter)
+                await self.send(channel, job.guild_id, user_id, job.content)
+                return SENT
+            except DMClosed:
+                self._closed[user_id] = time.monotonic() + CLOSED_TTL
+                return CLOSED
+            except MemberGone:
+                return GONE
+            except PermanentFailure as e:
+                logger.warning(f"Mass DM to {user_id} in guild {job.guild_id} failed: {e}")
+                return FAILED
+            except RetryAfter as e:
+                # Discord's limits are bot-wide, so every job backs off
+                self.counters["rate_limited"] += 1
+                rate_limited += 1
+                if rate_limited >= self.max_rate_limited:
+                    logger.warning(f"Mass DM to {user_id} in guild {job.guild_id} gave up after {rate_limited} rate limits")
+                    return FAILED
+                self._blocked_until = max(self._blocked_until, time.monotonic() + e.retry_after)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logger.warning(f"Mass DM to {user_id} in guild {job.guild_id} gave up: {e}")
+                    return FAILED
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.base_backoff * 2 ** (attempts - 1))
+
+    def progress(self, guild_id=None):
+        """Progress of known jobs, newest first; safe to call from other threads"""
+        jobs = list(self.jobs.values())
+        if guild_id is not None:
+            jobs = [job for job in jobs if job.guild_id == str(guild_id)]
+        return [job.progress() for job in reversed(jobs)]
+
+    def metrics(self):
+        blocked = self._blocked_until - time.monotonic()
+        return {
+            "active_jobs": sum(1 for job in list(self.jobs.values()) if job.state in ACTIVE_STATES),
+            "cached_channels": len(self._channels),
+            "closed_dms": len(self._closed),
+            "blocked_for_s": round(blocked, 3) if blocked > 0 else 0.0,
+            "open_limiter": self.open_limiter.stats(),
+            "send_limiter": self.send_limiter.stats(),
+            "counters": dict(self.counters.copy()),
+        }
+
+    async def close(self):
+        """Stop all jobs, leaving unfinished ones to resume on the next start"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,99 @@
+"""Token-bucket rate limits for the dashboard.
+
+Buckets hold up to `burst` tokens and refill at `rate` tokens per second.
+A request that finds its bucket empty is told how long until the next token,
+which the routes pass on as Retry-After. Limits are per process; with several
+dashboard workers each one enforces them on its own.
+"""
+import collections
+import math
+import threading
+import time
+
+class TokenBucket:
+    """A single bucket; not thread-safe on its own, callers hold a lock"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, cost=1.0):
+        """Spend `cost` tokens; returns 0 on success or the seconds to wait"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost=1.0):
+        """Give back tokens spent on a request that was refused further on"""
+        self.tokens = min(self.burst, self.tokens + cost)
+
+class RateLimiter:
+    """One limit applied per key, e.g. per session or per guild.
+
+    Buckets live in an LRU map capped at `max_keys`; the least recently used
+    bucket is dropped when a new key arrives, so an evicted key starts again
+    with a full bucket.
+    """
+
+    def __init__(self, name, rate, burst, max_keys=10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key=None, cost=1.0):
+        """Spend tokens from key's bucket; returns 0 on success or the seconds to wait"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(cost)
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+            return wait
+
+    def refund(self, key=None, cost=1.0):
+        """Give back tokens taken from key's bucket for a request that didn't go ahead"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.refund(cost)
+                self.allowed -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "evicted": self.evicted,
+            }
+
+def retry_after_header(wait):
+    """Retry-After takes whole seconds"""
+    return str(max(1, int(math.ceil(min(wait, 86400)))))
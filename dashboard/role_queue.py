@@ -0,0 +1,208 @@
+"""Paced AutoRole assignment queue for join bursts.
+
+Joins are queued per guild, ordered by when their roles are due (join time
+plus the configured delay). One worker task per guild with pending joins
+assigns roles in a single call per member, waiting on a per-guild token
+bucket (Discord rate-limits the member routes per guild) and on a global one
+shared by all guilds. Members who left before their turn are dropped, 429s
+are honoured with their retry-after, and other failures are retried with
+exponential backoff.
+
+The queue knows nothing about discord.py: it calls `assign(guild_id,
+member_id, role_ids)` and `is_member(guild_id, member_id)` supplied by the
+cog, so it can be driven by the synthetic join-burst benchmark as well.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+from dashboard.ratelimit import RateLimiter
+
+logger = logging.getLogger("discord_bot")
+
+class RetryAfter(Exception):
+    """Raised by `assign` when Discord answered 429"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited for {retry_after}s")
+        self.retry_after = retry_after
+
+class MemberGone(Exception):
+    """Raised by `assign` when the member is no longer in the guild"""
+
+class PermanentFailure(Exception):
+    """Raised by `assign` for errors retrying can't fix, e.g. missing permissions"""
+
+class RoleAssignmentQueue:
+    """Per-guild join queues drained by paced worker tasks"""
+
+    def __init__(self, assign, is_member, guild_rate=1.0, guild_burst=5, global_rate=20.0, global_burst=20,
+                 max_attempts=5, base_backoff=1.0, max_backoff=60.0, max_pending=10000):
+        self.assign = assign
+        self.is_member = is_member
+        self.guild_limiter = RateLimiter("autorole_guild", guild_rate, guild_burst)
+        self.global_limiter = RateLimiter("autorole_global", global_rate, global_burst, max_keys=1)
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self.counters = collections.Counter()
+        self.lags = collections.deque(maxlen=2000)
+        self._queues = {}  # guild_id -> heap of [due, seq, member_id, role_ids, first_due, attempts]
+        self._pending = {}  # (guild_id, member_id) -> heap entry
+        self._workers = {}
+        self._wakeups = {}
+        self._seq = itertools.count()
+        self._closed = False
+
+    def enqueue(self, guild_id, member_id, role_ids, delay=0.0):
+        """Queue a member for role assignment `delay` seconds from now; returns False if dropped"""
+        if self._closed:
+            return False
+        key = (guild_id, member_id)
+        if key in self._pending:
+            # Rejoined before being handled: the newer join replaces the old one
+            self._pending.pop(key)[2] = None
+            self.counters["replaced"] += 1
+        if len(self._pending) >= self.max_pending:
+            self.counters["overflow"] += 1
+            return False
+        due = time.monotonic() + delay
+        entry = [due, next(self._seq), member_id, list(role_ids), due, 0]
+        heapq.heappush(self._queues.setdefault(guild_id, []), entry)
+        self._pending[key] = entry
+        self.counters["enqueued"] += 1
+        wakeup = self._wakeups.get(guild_id)
+        if wakeup is not None:
+            wakeup.set()
+        if guild_id not in self._workers:
+            self._workers[guild_id] = asyncio.get_running_loop().create_task(self._drain(guild_id))
+        return True
+
+    def _pop_due(self, queue):
+        """Discard cancelled entries; returns the head entry or None"""
+        while queue and queue[0][2] is None:
+            heapq.heappop(queue)
+        return queue[0] if queue else None
+
+    async def _wait(self, limiter, key=None):
+        while True:
+            wait = limiter.take(key)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def _drain(self, guild_id):
+        queue = self._queues[guild_id]
+        wakeup = self._wakeups[guild_id] = asyncio.Event()
+        try:
+            while not self._closed:
+                entry = self._pop_due(queue)
+                if entry is None:
+                    return
+                delay = entry[0] - time.monotonic()
+                if delay > 0:
+                    # Sleep until the head is due, or until an earlier join is queued
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                heapq.heappop(queue)
+                await self._handle(guild_id, queue, entry)
+        finally:
+            self._workers.pop(guild_id, None)
+            self._wakeups.pop(guild_id, None)
+            if not queue:
+                self._queues.pop(guild_id, None)
+            elif not self._closed:
+                # A join slipped in while the worker was exiting
+                self._workers[guild_id] = asyncio.get_running_loop().create_task(self._drain(guild_id))
+
+    async def _handle(self, guild_id, queue, entry):
+        _, _, member_id, role_ids, first_due, attempts = entry
+        key = (guild_id, member_id)
+        if not self.is_member(guild_id, member_id):
+            self._finish(key, entry, "dropped_left")
+            return
+        await self._wait(self.guild_limiter, guild_id)
+        await self._wait(self.global_limiter)
+        if entry[2] is None:
+            # Replaced by a rejoin while we were waiting
+            return
+        try:
+            await self.assign(guild_id, member_id, role_ids)
+        except MemberGone:
+            self._finish(key, entry, "dropped_left")
+        except PermanentFailure as e:
+            logger.warning(f"AutoRole could not assign roles in guild {guild_id}: {e}")
+            self._finish(key, entry, "failed")
+        except Exception as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                logger.warning(f"AutoRole gave up on member {member_id} in guild {guild_id}: {e}")
+                self._finish(key, entry, "failed")
+                return
+            if isinstance(e, RetryAfter):
+                retry_in = e.retry_after
+                self.counters["rate_limited"] += 1
+            else:
+                retry_in = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            self.counters["retries"] += 1
+            entry[0] = time.monotonic() + retry_in
+            entry[5] = attempts
+            heapq.heappush(queue, entry)
+        else:
+            # Lag: how long after it was due the member actually got the roles
+            self.lags.append(time.monotonic() - first_due)
+            self._finish(key, entry, "assigned")
+
+    def _finish(self, key, entry, outcome):
+        if self._pending.get(key) is entry:
+            del self._pending[key]
+        self.counters[outcome] += 1
+
+    def depth(self, guild_id):
+        """Members waiting in one guild's queue; safe to call from other threads"""
+        return sum(1 for entry in list(self._queues.get(guild_id, ())) if entry[2] is not None)
+
+    def metrics(self):
+        """Queue depth, lag and outcome counters; safe to call from other threads"""
+        now = time.monotonic()
+        depth = {}
+        oldest = 0.0
+        # list() copies in one step under the GIL while the event loop keeps mutating
+        for guild_id, queue in list(self._queues.items()):
+            live = [entry for entry in list(queue) if entry[2] is not None]
+            if live:
+                depth[str(guild_id)] = len(live)
+                oldest = max(oldest, now - min(entry[0] for entry in live))
+        lags = sorted(list(self.lags))
+        return {
+            "pending": len(self._pending),
+            "guilds": len(depth),
+            "depth": dict(sorted(depth.items(), key=lambda item: -item[1])[:20]),
+            "oldest_due_s": round(oldest, 3),
+            "lag_p50_s": round(lags[len(lags) // 2], 3) if lags else None,
+            "lag_p95_s": round(lags[int(len(lags) * 0.95)], 3) if lags else None,
+            "lag_max_s": round(lags[-1], 3) if lags else None,
+            "counters": dict(self.counters.copy()),
+        }
+
+    async def join(self):
+        """Wait until every queued join has been handled"""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def close(self):
+        self._closed = True
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
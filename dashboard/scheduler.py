@@ -0,0 +1,272 @@
+"""One scheduler for the cogs' periodic work.
+
+With a tasks.loop per cog, every loop walks all guilds at the same moment,
+so CPU use and REST calls arrive in bursts every few minutes. Here a
+periodic job is registered once, and each (job, guild) pair runs on its own
+within the job's period:
+- A pair's phase is a stable hash of the job name and guild ID, so a job's
+  guilds are spread evenly over the period. Two jobs with the same period
+  don't line up either.
+- Each run also gets up to `jitter` (a fraction of the period) of random
+  delay, so pairs that hash close together drift apart.
+
+Due runs sit in a hashed timer wheel of `tick`-second slots. Adding or
+removing a run costs O(1) however many guilds there are. A fixed pool of
+workers executes due runs, so at most `concurrency` run at once; anything
+beyond that waits, and the wait counts as lateness. A run is scheduled
+again only after it finishes, so a slow guild never overlaps itself.
+Periods it missed entirely are counted and skipped, not replayed.
+
+A guild whose cog is disabled in the dashboard's cog settings is skipped
+(and counted as such) but stays scheduled, so the job picks up again once
+the cog is re-enabled. The list of guilds is refreshed once per period.
+"""
+import asyncio
+import collections
+import hashlib
+import logging
+import math
+import random
+import time
+
+logger = logging.getLogger("discord_bot")
+
+# Lateness samples kept per job for the percentiles
+LATENESS_SAMPLES = 512
+
+class TimerWheel:
+    """Hashed timer wheel keyed by absolute tick number"""
+
+    def __init__(self, tick, slots=4096, origin=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.origin = origin
+        self.current = 0  # Last tick handed out by advance()
+        self.size = 0
+        self._buckets = [[] for _ in range(slots)]
+
+    def add(self, when, item):
+        """Schedule item for `when`; a time in the past fires on the next tick"""
+        target = max(math.ceil((when - self.origin) / self.tick), self.current + 1)
+        self._buckets[target % self.slots].append((target, item))
+        self.size += 1
+
+    def advance(self, now):
+        """Items due up to `now`, in tick order"""
+        target = math.floor((now - self.origin) / self.tick)
+        due = []
+        # An idle wheel (or a long stall) doesn't need to walk every slot in between
+        if self.size == 0:
+            self.current = max(self.current, target)
+            return due
+        while self.current < target and self.size:
+            self.current += 1
+            bucket = self._buckets[self.current % self.slots]
+            if not bucket:
+                continue
+            keep = []
+            for entry in bucket:
+                if entry[0] <= self.current:
+                    due.append(entry[1])
+                else:
+                    # Wraps around the wheel; comes back on a later turn
+                    keep.append(entry)
+            self._buckets[self.current % self.slots] = keep
+            self.size -= len(bucket) - len(keep)
+        self.current = max(self.current, target)
+        return due
+
+class Job:
+    """A registered periodic job and its counters"""
+
+    def __init__(self, name, period, run, guilds, cog, jitter):
+        self.name = name
+        self.period = period
+        self.run = run
+        # () -> guild IDs, or None for a job that runs once per period for the whole bot
+        self.guilds = guilds
+        self.cog = cog
+        self.jitter = jitter
+        self.cancelled = False
+        self.scheduled = set()
+        self.current = set()
+        self.runs = 0
+        self.failures = 0
+        self.skipped_disabled = 0
+        self.missed = 0
+        self.duration_sum = 0.0
+        self.duration_max = 0.0
+        self.lateness = collections.deque(maxlen=LATENESS_SAMPLES)
+
+    def phase(self, guild_id):
+        """Stable offset of a guild within the period"""
+        digest = hashlib.blake2b(f"{self.name}:{guild_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 * self.period
+
+    def stats(self):
+        lateness = sorted(self.lateness)
+
+        def pct(p):
+            if not lateness:
+                return None
+            return round(lateness[min(len(lateness) - 1, int(p / 100 * len(lateness)))] * 1000, 1)
+        return {
+            "period_s": self.period,
+            "cog": self.cog,
+            "guilds": len(self.current) if self.guilds is not None else None,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_disabled": self.skipped_disabled,
+            "missed_periods": self.missed,
+            "duration_mean_ms": round(self.duration_sum / self.runs * 1000, 1) if self.runs else None,
+            "duration_max_ms": round(self.duration_max * 1000, 1),
+            "lateness_p50_ms": pct(50),
+            "lateness_p95_ms": pct(95),
+            "lateness_max_ms": round(lateness[-1] * 1000, 1) if lateness else None,
+        }
+
+class Scheduler:
+    """Runs registered periodic jobs on the bot's event loop.
+
+    `is_enabled(guild_id, cog)` is asked before every per-guild run of a job
+    that names its cog. The scheduler starts with the first job registered
+    and stops when the last one is cancelled.
+    """
+
+    def __init__(self, is_enabled=None, concurrency=8, tick=0.5, clock=time.monotonic):
+        self.is_enabled = is_enabled or (lambda guild_id, cog: True)
+        self.concurrency = concurrency
+        self.tick = tick
+        self.clock = clock
+        self.jobs = {}
+        self.wheel = None
+        self._queue = None
+        self._tasks = []
+
+    def every(self, name, period, run, guilds=None, cog=None, jitter=0.1):
+        """Run `run(guild_id)` for every guild in `guilds()` once per `period` seconds.
+
+        Without `guilds`, `run()` is called once per period with no arguments.
+        Registering a name again replaces the earlier job.
+        """
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.cancel(name)
+        self._start()
+        job = self.jobs[name] = Job(name, float(period), run, guilds, cog, min(max(jitter, 0.0), 0.5))
+        now = self.clock()
+        if guilds is None:
+            due = now + job.phase(None)
+            self.wheel.add(due, (job, None, due, due))
+        else:
+            self._refresh(job, now)
+        return job
+
+    def cancel(self, name):
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            # Entries still in the wheel are dropped when they come due
+            job.cancelled = True
+        if not self.jobs:
+            self._stop()
+
+    def _start(self):
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self.wheel = TimerWheel(self.tick, origin=self.clock())
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._drive())]
+        self._tasks += [loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def _stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def close(self):
+        for job in self.jobs.values():
+            job.cancelled = True
+        self.jobs.clear()
+        self._stop()
+
+    def _refresh(self, job, now):
+        """Pick up guilds that appeared since the last refresh and forget the ones that left"""
+        try:
+            current = {int(guild_id) for guild_id in job.guilds()}
+        except Exception as e:
+            logger.warning(f"Scheduler job {job.name} could not list its guilds: {e}")
+            current = job.current
+        start = now - now % job.period
+        for guild_id in current - job.scheduled:
+            due = start + job.phase(guild_id)
+            if due < now:
+                due += job.period
+            job.scheduled.add(guild_id)
+            self.wheel.add(due, (job, guild_id, due, due))
+        job.current = current
+        refresh_at = start + job.period
+        self.wheel.add(refresh_at, (job, "refresh", refresh_at, refresh_at))
+
+    def _reschedule(self, job, guild_id, due):
+        """Queue the next run one period after the last due time, skipping periods already past"""
+        now = self.clock()
+        following = due + job.period
+        if following < now:
+            skipped = math.ceil((now - following) / job.period)
+            job.missed += skipped
+            following += skipped * job.period
+        fire_at = following + random.random() * job.jitter * job.period
+        self.wheel.add(fire_at, (job, guild_id, following, fire_at))
+
+    async def _drive(self):
+        while True:
+            # Wake at the next tick boundary rather than a tick after the last wakeup, so drift doesn't add up
+            next_tick = self.wheel.origin + (self.wheel.current + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_tick - self.clock()))
+            now = self.clock()
+            for entry in self.wheel.advance(now):
+                job, guild_id = entry[0], entry[1]
+                if job.cancelled:
+                    continue
+                if guild_id == "refresh":
+                    self._refresh(job, now)
+                elif guild_id is not None and guild_id not in job.current:
+                    job.scheduled.discard(guild_id)
+                else:
+                    self._queue.put_nowait(entry)
+
+    async def _work(self):
+        while True:
+            job, guild_id, due, fire_at = await self._queue.get()
+            if job.cancelled:
+                continue
+            started = self.clock()
+            # Measured from the jittered time the run was meant to start
+            job.lateness.append(max(0.0, started - fire_at))
+            try:
+                if guild_id is not None and job.cog is not None and not self.is_enabled(guild_id, job.cog):
+                    job.skipped_disabled += 1
+                else:
+                    await (job.run() if guild_id is None else job.run(guild_id))
+                    elapsed = self.clock() - started
+                    job.runs += 1
+                    job.duration_sum += elapsed
+                    job.duration_max = max(job.duration_max, elapsed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                logger.error(f"Scheduled job {job.name} failed for guild {guild_id}: {e}")
+            finally:
+                if not job.cancelled:
+                    self._reschedule(job, guild_id, due)
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "tick_s": self.tick,
+            "pending": self.wheel.size if self.wheel is not None else 0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": {name: job.stats() for name, job in self.jobs.items()},
+        }
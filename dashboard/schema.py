@@ -0,0 +1,373 @@
+"""Declarative settings schemas for the dashboard modules.
+
+A module's settings are declared once as a Schema of typed fields:
+
+    Schema("counting", {
+        "channel": Channel("Counting channel"),
+        "reset_on_fail": Toggle("Reset on a wrong number", default=True),
+    })
+
+From that one declaration come the defaults, the config page (rendered by
+the dashboard from describe()), the JSON read/patch API and the
+validation. Each field compiles to a plain closure when the Schema is
+built, which happens once at import. Checking a request is then a dict
+walk with no per-request setup, however many modules declare settings.
+
+A guild's settings are one document in the schema's namespace of the
+settings store. Only values that were saved are stored. resolve() lays
+them over the defaults, so fields added later read as their default.
+"""
+import copy
+import math
+import re
+
+SNOWFLAKE = re.compile(r"^\d{15,21}$")
+COLOR = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+class Invalid(ValueError):
+    """A value that doesn't fit its field"""
+
+class Field:
+    kind = None
+
+    def __init__(self, label, default=None, help=""):
+        self.label = label
+        self.default = default
+        self.help = help
+
+    def compile(self):
+        """Return check(value) -> clean value, raising Invalid"""
+        raise NotImplementedError
+
+    def describe(self):
+        return {"type": self.kind, "label": self.label, "help": self.help, "default": self.default}
+
+class Toggle(Field):
+    kind = "toggle"
+
+    def __init__(self, label, default=False, help=""):
+        super().__init__(label, default, help)
+
+    def compile(self):
+        def check(value):
+            if not isinstance(value, bool):
+                raise Invalid("must be true or false")
+            return value
+        return check
+
+class Number(Field):
+    kind = "number"
+
+    def __init__(self, label, default=0, minimum=None, maximum=None, help=""):
+        super().__init__(label, default, help)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def compile(self):
+        minimum, maximum = self.minimum, self.maximum
+
+        def check(value):
+            # Infinity, NaN and 1e400 parse from JSON as floats that int() can't convert
+            if (isinstance(value, bool) or not isinstance(value, (int, float))
+                    or isinstance(value, float) and not math.isfinite(value) or value != int(value)):
+                raise Invalid("must be a whole number")
+            value = int(value)
+            if minimum is not None and value < minimum:
+                raise Invalid(f"must be at least {minimum}")
+            if maximum is not None and value > maximum:
+                raise Invalid(f"must be at most {maximum}")
+            return value
+        return check
+
+    def describe(self):
+        return dict(super().describe(), min=self.minimum, max=self.maximum)
+
+class Choice(Field):
+    kind = "choice"
+
+    def __init__(self, label, choices, default=None, help=""):
+        # choices: {value: label}
+        super().__init__(label, default if default is not None else next(iter(choices)), help)
+        self.choices = dict(choices)
+
+    def compile(self):
+        allowed = frozenset(self.choices)
+        listing = ", ".join(self.choices)
+
+        def check(value):
+            if value not in allowed:
+                raise Invalid(f"must be one of {listing}")
+            return value
+        return check
+
+    def describe(self):
+        return dict(super().describe(), choices=self.choices)
+
+class Text(Field):
+    kind = "text"
+
+    def __init__(self, label, default="", max_length=200, multiline=False, help=""):
+        super().__init__(label, default, help)
+        self.max_length = max_length
+        self.multiline = multiline
+
+    def compile(self):
+        max_length = self.max_length
+
+        def check(value):
+            if not isinstance(value, str):
+                raise Invalid("must be text")
+            value = value.strip()
+            if len(value) > max_length:
+                raise Invalid(f"must be at most {max_length} characters")
+            return value
+        return check
+
+    def describe(self):
+        return dict(super().describe(), max_length=self.max_length, multiline=self.multiline)
+
+class TextList(Field):
+    kind = "text_list"
+
+    def __init__(self, label, default=(), max_items=100, max_length=100, help=""):
+        super().__init__(label, list(default), help)
+        self.max_items = max_items
+        self.max_length = max_length
+
+    def compile(self):
+        max_items, max_length = self.max_items, self.max_length
+
+        def check(value):
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise Invalid("must be a list of text")
+            items = []
+            for item in value:
+                item = item.strip()
+                if len(item) > max_length:
+                    raise Invalid(f"entries must be at most {max_length} characters")
+                if item and item not in items:
+                    items.append(item)
+            if len(items) > max_items:
+                raise Invalid(f"must have at most {max_items} entries")
+            return items
+        return check
+
+    def describe(self):
+        return dict(super().describe(), max_items=self.max_items, max_length=self.max_length)
+
+class Color(Field):
+    kind = "color"
+
+    def __init__(self, label, default="#5865f2", help=""):
+        super().__init__(label, default, help)
+
+    def compile(self):
+        def check(value):
+            if not isinstance(value, str) or not COLOR.match(value):
+                raise Invalid("must be a color like #5865f2")
+            return value.lower()
+        return check
+
+class Role(Field):
+    """One role ID, or None"""
+    kind = "role"
+
+    def compile(self):
+        def check(value):
+            if value is None or value == "":
+                return None
+            value = str(value)
+            if not SNOWFLAKE.match(value):
+                raise Invalid("must be a role ID")
+            return value
+        return check
+
+class Channel(Role):
+    """One channel ID, or None"""
+    kind = "channel"
+
+    def compile(self):
+        def check(value):
+            if value is None or value == "":
+                return None
+            value = str(value)
+            if not SNOWFLAKE.match(value):
+                raise Invalid("must be a channel ID")
+            return value
+        return check
+
+class RoleList(Field):
+    kind = "role_list"
+
+    def __init__(self, label, max_items=25, help=""):
+        super().__init__(label, [], help)
+        self.max_items = max_items
+
+    def compile(self):
+        max_items = self.max_items
+        noun = "role" if self.kind == "role_list" else "channel"
+
+        def check(value):
+            if not isinstance(value, list):
+                raise Invalid(f"must be a list of {noun} IDs")
+            ids = []
+            for item in value:
+                item = str(item)
+                if not SNOWFLAKE.match(item):
+                    raise Invalid(f"must be a list of {noun} IDs")
+                if item not in ids:
+                    ids.append(item)
+            if len(ids) > max_items:
+                raise Invalid(f"must have at most {max_items} entries")
+            return ids
+        return check
+
+    def describe(self):
+        return dict(super().describe(), max_items=self.max_items)
+
+class ChannelList(RoleList):
+    kind = "channel_list"
+
+class Group(Field):
+    """Nested fields, stored as a sub-document"""
+    kind = "group"
+
+    def __init__(self, label, fields, help=""):
+        super().__init__(label, None, help)
+        self.fields = fields
+        self.default = {name: copy.deepcopy(field.default) for name, field in fields.items()}
+
+    def compile(self):
+        return _compile_patch(self.fields)
+
+    def describe(self):
+        return dict(super().describe(), fields={name: field.describe() for name, field in self.fields.items()})
+
+def _compile_patch(fields):
+    """check(changes) -> clean changes for a dict of fields; errors are collected per dotted path"""
+    checks = {name: (field.compile(), isinstance(field, Group)) for name, field in fields.items()}
+
+    def check(changes, path=""):
+        if not isinstance(changes, dict):
+            raise Invalid("must be an object")
+        clean = {}
+        errors = {}
+        for name, value in changes.items():
+            entry = checks.get(name)
+            if entry is None:
+                errors[path + name] = "unknown setting"
+                continue
+            field_check, nested = entry
+            try:
+                if nested:
+                    clean[name], nested_errors = field_check(value, f"{path}{name}.")
+                    errors.update(nested_errors)
+                else:
+                    clean[name] = field_check(value)
+            except Invalid as e:
+                errors[path + name] = str(e)
+        return clean, errors
+    return check
+
+def _merge(base, changes):
+    merged = dict(base)
+    for name, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(name), dict):
+            merged[name] = _merge(merged[name], value)
+        else:
+            merged[name] = value
+    return merged
+
+class Schema:
+    """The settings of one module, stored per guild in `namespace`"""
+
+    def __init__(self, namespace, fields, constraints=()):
+        self.namespace = namespace
+        self.fields = fields
+        # Checks across fields: callable(resolved settings) -> error message or None
+        self.constraints = list(constraints)
+        self._defaults = {name: copy.deepcopy(field.default) for name, field in fields.items()}
+        self._check = _compile_patch(fields)
+        self._description = {name: field.describe() for name, field in fields.items()}
+
+        def kinds(fields):
+            for field in fields.values():
+                yield field.kind
+                if isinstance(field, Group):
+                    yield from kinds(field.fields)
+        # Field kinds in use, so pages only fetch the roles or channels they need
+        self.kinds = frozenset(kinds(fields))
+
+    def defaults(self):
+        return copy.deepcopy(self._defaults)
+
+    def describe(self):
+        """JSON description of the fields, for the config page and API clients"""
+        return self._description
+
+    def resolve(self, stored):
+        """Stored document laid over the defaults; settings no longer in the schema are dropped"""
+        if not stored:
+            return self.defaults()
+        resolved = self.defaults()
+        for name, value in stored.items():
+            if name not in resolved:
+                continue
+            if isinstance(resolved[name], dict) and isinstance(value, dict):
+                resolved[name].update((key, item) for key, item in value.items() if key in resolved[name])
+            else:
+                resolved[name] = value
+        return resolved
+
+    def check(self, changes):
+        """Validate a (partial) settings object; returns (clean changes, {dotted path: error})"""
+        try:
+            return self._check(changes)
+        except Invalid as e:
+            return {}, {"": str(e)}
+
+    def apply(self, stored, changes):
+        """New stored document with already-checked changes merged in"""
+        return _merge(stored or {}, changes)
+
+    def violation(self, settings):
+        """First cross-field constraint the resolved settings break, or None"""
+        for constraint in self.constraints:
+            error = constraint(settings)
+            if error:
+                return error
+        return None
+
+    def references(self, changes, kind):
+        """IDs of the given field kind ("role" or "channel") that the changes point at"""
+        found = set()
+
+        def walk(fields, values):
+            for name, value in values.items():
+                field = fields.get(name)
+                if isinstance(field, Group):
+                    walk(field.fields, value)
+                elif field is not None and field.kind in (kind, f"{kind}_list") and value:
+                    found.update(value if isinstance(value, list) else [value])
+        walk(self.fields, changes)
+        return found
+
+    def drop_references(self, document, kind, known):
+        """(copy of the document without the `kind` IDs not in `known`, set of the IDs taken out)"""
+        dropped = set()
+
+        def walk(fields, values):
+            kept = {}
+            for name, value in values.items():
+                field = fields.get(name)
+                if isinstance(field, Group) and isinstance(value, dict):
+                    value = walk(field.fields, value)
+                elif field is not None and field.kind == kind and value is not None and value not in known:
+                    dropped.add(value)
+                    value = None
+                elif field is not None and field.kind == f"{kind}_list" and value:
+                    dropped.update(item for item in value if item not in known)
+                    value = [item for item in value if item in known]
+                kept[name] = value
+            return kept
+        return walk(self.fields, document), dropped
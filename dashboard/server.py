@@ -0,0 +1,97 @@
+"""Stoppable WSGI server for the dashboard running inside the bot process."""
+import logging
+import threading
+import time
+
+logger = logging.getLogger("discord_bot")
+
+class InFlightCounter:
+    """WSGI middleware counting requests that are still being served"""
+
+    def __init__(self, app):
+        from werkzeug.wsgi import ClosingIterator
+
+        self.app = app
+        self.active = 0
+        self._closing_iterator = ClosingIterator
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.active += 1
+        try:
+            iterable = self.app(environ, start_response)
+        except BaseException:
+            self._finished()
+            raise
+        # Streamed bodies keep the request in flight until the server closes them
+        return self._closing_iterator(iterable, [self._finished])
+
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+            if self.active == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Block until no request is in flight; returns False if the timeout hit first"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+class DashboardServer:
+    """Runs a WSGI app on a daemon thread and shuts it down gracefully"""
+
+    def __init__(self, app_factory, host="0.0.0.0", port=5379, drain_timeout=10.0):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.drain_timeout = drain_timeout
+        self.timings = {}
+        self._server = None
+        self._thread = None
+        self._counter = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Build the app, bind the port and start serving; returns startup timings in ms"""
+        started = time.perf_counter()
+        # werkzeug comes with flask; importing it here keeps extension load cheap
+        from werkzeug.serving import make_server
+
+        app = self.app_factory()
+        built = time.perf_counter()
+        self._counter = InFlightCounter(app)
+        self._server = make_server(self.host, self.port, self._counter, threaded=True)
+        bound = time.perf_counter()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="DashboardServer", daemon=True)
+        self._thread.start()
+        self.timings = {
+            "build_app_ms": round((built - started) * 1000, 2),
+            "bind_ms": round((bound - built) * 1000, 2),
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        return self.timings
+
+    def stop(self):
+        """Stop accepting connections, let in-flight requests finish, then release the port"""
+        if self._server is None:
+            return True
+        self._server.shutdown()
+        drained = self._counter.wait_idle(self.drain_timeout)
+        if not drained:
+            logger.warning(f"Dashboard stopped with {self._counter.active} request(s) still in flight")
+        self._server.server_close()
+        self._thread.join(timeout=1.0)
+        self._server = None
+        self._thread = None
+        return drained
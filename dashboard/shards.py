@@ -0,0 +1,405 @@
+"""Routing dashboard reads and writes to the shard process that owns a guild.
+
+Each bot shard process runs a ShardServer on its event loop. A standalone
+dashboard uses a ShardRouter, which sends every call to the process owning
+`(guild_id >> 22) % shard_count`. Calls to the same process that are issued
+within a few milliseconds of each other are sent as one batch.
+
+The wire format is one JSON document per line. A connection starts with a
+handshake proving the client knows the shared secret (DASHBOARD_SHARD_SECRET)
+without sending it:
+    server   {"challenge": "<random hex>"}
+    client   {"auth": HMAC-SHA256(secret, challenge) as hex}
+    server   {"ok": true}, or {"ok": false, "error": ...} and the connection closes
+and then carries batches:
+    request  {"batch": [{"id": 1, "op": "get_cog_status", "guild_id": "...", "args": {...}}]}
+    response {"results": [{"id": 1, "ok": true, "result": ...}]}
+
+Servers listen on loopback unless told otherwise.
+
+Try it locally with several shard processes:
+    python -m dashboard.shards demo --shards 4 --processes 2
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+
+logger = logging.getLogger("discord_bot")
+
+HANDSHAKE_TIMEOUT = 5.0
+
+def shard_for(guild_id, shard_count):
+    """Shard ID that owns a guild, as Discord computes it"""
+    return (int(guild_id) >> 22) % shard_count
+
+def parse_address(text):
+    host, _, port = text.strip().rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def sign(secret, challenge):
+    """Handshake answer for a challenge"""
+    return hmac.new(secret.encode(), challenge.encode(), hashlib.sha256).hexdigest()
+
+class ShardError(Exception):
+    """Raised when the owning shard cannot be reached or rejects a call"""
+
+class ShardConnection:
+    """Batching client connection to one shard process"""
+
+    def __init__(self, address, secret, batch_window=0.002, max_batch=64, connect_timeout=2.0):
+        self.address = address
+        self.secret = secret
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.connect_timeout = connect_timeout
+        self.batches_sent = 0
+        self.messages_sent = 0
+        self._queue = queue.Queue()
+        # message ID -> [future, socket it was sent on, or None while still queued]
+        self._waiting = {}
+        self._waiting_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._sock = None
+        self._sender = threading.Thread(target=self._send_loop, name=f"ShardSender-{address[1]}", daemon=True)
+        self._sender.start()
+
+    def submit(self, op, guild_id, args):
+        """Queue a call and return a concurrent.futures.Future for its result"""
+        future = concurrent.futures.Future()
+        message = {"id": next(self._ids), "op": op, "guild_id": str(guild_id), "args": args}
+        with self._waiting_lock:
+            self._waiting[message["id"]] = [future, None]
+        self._queue.put(message)
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = sock.makefile("rb")
+        try:
+            challenge = json.loads(reader.readline() or b"{}").get("challenge")
+            if not isinstance(challenge, str):
+                raise ShardError(f"Shard at {self.address} sent no handshake")
+            sock.sendall((json.dumps({"auth": sign(self.secret, challenge)}) + "\n").encode())
+            reply = json.loads(reader.readline() or b"{}")
+            if not reply.get("ok"):
+                raise ShardError(f"Shard at {self.address} refused the connection: {reply.get('error', 'closed')}")
+        except (OSError, ValueError, ShardError) as e:
+            reader.close()
+            sock.close()
+            raise e if isinstance(e, ShardError) else ShardError(f"Handshake with shard at {self.address} failed: {e}")
+        sock.settimeout(None)
+        threading.Thread(target=self._read_loop, args=(sock, reader), name=f"ShardReader-{self.address[1]}",
+                         daemon=True).start()
+        return sock
+
+    def _send_loop(self):
+        while True:
+            batch = self._collect()
+            payload = (json.dumps({"batch": batch}) + "\n").encode()
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                sock = self._sock
+                with self._waiting_lock:
+                    for message in batch:
+                        entry = self._waiting.get(message["id"])
+                        if entry is not None:
+                            entry[1] = sock
+                sock.sendall(payload)
+                self.batches_sent += 1
+                self.messages_sent += len(batch)
+            except ShardError as e:
+                self._fail([m["id"] for m in batch], e)
+            except OSError as e:
+                self._reset(self._sock)
+                self._fail([m["id"] for m in batch], ShardError(f"Shard at {self.address} unreachable: {e}"))
+
+    def _read_loop(self, sock, reader):
+        try:
+            for line in reader:
+                for item in json.loads(line).get("results", []):
+                    with self._waiting_lock:
+                        entry = self._waiting.pop(item["id"], None)
+                    if entry is None:
+                        continue
+                    if item.get("ok"):
+                        entry[0].set_result(item.get("result"))
+                    else:
+                        entry[0].set_exception(ShardError(item.get("error", "Shard call failed")))
+        except (OSError, ValueError):
+            pass
+        self._reset(sock)
+        # Only calls sent on this socket are lost with it; queued ones go out on the next connection
+        with self._waiting_lock:
+            ids = [message_id for message_id, entry in self._waiting.items() if entry[1] is sock]
+        self._fail(ids, ShardError(f"Connection to shard at {self.address} closed"))
+
+    def _reset(self, sock):
+        if sock is not None and sock is self._sock:
+            self._sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _fail(self, ids, error):
+        for message_id in ids:
+            with self._waiting_lock:
+                entry = self._waiting.pop(message_id, None)
+            if entry is not None and not entry[0].done():
+                entry[0].set_exception(error)
+
+class ShardRouter:
+    """Sends each call to the connection of the process that owns the guild"""
+
+    def __init__(self, shard_count, endpoints, secret, timeout=5.0, batch_window=0.002):
+        if len(endpoints) != shard_count:
+            raise ValueError("Need exactly one endpoint per shard ID")
+        if not secret:
+            raise ValueError("Shard IPC needs a shared secret")
+        self.shard_count = shard_count
+        self.timeout = timeout
+        # Processes hosting several shards share one connection
+        connections = {}
+        self.connections = []
+        for address in endpoints:
+            if address not in connections:
+                connections[address] = ShardConnection(address, secret, batch_window=batch_window)
+            self.connections.append(connections[address])
+
+    @classmethod
+    def from_env(cls):
+        """Build a router from DASHBOARD_SHARD_ENDPOINTS ("host:port" per shard ID), or None"""
+        endpoints = os.getenv("DASHBOARD_SHARD_ENDPOINTS")
+        if not endpoints:
+            return None
+        addresses = [parse_address(e) for e in endpoints.split(",") if e.strip()]
+        timeout = float(os.getenv("DASHBOARD_SHARD_TIMEOUT", 5.0))
+        return cls(len(addresses), addresses, os.getenv("DASHBOARD_SHARD_SECRET"), timeout=timeout)
+
+    def submit(self, guild_id, op, **args):
+        """Queue a call to the owning shard and return a future"""
+        return self.connections[shard_for(guild_id, self.shard_count)].submit(op, guild_id, args)
+
+    def call(self, guild_id, op, **args):
+        """Call an operation on the owning shard and wait for its result"""
+        try:
+            return self.submit(guild_id, op, **args).result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise ShardError(f"Shard call {op} for guild {guild_id} timed out")
+
+    def stats(self):
+        """Batching statistics per distinct shard process"""
+        seen = {}
+        for connection in self.connections:
+            seen[f"{connection.address[0]}:{connection.address[1]}"] = {
+                "batches": connection.batches_sent,
+                "messages": connection.messages_sent,
+            }
+        return seen
+
+class ShardServer:
+    """Serves dashboard calls for the guilds owned by this shard process"""
+
+    def __init__(self, handlers, secret, shard_ids=None, shard_count=None):
+        if not secret:
+            raise ValueError("Shard IPC needs a shared secret")
+        self.handlers = handlers
+        self.secret = secret
+        self.shard_ids = set(shard_ids) if shard_ids is not None else None
+        self.shard_count = shard_count
+        self.server = None
+
+    def owns(self, guild_id):
+        if self.shard_ids is None or not self.shard_count:
+            return True
+        return shard_for(guild_id, self.shard_count) in self.shard_ids
+
+    async def start(self, host, port, allow_remote=False):
+        if not allow_remote and not is_loopback(host):
+            raise ShardError(f"Refusing to serve shard IPC on non-loopback address {host}")
+        self.server = await asyncio.start_server(self._handle, host, port, limit=2 ** 22)
+        logger.info(f"Dashboard shard IPC listening on {host}:{port}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _dispatch(self, message):
+        handler = self.handlers.get(message.get("op"))
+        if handler is None:
+            return {"id": message.get("id"), "ok": False, "error": f"Unknown operation {message.get('op')}"}
+        guild_id = message.get("guild_id")
+        if not self.owns(guild_id):
+            return {"id": message["id"], "ok": False, "error": f"Guild {guild_id} is not on this shard"}
+        try:
+            if asyncio.iscoroutinefunction(handler):
+                result = await handler(guild_id, **message.get("args", {}))
+            else:
+                # Handlers touch the settings store, so keep them off the event loop
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, lambda: handler(guild_id, **message.get("args", {})))
+            return {"id": message["id"], "ok": True, "result": result}
+        except Exception as e:
+            return {"id": message["id"], "ok": False, "error": str(e)}
+
+    async def _authenticate(self, reader, writer):
+        challenge = secrets.token_hex(16)
+        try:
+            writer.write((json.dumps({"challenge": challenge}) + "\n").encode())
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), HANDSHAKE_TIMEOUT)
+        except (ConnectionError, asyncio.TimeoutError):
+            return False
+        if not line:
+            # Closed without answering, e.g. a port check
+            return False
+        try:
+            answer = json.loads(line).get("auth")
+        except (ValueError, AttributeError):
+            answer = None
+        if not isinstance(answer, str) or not hmac.compare_digest(answer, sign(self.secret, challenge)):
+            writer.write((json.dumps({"ok": False, "error": "Authentication failed"}) + "\n").encode())
+            await writer.drain()
+            peer = writer.get_extra_info("peername")
+            logger.warning(f"Dashboard shard IPC rejected a connection from {peer}")
+            return False
+        writer.write((json.dumps({"ok": True}) + "\n").encode())
+        await writer.drain()
+        return True
+
+    async def _handle(self, reader, writer):
+        try:
+            if not await self._authenticate(reader, writer):
+                return
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                batch = json.loads(line).get("batch", [])
+                results = await asyncio.gather(*(self._dispatch(m) for m in batch))
+                writer.write((json.dumps({"results": results}) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Dashboard shard IPC connection dropped: {e}")
+        finally:
+            writer.close()
+
+def _demo_shard_process(host, port, secret, shard_ids, shard_count):
+    """Shard process for the local demo: answers from an in-memory settings dict"""
+    settings = {}
+
+    def get_cog_status(guild_id, cog_name):
+        return {"enabled": settings.get((guild_id, cog_name), True), "served_by": shard_ids}
+
+    def set_cog_status(guild_id, cog_name, enabled):
+        settings[(guild_id, cog_name)] = enabled
+        return {"served_by": shard_ids}
+
+    async def main():
+        server = ShardServer({"get_cog_status": get_cog_status, "set_cog_status": set_cog_status},
+                             secret, shard_ids, shard_count)
+        await server.start(host, port)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+def _demo(shards, processes, guilds, base_port):
+    import multiprocessing
+
+    secret = secrets.token_hex(16)
+    per_process = [list(range(shards))[i::processes] for i in range(processes)]
+    endpoints = [None] * shards
+    workers = []
+    for index, shard_ids in enumerate(per_process):
+        address = ("127.0.0.1", base_port + index)
+        for shard_id in shard_ids:
+            endpoints[shard_id] = address
+        worker = multiprocessing.Process(target=_demo_shard_process, args=(*address, secret, shard_ids, shards), daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    deadline = time.monotonic() + 10
+    for address in set(endpoints):
+        while True:
+            try:
+                socket.create_connection(address, timeout=0.5).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    router = ShardRouter(shards, endpoints, secret)
+    # Spread guild IDs over the snowflake timestamp bits so they land on different shards
+    guild_ids = [str((1420070400000 + i * 7919) << 22) for i in range(guilds)]
+    started = time.perf_counter()
+    writes = [router.submit(g, "set_cog_status", cog_name="AutoMod", enabled=False) for g in guild_ids]
+    for future in writes:
+        future.result(timeout=5)
+    reads = [(g, router.submit(g, "get_cog_status", cog_name="AutoMod")) for g in guild_ids]
+    misrouted = 0
+    for guild_id, future in reads:
+        result = future.result(timeout=5)
+        if shard_for(guild_id, shards) not in result["served_by"] or result["enabled"]:
+            misrouted += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"{2 * guilds} calls to {shards} shards in {processes} processes took {elapsed * 1000:.1f} ms")
+    print(f"Misrouted or stale results: {misrouted}")
+    print(json.dumps(router.stats(), indent=4))
+    for worker in workers:
+        worker.terminate()
+    return misrouted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard shard IPC tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    demo = sub.add_parser("demo", help="run several local shard processes and route calls to them")
+    demo.add_argument("--shards", type=int, default=4)
+    demo.add_argument("--processes", type=int, default=2)
+    demo.add_argument("--guilds", type=int, default=500)
+    demo.add_argument("--base-port", type=int, default=6400)
+    args = parser.parse_args(argv)
+    if args.command == "demo":
+        raise SystemExit(1 if _demo(args.shards, args.processes, args.guilds, args.base_port) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Process-wide objects that outlive reloads of the dashboard cog.
+
+`bot.reload_extension("webcog")` runs webcog again from scratch. Singletons
+kept in webcog's module globals were therefore built a second time, each
+with threads or tasks of their own. Cogs that had imported the old getters
+kept using the first copies, which nothing ever closed. The dashboard
+package isn't reloaded, so the instances live here, and webcog's getters
+only say how to build them.
+"""
+import threading
+
+_instances = {}
+# Reentrant: building the cog index needs the settings store
+_lock = threading.RLock()
+
+def get(name, factory):
+    """The instance registered under `name`, built with factory() on first use"""
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _instances[name] = factory()
+        return instance
@@ -0,0 +1,228 @@
+"""Warm-start snapshot of the dashboard caches.
+
+Every few minutes the bot's guild list, the cached guild role lists and the
+parsed settings namespaces are written to one compact file. At startup the
+file is memory-mapped and only its small header is read; each section is
+decompressed and decoded the first time something asks for it. The Discord
+client and the settings store consult the snapshot on a cache miss, so
+pages can be served right after a restart while live data is fetched and
+checked in the background.
+
+File layout: a magic line, a JSON header line with the write time and the
+(offset, length) of every section, then the zlib-compressed JSON sections.
+"""
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("discord_bot")
+
+MAGIC = b"MODWAYSNAP1\n"
+
+def write_snapshot(path, sections):
+    """Atomically write {name: json-serializable} as a snapshot file"""
+    blobs = {name: zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+             for name, value in sections.items()}
+    offsets = {}
+    position = 0
+    for name, blob in blobs.items():
+        offsets[name] = [position, len(blob)]
+        position += len(blob)
+    header = json.dumps({"written_at": time.time(), "sections": offsets}).encode() + b"\n"
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(header)
+        for blob in blobs.values():
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(MAGIC) + len(header) + position
+
+class Snapshot:
+    """A snapshot file opened for lazy reading"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError("not a dashboard snapshot")
+            header_end = self._map.find(b"\n", len(MAGIC))
+            header = json.loads(self._map[len(MAGIC):header_end])
+        except Exception:
+            self.close()
+            raise
+        self.written_at = header["written_at"]
+        self._sections = header["sections"]
+        self._body = header_end + 1
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        """Open a snapshot, or return None if there is no usable one"""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dashboard snapshot {path}: {e}")
+            return None
+
+    @property
+    def age(self):
+        return max(0.0, time.time() - self.written_at)
+
+    def section(self, name):
+        """Decoded section, or None if the snapshot doesn't have it"""
+        with self._lock:
+            if name in self._decoded:
+                return self._decoded[name]
+            value = None
+            if name in self._sections and self._map is not None:
+                offset, length = self._sections[name]
+                start = self._body + offset
+                value = json.loads(zlib.decompress(self._map[start:start + length]))
+            self._decoded[name] = value
+            return value
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+class SnapshotManager:
+    """Seeds the Discord client and settings store from a snapshot and keeps it up to date"""
+
+    def __init__(self, client, store, path, namespaces, interval=300.0):
+        self.client = client
+        self.store = store
+        self.path = path
+        self.namespaces = namespaces
+        self.interval = interval
+        self.snapshot = None
+        self.departed = set()
+        self.validation = None
+        self.last_write = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, client, store, path, namespaces):
+        return cls(client, store, path, namespaces, interval=float(os.getenv("DASHBOARD_SNAPSHOT_INTERVAL", 300)))
+
+    def load(self):
+        """Open the snapshot file and hook it up as a fallback; returns whether one was found"""
+        self.snapshot = Snapshot.open(self.path)
+        self.client.fallback = self.client_entry
+        self.store.fallback = self.settings_entry
+        if self.snapshot is not None:
+            logger.info(f"Dashboard warm-start snapshot loaded ({self.snapshot.age:.0f}s old)")
+        return self.snapshot is not None
+
+    def client_entry(self, key):
+        """(data, age) for a Discord client cache key, from the snapshot"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if key == ("bot_guilds",):
+            entry = snapshot.section("bot_guilds")
+        elif key[0] == "guild_roles" and key[1] not in self.departed:
+            entry = (snapshot.section("guild_roles") or {}).get(key[1])
+        else:
+            return None
+        if entry is None:
+            return None
+        age, data = entry
+        return data, age + snapshot.age
+
+    def settings_entry(self, namespace):
+        """(seq, documents) for a settings namespace, from the snapshot"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        entry = (snapshot.section("settings") or {}).get(namespace)
+        return (entry[0], entry[1]) if entry is not None else None
+
+    def write(self):
+        """Write the current caches out as the new snapshot"""
+        started = time.perf_counter()
+        bot_guilds = None
+        guild_roles = {}
+        for key, data, age in self.client.export():
+            if key[0] == "bot_guilds":
+                bot_guilds = [round(age, 1), data]
+            elif key[0] == "guild_roles":
+                guild_roles[key[1]] = [round(age, 1), data]
+        for namespace in self.namespaces:
+            self.store.load(namespace)
+        settings = {namespace: [seq, documents] for namespace, (seq, documents) in self.store.cached().items()}
+        size = write_snapshot(self.path, {
+            "bot_guilds": bot_guilds,
+            "guild_roles": guild_roles,
+            "settings": settings,
+        })
+        self.last_write = {
+            "at": time.time(),
+            "bytes": size,
+            "roles": len(guild_roles),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return self.last_write
+
+    def validate(self):
+        """Compare the snapshot's guild list with Discord's and drop guilds the bot has left"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        entry = snapshot.section("bot_guilds")
+        live = self.client.bot_guilds(live=True)
+        if entry is None or not live.ok:
+            return None
+        saved = {guild["id"] for guild in entry[1]}
+        current = {guild["id"] for guild in live.data}
+        self.departed = saved - current
+        for guild_id in self.departed:
+            self.client.invalidate("guild_roles", guild_id)
+        self.validation = {"guilds": len(current), "left": len(self.departed), "joined": len(current - saved)}
+        logger.info(
+            f"Dashboard snapshot validated: {len(current)} guilds live, "
+            f"{len(self.departed)} left and {len(current - saved)} joined since it was written")
+        return self.validation
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="DashboardSnapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.validate()
+        except Exception as e:
+            logger.warning(f"Dashboard snapshot validation failed: {e}")
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                logger.error(f"Failed to write dashboard snapshot: {e}")
+
+    def stop(self, final_write=True):
+        self._stop_event.set()
+        if final_write:
+            try:
+                self.write()
+            except Exception as e:
+                logger.error(f"Failed to write dashboard snapshot: {e}")
+
+    def status(self):
+        return {
+            "path": self.path,
+            "loaded_age": round(self.snapshot.age, 1) if self.snapshot is not None else None,
+            "last_write": self.last_write,
+            "validation": self.validation,
+        }
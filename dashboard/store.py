@@ -0,0 +1,332 @@
+"""Shared settings store backed by SQLite.
+
+All guild settings live in one SQLite database so the bot process and any
+number of dashboard worker processes read the same data. Every write bumps
+a per-namespace change counter in the same transaction and stamps the row
+with the new counter value. Readers compare the counter with the one they
+cached and pull only the rows written since, so a toggle saved by one
+process is visible to every other process on its next read.
+
+Each guild document also carries its own version, bumped on every write to
+it. Writers that pass `expected_version` get compare-and-swap semantics: the
+write only happens if nobody else wrote that document since it was read.
+"""
+import contextlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+
+logger = logging.getLogger("discord_bot")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    namespace TEXT NOT NULL,
+    guild_id TEXT NOT NULL,
+    data TEXT,
+    seq INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, guild_id)
+);
+CREATE INDEX IF NOT EXISTS settings_seq ON settings (namespace, seq);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Upsert one document, bumping its version
+UPSERT = (
+    "INSERT INTO settings (namespace, guild_id, data, seq, version) VALUES (?, ?, ?, ?, 1) "
+    "ON CONFLICT(namespace, guild_id) DO UPDATE SET "
+    "data = excluded.data, seq = excluded.seq, version = settings.version + 1"
+)
+
+class VersionConflict(Exception):
+    """A compare-and-swap write found the document at a different version"""
+
+    def __init__(self, namespace, guild_id, expected, current):
+        super().__init__(f"{namespace} for guild {guild_id} is at version {current}, not {expected}")
+        self.expected = expected
+        self.current = current
+
+class SettingsStore:
+    """Per-guild JSON documents grouped by namespace ("cog_settings", "autorole", ...)"""
+
+    def __init__(self, path, legacy_files=None, pool_size=8):
+        self.path = path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._cache = {}  # namespace -> [seq, {guild_id: data}]
+        self._cache_lock = threading.Lock()
+        # Optional callable(namespace) -> (seq, documents) used to seed an empty cache
+        self.fallback = None
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+        for namespace, json_path in (legacy_files or {}).items():
+            self.import_json(namespace, json_path)
+
+    def _migrate(self, conn):
+        """Add the version column to databases created before it existed"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(settings)")}
+        if "version" in columns:
+            return
+        try:
+            conn.execute("ALTER TABLE settings ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            # Another process added it first
+            pass
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Borrow a pooled connection; request threads come and go so they don't own one"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _bump(self, conn, namespace):
+        """Bump a namespace's change counter inside a write; returns the new value"""
+        conn.execute(
+            "INSERT INTO counters (namespace, value) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET value = value + 1",
+            (namespace,))
+        return conn.execute("SELECT value FROM counters WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    @contextlib.contextmanager
+    def _write(self, namespace):
+        """Write transaction that yields (conn, seq) with the namespace counter already bumped"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._bump(conn, namespace)
+                yield conn, seq
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def change_counter(self, namespace):
+        """Current change counter of a namespace (0 if never written)"""
+        with self._connection() as conn:
+            row = conn.execute("SELECT value FROM counters WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def counters(self):
+        """Snapshot of all change counters, used by watchers"""
+        with self._connection() as conn:
+            return dict(conn.execute("SELECT namespace, value FROM counters").fetchall())
+
+    def changes_since(self, namespace, since):
+        """Raw (guild_id, data JSON or None for deleted, seq) rows written after `since`"""
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT guild_id, data, seq FROM settings WHERE namespace = ? AND seq > ? ORDER BY seq",
+                (namespace, since)).fetchall()
+
+    def load(self, namespace):
+        """All guild documents of a namespace; the returned dict must be treated as read-only"""
+        current = self.change_counter(namespace)
+        with self._cache_lock:
+            entry = self._cache.get(namespace)
+            if entry is None and self.fallback is not None:
+                seeded = self.fallback(namespace)
+                # A seed newer than the database (e.g. restored from a backup) can't be caught up
+                if seeded is not None and seeded[0] <= current:
+                    entry = [seeded[0], seeded[1]]
+            if entry is not None and entry[0] == current:
+                self._cache[namespace] = entry
+                return entry[1]
+            since = entry[0] if entry is not None else 0
+            documents = dict(entry[1]) if entry is not None else {}
+            seq = since
+            for guild_id, data, row_seq in self.changes_since(namespace, since):
+                if data is None:
+                    documents.pop(guild_id, None)
+                else:
+                    documents[guild_id] = json.loads(data)
+                seq = max(seq, row_seq)
+            # Rows committed after we read the counter are picked up by the next refresh
+            self._cache[namespace] = [max(seq, current), documents]
+            return documents
+
+    def cached(self):
+        """Namespaces currently cached, as {namespace: (seq, documents)}"""
+        with self._cache_lock:
+            return {namespace: (entry[0], entry[1]) for namespace, entry in self._cache.items()}
+
+    def iter_raw(self, namespace, batch=1000):
+        """(guild_id, document JSON) of a namespace in guild ID order, read a batch at a time.
+
+        Unlike load() this neither caches nor decodes, so walking every guild
+        of a big install keeps memory flat.
+        """
+        after = ""
+        while True:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT guild_id, data FROM settings WHERE namespace = ? AND guild_id > ? AND data IS NOT NULL "
+                    "ORDER BY guild_id LIMIT ?", (namespace, after, batch)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            after = rows[-1][0]
+
+    def get(self, namespace, guild_id, default=None):
+        """One guild's document, or default"""
+        return self.load(namespace).get(str(guild_id), default)
+
+    def get_versioned(self, namespace, guild_id, default=None):
+        """(document or default, version) read straight from the database; version 0 means never written"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT data, version FROM settings WHERE namespace = ? AND guild_id = ?",
+                (namespace, str(guild_id))).fetchone()
+        if row is None:
+            return default, 0
+        return (json.loads(row[0]) if row[0] is not None else default), row[1]
+
+    def version(self, namespace, guild_id):
+        """Current version of one guild's document"""
+        return self.get_versioned(namespace, guild_id)[1]
+
+    def _current(self, conn, namespace, guild_id, expected_version=None):
+        """(data JSON, version) of a row inside a write; raises VersionConflict on a CAS mismatch"""
+        row = conn.execute(
+            "SELECT data, version FROM settings WHERE namespace = ? AND guild_id = ?",
+            (namespace, str(guild_id))).fetchone()
+        data, version = row if row else (None, 0)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(namespace, guild_id, expected_version, version)
+        return data, version
+
+    def put(self, namespace, guild_id, data, expected_version=None):
+        """Insert or replace one guild's document; returns its new version"""
+        with self._write(namespace) as (conn, seq):
+            version = self._current(conn, namespace, guild_id, expected_version)[1]
+            conn.execute(UPSERT, (namespace, str(guild_id), json.dumps(data), seq))
+        return version + 1
+
+    def delete(self, namespace, guild_id, expected_version=None):
+        """Remove one guild's document (kept as a tombstone so other processes notice); returns its new version"""
+        with self._write(namespace) as (conn, seq):
+            version = self._current(conn, namespace, guild_id, expected_version)[1]
+            conn.execute(UPSERT, (namespace, str(guild_id), None, seq))
+        return version + 1
+
+    def update_versioned(self, namespace, guild_id, mutate, default=None, expected_version=None):
+        """Atomically read, mutate and write one guild's document; returns (new document, new version)"""
+        with self._write(namespace) as (conn, seq):
+            data, version = self._current(conn, namespace, guild_id, expected_version)
+            current = json.loads(data) if data is not None else default
+            new = mutate(current)
+            conn.execute(UPSERT, (namespace, str(guild_id), json.dumps(new) if new is not None else None, seq))
+        return new, version + 1
+
+    def update(self, namespace, guild_id, mutate, default=None, expected_version=None):
+        """Atomically read, mutate and write one guild's document; returns the new document"""
+        return self.update_versioned(namespace, guild_id, mutate, default, expected_version)[0]
+
+    def put_many(self, records, batch=500):
+        """Write (namespace, guild_id, document or None to delete) records in one transaction.
+
+        `records` may be a generator; rows go to SQLite a batch at a time, so
+        memory stays bounded however many there are. If the generator raises,
+        nothing is written. Returns the number of records written.
+        """
+        count = 0
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                seqs = {}
+                rows = []
+                for namespace, guild_id, data in records:
+                    if namespace not in seqs:
+                        seqs[namespace] = self._bump(conn, namespace)
+                    rows.append((namespace, str(guild_id), json.dumps(data) if data is not None else None, seqs[namespace]))
+                    if len(rows) >= batch:
+                        conn.executemany(UPSERT, rows)
+                        count += len(rows)
+                        rows = []
+                conn.executemany(UPSERT, rows)
+                count += len(rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def replace_all(self, namespace, documents):
+        """Make the namespace contain exactly `documents` in one transaction"""
+        existing = set(self.load(namespace))
+        with self._write(namespace) as (conn, seq):
+            conn.executemany(UPSERT, [(namespace, str(g), json.dumps(d), seq) for g, d in documents.items()])
+            conn.executemany(UPSERT, [(namespace, g, None, seq) for g in existing - set(map(str, documents))])
+
+    def import_json(self, namespace, json_path):
+        """Seed a namespace from a legacy JSON settings file the first time the store sees it"""
+        if self.change_counter(namespace) or not os.path.exists(json_path):
+            return False
+        with open(json_path, "r") as f:
+            documents = json.load(f)
+        self.replace_all(namespace, documents)
+        logger.info(f"Imported {len(documents)} guilds from {json_path} into the settings store")
+        return True
+
+    def export_json(self, namespace, json_path):
+        """Atomically write a namespace back out as a legacy JSON settings file"""
+        # A temp file of its own, so processes exporting at the same time don't write into each other's
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(json_path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(json_path) or ".")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.load(namespace), f, indent=4)
+            os.replace(tmp_path, json_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+class SettingsWatcher(threading.Thread):
+    """Polls the store's change counters and calls `callback(namespace)` when one moves"""
+
+    def __init__(self, store, callback, interval=0.5):
+        super().__init__(name="SettingsWatcher", daemon=True)
+        self.store = store
+        self.callback = callback
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        seen = self.store.counters()
+        while not self._stop_event.wait(self.interval):
+            try:
+                current = self.store.counters()
+            except sqlite3.Error as e:
+                logger.error(f"Settings watcher failed to read counters: {e}")
+                continue
+            for namespace, value in current.items():
+                if seen.get(namespace) != value:
+                    try:
+                        self.callback(namespace)
+                    except Exception as e:
+                        logger.error(f"Settings change handler failed for {namespace}: {e}")
+            seen = current
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,224 @@
+"""Per-guild, per-cog usage counters at minute, hour and day resolution.
+
+Every (guild, cog) pair that has seen an event owns one array of 32-bit
+counters split into three rings:
+
+    minute  60 slots  (the last hour)
+    hour    48 slots  (the last two days)
+    day     30 slots  (the last month)
+
+An event is added to the current slot of all three rings, so the coarser
+rings are exact sums of the finer ones without a separate downsampling pass.
+Before a ring is written or read, the slots between its newest bucket and
+the current one are zeroed, so old buckets fall out on their own.
+
+That is 138 counters, or 552 bytes, per (guild, cog), plus about 120 bytes
+of Python object overhead. Memory is bounded by the number of cogs: a guild
+using every dashboard module (14 today) costs under 10 KB, however busy it is.
+
+The rings are persisted as one zlib-compressed binary file. Idle rings are
+mostly zeros and compress to a few bytes each. The bot process records and
+saves. Standalone dashboard workers call refresh(), which looks at the file
+at most once per RELOAD_INTERVAL and re-reads it only when its modification
+time or size changed.
+"""
+import array
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("discord_bot")
+
+# name -> (bucket seconds, slots)
+RESOLUTIONS = {
+    "minute": (60, 60),
+    "hour": (3600, 48),
+    "day": (86400, 30),
+}
+SLOTS = sum(slots for _, slots in RESOLUTIONS.values())
+MAGIC = b"TLM1"
+RECORD = struct.Struct("<QB")  # guild ID, cog name length
+STAMP = struct.Struct("<I")  # minute the series was last advanced to
+# Seconds refresh() trusts the last look at the file; the bot saves once a minute by default
+RELOAD_INTERVAL = float(os.getenv("DASHBOARD_TELEMETRY_RELOAD_INTERVAL", 5))
+
+class Series:
+    """Fixed-size counters of one (guild, cog) pair"""
+
+    __slots__ = ("counts", "minute")
+
+    def __init__(self, counts=None, minute=0):
+        self.counts = counts if counts is not None else array.array("I", bytes(4 * SLOTS))
+        self.minute = minute
+
+    def advance(self, minute):
+        """Zero the buckets that elapsed since the series was last touched"""
+        if minute <= self.minute:
+            return
+        offset = 0
+        for seconds, slots in RESOLUTIONS.values():
+            per_bucket = seconds // 60
+            old, new = self.minute // per_bucket, minute // per_bucket
+            for bucket in range(max(old + 1, new - slots + 1), new + 1):
+                self.counts[offset + bucket % slots] = 0
+            offset += slots
+        self.minute = minute
+
+    def add(self, minute, n):
+        offset = 0
+        for seconds, slots in RESOLUTIONS.values():
+            index = offset + (minute // (seconds // 60)) % slots
+            self.counts[index] = min(self.counts[index] + n, 0xFFFFFFFF)
+            offset += slots
+
+    def window(self, resolution):
+        """Counts of one ring, oldest bucket first, ending with the current one"""
+        offset = 0
+        for name, (seconds, slots) in RESOLUTIONS.items():
+            if name == resolution:
+                newest = self.minute // (seconds // 60)
+                return [self.counts[offset + (newest - i) % slots] for i in range(slots - 1, -1, -1)]
+            offset += slots
+        raise KeyError(resolution)
+
+class Telemetry:
+    """Event counters for every (guild, cog) pair, safe to use from any thread"""
+
+    def __init__(self, path=None, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._guilds = {}  # guild_id -> {cog: Series}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._seen = None  # (mtime_ns, size) of the file last read
+        self._checked_at = None
+
+    def _minute(self):
+        return int(self.clock() // 60)
+
+    def record(self, guild_id, cog, n=1):
+        """Count n events of a cog in a guild"""
+        if guild_id is None:
+            return
+        minute = self._minute()
+        with self._lock:
+            cogs = self._guilds.setdefault(int(guild_id), {})
+            series = cogs.get(cog)
+            if series is None:
+                series = cogs[cog] = Series(minute=minute)
+            series.advance(minute)
+            series.add(minute, n)
+            self._dirty = True
+
+    def guild(self, guild_id, resolution="hour"):
+        """{cog: counts oldest first} for one guild, plus where the window ends"""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        seconds, slots = RESOLUTIONS[resolution]
+        minute = self._minute()
+        cogs = {}
+        with self._lock:
+            for cog, series in self._guilds.get(int(guild_id), {}).items():
+                series.advance(minute)
+                cogs[cog] = series.window(resolution)
+        # Start of the newest bucket
+        end = minute * 60 // seconds * seconds
+        return {"resolution": resolution, "bucket_seconds": seconds, "buckets": slots, "end": end, "cogs": cogs}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "series": sum(len(cogs) for cogs in self._guilds.values()),
+                "guilds": len(self._guilds),
+                "bytes_per_series": SLOTS * 4,
+            }
+
+    def dump(self):
+        """Compact binary image of every series"""
+        parts = []
+        with self._lock:
+            for guild_id, cogs in self._guilds.items():
+                for cog, series in cogs.items():
+                    name = cog.encode()
+                    parts.append(RECORD.pack(guild_id, len(name)) + name + STAMP.pack(series.minute)
+                                 + series.counts.tobytes())
+            self._dirty = False
+        return MAGIC + zlib.compress(b"".join(parts), 6)
+
+    def restore(self, blob):
+        if blob[:4] != MAGIC:
+            raise ValueError("not a telemetry file")
+        data = zlib.decompress(blob[4:])
+        guilds = {}
+        position = 0
+        while position < len(data):
+            guild_id, length = RECORD.unpack_from(data, position)
+            position += RECORD.size
+            cog = data[position:position + length].decode()
+            position += length
+            minute = STAMP.unpack_from(data, position)[0]
+            position += STAMP.size
+            counts = array.array("I")
+            counts.frombytes(data[position:position + 4 * SLOTS])
+            position += 4 * SLOTS
+            guilds.setdefault(guild_id, {})[cog] = Series(counts, minute)
+        with self._lock:
+            self._guilds = guilds
+            self._dirty = False
+
+    def save(self):
+        """Write the counters to disk if anything changed since the last save"""
+        if self.path is None or not self._dirty:
+            return False
+        blob = self.dump()
+        try:
+            self._write(blob)
+        except BaseException:
+            # Try again on the next save
+            self._dirty = True
+            raise
+        return True
+
+    def _write(self, blob):
+        # A temp file of its own, so two processes saving at once don't write into each other's
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(self.path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self):
+        """Read the counters from disk; returns False if the file is missing, unchanged or unreadable"""
+        if self.path is None:
+            return False
+        try:
+            st = os.stat(self.path)
+            # Size as well as mtime: a coarse mtime can miss a save within the same tick
+            seen = (st.st_mtime_ns, st.st_size)
+            if seen == self._seen:
+                return False
+            self._seen = seen
+            with open(self.path, "rb") as f:
+                self.restore(f.read())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not load telemetry from {self.path}: {e}")
+            return False
+        return True
+
+    def refresh(self, max_age=RELOAD_INTERVAL):
+        """load(), unless the file was already looked at in the last max_age seconds"""
+        now = self.clock()
+        if self._checked_at is not None and 0 <= now - self._checked_at < max_age:
+            return False
+        self._checked_at = now
+        return self.load()
@@ -0,0 +1,135 @@
+"""Background cache warming right after a dashboard login.
+
+The login callback hands the new access token to CacheWarmer.warm(), which
+fetches the user's guild list, the bot's guild list, the roles of every guild
+the user can manage and the bot is in, and those guilds' settings. Everything
+lands in the DiscordClient cache and the settings store, so the first pages
+after login don't pay for cold fetches.
+
+Warming is strictly best effort. A few jobs run at a time, bot-token calls
+from all jobs share one paced budget, and a job gives up as soon as Discord
+rate-limits it or a breaker stops allowing calls.
+"""
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("discord_bot")
+
+MANAGE_GUILD = 0x20
+
+class CacheWarmer:
+    """Runs post-login warm-up jobs on a small bounded pool"""
+
+    def __init__(self, client, load_settings, workers=2, max_guilds=25, rate=5.0, max_pending=32):
+        self.client = client
+        self.load_settings = load_settings
+        self.max_guilds = max_guilds
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.max_pending = max_pending
+        self.jobs_started = 0
+        self.jobs_skipped = 0
+        self.jobs_aborted = 0
+        self.guilds_warmed = 0
+        self.calls = 0
+        self.last_duration_ms = None
+        self._pending = set()
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+        self._pace_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DashboardWarmup")
+
+    @classmethod
+    def from_env(cls, client, load_settings):
+        return cls(
+            client, load_settings,
+            workers=int(os.getenv("DASHBOARD_WARM_WORKERS", 2)),
+            max_guilds=int(os.getenv("DASHBOARD_WARM_MAX_GUILDS", 25)),
+            rate=float(os.getenv("DASHBOARD_WARM_RATE", 5.0)),
+        )
+
+    def warm(self, user_id, access_token):
+        """Queue a warm-up for a freshly logged-in user; returns False if it was skipped"""
+        with self._lock:
+            if user_id in self._pending or len(self._pending) >= self.max_pending:
+                self.jobs_skipped += 1
+                return False
+            self._pending.add(user_id)
+            self.jobs_started += 1
+        try:
+            self._executor.submit(self._run, user_id, access_token)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._pending.discard(user_id)
+            return False
+        return True
+
+    def _pace(self):
+        """Wait for the next slot in the shared bot-token budget"""
+        with self._pace_lock:
+            now = time.monotonic()
+            wait = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.calls += 1
+
+    def _run(self, user_id, access_token):
+        started = time.perf_counter()
+        try:
+            if not self._warm(access_token):
+                with self._lock:
+                    self.jobs_aborted += 1
+        except Exception as e:
+            logger.warning(f"Dashboard cache warm-up failed for user {user_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(user_id)
+                self.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def _warm(self, access_token):
+        """Returns False if the job stopped early to stay within Discord's limits"""
+        user_guilds = self.client.user_guilds(access_token)
+        if not user_guilds.ok:
+            return False
+        if not self.client.is_fresh("bot_guilds"):
+            self._pace()
+        bot_guilds = self.client.bot_guilds()
+        if not bot_guilds.ok:
+            return False
+
+        bot_guild_ids = {guild["id"] for guild in bot_guilds.data}
+        manageable = [
+            guild["id"] for guild in user_guilds.data
+            if int(guild["permissions"]) & MANAGE_GUILD and guild["id"] in bot_guild_ids
+        ]
+        for guild_id in manageable[:self.max_guilds]:
+            self.load_settings(guild_id)
+            if not self.client.is_fresh("guild_roles", str(guild_id)):
+                if not self.client.is_available("guild_roles"):
+                    return False
+                self._pace()
+                if self.client.guild_roles(guild_id).status == 429:
+                    return False
+            with self._lock:
+                self.guilds_warmed += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "jobs_started": self.jobs_started,
+                "jobs_skipped": self.jobs_skipped,
+                "jobs_aborted": self.jobs_aborted,
+                "guilds_warmed": self.guilds_warmed,
+                "calls": self.calls,
+                "last_duration_ms": self.last_duration_ms,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
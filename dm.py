@@ -0,0 +1,106 @@
+from discord.ext import commands
+import discord
+import logging
+import os
+
+from dashboard.mass_dm import DMClosed, MassDMDispatcher
+from dashboard.role_queue import MemberGone, PermanentFailure, RetryAfter
+from webcog import get_telemetry
+
+logger = logging.getLogger('discord_bot')
+
+DM_JOBS_DIR = "data/dm_jobs"
+
+# Discord limits DM channel creation and message sends bot-wide, and flags
+# bursts of new DM channels as spam, so mass DMs are paced on both
+DM_CONCURRENCY = int(os.getenv("DM_CONCURRENCY", 8))
+DM_OPEN_RATE = float(os.getenv("DM_OPEN_RATE", 1.0))
+DM_OPEN_BURST = float(os.getenv("DM_OPEN_BURST", 5))
+DM_SEND_RATE = float(os.getenv("DM_SEND_RATE", 5.0))
+DM_SEND_BURST = float(os.getenv("DM_SEND_BURST", 10))
+
+# Discord error codes
+CANNOT_SEND_TO_USER = 50007
+OPENING_DMS_TOO_FAST = 40003
+
+class DMSystem(commands.Cog, name="DM"):
+    def __init__(self, bot):
+        self.bot = bot
+        self.dispatcher = MassDMDispatcher(
+            DM_JOBS_DIR, self.open_channel, self.send,
+            concurrency=DM_CONCURRENCY,
+            open_rate=DM_OPEN_RATE, open_burst=DM_OPEN_BURST,
+            send_rate=DM_SEND_RATE, send_burst=DM_SEND_BURST
+        )
+
+    async def cog_load(self):
+        resumed = self.dispatcher.load()
+        if resumed:
+            logger.info(f"Loaded {resumed} mass DM jobs")
+        self.dispatcher.start()
+
+    async def cog_unload(self):
+        # Unfinished jobs resume from their checkpoint when the cog loads again
+        await self.dispatcher.close()
+
+    async def start_mass_dm(self, guild_id, content, role_id=None, actor=None):
+        """Start a mass DM to the guild's human members, optionally only those with a role"""
+        guild = self.bot.get_guild(int(guild_id))
+        if guild is None:
+            raise ValueError("The bot is not in this server")
+        if not self.bot.intents.members:
+            raise ValueError("Mass DMs need the Server Members intent to list members")
+        if not guild.chunked:
+            await guild.chunk()
+        members = guild.members
+        if role_id:
+            role = guild.get_role(int(role_id))
+            if role is None:
+                raise ValueError("Selected role does not exist in this server")
+            members = role.members
+        recipients = [member.id for member in members if not member.bot]
+        if not recipients:
+            raise ValueError("No members to message")
+        job = self.dispatcher.create(guild.id, recipients, content, created_by=actor)
+        logger.info(f"Mass DM job {job.id} started in {guild.name} for {len(job.recipients)} members")
+        return job.progress()
+
+    def rate_limited(self, error):
+        retry_after = error.response.headers.get("Retry-After") if error.response is not None else None
+        return RetryAfter(float(retry_after or 1))
+
+    async def open_channel(self, user_id):
+        """DM channel with a user, creating it if discord.py doesn't have it yet"""
+        user = self.bot.get_user(int(user_id))
+        try:
+            if user is None:
+                user = await self.bot.fetch_user(int(user_id))
+            return user.dm_channel or await user.create_dm()
+        except discord.NotFound:
+            raise MemberGone()
+        except discord.HTTPException as e:
+            if e.status == 429:
+                raise self.rate_limited(e)
+            if e.code == OPENING_DMS_TOO_FAST:
+                raise RetryAfter(10.0)
+            raise
+
+    async def send(self, channel, guild_id, user_id, content):
+        guild = self.bot.get_guild(int(guild_id))
+        text = content.replace("{user}", f"<@{user_id}>").replace("{server}", guild.name if guild else "")
+        try:
+            await channel.send(text)
+            get_telemetry().record(guild_id, "DM")
+        except discord.Forbidden as e:
+            if e.code == CANNOT_SEND_TO_USER:
+                raise DMClosed()
+            raise PermanentFailure(str(e))
+        except discord.NotFound:
+            raise MemberGone()
+        except discord.HTTPException as e:
+            if e.status == 429:
+                raise self.rate_limited(e)
+            raise
+
+async def setup(bot):
+    await bot.add_cog(DMSystem(bot))
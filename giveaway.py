@@ -0,0 +1,210 @@
+from discord.ext import commands
+import discord
+import logging
+import re
+import time
+from typing import Optional
+
+from dashboard.giveaway import (MAX_WINNERS, Entrant, draw_winners, end_without_draw, make_check, new_seed,
+                               normalize_requirements)
+from webcog import cog_enabled, get_scheduler, get_settings_store, get_telemetry
+
+logger = logging.getLogger('discord_bot')
+
+EMOJI = "🎉"
+CHECK_INTERVAL = 15
+DURATION = re.compile(r"^(\d+)([smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_duration(text):
+    match = DURATION.match(text.strip().lower())
+    if not match:
+        raise commands.BadArgument("Duration must look like 30m, 12h or 7d")
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+class Giveaways(commands.Cog, name="Giveaway"):
+    def __init__(self, bot):
+        self.bot = bot
+        self.store = get_settings_store()
+        self.drawing = set()
+
+    async def cog_load(self):
+        # Each guild with giveaways is checked on its own slot within the interval
+        get_scheduler().every("giveaway.end", CHECK_INTERVAL, self.end_due_giveaways,
+                              guilds=lambda: self.store.load("giveaways").keys(), cog="Giveaway")
+
+    async def cog_unload(self):
+        get_scheduler().cancel("giveaway.end")
+
+    def is_enabled(self, guild_id):
+        return cog_enabled(guild_id, "Giveaway")
+
+    async def end_due_giveaways(self, guild_id):
+        if not self.bot.is_ready():
+            return
+        now = time.time()
+        for message_id, giveaway in list((self.store.get("giveaways", guild_id) or {}).items()):
+            if not giveaway.get("ended") and giveaway["ends_at"] <= now:
+                try:
+                    await self.draw(guild_id, message_id)
+                except Exception as e:
+                    logger.error(f"Failed to end giveaway {message_id} in guild {guild_id}: {e}")
+
+    async def entrants(self, guild, message):
+        """Stream the users who entered, one reaction page at a time"""
+        reaction = discord.utils.get(message.reactions, emoji=EMOJI)
+        if reaction is None:
+            return
+        async for user in reaction.users(limit=None):
+            member = guild.get_member(user.id)
+            yield Entrant(user.id, user.bot, [role.id for role in member.roles] if member else None)
+
+    async def draw(self, guild_id, message_id, count=None):
+        """Run the next draw of a giveaway and announce it; returns the winner IDs"""
+        key = (guild_id, str(message_id))
+        if key in self.drawing:
+            raise ValueError("A draw for this giveaway is already running")
+        self.drawing.add(key)
+        try:
+            return await self._draw(guild_id, message_id, count)
+        finally:
+            self.drawing.discard(key)
+
+    async def _draw(self, guild_id, message_id, count):
+        guild = self.bot.get_guild(guild_id)
+        giveaway = (self.store.get("giveaways", guild_id, {}) or {}).get(str(message_id))
+        if guild is None or giveaway is None:
+            raise ValueError("Giveaway not found")
+        # Account age is judged as of when the giveaway ended, so a reroll months later
+        # applies the same cutoff as the first draw
+        ended_at = giveaway.get("ended_at") or min(time.time(), giveaway["ends_at"])
+        channel = guild.get_channel(giveaway["channel_id"])
+        try:
+            if channel is None:
+                raise ValueError("The giveaway's channel no longer exists")
+            try:
+                message = await channel.fetch_message(int(message_id))
+            except discord.NotFound:
+                raise ValueError("The giveaway message was deleted")
+        except ValueError as e:
+            # Retrying can't bring them back, so end the giveaway instead of failing every check
+            self.store.update("giveaways", guild_id, end_without_draw(message_id, str(e), ended_at))
+            raise
+        draw = len(giveaway["draws"])
+        previous = [user_id for winners in giveaway["draws"] for user_id in winners]
+        # Anyone who already won is excluded, so a reroll only replaces winners
+        winners, stats = await draw_winners(
+            self.entrants(guild, message), count or giveaway["winners"], giveaway["seed"], draw,
+            make_check(giveaway["requirements"], now=ended_at), exclude=previous + [str(self.bot.user.id)]
+        )
+
+        def record(document):
+            document = document or {}
+            entry = document.get(str(message_id))
+            if entry is not None and len(entry["draws"]) == draw:
+                entry["ended"] = True
+                entry.setdefault("ended_at", ended_at)
+                entry["draws"].append(winners)
+                entry["stats"] = stats
+            return document
+        self.store.update("giveaways", guild_id, record)
+
+        if winners:
+            mentions = ", ".join(f"<@{user_id}>" for user_id in winners)
+            verb = "rerolled" if draw else "won"
+            await channel.send(f"{EMOJI} {mentions} {verb} **{giveaway['prize']}**!", reference=message)
+        else:
+            await channel.send(f"No eligible entries for **{giveaway['prize']}**.", reference=message)
+        get_telemetry().record(guild_id, "Giveaway")
+        logger.info(f"Giveaway {message_id} in {guild.name}, draw {draw}: {stats}")
+        return winners
+
+    @commands.hybrid_group(name="giveaway")
+    @commands.has_permissions(manage_guild=True)
+    async def giveaway(self, ctx):
+        """Create and manage giveaways"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send("Use `giveaway start`, `giveaway end` or `giveaway reroll`.")
+
+    @giveaway.command(name="start")
+    @commands.has_permissions(manage_guild=True)
+    async def giveaway_start(self, ctx, duration: str, winners: int, required_role: Optional[discord.Role] = None,
+                             min_account_age_days: Optional[int] = 0, *, prize: str):
+        """Start a giveaway in this channel"""
+        if not self.is_enabled(ctx.guild.id):
+            return await ctx.send("The Giveaways module is disabled on this server.")
+        if not 1 <= winners <= MAX_WINNERS:
+            return await ctx.send(f"Winners must be between 1 and {MAX_WINNERS}.")
+        try:
+            seconds = parse_duration(duration)
+            requirements = normalize_requirements({
+                "roles": [required_role.id] if required_role else [],
+                "min_account_age_days": min_account_age_days,
+            })
+        except (commands.BadArgument, ValueError) as e:
+            return await ctx.send(str(e))
+
+        ends_at = time.time() + seconds
+        embed = discord.Embed(
+            title=f"{EMOJI} {prize}",
+            description=f"React with {EMOJI} to enter!\nEnds <t:{int(ends_at)}:R> · {winners} winner(s)",
+            color=discord.Color.green()
+        )
+        if required_role:
+            embed.add_field(name="Required role", value=required_role.mention)
+        if min_account_age_days:
+            embed.add_field(name="Minimum account age", value=f"{min_account_age_days} days")
+        message = await ctx.channel.send(embed=embed)
+        await message.add_reaction(EMOJI)
+
+        def record(document):
+            document = document or {}
+            document[str(message.id)] = {
+                "channel_id": ctx.channel.id,
+                "prize": prize,
+                "winners": winners,
+                "ends_at": ends_at,
+                "requirements": requirements,
+                # Stored so every draw can be reproduced
+                "seed": new_seed(),
+                "host_id": ctx.author.id,
+                "ended": False,
+                "draws": [],
+            }
+            return document
+        self.store.update("giveaways", ctx.guild.id, record)
+        if ctx.interaction is not None:
+            await ctx.send("Giveaway started!", ephemeral=True)
+
+    @giveaway.command(name="end")
+    @commands.has_permissions(manage_guild=True)
+    async def giveaway_end(self, ctx, message_id: str):
+        """End a giveaway now and draw its winners"""
+        giveaway = (self.store.get("giveaways", ctx.guild.id, {}) or {}).get(message_id)
+        if giveaway is None:
+            return await ctx.send("Giveaway not found.")
+        if giveaway.get("ended"):
+            return await ctx.send("That giveaway has already ended; use `giveaway reroll`.")
+        try:
+            async with ctx.typing():
+                await self.draw(ctx.guild.id, message_id)
+        except ValueError as e:
+            await ctx.send(str(e))
+
+    @giveaway.command(name="reroll")
+    @commands.has_permissions(manage_guild=True)
+    async def giveaway_reroll(self, ctx, message_id: str, count: int = 1):
+        """Draw replacement winners for an ended giveaway"""
+        giveaway = (self.store.get("giveaways", ctx.guild.id, {}) or {}).get(message_id)
+        if giveaway is None or not giveaway.get("ended"):
+            return await ctx.send("Ended giveaway not found.")
+        if not 1 <= count <= MAX_WINNERS:
+            return await ctx.send(f"Count must be between 1 and {MAX_WINNERS}.")
+        try:
+            async with ctx.typing():
+                await self.draw(ctx.guild.id, message_id, count)
+        except ValueError as e:
+            await ctx.send(str(e))
+
+async def setup(bot):
+    await bot.add_cog(Giveaways(bot))
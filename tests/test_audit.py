@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from dashboard.audit import AuditJournal, record_id, split_record_id
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = AuditJournal(str(tmp_path / "audit"), flush_interval=0.01)
+    yield journal
+    journal.close()
+
+def write(journal, guild_id, count, **details):
+    for i in range(count):
+        journal.append(guild_id, "toggle_cog", {"id": "1", "name": "admin"}, n=i, **details)
+    journal.flush()
+
+def test_record_ids_pack_segment_and_offset():
+    assert split_record_id(record_id(3, 12345)) == (3, 12345)
+    assert record_id(2, 0) > record_id(1, 10 ** 9)
+
+def test_history_is_newest_first_per_guild(journal):
+    write(journal, 1, 3)
+    write(journal, 2, 2)
+    records, cursor = journal.history(1)
+    assert [record["n"] for record in records] == [2, 1, 0]
+    assert {record["guild_id"] for record in records} == {"1"}
+    assert records[0]["actor"] == {"id": "1", "name": "admin"}
+    assert cursor is None
+    assert journal.stats()["written"] == 5
+
+def test_pages_follow_the_cursor(journal):
+    write(journal, 1, 7)
+    pages = []
+    cursor = None
+    while True:
+        records, cursor = journal.history(1, before=int(cursor) if cursor else None, limit=3)
+        pages.append([record["n"] for record in records])
+        if cursor is None:
+            break
+    assert pages == [[6, 5, 4], [3, 2, 1], [0]]
+
+def test_time_range_filters(journal):
+    write(journal, 1, 3)
+    records, _ = journal.history(1)
+    middle = records[1]["ts"]
+    assert all(record["ts"] >= middle for record in journal.history(1, since=middle)[0])
+    assert all(record["ts"] < middle for record in journal.history(1, until=middle)[0])
+    assert journal.history(1, since=middle + 3600)[0] == []
+
+def test_segments_roll_over(tmp_path):
+    journal = AuditJournal(str(tmp_path / "audit"), segment_bytes=200, flush_interval=0.01)
+    for _ in range(5):
+        write(journal, 1, 2, padding="x" * 100)
+    assert len(journal.segments()) > 1
+    assert len(journal.history(1, limit=100)[0]) == 10
+    journal.close()
+
+def test_another_process_sees_new_records_incrementally(tmp_path, journal):
+    reader = AuditJournal(journal.directory)
+    write(journal, 1, 2)
+    assert len(reader.history(1)[0]) == 2
+    scanned = reader._scanned
+    write(journal, 1, 1)
+    assert [record["n"] for record in reader.history(1)[0]] == [0, 1, 0]
+    assert reader._scanned > scanned
+
+def test_corrupt_and_partial_lines_are_skipped(journal):
+    write(journal, 1, 1)
+    path = journal._segment_path(journal.segments()[-1])
+    with open(path, "ab") as f:
+        f.write(b"not json\n")
+        f.write(b'{"ts": 1, "guild_id": "1"')
+    records, _ = journal.history(1)
+    assert len(records) == 1
+    # The partial record is indexed once it's complete
+    with open(path, "ab") as f:
+        f.write(b', "action": "late"}\n')
+    assert journal.history(1)[0][0]["action"] == "late"
+    assert os.path.getsize(path) == journal._scanned[1]
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from dashboard.autorole import MAX_ROLES, RoleIndex, RoleIndexCache, applies_to, normalize, parse_request
+
+def test_legacy_and_current_entries_normalize_alike():
+    assert normalize("123") == {"roles": ["123"], "delay": 0, "target": "all"}
+    assert normalize(123) == {"roles": ["123"], "delay": 0, "target": "all"}
+    assert normalize({"roles": [1, "2"], "delay": 30, "target": "humans"}) == {
+        "roles": ["1", "2"], "delay": 30, "target": "humans"}
+    assert normalize(None) is None and normalize({"roles": []}) is None
+
+def test_target_filters_bots_and_humans():
+    assert applies_to({"target": "all"}, True) and applies_to({"target": "all"}, False)
+    assert applies_to({"target": "bots"}, True) and not applies_to({"target": "bots"}, False)
+    assert applies_to({"target": "humans"}, False) and not applies_to({"target": "humans"}, True)
+
+def test_request_bodies_old_and_new():
+    assert parse_request({"roleId": "5"}) == ({"roles": ["5"], "delay": 0, "target": "all"}, None)
+    assert parse_request({"roleIds": ["5", 6, "5"], "delay": "60", "target": "bots"}) == (
+        {"roles": ["5", "6"], "delay": 60, "target": "bots"}, None)
+    # No roles clears the setting
+    assert parse_request({"roleIds": []}) == (None, None)
+    assert parse_request({}) == (None, None)
+
+@pytest.mark.parametrize("body", [
+    {"roleIds": "5"},
+    {"roleIds": [{"id": "5"}]},
+    {"roleIds": [str(i) for i in range(MAX_ROLES + 1)]},
+    {"roleIds": ["5"], "delay": -1},
+    {"roleIds": ["5"], "delay": "soon"},
+    {"roleIds": ["5"], "target": "everyone"},
+])
+def test_invalid_requests_are_rejected(body):
+    settings, error = parse_request(body)
+    assert settings is None and error
+
+@pytest.mark.parametrize("raw", ["Infinity", "-Infinity", "NaN", "1e400"])
+def test_non_finite_delay_is_rejected(raw):
+    body = json.loads('{"roleIds": ["5"], "delay": %s}' % raw)
+    settings, error = parse_request(body)
+    assert settings is None and error
+
+@pytest.mark.parametrize("delay", [True, 12.9, "12.9", [30]])
+def test_delay_must_be_whole_seconds(delay):
+    assert parse_request({"roleIds": ["5"], "delay": delay}) == (None, "Delay must be a number of seconds")
+    assert parse_request({"roleIds": ["5"], "delay": 30.0}) == ({"roles": ["5"], "delay": 30, "target": "all"}, None)
+
+def roles():
+    return [
+        {"id": "1", "name": "@everyone", "position": 0},
+        {"id": "10", "name": "Moderator", "position": 5},
+        {"id": "11", "name": "Member", "position": 1},
+        {"id": "12", "name": "Bot Role", "position": 9, "managed": True},
+        {"id": "13", "name": "Game Master", "position": 3},
+    ]
+
+def test_index_leaves_out_everyone_and_managed_roles():
+    index = RoleIndex("1", roles())
+    assert [role["id"] for role in index.roles] == ["10", "13", "11"]
+    assert set(index.by_id) == {"10", "11", "13"}
+
+def test_search_puts_prefix_matches_first():
+    index = RoleIndex("1", roles())
+    assert [role["name"] for role in index.search("m")] == ["Moderator", "Member", "Game Master"]
+    assert [role["name"] for role in index.search("MAST")] == ["Game Master"]
+    assert [role["name"] for role in index.search("", limit=2)] == ["Moderator", "Game Master"]
+    assert index.search("zzz") == []
+
+def test_cache_rebuilds_only_for_a_new_role_list():
+    cache = RoleIndexCache(max_guilds=1)
+    first = roles()
+    index = cache.get("1", first)
+    assert cache.get("1", first) is index
+    assert cache.get("1", roles()) is not index
+    cache.get("2", first)
+    assert "1" not in cache._indexes
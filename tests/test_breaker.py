@@ -0,0 +1,141 @@
+import threading
+import time
+
+from dashboard.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from dashboard.discord_api import DiscordClient
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("guild_roles", failure_threshold=3, recovery_timeout=60)
+    for _ in range(2):
+        breaker.record_failure("HTTP 503")
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure("HTTP 503")
+    assert breaker.state == CLOSED
+    breaker.record_failure("HTTP 503")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["last_error"] == "HTTP 503"
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker("guild_roles", failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker("guild_roles", failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+
+class Response:
+    def __init__(self, status, data):
+        self.status_code = status
+        self._data = data
+
+    def json(self):
+        return self._data
+
+class Upstream:
+    """Stands in for the HTTP session: answers from `status`/`data`, optionally after a delay"""
+
+    def __init__(self):
+        self.status = 200
+        self.data = [{"id": "1"}]
+        self.delay = 0
+        self.calls = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.status is None:
+            raise ConnectionError("unreachable")
+        return Response(self.status, self.data)
+
+def client(**kwargs):
+    options = dict(cache_ttl=0.05, slow_call=0.05, failure_threshold=2, recovery_timeout=60)
+    options.update(kwargs)
+    discord = DiscordClient("https://discord.test/api", "token", **options)
+    discord._session = Upstream()
+    return discord
+
+def test_fresh_entries_are_served_from_memory():
+    discord = client(cache_ttl=60)
+    assert discord.guild_roles(1).data == [{"id": "1"}]
+    discord._session.data = [{"id": "2"}]
+    result = discord.guild_roles(1)
+    assert result.data == [{"id": "1"}] and not result.stale
+    assert discord._session.calls == 1
+
+def test_failing_upstream_serves_the_last_good_copy():
+    discord = client()
+    discord.guild_roles(1)
+    time.sleep(0.06)
+    discord._session.status = 503
+    result = discord.guild_roles(1)
+    assert result.ok and result.stale and result.data == [{"id": "1"}]
+    assert discord.stale_served == 1
+
+def test_slow_upstream_serves_stale_and_refreshes_in_the_background():
+    discord = client()
+    discord.guild_roles(1)
+    time.sleep(0.06)
+    discord._session.delay = 0.2
+    discord._session.data = [{"id": "2"}]
+    result = discord.guild_roles(1)
+    assert result.stale and result.data == [{"id": "1"}]
+    time.sleep(0.3)
+    discord._session.delay = 0
+    assert discord.guild_roles(1).data == [{"id": "2"}]
+
+def test_concurrent_refreshes_share_one_upstream_call():
+    discord = client()
+    discord.guild_roles(1)
+    time.sleep(0.06)
+    discord._session.delay = 0.1
+    threads = [threading.Thread(target=discord.guild_roles, args=(1,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert discord._session.calls == 2
+
+def test_open_breaker_stops_upstream_calls():
+    discord = client()
+    discord._session.status = None
+    for _ in range(2):
+        assert not discord.guild_channels(1).ok
+    calls = discord._session.calls
+    result = discord.guild_channels(1)
+    assert not result.ok and result.error == "Discord is unavailable"
+    assert discord._session.calls == calls
+    assert not discord.is_available("guild_channels")
+    # Other endpoint families keep working
+    discord._session.status = 200
+    assert discord.guild_roles(1).ok
+
+def test_close_stops_the_refresh_threads():
+    discord = client()
+    discord._refresh("guild_roles", ("guild_roles", "1"), "/guilds/1/roles", {}).result(timeout=5)
+    threads = list(discord._refresher._threads)
+    assert threads
+    discord.close()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert discord._session.closed
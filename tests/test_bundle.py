@@ -0,0 +1,114 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from dashboard import bundle
+from dashboard.bundle import BundleError, BundleReader, export, write
+from dashboard.store import SettingsStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = SettingsStore(str(tmp_path / "settings.db"))
+    store.put("cog_settings", 1, {"AutoRole": True})
+    store.put("cog_settings", 2, {"AutoRole": False})
+    store.put("autorole", 1, {"roles": ["10"], "delay": 0, "target": "all"})
+    return store
+
+def read(data):
+    reader = BundleReader(io.BytesIO(data))
+    return reader.header, [record[1:] for record in reader]
+
+def gzipped(*lines):
+    return gzip.compress("".join(json.dumps(line) + "\n" for line in lines).encode())
+
+HEADER = {"format": "modway-settings", "version": 1}
+
+def test_export_round_trips_every_guild(store):
+    header, records = read(b"".join(export(store, ["cog_settings", "autorole"])))
+    assert header["namespaces"] == ["cog_settings", "autorole"] and header["guild"] is None
+    assert sorted(records) == [
+        ("autorole", "1", {"roles": ["10"], "delay": 0, "target": "all"}),
+        ("cog_settings", "1", {"AutoRole": True}),
+        ("cog_settings", "2", {"AutoRole": False}),
+    ]
+
+def test_export_of_one_guild(store):
+    header, records = read(b"".join(export(store, ["cog_settings", "autorole"], guild_id=2)))
+    assert header["guild"] == 2
+    assert records == [("cog_settings", "2", {"AutoRole": False})]
+
+def test_large_bundles_stream_in_chunks():
+    records = [("levels", str(guild_id), json.dumps({"note": os.urandom(50).hex()})) for guild_id in range(5000)]
+    chunks = list(write(iter(records)))
+    assert len(chunks) > 3
+    _, read_back = read(b"".join(chunks))
+    assert [record[1] for record in read_back] == [str(guild_id) for guild_id in range(5000)]
+
+def test_truncated_upload_is_refused(store):
+    data = b"".join(export(store, ["cog_settings", "autorole"]))
+    for cut in (len(data) // 2, len(data) - 4):
+        with pytest.raises(BundleError, match="cut short"):
+            read(data[:cut])
+
+def test_bundle_without_trailer_is_cut_short():
+    with pytest.raises(BundleError, match="no trailer"):
+        read(gzipped(HEADER, {"ns": "autorole", "guild": "1", "data": None}))
+
+def test_data_after_the_trailer_is_refused():
+    with pytest.raises(BundleError, match="Line 3: data after the trailer"):
+        read(gzipped(HEADER, {"end": True, "records": 0}, {"ns": "autorole", "guild": "1", "data": None}))
+
+def test_trailer_must_match_the_record_count():
+    with pytest.raises(BundleError, match="trailer counts 2 records, found 1") as caught:
+        read(gzipped(HEADER, {"ns": "autorole", "guild": "1", "data": None}, {"end": True, "records": 2}))
+    assert caught.value.line == 3
+
+@pytest.mark.parametrize("data, message", [
+    (b"plain text", "not a gzip-compressed bundle"),
+    (gzip.compress(b"[1, 2]\n"), "Line 1: not a JSON object"),
+    (gzipped({"format": "other", "version": 1}), "Line 1: not a settings bundle"),
+    (gzipped(dict(HEADER, version=2)), "Line 1: bundle version 2 is not supported"),
+])
+def test_foreign_or_newer_files_are_refused(data, message):
+    with pytest.raises(BundleError, match=message):
+        read(data)
+
+@pytest.mark.parametrize("record", [
+    {"ns": "autorole", "data": {}},
+    {"ns": "autorole", "guild": "server", "data": {}},
+    {"ns": 5, "guild": "1", "data": {}},
+])
+def test_records_need_a_namespace_and_guild(record):
+    with pytest.raises(BundleError, match="Line 2: a record needs a namespace and a guild ID"):
+        read(gzipped(HEADER, record, {"end": True, "records": 1}))
+
+def test_overlong_lines_are_refused(monkeypatch):
+    monkeypatch.setattr(bundle, "MAX_LINE", 100)
+    data = gzip.compress((json.dumps(HEADER) + "\n" + "x" * 200).encode())
+    with pytest.raises(BundleError, match="longer than 100 bytes"):
+        read(data)
+
+def test_non_finite_numbers_reach_the_checks_as_floats():
+    # The import checks have to reject these; json lets them through
+    data = gzip.compress((json.dumps(HEADER) + '\n{"ns": "levels", "guild": "1", "data": {"xp": Infinity}}\n'
+                          + json.dumps({"end": True, "records": 1}) + "\n").encode())
+    _, records = read(data)
+    assert records == [("levels", "1", {"xp": float("inf")})]
+
+def test_a_bad_record_rolls_back_the_whole_import(store):
+    data = gzipped(HEADER, {"ns": "cog_settings", "guild": "1", "data": {"AutoRole": False}},
+                   {"ns": "cog_settings", "guild": "3", "data": {"AutoRole": True}},
+                   {"end": True, "records": 3})
+
+    def records():
+        for _, namespace, guild_id, document in BundleReader(io.BytesIO(data)):
+            yield namespace, guild_id, document
+    counter = store.change_counter("cog_settings")
+    with pytest.raises(BundleError):
+        store.put_many(records())
+    assert store.get("cog_settings", 1) == {"AutoRole": True}
+    assert store.get("cog_settings", 3) is None
+    assert store.change_counter("cog_settings") == counter
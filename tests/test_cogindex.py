@@ -0,0 +1,84 @@
+import pytest
+
+from dashboard.cogindex import CogIndex, SortedIds
+from dashboard.store import SettingsStore
+
+COGS = ["AutoRole", "Economy"]
+
+@pytest.fixture
+def store(tmp_path):
+    return SettingsStore(str(tmp_path / "settings.db"))
+
+def test_sorted_ids_page_after_a_cursor():
+    ids = SortedIds()
+    for guild_id in (30, 10, 20, 20, 40):
+        ids.add(guild_id)
+    ids.discard(40)
+    ids.discard(99)
+    assert ids.ids == [10, 20, 30]
+    assert ids.page(limit=2) == [10, 20]
+    assert ids.page(after=20) == [30]
+    assert ids.page(after=15, limit=1) == [20]
+
+def test_tracked_guilds_without_settings_count_as_enabled(store):
+    index = CogIndex(store, COGS)
+    index.track(["1", "2"])
+    assert index.counts() == {cog: {"enabled": 2, "disabled": 0} for cog in COGS}
+
+def test_sync_follows_writes_from_other_processes(store):
+    index = CogIndex(store, COGS)
+    index.track(["1", "2", "3"])
+    writer = SettingsStore(store.path)
+    writer.put("cog_settings", 2, {"AutoRole": False})
+    writer.put("cog_settings", 3, {"AutoRole": False, "Economy": False})
+    index.sync()
+    assert index.counts()["AutoRole"] == {"enabled": 1, "disabled": 2}
+    assert index.page("AutoRole", False) == (2, ["2", "3"])
+    writer.delete("cog_settings", 3)
+    index.sync()
+    assert index.page("AutoRole", False) == (1, ["2"])
+    assert index.counts()["Economy"] == {"enabled": 3, "disabled": 0}
+
+def test_sync_reads_only_new_rows(store, monkeypatch):
+    index = CogIndex(store, COGS)
+    store.put("cog_settings", 1, {"AutoRole": False})
+    index.sync()
+    calls = []
+    original = store.changes_since
+    monkeypatch.setattr(store, "changes_since", lambda namespace, since: calls.append(since) or original(namespace, since))
+    index.sync()
+    assert calls == []
+    store.put("cog_settings", 2, {"AutoRole": False})
+    index.sync()
+    assert calls == [1]
+    assert index.page("AutoRole", False) == (2, ["1", "2"])
+
+def test_local_changes_show_up_before_the_next_sync(store):
+    index = CogIndex(store, COGS)
+    index.set("5", "Economy", False)
+    index.set("5", "NotACog", False)
+    assert index.page("Economy", False) == (1, ["5"])
+    assert index.page("AutoRole", True) == (1, ["5"])
+
+def test_is_enabled_answers_from_memory(store, monkeypatch):
+    index = CogIndex(store, COGS)
+    store.put("cog_settings", 1, {"AutoRole": False})
+    index.sync()
+    monkeypatch.setattr(store, "get", None)
+    assert not index.is_enabled("1", "AutoRole") and index.is_enabled(1, "Economy")
+    # Guilds and cogs the index has never seen default to enabled
+    assert index.is_enabled(2, "AutoRole") and index.is_enabled(1, "NotACog")
+    index.set(2, "Economy", False)
+    assert not index.is_enabled(2, "Economy")
+
+def test_concurrent_syncs_keep_the_newest_row(store):
+    index = CogIndex(store, COGS)
+    store.put("cog_settings", 1, {"AutoRole": False})
+    stale = store.changes_since("cog_settings", 0)
+    store.put("cog_settings", 1, {"AutoRole": True})
+    index.sync()
+    # A sync that read before the second write finishes last
+    index.store = type("Stale", (), {"change_counter": lambda self, namespace: 1,
+                                     "changes_since": lambda self, namespace, since: stale})()
+    index.sync()
+    assert index.is_enabled(1, "AutoRole")
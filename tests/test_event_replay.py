@@ -0,0 +1,65 @@
+import argparse
+import collections
+import json
+
+import pytest
+
+pytest.importorskip("discord")
+
+from benchmarks.event_replay import load_stream, prepare_workdir, regressions, save_stream, synthetic_stream
+
+def stream_args(**overrides):
+    return argparse.Namespace(**dict(dict(seed=1, guilds=2, channels=3, members=5, messages=200, joins=20),
+                                     **overrides))
+
+def test_stream_builds_guilds_before_events():
+    frames, guilds = synthetic_stream(stream_args())
+    kinds = collections.Counter(frame["t"] for frame in frames)
+    assert kinds == {"GUILD_CREATE": 2, "MESSAGE_CREATE": 200, "GUILD_MEMBER_ADD": 20}
+    assert [frame["t"] for frame in frames[:2]] == ["GUILD_CREATE"] * 2
+    assert len(frames[0]["d"]["channels"]) == 3
+    assert sum(len(guild["members"]) for guild in guilds) == 2 * 5 + 20
+
+def test_counting_channels_count_up_without_doubles():
+    frames, guilds = synthetic_stream(stream_args(messages=500))
+    for guild in guilds:
+        counting = [frame["d"] for frame in frames
+                    if frame["t"] == "MESSAGE_CREATE" and frame["d"]["channel_id"] == str(guild["channels"][0])]
+        assert [message["content"] for message in counting] == [str(n) for n in range(1, len(counting) + 1)]
+        authors = [message["author"]["id"] for message in counting]
+        assert all(a != b for a, b in zip(authors, authors[1:]))
+
+def test_same_seed_gives_the_same_event_order():
+    def shape(frames):
+        return [(frame["t"], frame["d"].get("content")) for frame in frames]
+    assert shape(synthetic_stream(stream_args())[0]) == shape(synthetic_stream(stream_args())[0])
+    assert shape(synthetic_stream(stream_args())[0]) != shape(synthetic_stream(stream_args(seed=2))[0])
+
+def test_saved_stream_replays_as_is(tmp_path):
+    frames, _ = synthetic_stream(stream_args(messages=10, joins=2))
+    path = str(tmp_path / "stream.jsonl")
+    save_stream(path, frames)
+    assert load_stream(path) == frames
+
+def test_workdir_gets_the_bot_config_and_counting_channels(tmp_path):
+    bot_dir = tmp_path / "bot"
+    bot_dir.mkdir()
+    (bot_dir / "levels.json").write_text("{}")
+    (bot_dir / "counting.json").write_text(json.dumps({"channels": {"1": {"current_count": 7}}}))
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    _, guilds = synthetic_stream(stream_args(messages=0, joins=0))
+    prepare_workdir(str(workdir), str(bot_dir), guilds)
+    assert (workdir / "levels.json").exists()
+    channels = json.loads((workdir / "counting.json").read_text())["channels"]
+    assert channels["1"] == {"current_count": 7}
+    assert {str(guild["channels"][0]) for guild in guilds} <= set(channels)
+
+def test_regressions_beyond_the_limit():
+    deltas = {
+        "slower": {"p95_ms": 25.0, "throughput_rps": -2.0},
+        "fewer": {"p95_ms": 1.0, "throughput_rps": -30.0},
+        "fine": {"p95_ms": 9.0, "throughput_rps": 5.0},
+        "new": {},
+    }
+    assert regressions(deltas, 10) == ["slower", "fewer"]
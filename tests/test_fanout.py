@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from dashboard.fanout import FanoutTimeout, gather, start
+
+def test_results_come_back_in_call_order():
+    def after(delay, value):
+        return lambda: time.sleep(delay) or value
+
+    assert gather(after(0.05, "slow"), after(0, "fast"), timeout=5) == ["slow", "fast"]
+
+def test_calls_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    # Each call waits for the other two, so this only finishes if all three run at once
+    assert sorted(gather(barrier.wait, barrier.wait, barrier.wait, timeout=5)) == [0, 1, 2]
+
+def test_errors_raise_or_are_returned_in_place():
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        gather(lambda: 1, broken, timeout=5)
+    ok, error = gather(lambda: 1, broken, timeout=5, return_exceptions=True)
+    assert ok == 1 and isinstance(error, ValueError)
+
+def test_calls_share_one_deadline():
+    started = time.monotonic()
+    results = gather(lambda: time.sleep(0.5), lambda: time.sleep(0.5), lambda: "done",
+                     timeout=0.1, return_exceptions=True)
+    # Two slow calls cost one timeout between them, not one each
+    assert time.monotonic() - started < 0.4
+    assert isinstance(results[0], FanoutTimeout) and isinstance(results[1], FanoutTimeout)
+    assert results[2] == "done"
+    with pytest.raises(FanoutTimeout):
+        gather(lambda: time.sleep(0.5), timeout=0.05)
+
+def test_started_calls_can_be_collected_one_at_a_time():
+    release = threading.Event()
+    pending = start(lambda: "shell", lambda: release.wait(5) and "data", timeout=5)
+    # The first result is usable while the second call is still running
+    assert pending.result(0) == "shell"
+    assert not pending.futures[1].done()
+    release.set()
+    assert pending.result(1) == "data"
+
+def test_failed_result_cancels_calls_not_yet_started():
+    def broken():
+        raise ValueError("boom")
+
+    pending = start(broken, *(lambda: time.sleep(0.2) for _ in range(64)), timeout=5)
+    with pytest.raises(ValueError):
+        pending.result(0)
+    assert any(future.cancelled() for future in pending.futures[1:])
@@ -0,0 +1,91 @@
+import asyncio
+import random
+
+import pytest
+
+from dashboard.giveaway import (DISCORD_EPOCH_MS, Entrant, Reservoir, draw_winners, end_without_draw, make_check,
+                               normalize_requirements)
+from dashboard.store import SettingsStore
+
+DAY = 86400
+
+def user_id_at(timestamp):
+    """A user ID created at `timestamp` (seconds)"""
+    return str((int(timestamp * 1000) - DISCORD_EPOCH_MS) << 22)
+
+async def stream(entrants):
+    for entrant in entrants:
+        yield entrant
+
+def draw(entrants, k, seed="seed", **options):
+    return asyncio.run(draw_winners(stream(entrants), k, seed, **options))
+
+def members(count):
+    return [Entrant(str(1000 + i), False, ["r"]) for i in range(count)]
+
+def test_winners_do_not_depend_on_arrival_order():
+    entrants = members(200)
+    winners, stats = draw(entrants, 5)
+    shuffled = list(entrants)
+    random.Random(1).shuffle(shuffled)
+    assert draw(shuffled, 5)[0] == winners
+    assert len(set(winners)) == 5 and stats == {"seen": 200, "eligible": 200}
+    assert draw(entrants, 5, seed="other")[0] != winners
+
+def test_reroll_replaces_winners_without_repeats():
+    entrants = members(50)
+    first, _ = draw(entrants, 3)
+    reroll, _ = draw(entrants, 2, draw=1, exclude=first)
+    assert not set(first) & set(reroll)
+    assert draw(entrants, 2, draw=1, exclude=first)[0] == reroll
+
+def test_reservoir_ignores_duplicates_and_excluded():
+    reservoir = Reservoir(3, "seed", exclude=["1"])
+    for user_id in ["1", "2", "2", "3"]:
+        reservoir.offer(user_id)
+    assert sorted(reservoir.winners()) == ["2", "3"]
+
+def test_rejections_are_counted_by_reason():
+    entrants = [Entrant("1", True, []), Entrant("2", False, None), Entrant("3", False, ["x"]), Entrant("4", False, ["r"])]
+    winners, stats = draw(entrants, 5, check=make_check({"roles": ["r"]}))
+    assert winners == ["4"]
+    assert stats == {"seen": 4, "eligible": 1, "rejected_bot": 1, "rejected_not_member": 1, "rejected_roles": 1}
+
+def test_role_modes():
+    any_role = make_check({"roles": ["a", "b"]})
+    all_roles = make_check({"roles": ["a", "b"], "role_mode": "all"})
+    assert any_role(Entrant("1", False, ["a"])) is None
+    assert all_roles(Entrant("1", False, ["a"])) == "roles"
+    assert all_roles(Entrant("1", False, ["a", "b", "c"])) is None
+
+def test_account_age_is_judged_at_the_given_time():
+    ended_at = 1700000000
+    check = make_check({"min_account_age_days": 7}, now=ended_at)
+    old_enough = Entrant(user_id_at(ended_at - 8 * DAY), False, [])
+    too_young = Entrant(user_id_at(ended_at - 6 * DAY), False, [])
+    assert check(old_enough) is None
+    assert check(too_young) == "account_age"
+    # A month later the same account would pass, so rerolls have to reuse the end time
+    assert make_check({"min_account_age_days": 7}, now=ended_at + 30 * DAY)(too_young) is None
+
+@pytest.mark.parametrize("data", [
+    {"role_mode": "some"},
+    {"min_account_age_days": "a week"},
+    {"min_account_age_days": -1},
+])
+def test_invalid_requirements_are_rejected(data):
+    with pytest.raises(ValueError):
+        normalize_requirements(data)
+
+def test_giveaway_that_cant_be_drawn_is_ended_with_the_reason(tmp_path):
+    store = SettingsStore(str(tmp_path / "settings.db"))
+    store.put("giveaways", 1, {"10": {"ends_at": 100, "draws": []},
+                               "11": {"ends_at": 50, "ended": True, "ended_at": 50, "draws": [["7"]]}})
+    store.update("giveaways", 1, end_without_draw(10, "The giveaway message was deleted", 100))
+    # An ended giveaway keeps its draws; a reroll failing doesn't overwrite them
+    store.update("giveaways", 1, end_without_draw("11", "The giveaway message was deleted", 120))
+    store.update("giveaways", 1, end_without_draw("12", "The giveaway message was deleted", 120))
+    assert store.get("giveaways", 1) == {
+        "10": {"ends_at": 100, "draws": [], "ended": True, "ended_at": 100, "error": "The giveaway message was deleted"},
+        "11": {"ends_at": 50, "ended": True, "ended_at": 50, "draws": [["7"]]},
+    }
@@ -0,0 +1,39 @@
+import asyncio
+import types
+
+import pytest
+
+discord = pytest.importorskip("discord")
+pytest.importorskip("flask")
+
+from dashboard.store import SettingsStore
+
+class Channel:
+    async def fetch_message(self, message_id):
+        raise discord.NotFound(types.SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+
+class Guild:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+@pytest.fixture
+def cog(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from giveaway import Giveaways
+    guild = Guild({5: Channel()})
+    cog = Giveaways(types.SimpleNamespace(get_guild=lambda guild_id: guild, is_ready=lambda: True))
+    cog.store = SettingsStore(str(tmp_path / "settings.db"))
+    return cog
+
+@pytest.mark.parametrize("channel_id, error", [
+    (5, "The giveaway message was deleted"),
+    (6, "The giveaway's channel no longer exists"),
+])
+def test_giveaway_without_its_message_ends_instead_of_retrying(cog, channel_id, error):
+    cog.store.put("giveaways", 1, {"10": {"channel_id": channel_id, "ends_at": 100, "draws": []}})
+    asyncio.run(cog.end_due_giveaways(1))
+    entry = cog.store.get("giveaways", 1)["10"]
+    assert (entry["ended"], entry["ended_at"], entry["error"]) == (True, 100, error)
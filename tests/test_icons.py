@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+import pytest
+
+from dashboard import icons
+from dashboard.icons import IconCache, snap_size
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+class CDN:
+    """Fetcher serving `images` by URL; unknown URLs are 404s"""
+
+    def __init__(self, images=None, delay=0):
+        self.images = images or {}
+        self.delay = delay
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        if self.delay:
+            time.sleep(self.delay)
+        return self.images.get(url)
+
+@pytest.fixture(autouse=True)
+def without_pillow(monkeypatch):
+    # Resizing is Pillow's job; these tests cover the cache around it
+    monkeypatch.setattr(icons, "Image", None)
+
+def icon_url(owner_id, icon_hash):
+    return f"{icons.CDN}/icons/{owner_id}/{icon_hash}.png?size=256"
+
+def test_sizes_snap_to_the_supported_ones():
+    assert [snap_size(size) for size in (1, 64, 65, 200, 1000)] == [64, 64, 96, 256, 256]
+
+def test_icons_are_fetched_once_then_served_from_disk(tmp_path):
+    cdn = CDN({icon_url("1", "abc"): PNG})
+    cache = IconCache(str(tmp_path), cdn)
+    assert cache.get("icons", "1", "abc", 90) == (PNG, "image/png")
+    assert cache.get("icons", "1", "abc", 96) == (PNG, "image/png")
+    assert len(cdn.urls) == 1
+    assert cache.stats()["hits"] == 1
+    # A restarted process finds the file again
+    assert IconCache(str(tmp_path), cdn).get("icons", "1", "abc", 96) == (PNG, "image/png")
+    assert len(cdn.urls) == 1
+
+def test_unsafe_paths_are_refused_without_fetching(tmp_path):
+    cdn = CDN()
+    cache = IconCache(str(tmp_path), cdn)
+    assert cache.get("icons", "1", "../../etc/passwd", 64) is None
+    assert cache.get("banners", "1", "abc", 64) is None
+    assert cdn.urls == []
+
+def test_concurrent_requests_share_one_fetch(tmp_path):
+    cdn = CDN({icon_url("1", "abc"): PNG}, delay=0.05)
+    cache = IconCache(str(tmp_path), cdn)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("icons", "1", "abc", 64))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [(PNG, "image/png")] * 5
+    assert len(cdn.urls) == 1
+
+def test_missing_icons_are_remembered_for_a_while(tmp_path, monkeypatch):
+    cdn = CDN()
+    cache = IconCache(str(tmp_path), cdn)
+    assert cache.get("icons", "1", "gone", 64) is None
+    assert cache.get("icons", "1", "gone", 64) is None
+    assert len(cdn.urls) == 1
+    monkeypatch.setattr(icons, "MISSING_TTL", 0.0)
+    cache._missing.clear()
+    cache.get("icons", "1", "gone", 64)
+    cache.get("icons", "1", "gone", 64)
+    assert len(cdn.urls) == 3
+
+def test_missing_icons_are_bounded(tmp_path):
+    cache = IconCache(str(tmp_path), CDN(), max_missing=10)
+    for i in range(100):
+        cache.get("icons", "1", f"random{i}", 64)
+    assert cache.stats()["missing"] == 10
+    # The most recent ones are the ones kept
+    assert any(name.startswith("icons-1-random99-") for name in cache._missing)
+
+def test_expired_missing_entries_are_dropped(tmp_path, monkeypatch):
+    cache = IconCache(str(tmp_path), CDN())
+    monkeypatch.setattr(icons, "MISSING_TTL", 0.01)
+    for i in range(5):
+        cache.get("icons", "1", f"random{i}", 64)
+    time.sleep(0.02)
+    cache.get("icons", "1", "latest", 64)
+    assert list(cache._missing) == ["icons-1-latest-64.png"]
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cdn = CDN({icon_url("1", name): PNG for name in ("a", "b", "c")})
+    cache = IconCache(str(tmp_path), cdn, max_bytes=2 * len(PNG))
+    cache.get("icons", "1", "a", 64)
+    cache.get("icons", "1", "b", 64)
+    cache.get("icons", "1", "a", 64)
+    cache.get("icons", "1", "c", 64)
+    assert sorted(os.listdir(tmp_path)) == ["icons-1-a-64.png", "icons-1-c-64.png"]
+    assert cache.stats()["evictions"] == 1
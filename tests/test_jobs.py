@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from dashboard.jobs import AlreadyQueued, Cancelled, JobQueue
+from dashboard.role_queue import RetryAfter
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), poll=0.01)
+    yield queue
+    queue.close()
+
+def wait_for(queue, job_id, *states, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["state"] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is still {queue.get(job_id)['state']}")
+
+def test_jobs_run_and_keep_their_result(queue):
+    def handler(job):
+        job.progress(3, 4, "Almost there")
+        return {"guild": job.guild_id, "params": job.params, "by": job.created_by}
+    queue.register("count", handler)
+    job = queue.submit("count", {"n": 1}, guild_id=5, created_by={"id": "1"})
+    assert job["guild_id"] == "5"
+    job = wait_for(queue, job["id"], "succeeded")
+    assert job["result"] == {"guild": "5", "params": {"n": 1}, "by": {"id": "1"}}
+    assert (job["done"], job["total"], job["percent"], job["message"]) == (3, 4, 75.0, "Almost there")
+    assert job["attempts"] == 1 and job["finished_at"] >= job["started_at"]
+
+def test_unique_jobs_are_not_queued_twice(queue):
+    first = queue.submit("backfill", guild_id=1, unique=True)
+    with pytest.raises(AlreadyQueued) as caught:
+        queue.submit("backfill", guild_id=1, unique=True)
+    assert caught.value.job["id"] == first["id"]
+    queue.submit("backfill", guild_id=2, unique=True)
+    queue.submit("other", guild_id=1, unique=True)
+    queue.cancel(first["id"])
+    queue.submit("backfill", guild_id=1, unique=True)
+    assert [job["guild_id"] for job in queue.list(kinds=["backfill"])] == ["1", "2", "1"]
+    assert len(queue.list(guild_id=1)) == 3
+
+def test_queued_job_is_cancelled_at_once(queue):
+    job = queue.submit("never_registered", guild_id=1)
+    job = queue.cancel(job["id"])
+    assert job["state"] == "cancelled" and job["cancel_requested"]
+    assert queue.cancel("missing") is None
+
+def test_running_job_stops_at_its_next_progress(queue):
+    started = threading.Event()
+
+    def handler(job):
+        started.set()
+        for n in range(1000):
+            job.progress(n)
+            time.sleep(0.01)
+        return "finished"
+    queue.register("long", handler)
+    job = queue.submit("long")
+    assert started.wait(5)
+    queue.cancel(job["id"])
+    job = wait_for(queue, job["id"], "cancelled", "succeeded")
+    assert job["state"] == "cancelled" and job["error"] == "Cancelled"
+
+def test_rate_limited_job_is_retried_then_gives_up(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), poll=0.01, max_attempts=3)
+
+    def handler(job):
+        if job.params["fail"] or job.attempt < 2:
+            raise RetryAfter(0.01)
+        return "ok"
+    queue.register("limited", handler)
+    recovers = queue.submit("limited", {"fail": False})
+    stuck = queue.submit("limited", {"fail": True})
+    assert wait_for(queue, recovers["id"], "succeeded")["attempts"] == 2
+    stuck = wait_for(queue, stuck["id"], "failed")
+    assert stuck["attempts"] == 3 and stuck["error"] == "Still rate limited after 3 attempts"
+    queue.close()
+
+def test_errors_fail_the_job(queue):
+    def handler(job):
+        raise ValueError("bad input")
+    queue.register("broken", handler)
+    job = wait_for(queue, queue.submit("broken")["id"], "failed")
+    assert job["error"] == "bad input" and job["attempts"] == 1
+
+def test_jobs_wait_for_a_process_that_accepts_their_guild(queue):
+    queue.register("sharded", lambda job: job.guild_id, accepts=lambda guild_id: guild_id == "2")
+    elsewhere = queue.submit("sharded", guild_id=1)
+    here = queue.submit("sharded", guild_id=2)
+    assert wait_for(queue, here["id"], "succeeded")["result"] == "2"
+    time.sleep(0.05)
+    assert queue.get(elsewhere["id"])["state"] == "queued"
+
+def test_expired_lease_is_reclaimed_from_the_checkpoint(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    # A process that took the job and then stopped heartbeating
+    dead = JobQueue(path, lease=0.05)
+    dead.handlers["backfill"] = (None, lambda guild_id: True)
+    submitted = dead.submit("backfill", guild_id=1)
+    stale = dead._claim()
+    stale.progress(50, 100, checkpoint={"after": "member-50"})
+    time.sleep(0.1)
+
+    seen = []
+    alive = JobQueue(path, poll=0.01)
+    alive.register("backfill", lambda job: seen.append((job.attempt, job.checkpoint)) or "done")
+    job = wait_for(alive, submitted["id"], "succeeded")
+    alive.close()
+    assert seen == [(2, {"after": "member-50"})]
+    assert job["attempts"] == 2
+    # The old worker finds out at its next progress report
+    with pytest.raises(Cancelled):
+        stale.progress(60, checkpoint={"after": "member-60"})
+    assert stale.lost
+
+def test_lease_reclaim_gives_up_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease=0.01, max_attempts=2)
+    queue.handlers["crashy"] = (None, lambda guild_id: True)
+    job = queue.submit("crashy")
+    assert queue._claim() is not None
+    time.sleep(0.02)
+    assert queue._claim() is not None
+    time.sleep(0.02)
+    assert queue._claim() is None
+    job = queue.get(job["id"])
+    assert job["state"] == "failed" and job["error"] == "Gave up after 2 attempts"
+
+def test_shutdown_hands_running_jobs_back(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    started = threading.Event()
+
+    def handler(job):
+        started.set()
+        while True:
+            job.progress(7, 10)
+            time.sleep(0.01)
+    queue = JobQueue(path, poll=0.01)
+    queue.register("long", handler)
+    job = queue.submit("long")
+    assert started.wait(5)
+    queue.close()
+    job = queue.get(job["id"])
+    assert job["state"] == "queued"
+    # Shutting down doesn't spend an attempt, and the progress so far is kept
+    assert job["attempts"] == 0 and job["done"] == 7
+
+    restarted = JobQueue(path, poll=0.01)
+    restarted.register("long", lambda job: job.attempt)
+    assert wait_for(restarted, job["id"], "succeeded")["result"] == 1
+    restarted.close()
+
+def test_stats_count_jobs_by_state(queue):
+    queue.register("quick", lambda job: None)
+    job = queue.submit("quick")
+    queue.cancel(queue.submit("idle")["id"])
+    wait_for(queue, job["id"], "succeeded")
+    stats = queue.stats()
+    assert stats["kinds"] == ["quick"]
+    assert stats["states"] == {"queued": 0, "running": 0, "succeeded": 1, "failed": 0, "cancelled": 1}
@@ -0,0 +1,128 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.common import compare_routes, guild_id, percentile, role_id, summarize
+from benchmarks.gen_settings import build_settings, write_settings
+from benchmarks.load_driver import parse_mix, run_load
+from benchmarks.stub_discord import StubConfig, make_server
+
+@pytest.fixture
+def stub():
+    """Serve the stub API on a free loopback port; yields (base URL, config)"""
+    servers = []
+
+    def start(**options):
+        config = StubConfig(**dict(dict(latency_ms=0, jitter_ms=0), **options))
+        server = make_server("127.0.0.1", 0, config)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/api", config
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def call(url, token="stub-admin", data=None):
+    request = urllib.request.Request(url, data=data, headers={"Authorization": token})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read()), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read()), e.headers
+
+def test_stub_answers_the_dashboard_endpoints(stub):
+    base, config = stub(user_guilds=10, bot_guild_ratio=0.5, roles_per_guild=5)
+    status, token, _ = call(base + "/oauth2/token", data=b"code=alice")
+    assert status == 200 and token["access_token"] == "stub-alice"
+    status, user, _ = call(base + "/users/@me", "Bearer stub-alice")
+    assert status == 200 and user["username"] == "alice"
+    # Same name, same ID
+    assert call(base + "/users/@me", "Bearer stub-alice")[1]["id"] == user["id"]
+    _, guilds, _ = call(base + "/users/@me/guilds", "Bearer stub-alice")
+    _, bot_guilds, _ = call(base + "/users/@me/guilds", "Bot token")
+    assert len(guilds) == 10 and all(int(guild["permissions"]) & 0x20 for guild in guilds)
+    assert [guild["id"] for guild in bot_guilds] == [guild["id"] for guild in guilds[:5]]
+    _, roles, _ = call(f"{base}/guilds/{guild_id(3)}/roles")
+    _, channels, _ = call(f"{base}/guilds/{guild_id(3)}/channels")
+    assert roles[0] == {"id": guild_id(3), "name": "@everyone", "color": 0, "position": 0}
+    assert [role["id"] for role in roles[1:]] == [role_id(3, r) for r in range(1, 5)]
+    assert not {role["id"] for role in roles} & {channel["id"] for channel in channels}
+    assert call(base + "/guilds/x/emojis")[0] == 404
+    assert config.counters == {"oauth2/token": 1, "users/@me": 2, "users/@me/guilds": 1,
+                               "users/@me/guilds:bot": 1, "guilds/roles": 1, "guilds/channels": 1}
+
+def test_stub_injects_rate_limits(stub):
+    base, config = stub(rate_429=1.0, retry_after=2.5)
+    status, body, headers = call(base + "/users/@me/guilds")
+    assert status == 429
+    assert body["retry_after"] == 2.5 and headers["Retry-After"] == "2.5"
+    assert config.counters["users/@me/guilds:429"] == 1
+
+def test_settings_are_generated_deterministically(tmp_path):
+    cog_settings, autorole, automod = build_settings(200, seed=3)
+    assert (cog_settings, autorole, automod) == build_settings(200, seed=3)
+    assert build_settings(200, seed=4) != (cog_settings, autorole, automod)
+    assert set(autorole) <= {guild_id(i) for i in range(200)}
+    assert all(role.startswith("8") for role in autorole.values())
+    sizes = write_settings(str(tmp_path), 50, seed=3)
+    assert set(sizes) == {"cog_settings.json", "autorole.json", "automod.json"}
+    with open(tmp_path / "data" / "autorole.json") as f:
+        assert json.load(f) == build_settings(50, seed=3)[1]
+
+def test_percentiles_and_summaries():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05 and percentile(values, 99) == 0.099
+    assert percentile([], 50) is None
+    summary = summarize(list(reversed(values)), 2, 10.0)
+    assert (summary["requests"], summary["errors"], summary["throughput_rps"]) == (100, 2, 10.0)
+    assert (summary["p50_ms"], summary["p95_ms"], summary["max_ms"]) == (50.0, 95.0, 100.0)
+    assert summarize([], 0, 0)["p50_ms"] is None
+
+def test_routes_are_compared_with_a_baseline():
+    current = {"save": {"throughput_rps": 110.0, "p95_ms": 9.0, "p99_ms": None}, "new": {"p95_ms": 1.0}}
+    baseline = {"save": {"throughput_rps": 100.0, "p95_ms": 10.0, "p99_ms": 12.0}}
+    assert compare_routes(current, baseline) == {"save": {"throughput_rps": 10.0, "p95_ms": -10.0}}
+
+def test_mix_parsing():
+    assert parse_mix("servers=4, save=1,home") == [("servers", 4.0), ("save", 1.0), ("home", 1.0)]
+
+class Dashboard(BaseHTTPRequestHandler):
+    """Answers every route; toggling a cog fails"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def answer(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        status = 500 if self.path.startswith("/api/toggle-cog/") else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = answer
+
+def test_load_driver_reports_every_route():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Dashboard)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        routes = run_load(f"http://127.0.0.1:{server.server_address[1]}", 2, 0.3,
+                          parse_mix("servers=1,toggle=1,save=1"), 5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert set(routes) == {"login", "servers", "toggle", "save", "_all"}
+    assert routes["login"]["requests"] == 2 and routes["login"]["errors"] == 0
+    assert routes["toggle"]["errors"] == routes["toggle"]["requests"] > 0
+    assert routes["servers"]["errors"] == 0 and routes["servers"]["ttfb_p50_ms"] is not None
+    assert routes["_all"]["requests"] == sum(routes[route]["requests"] for route in ("servers", "toggle", "save"))
+    assert routes["_all"]["errors"] == routes["toggle"]["errors"]
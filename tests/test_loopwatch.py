@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+
+from dashboard.loopwatch import BUCKETS_MS, LoopWatchdog
+
+HERE = os.path.abspath(__file__)
+
+def block(seconds):
+    time.sleep(seconds)
+
+def watch(coroutine, cog_files=None, **options):
+    """Run `coroutine(watchdog)` under a fast watchdog; returns its stats"""
+    async def main():
+        watchdog = LoopWatchdog(asyncio.get_running_loop(), interval=0.01, threshold=0.05, cog_files=cog_files,
+                                **options)
+        watchdog.start()
+        try:
+            await coroutine(watchdog)
+        finally:
+            watchdog.stop()
+        return watchdog.stats(stacks=True)
+    return asyncio.run(main())
+
+async def block_then_idle(watchdog):
+    await asyncio.sleep(0.05)
+    block(0.3)
+    await asyncio.sleep(0.05)
+
+def test_an_idle_loop_has_no_stalls():
+    async def idle(watchdog):
+        await asyncio.sleep(0.2)
+    stats = watch(idle)
+    assert stats["samples"] > 5
+    assert stats["stalls"] == [] and stats["stalls_by_cog"] == {}
+    assert sum(stats["histogram"].values()) == stats["samples"]
+
+def test_blocking_call_is_caught_and_attributed_to_its_cog():
+    stats = watch(block_then_idle, cog_files=lambda: {HERE: "Tests"})
+    assert stats["stalls_by_cog"] == {"Tests": 1}
+    stall = stats["stalls"][0]
+    assert stall["cog"] == "Tests"
+    assert stall["function"].startswith("block (test_loopwatch.py:")
+    assert any("time.sleep" in line for line in stall["stack"])
+    # Filled in once the loop ran again
+    assert stall["duration_ms"] >= 250
+    assert stats["lag_max_ms"] >= 250
+    assert stats["histogram"]["le_500ms"] >= 1
+
+def test_unknown_code_and_broken_cog_lookup():
+    def broken():
+        raise RuntimeError("no cogs")
+    stats = watch(block_then_idle, cog_files=broken)
+    assert stats["stalls_by_cog"] == {"unknown": 1}
+    assert stats["stalls"][0]["cog"] is None and stats["stalls"][0]["function"] is None
+
+def test_stacks_only_when_asked_and_stalls_are_bounded():
+    async def block_often(watchdog):
+        for _ in range(3):
+            await asyncio.sleep(0.03)
+            block(0.12)
+        await asyncio.sleep(0.03)
+        assert all("stack" not in stall for stall in watchdog.stats()["stalls"])
+    stats = watch(block_often, max_stalls=2)
+    assert len(stats["stalls"]) == 2
+    assert stats["stalls_by_cog"] == {"unknown": 3}
+    # Newest first
+    assert stats["stalls"][0]["at"] >= stats["stalls"][1]["at"]
+
+def test_histogram_buckets():
+    watchdog = LoopWatchdog(None)
+    for lag in (0.0005, 0.003, 0.2, 60):
+        watchdog._record(lag)
+    stats = watchdog.stats()
+    assert stats["histogram"] == dict({f"le_{bound}ms": 0 for bound in BUCKETS_MS},
+                                      le_1ms=1, le_5ms=1, le_250ms=1, over=1)
+    assert stats["lag_max_ms"] == 60000.0
+    assert LoopWatchdog(None).stats()["lag_mean_ms"] is None
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from dashboard.mass_dm import CLOSED, FAILED, SENT, DMClosed, JobConflict, MassDMDispatcher, MassDMJob
+from dashboard.role_queue import MemberGone, PermanentFailure, RetryAfter
+
+class Discord:
+    """open_channel/send stand-ins; `errors` maps user ID to exceptions raised on successive sends"""
+
+    def __init__(self, errors=None, closed=(), release=None):
+        self.errors = errors or {}
+        self.closed = set(closed)
+        self.release = release
+        self.opened = []
+        self.sent = []
+
+    async def open_channel(self, user_id):
+        if user_id in self.closed:
+            raise DMClosed()
+        self.opened.append(user_id)
+        return f"channel-{user_id}"
+
+    async def send(self, channel, guild_id, user_id, content):
+        await asyncio.sleep(0)
+        if self.release is not None:
+            await self.release.wait()
+        errors = self.errors.get(user_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append(user_id)
+
+def dispatcher_for(directory, discord, **options):
+    options = dict(dict(open_rate=10000, open_burst=10000, send_rate=10000, send_burst=10000, base_backoff=0.001,
+                        checkpoint_interval=0.01), **options)
+    return MassDMDispatcher(str(directory), discord.open_channel, discord.send, **options)
+
+async def finish(dispatcher):
+    while dispatcher._tasks:
+        await asyncio.gather(*list(dispatcher._tasks.values()), return_exceptions=True)
+
+def run(directory, discord, recipients, **options):
+    async def main():
+        dispatcher = dispatcher_for(directory, discord, **options)
+        job = dispatcher.create(1, recipients, "Hello")
+        await finish(dispatcher)
+        return dispatcher, job
+    return asyncio.run(main())
+
+def test_every_recipient_gets_an_outcome(tmp_path):
+    discord = Discord(errors={"3": [MemberGone()], "4": [PermanentFailure("Missing Access")]}, closed={"2"})
+    dispatcher, job = run(tmp_path, discord, ["1", "2", "3", "4", "1"])
+    progress = job.progress()
+    assert job.recipients == ["1", "2", "3", "4"]
+    assert progress["state"] == "done" and progress["remaining"] == 0
+    assert (progress["sent"], progress["closed"], progress["gone"], progress["failed"]) == (1, 1, 1, 1)
+
+def test_closed_dms_are_skipped_by_later_jobs(tmp_path):
+    async def main():
+        discord = Discord(closed={"2"})
+        dispatcher = dispatcher_for(tmp_path, discord)
+        dispatcher.create(1, ["1", "2"], "First")
+        await finish(dispatcher)
+        job = dispatcher.create(1, ["1", "2"], "Second")
+        await finish(dispatcher)
+        return discord, dispatcher, job
+    discord, dispatcher, job = asyncio.run(main())
+    # The DM channel to 1 is reused and 2 isn't asked again
+    assert discord.opened == ["1"]
+    assert list(job.status) == [SENT, CLOSED]
+    assert dispatcher.counters["skipped_closed"] == 1
+
+def test_rate_limits_are_retried(tmp_path):
+    discord = Discord(errors={"1": [RetryAfter(0.01), RetryAfter(0.01)]})
+    dispatcher, job = run(tmp_path, discord, ["1", "2"])
+    assert sorted(discord.sent) == ["1", "2"]
+    assert dispatcher.counters["rate_limited"] == 2
+
+def test_endless_rate_limits_give_up_on_the_recipient(tmp_path):
+    discord = Discord(errors={"1": [RetryAfter(0.001) for _ in range(100)]})
+    dispatcher, job = run(tmp_path, discord, ["1", "2"], max_rate_limited=5)
+    assert list(job.status) == [FAILED, SENT]
+    assert dispatcher.counters["rate_limited"] == 5
+    assert job.progress()["state"] == "done"
+
+def test_errors_are_retried_up_to_max_attempts(tmp_path):
+    discord = Discord(errors={"1": [RuntimeError("flaky")], "2": [RuntimeError("down")] * 5})
+    dispatcher, job = run(tmp_path, discord, ["1", "2"], max_attempts=3)
+    assert list(job.status) == [SENT, FAILED]
+    assert dispatcher.counters["retries"] == 3
+
+def test_one_running_job_per_guild(tmp_path):
+    async def main():
+        dispatcher = dispatcher_for(tmp_path, Discord(release=asyncio.Event()))
+        dispatcher.create(1, ["1"], "Hello")
+        with pytest.raises(JobConflict):
+            dispatcher.create(1, ["2"], "Again")
+        with pytest.raises(ValueError):
+            dispatcher.create(2, ["1"], "")
+        dispatcher.create(2, ["1"], "Other guild")
+        await dispatcher.close()
+    asyncio.run(main())
+
+def test_stopped_job_resumes_where_it_left_off(tmp_path):
+    async def first_run():
+        release = asyncio.Event()
+        discord = Discord(release=release)
+        dispatcher = dispatcher_for(tmp_path, discord, concurrency=1)
+        job = dispatcher.create(1, [str(i) for i in range(10)], "Hello")
+        release.set()
+        while job.counts["sent"] < 4:
+            await asyncio.sleep(0)
+        release.clear()
+        await asyncio.sleep(0.05)
+        await dispatcher.close()
+        return job.id, set(discord.sent)
+
+    job_id, sent_before = asyncio.run(first_run())
+    saved = MassDMJob.load(str(tmp_path / job_id))
+    assert saved.state == "running" and saved.counts["sent"] == len(sent_before)
+
+    async def second_run():
+        discord = Discord()
+        dispatcher = dispatcher_for(tmp_path, discord)
+        assert dispatcher.load() == 1
+        dispatcher.start()
+        await finish(dispatcher)
+        return dispatcher.jobs[job_id], set(discord.sent)
+
+    job, sent_after = asyncio.run(second_run())
+    assert job.state == "done" and job.counts["sent"] == 10
+    assert sent_before.isdisjoint(sent_after) and len(sent_before | sent_after) == 10
+
+def test_pause_resume_and_cancel(tmp_path):
+    async def main():
+        release = asyncio.Event()
+        dispatcher = dispatcher_for(tmp_path, Discord(release=release))
+        job = dispatcher.create(1, ["1", "2"], "Hello")
+        await asyncio.sleep(0)
+        assert dispatcher.pause(job.id) and job.state == "paused"
+        assert not dispatcher.pause(job.id)
+        release.set()
+        assert dispatcher.resume(job.id)
+        await finish(dispatcher)
+        assert job.state == "done"
+        assert not dispatcher.cancel(job.id)
+        other = dispatcher.create(1, ["3"], "Later")
+        release.clear()
+        assert dispatcher.cancel(other.id) and other.state == "cancelled"
+        await dispatcher.close()
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+import math
+import time
+
+from dashboard.ratelimit import RateLimiter, TokenBucket, retry_after_header
+
+def test_bucket_allows_a_burst_then_reports_the_wait():
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    wait = bucket.take()
+    assert 0.4 < wait <= 0.5
+
+def test_bucket_refills_over_time_up_to_the_burst():
+    bucket = TokenBucket(rate=100, burst=2)
+    bucket.take()
+    bucket.take()
+    time.sleep(0.05)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() > 0
+
+def test_zero_rate_never_refills():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert bucket.take() == 0
+    assert bucket.take() == math.inf
+
+def test_keys_have_their_own_buckets():
+    limiter = RateLimiter("writes", rate=0.001, burst=1)
+    assert limiter.take("guild-1") == 0
+    assert limiter.take("guild-1") > 0
+    assert limiter.take("guild-2") == 0
+    assert limiter.stats()["allowed"] == 2 and limiter.stats()["limited"] == 1
+
+def test_least_recently_used_key_is_evicted():
+    limiter = RateLimiter("writes", rate=0.001, burst=1, max_keys=2)
+    limiter.take("a")
+    limiter.take("b")
+    limiter.take("a")
+    limiter.take("c")
+    assert limiter.stats()["evicted"] == 1
+    # "b" was evicted and starts again with a full bucket; "a" is still empty
+    assert limiter.take("a") > 0
+    assert limiter.take("b") == 0
+
+def test_refund_gives_back_a_refused_request():
+    session = RateLimiter("session", rate=0.001, burst=1)
+    assert session.take("user") == 0
+    session.refund("user")
+    assert session.take("user") == 0
+    assert session.stats()["allowed"] == 1
+
+def test_refund_never_exceeds_the_burst():
+    limiter = RateLimiter("session", rate=0.001, burst=1)
+    limiter.take("user")
+    limiter.refund("user")
+    limiter.refund("user")
+    assert limiter.take("user") == 0
+    assert limiter.take("user") > 0
+    # Unknown keys are ignored
+    limiter.refund("nobody")
+
+def test_retry_after_is_whole_seconds():
+    assert retry_after_header(0.01) == "1"
+    assert retry_after_header(2.2) == "3"
+    assert retry_after_header(math.inf) == "86400"
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from dashboard.role_queue import MemberGone, PermanentFailure, RetryAfter, RoleAssignmentQueue
+
+class Guild:
+    """Records assignments; `failures` maps member ID to exceptions raised on successive calls"""
+
+    def __init__(self, members=None, failures=None):
+        self.members = members
+        self.failures = failures or {}
+        self.assigned = []
+
+    async def assign(self, guild_id, member_id, role_ids):
+        errors = self.failures.get(member_id)
+        if errors:
+            raise errors.pop(0)
+        self.assigned.append((guild_id, member_id, role_ids))
+
+    def is_member(self, guild_id, member_id):
+        return self.members is None or member_id in self.members
+
+def queue_for(guild, **options):
+    options = dict(dict(guild_rate=1000, guild_burst=1000, global_rate=1000, global_burst=1000, base_backoff=0.01),
+                   **options)
+    return RoleAssignmentQueue(guild.assign, guild.is_member, **options)
+
+def run(guild, joins, **options):
+    async def main():
+        queue = queue_for(guild, **options)
+        for join in joins:
+            queue.enqueue(*join)
+        await queue.join()
+        return queue.metrics()
+    return asyncio.run(main())
+
+def test_roles_are_given_in_due_order():
+    guild = Guild()
+    metrics = run(guild, [(1, "late", ["r"], 0.05), (1, "now", ["r"]), (2, "other", ["r"])])
+    assert [member for _, member, _ in guild.assigned] == ["now", "other", "late"]
+    assert metrics["counters"]["assigned"] == 3 and metrics["pending"] == 0
+
+def test_members_who_left_are_dropped():
+    guild = Guild(members={"stays"}, failures={"stays": [MemberGone()]})
+    metrics = run(guild, [(1, "gone", ["r"]), (1, "stays", ["r"])])
+    assert guild.assigned == []
+    assert metrics["counters"]["dropped_left"] == 2
+
+def test_rejoin_replaces_the_queued_join():
+    guild = Guild()
+    metrics = run(guild, [(1, "m", ["old"], 0.02), (1, "m", ["new"])])
+    assert guild.assigned == [(1, "m", ["new"])]
+    assert metrics["counters"]["replaced"] == 1
+
+def test_rate_limits_and_errors_are_retried():
+    guild = Guild(failures={"m": [RetryAfter(0.01), RuntimeError("flaky")]})
+    metrics = run(guild, [(1, "m", ["r"])])
+    assert guild.assigned == [(1, "m", ["r"])]
+    assert metrics["counters"]["retries"] == 2 and metrics["counters"]["rate_limited"] == 1
+
+def test_gives_up_after_max_attempts_and_on_permanent_failures():
+    guild = Guild(failures={"flaky": [RetryAfter(0.001)] * 10, "forbidden": [PermanentFailure("Missing Permissions")]})
+    metrics = run(guild, [(1, "flaky", ["r"]), (1, "forbidden", ["r"])], max_attempts=3)
+    assert guild.assigned == []
+    assert metrics["counters"]["failed"] == 2
+    assert metrics["counters"]["retries"] == 2
+
+def test_overflowing_joins_are_refused():
+    async def main():
+        queue = queue_for(Guild(), max_pending=2)
+        accepted = [queue.enqueue(1, member, ["r"], 10) for member in range(3)]
+        assert queue.depth(1) == 2
+        await queue.close()
+        return accepted, queue.metrics()
+    accepted, metrics = asyncio.run(main())
+    assert accepted == [True, True, False]
+    assert metrics["counters"]["overflow"] == 1
+
+def test_each_guild_is_paced_by_its_own_bucket():
+    guild = Guild()
+    started = time.monotonic()
+    run(guild, [(1, member, ["r"]) for member in range(4)] + [(2, member, ["r"]) for member in range(4)],
+        guild_rate=20, guild_burst=1)
+    elapsed = time.monotonic() - started
+    # Three waits of 50 ms per guild, with the two guilds running side by side
+    assert 0.14 <= elapsed < 0.3
+    assert len(guild.assigned) == 8
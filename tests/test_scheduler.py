@@ -0,0 +1,146 @@
+import asyncio
+import collections
+
+import pytest
+
+from dashboard.scheduler import Job, Scheduler, TimerWheel
+
+def test_wheel_hands_out_items_in_tick_order():
+    wheel = TimerWheel(1.0, slots=8)
+    for when in (5, 2, 3.5, 2):
+        wheel.add(when, when)
+    assert wheel.advance(1.9) == []
+    assert wheel.advance(3) == [2, 2]
+    assert wheel.advance(10) == [3.5, 5]
+    assert wheel.size == 0
+
+def test_wheel_keeps_items_a_full_turn_or_more_away():
+    wheel = TimerWheel(1.0, slots=4)
+    wheel.add(2, "soon")
+    wheel.add(10, "later")
+    assert wheel.advance(6) == ["soon"]
+    assert wheel.size == 1
+    assert wheel.advance(10) == ["later"]
+
+def test_wheel_fires_past_times_on_the_next_tick():
+    wheel = TimerWheel(1.0)
+    assert wheel.advance(100) == []
+    wheel.add(3, "late")
+    assert wheel.advance(100.5) == []
+    assert wheel.advance(101) == ["late"]
+
+def test_phases_are_stable_and_spread_over_the_period():
+    job = Job("welcome", 60.0, None, None, None, 0.1)
+    phases = [job.phase(guild_id) for guild_id in range(1000)]
+    assert phases == [Job("welcome", 60.0, None, None, None, 0.1).phase(guild_id) for guild_id in range(1000)]
+    assert all(0 <= phase < 60 for phase in phases)
+    # Roughly even: every tenth of the period gets some guilds
+    assert len({int(phase // 6) for phase in phases}) == 10
+    assert Job("other", 60.0, None, None, None, 0.1).phase(1) != job.phase(1)
+
+def run_for(seconds, setup, **options):
+    async def main():
+        scheduler = Scheduler(tick=0.005, **options)
+        result = setup(scheduler)
+        await asyncio.sleep(seconds)
+        stats = scheduler.stats()
+        scheduler.close()
+        return result, stats
+    return asyncio.run(main())
+
+def test_each_guild_runs_once_per_period():
+    calls = collections.Counter()
+
+    async def run(guild_id):
+        calls[guild_id] += 1
+    _, stats = run_for(0.5, lambda scheduler: scheduler.every("job", 0.1, run, guilds=lambda: [1, 2, 3], jitter=0))
+    assert set(calls) == {1, 2, 3}
+    assert all(4 <= count <= 6 for count in calls.values())
+    job = stats["jobs"]["job"]
+    assert job["guilds"] == 3 and job["runs"] == sum(calls.values()) and job["failures"] == 0
+
+def test_job_without_guilds_runs_once_per_period():
+    calls = []
+
+    async def run():
+        calls.append(None)
+    _, stats = run_for(0.35, lambda scheduler: scheduler.every("bot", 0.1, run))
+    assert 3 <= len(calls) <= 4
+    assert stats["jobs"]["bot"]["guilds"] is None
+
+def test_disabled_guilds_are_skipped_and_failures_counted():
+    calls = []
+
+    async def run(guild_id):
+        calls.append(guild_id)
+        if guild_id == 2:
+            raise RuntimeError("broken")
+    _, stats = run_for(0.25, lambda scheduler: scheduler.every("job", 0.1, run, guilds=lambda: [1, 2, 3], cog="Welcome"),
+                       is_enabled=lambda guild_id, cog: guild_id != 3)
+    job = stats["jobs"]["job"]
+    assert 3 not in calls
+    # Failing and disabled guilds stay scheduled
+    assert calls.count(2) >= 2 and job["failures"] == calls.count(2)
+    assert job["skipped_disabled"] >= 2
+
+def test_guild_list_is_refreshed_every_period():
+    guilds = {1}
+    calls = []
+
+    async def run(guild_id):
+        calls.append(guild_id)
+
+    async def main():
+        scheduler = Scheduler(tick=0.005)
+        scheduler.every("job", 0.1, run, guilds=lambda: list(guilds), jitter=0)
+        await asyncio.sleep(0.25)
+        guilds.clear()
+        guilds.add(2)
+        await asyncio.sleep(0.15)
+        calls.clear()
+        await asyncio.sleep(0.25)
+        scheduler.close()
+    asyncio.run(main())
+    assert set(calls) == {2}
+
+def test_at_most_concurrency_runs_at_once():
+    running = []
+    peak = []
+
+    async def run(guild_id):
+        running.append(guild_id)
+        peak.append(len(running))
+        await asyncio.sleep(0.03)
+        running.remove(guild_id)
+    _, stats = run_for(0.2, lambda scheduler: scheduler.every("job", 0.1, run, guilds=lambda: range(10)), concurrency=2)
+    assert max(peak) == 2
+    # The guilds that waited for a worker show up as lateness
+    assert stats["jobs"]["job"]["lateness_max_ms"] >= 20
+
+def test_cancel_stops_the_job_and_replacing_a_name_keeps_one_job():
+    calls = collections.Counter()
+
+    def run_as(name):
+        async def run(guild_id):
+            calls[name] += 1
+        return run
+
+    async def main():
+        scheduler = Scheduler(tick=0.005)
+        scheduler.every("job", 0.05, run_as("first"), guilds=lambda: [1])
+        scheduler.every("job", 0.05, run_as("second"), guilds=lambda: [1])
+        await asyncio.sleep(0.12)
+        scheduler.cancel("job")
+        assert scheduler._tasks == []
+        before = sum(calls.values())
+        await asyncio.sleep(0.1)
+        return before
+    before = asyncio.run(main())
+    assert calls["first"] == 0 and calls["second"] >= 1
+    assert sum(calls.values()) == before
+
+def test_period_must_be_positive():
+    async def main():
+        with pytest.raises(ValueError):
+            Scheduler().every("job", 0, None)
+    asyncio.run(main())
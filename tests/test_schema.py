@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from dashboard.schema import (Channel, ChannelList, Choice, Color, Group, Invalid, Number, Role, RoleList, Schema, Text,
+                              TextList, Toggle)
+
+ROLE = "123456789012345678"
+CHANNEL = "223456789012345678"
+
+def leveling():
+    return Schema("levels", {
+        "enabled": Toggle("Enabled"),
+        "xp_min": Number("Minimum XP", default=15, minimum=0, maximum=1000),
+        "xp_max": Number("Maximum XP", default=25, minimum=0, maximum=1000),
+        "style": Choice("Style", {"plain": "Plain", "embed": "Embed"}),
+        "message": Text("Level-up message", default="GG", max_length=20),
+        "color": Color("Color"),
+        "announce": Group("Announcements", {
+            "channel": Channel("Channel"),
+            "ping": Toggle("Ping", default=True),
+        }),
+        "reward": Role("Reward role"),
+        "ignored_roles": RoleList("Ignored roles", max_items=2),
+        "ignored_channels": ChannelList("Ignored channels"),
+        "blocked_words": TextList("Blocked words", max_items=2),
+    }, constraints=[
+        lambda settings: "Minimum XP can't be above maximum XP" if settings["xp_min"] > settings["xp_max"] else None,
+    ])
+
+def test_clean_values_come_back_normalized():
+    clean, errors = leveling().check({
+        "xp_min": 20.0, "message": "  Level up!  ", "color": "#ABCDEF", "announce": {"channel": int(CHANNEL)},
+        "reward": "", "ignored_roles": [ROLE, int(ROLE)], "blocked_words": ["a", " a ", ""],
+    })
+    assert errors == {}
+    assert clean == {"xp_min": 20, "message": "Level up!", "color": "#abcdef", "announce": {"channel": CHANNEL},
+                     "reward": None, "ignored_roles": [ROLE], "blocked_words": ["a"]}
+
+@pytest.mark.parametrize("changes, path", [
+    ({"enabled": 1}, "enabled"),
+    ({"xp_min": "15"}, "xp_min"),
+    ({"xp_min": True}, "xp_min"),
+    ({"xp_min": 1.5}, "xp_min"),
+    ({"xp_min": -1}, "xp_min"),
+    ({"xp_max": 1001}, "xp_max"),
+    ({"style": "fancy"}, "style"),
+    ({"message": "x" * 21}, "message"),
+    ({"color": "blue"}, "color"),
+    ({"announce": {"channel": "general"}}, "announce.channel"),
+    ({"announce": {"volume": 3}}, "announce.volume"),
+    ({"announce": "on"}, "announce"),
+    ({"reward": "Admin"}, "reward"),
+    ({"ignored_roles": [ROLE, "3" + ROLE[1:], "4" + ROLE[1:]]}, "ignored_roles"),
+    ({"ignored_channels": CHANNEL}, "ignored_channels"),
+    ({"blocked_words": [1]}, "blocked_words"),
+    ({"level": 3}, "level"),
+])
+def test_bad_values_are_reported_by_path(changes, path):
+    clean, errors = leveling().check(changes)
+    assert list(errors) == [path]
+
+@pytest.mark.parametrize("raw", ["Infinity", "-Infinity", "NaN", "1e400", "-1e400"])
+def test_non_finite_numbers_are_invalid(raw):
+    changes = json.loads('{"xp_min": %s}' % raw)
+    assert leveling().check(changes) == ({}, {"xp_min": "must be a whole number"})
+
+def test_huge_integers_are_out_of_range_not_an_error():
+    changes = json.loads('{"xp_max": %s}' % ("9" * 400))
+    assert leveling().check(changes) == ({}, {"xp_max": "must be at most 1000"})
+    with pytest.raises(Invalid):
+        Number("Unbounded").compile()(float("inf"))
+    assert Number("Unbounded").compile()(10 ** 400) == 10 ** 400
+
+def test_body_that_is_not_an_object():
+    assert leveling().check(["xp_min"]) == ({}, {"": "must be an object"})
+    assert leveling().check(None) == ({}, {"": "must be an object"})
+
+def test_resolve_lays_stored_values_over_defaults():
+    schema = leveling()
+    resolved = schema.resolve({"xp_min": 5, "announce": {"ping": False, "gone": 1}, "removed": True})
+    assert resolved["xp_min"] == 5 and resolved["xp_max"] == 25
+    assert resolved["announce"] == {"channel": None, "ping": False}
+    assert "removed" not in resolved
+    assert schema.resolve(None) == schema.defaults()
+    # Defaults are copies
+    schema.defaults()["ignored_roles"].append(ROLE)
+    assert schema.defaults()["ignored_roles"] == []
+
+def test_apply_merges_groups():
+    schema = leveling()
+    stored = schema.apply({"announce": {"channel": CHANNEL}}, {"announce": {"ping": False}, "xp_min": 1})
+    assert stored == {"announce": {"channel": CHANNEL, "ping": False}, "xp_min": 1}
+
+def test_constraints_see_the_resolved_settings():
+    schema = leveling()
+    assert schema.violation(schema.resolve({"xp_min": 30})) == "Minimum XP can't be above maximum XP"
+    assert schema.violation(schema.resolve({"xp_min": 20})) is None
+
+def test_references_find_roles_and_channels_in_groups():
+    schema = leveling()
+    changes = {"reward": ROLE, "ignored_roles": ["3" + ROLE[1:]], "announce": {"channel": CHANNEL}}
+    assert schema.references(changes, "role") == {ROLE, "3" + ROLE[1:]}
+    assert schema.references(changes, "channel") == {CHANNEL}
+    assert schema.references({"reward": None}, "role") == set()
+
+def test_drop_references_keeps_only_known_ids():
+    schema = leveling()
+    other = "3" + ROLE[1:]
+    document = {"reward": other, "ignored_roles": [ROLE, other], "announce": {"channel": CHANNEL, "ping": False},
+                "xp_min": 5}
+    kept, dropped = schema.drop_references(document, "role", {ROLE})
+    assert kept == {"reward": None, "ignored_roles": [ROLE], "announce": {"channel": CHANNEL, "ping": False},
+                    "xp_min": 5}
+    assert dropped == {other}
+    assert schema.drop_references(kept, "channel", {CHANNEL}) == (kept, set())
+    assert schema.drop_references(kept, "channel", set())[0]["announce"]["channel"] is None
+    # The document itself is left as it was
+    assert document["ignored_roles"] == [ROLE, other]
+
+def test_describe_and_kinds():
+    schema = leveling()
+    description = schema.describe()
+    assert description["xp_min"] == {"type": "number", "label": "Minimum XP", "help": "", "default": 15,
+                                      "min": 0, "max": 1000}
+    assert description["announce"]["fields"]["ping"]["default"] is True
+    assert {"role", "role_list", "channel", "channel_list", "group"} <= schema.kinds
@@ -0,0 +1,75 @@
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip("werkzeug")
+
+from dashboard.server import DashboardServer, InFlightCounter
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def hello(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+def test_counter_tracks_streamed_bodies_until_closed():
+    counter = InFlightCounter(hello)
+    body = counter({}, lambda status, headers: None)
+    assert counter.active == 1
+    assert not counter.wait_idle(0.01)
+    assert list(body) == [b"hello"]
+    body.close()
+    assert counter.active == 0
+    assert counter.wait_idle(0)
+
+def test_counter_releases_a_request_whose_app_raised():
+    def broken(environ, start_response):
+        raise RuntimeError("boom")
+
+    counter = InFlightCounter(broken)
+    with pytest.raises(RuntimeError):
+        counter({}, lambda status, headers: None)
+    assert counter.active == 0
+
+def test_server_serves_then_releases_its_port():
+    port = free_port()
+    server = DashboardServer(lambda: hello, host="127.0.0.1", port=port)
+    timings = server.start()
+    assert set(timings) == {"build_app_ms", "bind_ms", "total_ms"}
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+        assert response.read() == b"hello"
+    assert server.stop()
+    assert not server.running
+    # The port is free again, so a reloaded cog can bind it straight away
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", port))
+
+def test_stop_waits_for_requests_in_flight():
+    release = threading.Event()
+
+    def slow(environ, start_response):
+        release.wait(5)
+        start_response("200 OK", [])
+        return [b"done"]
+
+    port = free_port()
+    server = DashboardServer(lambda: slow, host="127.0.0.1", port=port, drain_timeout=5)
+    server.start()
+    responses = []
+    client = threading.Thread(target=lambda: responses.append(
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5).read()))
+    client.start()
+    deadline = time.monotonic() + 5
+    while server._counter.active == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    threading.Timer(0.1, release.set).start()
+    assert server.stop()
+    client.join()
+    assert responses == [b"done"]
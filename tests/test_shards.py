@@ -0,0 +1,119 @@
+import asyncio
+import concurrent.futures
+import json
+import socket
+import threading
+
+import pytest
+
+from dashboard.shards import ShardConnection, ShardError, ShardRouter, ShardServer, shard_for
+
+SECRET = "test-secret"
+
+def guild_on(shard_id, shard_count):
+    """A guild ID that Discord puts on shard_id"""
+    guild_id = 1 << 22
+    while shard_for(guild_id, shard_count) != shard_id:
+        guild_id += 1 << 22
+    return str(guild_id)
+
+class RunningServer:
+    """A ShardServer on its own event loop thread, listening on a free loopback port"""
+
+    def __init__(self, handlers, shard_ids=None, shard_count=None):
+        self.server = ShardServer(handlers, SECRET, shard_ids, shard_count)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.address = probe.getsockname()
+        self.run(self.server.start(*self.address))
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=5)
+
+    def close(self):
+        self.run(self.server.close())
+        self.run(self.cancel_connections())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def cancel_connections(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@pytest.fixture
+def servers():
+    running = []
+    yield running
+    for server in running:
+        server.close()
+
+def test_calls_reach_the_owning_shard(servers):
+    for shard_id in range(2):
+        servers.append(RunningServer({"whoami": lambda guild_id, shard_id=shard_id: shard_id}, [shard_id], 2))
+    router = ShardRouter(2, [server.address for server in servers], SECRET)
+    for shard_id in range(2):
+        assert router.call(guild_on(shard_id, 2), "whoami") == shard_id
+
+def test_server_rejects_guilds_of_other_shards(servers):
+    servers.append(RunningServer({"whoami": lambda guild_id: 0}, [0], 2))
+    router = ShardRouter(1, [servers[0].address], SECRET)
+    with pytest.raises(ShardError, match="not on this shard"):
+        router.call(guild_on(1, 2), "whoami")
+
+def test_handler_errors_come_back_as_shard_errors(servers):
+    def broken(guild_id):
+        raise RuntimeError("boom")
+
+    servers.append(RunningServer({"broken": broken}))
+    router = ShardRouter(1, [servers[0].address], SECRET)
+    with pytest.raises(ShardError, match="boom"):
+        router.call("1", "broken")
+    with pytest.raises(ShardError, match="Unknown operation"):
+        router.call("1", "missing")
+
+def test_wrong_secret_is_refused(servers):
+    called = []
+    servers.append(RunningServer({"write": lambda guild_id: called.append(guild_id)}))
+    router = ShardRouter(1, [servers[0].address], "not-the-secret")
+    with pytest.raises(ShardError, match="refused"):
+        router.call("1", "write")
+    assert called == []
+
+def test_unauthenticated_batch_is_not_dispatched(servers):
+    called = []
+    servers.append(RunningServer({"write": lambda guild_id: called.append(guild_id)}))
+    with socket.create_connection(servers[0].address, timeout=5) as sock:
+        reader = sock.makefile("rb")
+        assert "challenge" in json.loads(reader.readline())
+        sock.sendall(b'{"batch": [{"id": 1, "op": "write", "guild_id": "1", "args": {}}]}\n')
+        assert json.loads(reader.readline()) == {"ok": False, "error": "Authentication failed"}
+        assert reader.readline() == b""
+    assert called == []
+
+def test_secret_and_loopback_are_required():
+    with pytest.raises(ValueError):
+        ShardServer({}, "")
+    with pytest.raises(ValueError):
+        ShardRouter(1, [("127.0.0.1", 1)], None)
+    server = ShardServer({}, SECRET)
+    with pytest.raises(ShardError, match="non-loopback"):
+        asyncio.run(server.start("0.0.0.0", 0))
+
+def test_closed_socket_only_fails_calls_sent_on_it():
+    connection = ShardConnection(("127.0.0.1", 1), SECRET)
+    old, old_peer = socket.socketpair()
+    new, new_peer = socket.socketpair()
+    sent_on_old, sent_on_new, queued = (concurrent.futures.Future() for _ in range(3))
+    connection._waiting.update({1: [sent_on_old, old], 2: [sent_on_new, new], 3: [queued, None]})
+    old_peer.close()
+    connection._read_loop(old, old.makefile("rb"))
+    assert isinstance(sent_on_old.exception(timeout=0), ShardError)
+    assert not sent_on_new.done() and not queued.done()
+    new.close()
+    new_peer.close()
@@ -0,0 +1,29 @@
+import threading
+
+from dashboard import shared
+
+def test_instances_are_built_once(monkeypatch):
+    monkeypatch.setattr(shared, "_instances", {})
+    built = []
+
+    def build():
+        built.append(1)
+        return object()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(shared.get("thing", build))
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1 and len({id(result) for result in results}) == 1
+
+def test_a_factory_may_use_other_instances(monkeypatch):
+    monkeypatch.setattr(shared, "_instances", {})
+    store = shared.get("store", dict)
+    index = shared.get("index", lambda: {"store": shared.get("store", dict)})
+    assert index["store"] is store
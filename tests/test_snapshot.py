@@ -0,0 +1,93 @@
+import time
+
+from dashboard.discord_api import DiscordClient
+from dashboard.snapshot import Snapshot, SnapshotManager, write_snapshot
+from dashboard.store import SettingsStore
+
+class Response:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+class Upstream:
+    def __init__(self, bot_guilds):
+        self.bot_guilds = bot_guilds
+        self.paths = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.paths.append(url.split("/api", 1)[1])
+        return Response(self.bot_guilds)
+
+def client(bot_guilds=()):
+    discord = DiscordClient("https://discord.test/api", "token", cache_ttl=60)
+    discord._session = Upstream([{"id": guild_id} for guild_id in bot_guilds])
+    return discord
+
+def test_sections_round_trip_and_decode_lazily(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {"a": {"x": [1, 2]}, "b": None})
+    snapshot = Snapshot(path)
+    assert snapshot._decoded == {}
+    assert snapshot.section("a") == {"x": [1, 2]}
+    assert set(snapshot._decoded) == {"a"}
+    assert snapshot.section("b") is None and snapshot.section("missing") is None
+    assert snapshot.age < 5
+    snapshot.close()
+
+def test_unreadable_snapshots_are_ignored(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    assert Snapshot.open(str(path)) is None
+    path.write_bytes(b"something else\n{}\n")
+    assert Snapshot.open(str(path)) is None
+
+def test_restart_serves_cached_roles_and_settings_from_the_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    store = SettingsStore(str(tmp_path / "settings.db"))
+    store.put("autorole", 1, {"roles": ["10"]})
+    before = client(["1"])
+    before.bot_guilds()
+    before.guild_roles("1")
+    SnapshotManager(before, store, path, ["autorole"]).write()
+
+    store.put("autorole", 2, {"roles": ["20"]})
+    after, restarted = client(), SettingsStore(str(tmp_path / "settings.db"))
+    manager = SnapshotManager(after, restarted, path, ["autorole"])
+    assert manager.load()
+    assert after.guild_roles("1").ok
+    assert after._session.paths == []
+    # Seeded from the snapshot, then caught up with the row written since
+    assert restarted.load("autorole") == {"1": {"roles": ["10"]}, "2": {"roles": ["20"]}}
+
+def test_snapshot_newer_than_the_database_is_not_used(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {"settings": {"autorole": [5, {"1": {"roles": ["10"]}}]}})
+    store = SettingsStore(str(tmp_path / "settings.db"))
+    manager = SnapshotManager(client(), store, path, ["autorole"])
+    manager.load()
+    assert store.load("autorole") == {}
+
+def test_validation_drops_roles_of_guilds_the_bot_left(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {
+        "bot_guilds": [0, [{"id": "1"}, {"id": "2"}]],
+        "guild_roles": {"1": [0, [{"id": "r1"}]], "2": [0, [{"id": "r2"}]]},
+    })
+    discord = client(["1", "3"])
+    manager = SnapshotManager(discord, SettingsStore(str(tmp_path / "settings.db")), path, [])
+    manager.load()
+    assert manager.validate() == {"guilds": 2, "left": 1, "joined": 1}
+    assert manager.client_entry(("guild_roles", "1"))[0] == [{"id": "r1"}]
+    assert manager.client_entry(("guild_roles", "2")) is None
+
+def test_entries_keep_their_age(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, {"guild_roles": {"1": [120, []]}})
+    manager = SnapshotManager(client(), SettingsStore(str(tmp_path / "settings.db")), path, [])
+    manager.load()
+    time.sleep(0.01)
+    data, age = manager.client_entry(("guild_roles", "1"))
+    assert data == [] and age >= 120
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from dashboard.store import SettingsStore, SettingsWatcher, VersionConflict
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "settings.db")
+
+def test_write_is_visible_to_another_store_on_the_same_file(path):
+    bot, dashboard = SettingsStore(path), SettingsStore(path)
+    assert dashboard.load("cog_settings") == {}
+    bot.put("cog_settings", 1, {"AutoRole": True})
+    assert dashboard.load("cog_settings") == {"1": {"AutoRole": True}}
+    bot.put("cog_settings", 1, {"AutoRole": False})
+    assert dashboard.get("cog_settings", 1) == {"AutoRole": False}
+
+def test_delete_is_picked_up_incrementally(path):
+    bot, dashboard = SettingsStore(path), SettingsStore(path)
+    bot.put("autorole", 1, {"roles": ["10"]})
+    bot.put("autorole", 2, {"roles": ["20"]})
+    assert set(dashboard.load("autorole")) == {"1", "2"}
+    bot.delete("autorole", 1)
+    assert dashboard.load("autorole") == {"2": {"roles": ["20"]}}
+
+def test_change_counter_moves_per_namespace(path):
+    store = SettingsStore(path)
+    assert store.change_counter("cog_settings") == 0
+    store.put("cog_settings", 1, {})
+    store.put("cog_settings", 2, {})
+    store.put("autorole", 1, {})
+    assert store.counters() == {"cog_settings": 2, "autorole": 1}
+
+def test_update_is_atomic_across_threads(path):
+    store = SettingsStore(path)
+
+    def increment():
+        for _ in range(50):
+            store.update("counting", 1, lambda doc: {"n": doc["n"] + 1}, default={"n": 0})
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("counting", 1) == {"n": 200}
+
+def test_replace_all_removes_missing_guilds(path):
+    store = SettingsStore(path)
+    store.replace_all("cog_settings", {"1": {"a": True}, "2": {"b": True}})
+    store.replace_all("cog_settings", {"2": {"b": False}})
+    assert SettingsStore(path).load("cog_settings") == {"2": {"b": False}}
+
+def test_legacy_file_is_imported_once(tmp_path, path):
+    legacy = tmp_path / "cog_settings.json"
+    legacy.write_text(json.dumps({"1": {"AutoRole": True}}))
+    store = SettingsStore(path, legacy_files={"cog_settings": str(legacy)})
+    assert store.load("cog_settings") == {"1": {"AutoRole": True}}
+    legacy.write_text(json.dumps({"1": {"AutoRole": False}}))
+    assert not store.import_json("cog_settings", str(legacy))
+    assert store.get("cog_settings", 1) == {"AutoRole": True}
+
+def test_concurrent_exports_use_their_own_temp_files(tmp_path, path):
+    stores = [SettingsStore(path) for _ in range(4)]
+    stores[0].replace_all("cog_settings", {str(g): {"AutoRole": True} for g in range(500)})
+    target = str(tmp_path / "cog_settings.json")
+    errors = []
+
+    def export(store):
+        try:
+            for _ in range(10):
+                store.export_json("cog_settings", target)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=export, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(target) as f:
+        assert len(json.load(f)) == 500
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+def test_watcher_reports_changed_namespaces(path):
+    store = SettingsStore(path)
+    changed = []
+    watcher = SettingsWatcher(SettingsStore(path), changed.append, interval=0.01)
+    watcher.start()
+    try:
+        time.sleep(0.05)
+        store.put("autorole", 1, {"roles": ["10"]})
+        deadline = time.monotonic() + 2
+        while not changed and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+        watcher.join()
+    assert changed == ["autorole"]
+
+def test_every_write_bumps_the_document_version(path):
+    store = SettingsStore(path)
+    assert store.get_versioned("autorole", 1) == (None, 0)
+    assert store.put("autorole", 1, {"roles": ["10"]}) == 1
+    assert store.update_versioned("autorole", 1, lambda doc: dict(doc, delay=5)) == ({"roles": ["10"], "delay": 5}, 2)
+    assert store.delete("autorole", 1) == 3
+    assert store.get_versioned("autorole", 1, default={}) == ({}, 3)
+
+def test_expected_version_makes_writes_compare_and_swap(path):
+    store = SettingsStore(path)
+    store.put("autorole", 1, {"roles": ["10"]})
+    with pytest.raises(VersionConflict) as conflict:
+        store.put("autorole", 1, {"roles": ["20"]}, expected_version=0)
+    assert (conflict.value.expected, conflict.value.current) == (0, 1)
+    assert store.get("autorole", 1) == {"roles": ["10"]}
+    assert store.put("autorole", 1, {"roles": ["20"]}, expected_version=1) == 2
+
+def test_only_one_of_two_racing_writers_wins(path):
+    first, second = SettingsStore(path), SettingsStore(path)
+    first.put("cog_settings", 1, {})
+    version = first.version("cog_settings", 1)
+    first.update("cog_settings", 1, lambda doc: dict(doc, AutoRole=False), expected_version=version)
+    with pytest.raises(VersionConflict):
+        second.update("cog_settings", 1, lambda doc: dict(doc, Economy=False), expected_version=version)
+    assert second.get("cog_settings", 1) == {"AutoRole": False}
+
+def test_conflicting_write_leaves_the_change_counter_alone(path):
+    store = SettingsStore(path)
+    store.put("autorole", 1, {})
+    counter = store.change_counter("autorole")
+    with pytest.raises(VersionConflict):
+        store.delete("autorole", 1, expected_version=5)
+    assert store.change_counter("autorole") == counter
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+from dashboard.telemetry import SLOTS, Series, Telemetry
+
+class Clock:
+    def __init__(self, now=1700000000 // 86400 * 86400):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_events_land_in_every_ring():
+    clock = Clock()
+    telemetry = Telemetry(clock=clock)
+    telemetry.record(1, "Giveaway")
+    telemetry.record(1, "Giveaway", 2)
+    telemetry.record(None, "Giveaway")
+    for resolution in ("minute", "hour", "day"):
+        counts = telemetry.guild(1, resolution)["cogs"]["Giveaway"]
+        assert counts[-1] == 3 and sum(counts) == 3
+    assert telemetry.guild(2)["cogs"] == {}
+
+def test_coarser_rings_sum_the_finer_ones():
+    clock = Clock()
+    telemetry = Telemetry(clock=clock)
+    for minute in range(90):
+        telemetry.record(1, "Welcome", minute)
+        clock.now += 60
+    clock.now -= 60
+    minutes = telemetry.guild(1, "minute")["cogs"]["Welcome"]
+    hours = telemetry.guild(1, "hour")["cogs"]["Welcome"]
+    assert minutes == list(range(30, 90))
+    assert hours[-2:] == [sum(range(60)), sum(range(60, 90))]
+    assert telemetry.guild(1, "day")["cogs"]["Welcome"][-1] == sum(range(90))
+
+def test_old_buckets_fall_out():
+    clock = Clock()
+    telemetry = Telemetry(clock=clock)
+    telemetry.record(1, "Welcome", 5)
+    clock.now += 30 * 60
+    telemetry.record(1, "Welcome", 1)
+    assert sum(telemetry.guild(1, "minute")["cogs"]["Welcome"]) == 6
+    clock.now += 45 * 60
+    # The first event is over an hour old now; the hour ring still has both
+    assert sum(telemetry.guild(1, "minute")["cogs"]["Welcome"]) == 1
+    assert sum(telemetry.guild(1, "hour")["cogs"]["Welcome"]) == 6
+    clock.now += 31 * 86400
+    assert sum(telemetry.guild(1, "day")["cogs"]["Welcome"]) == 0
+
+def test_window_ends_at_the_current_bucket():
+    clock = Clock()
+    clock.now += 3 * 3600 + 125
+    window = Telemetry(clock=clock).guild(1, "hour")
+    assert window["end"] == clock.now // 3600 * 3600
+    assert window["buckets"] == 48 and window["bucket_seconds"] == 3600
+    with pytest.raises(ValueError):
+        Telemetry().guild(1, "week")
+
+def test_counters_saturate_instead_of_wrapping():
+    series = Series()
+    series.add(0, 0xFFFFFFFF)
+    series.add(0, 10)
+    assert series.window("minute")[-1] == 0xFFFFFFFF
+
+def test_save_and_load_round_trip(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "telemetry.bin")
+    writer = Telemetry(path, clock=clock)
+    assert not writer.save()
+    writer.record(1, "Giveaway", 4)
+    writer.record(2, "Modération", 1)
+    assert writer.save()
+    assert not writer.save()
+    assert os.listdir(tmp_path) == ["telemetry.bin"]
+    reader = Telemetry(path, clock=clock)
+    assert reader.load()
+    assert not reader.load()
+    assert reader.guild(1)["cogs"]["Giveaway"][-1] == 4
+    assert reader.guild(2)["cogs"]["Modération"][-1] == 1
+    assert reader.stats() == {"series": 2, "guilds": 2, "bytes_per_series": SLOTS * 4}
+
+def test_refresh_looks_at_the_file_at_most_once_per_interval(tmp_path, monkeypatch):
+    clock = Clock()
+    path = str(tmp_path / "telemetry.bin")
+    writer = Telemetry(path, clock=clock)
+    writer.record(1, "Giveaway")
+    writer.save()
+    reader = Telemetry(path, clock=clock)
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda p, *args, **kwargs: stats.append(p) or real_stat(p, *args, **kwargs))
+    assert reader.refresh(5)
+    writer.record(1, "Giveaway")
+    writer.save()
+    assert not reader.refresh(5)
+    assert stats == [path]
+    clock.now += 5
+    assert reader.refresh(5)
+    assert reader.guild(1, "minute")["cogs"]["Giveaway"][-1] == 2
+    clock.now += 5
+    assert not reader.refresh(5)
+
+def test_a_save_within_one_mtime_tick_is_noticed_by_its_size(tmp_path):
+    path = str(tmp_path / "telemetry.bin")
+    writer = Telemetry(path)
+    writer.record(1, "Giveaway")
+    writer.save()
+    mtime = os.stat(path).st_mtime_ns
+    reader = Telemetry(path)
+    assert reader.load()
+    writer.record(2, "Giveaway")
+    writer.save()
+    # Saved again within one mtime tick: the size still gives it away
+    os.utime(path, ns=(mtime, mtime))
+    assert reader.load()
+    assert reader.stats()["guilds"] == 2
+
+def test_bad_files_are_not_loaded(tmp_path):
+    path = tmp_path / "telemetry.bin"
+    telemetry = Telemetry(str(path))
+    assert not telemetry.load()
+    path.write_bytes(b"nonsense")
+    assert not telemetry.load()
+    with pytest.raises(ValueError):
+        telemetry.restore(b"nonsense")
+
+def test_a_failed_save_is_retried(tmp_path):
+    telemetry = Telemetry(str(tmp_path / "missing" / "telemetry.bin"))
+    telemetry.record(1, "Giveaway")
+    with pytest.raises(OSError):
+        telemetry.save()
+    (tmp_path / "missing").mkdir()
+    assert telemetry.save()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from dashboard.discord_api import ApiResult
+from dashboard.warmup import CacheWarmer
+
+class Client:
+    """The parts of DiscordClient the warmer uses, answering from fixed guild lists"""
+
+    def __init__(self, user_guilds, bot_guilds, roles_status=200):
+        self.user = user_guilds
+        self.bot = bot_guilds
+        self.roles_status = roles_status
+        self.roles_fetched = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def user_guilds(self, access_token):
+        self.release.wait(5)
+        return ApiResult(self.user, 200)
+
+    def bot_guilds(self):
+        return ApiResult(self.bot, 200)
+
+    def guild_roles(self, guild_id):
+        self.roles_fetched.append(guild_id)
+        return ApiResult([], self.roles_status)
+
+    def is_fresh(self, *key):
+        return False
+
+    def is_available(self, family):
+        return True
+
+def guild(guild_id, manage=True):
+    return {"id": guild_id, "permissions": str(0x20 if manage else 0)}
+
+def run(warmer, user_id="u1", token="token"):
+    assert warmer.warm(user_id, token)
+    warmer._executor.shutdown(wait=True)
+    return warmer.stats()
+
+def test_warms_guilds_the_user_manages_and_the_bot_is_in():
+    client = Client([guild("1"), guild("2", manage=False), guild("3"), guild("4")], [guild("1"), guild("2"), guild("3")])
+    loaded = []
+    stats = run(CacheWarmer(client, loaded.append, rate=0))
+    assert loaded == ["1", "3"]
+    assert client.roles_fetched == ["1", "3"]
+    assert stats["guilds_warmed"] == 2 and stats["jobs_aborted"] == 0 and stats["pending"] == 0
+
+def test_stops_at_max_guilds():
+    client = Client([guild(str(i)) for i in range(10)], [guild(str(i)) for i in range(10)])
+    stats = run(CacheWarmer(client, lambda guild_id: None, max_guilds=3, rate=0))
+    assert client.roles_fetched == ["0", "1", "2"]
+    assert stats["guilds_warmed"] == 3
+
+def test_gives_up_when_rate_limited():
+    client = Client([guild("1"), guild("2")], [guild("1"), guild("2")], roles_status=429)
+    stats = run(CacheWarmer(client, lambda guild_id: None, rate=0))
+    assert client.roles_fetched == ["1"]
+    assert stats["jobs_aborted"] == 1
+
+def test_one_job_per_user_at_a_time():
+    client = Client([], [])
+    client.release.clear()
+    warmer = CacheWarmer(client, lambda guild_id: None, rate=0)
+    assert warmer.warm("u1", "token")
+    assert not warmer.warm("u1", "token")
+    assert warmer.stats()["jobs_skipped"] == 1
+    client.release.set()
+    warmer._executor.shutdown(wait=True)
+
+def test_bot_token_calls_are_paced():
+    client = Client([guild(str(i)) for i in range(3)], [guild(str(i)) for i in range(3)])
+    warmer = CacheWarmer(client, lambda guild_id: None, rate=20)
+    started = time.monotonic()
+    stats = run(warmer)
+    # The bot guild list plus three role lists, 50 ms apart
+    assert stats["calls"] == 4
+    assert time.monotonic() - started >= 0.15
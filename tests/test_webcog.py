@@ -0,0 +1,118 @@
+import asyncio
+import importlib
+import json
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("flask")
+
+import webcog
+from dashboard.audit import AuditJournal
+from dashboard.autorole import RoleIndexCache
+from dashboard.bundle import write
+from dashboard.discord_api import ApiResult
+from dashboard.store import SettingsStore
+
+@pytest.fixture
+def dashboard(tmp_path):
+    # Only what update_module_settings touches; the real cog needs a bot and Discord credentials
+    audit = AuditJournal(str(tmp_path / "audit"), flush_interval=0.01)
+    yield types.SimpleNamespace(shard_router=None, store=SettingsStore(str(tmp_path / "settings.db")), audit=audit)
+    audit.close()
+
+def test_automod_saves_are_audited(dashboard):
+    actor = {"id": "1", "name": "admin"}
+    result = webcog.ModwayDashboard.update_module_settings(
+        dashboard, 5, "AutoMod", {"badwords": ["spam"], "antispam": {"enabled": True}}, actor=actor)
+    assert result["settings"]["badwords"] == ["spam"] and result["settings"]["antispam"]["enabled"]
+    dashboard.audit.flush()
+    records, _ = dashboard.audit.history(5)
+    assert len(records) == 1
+    record = records[0]
+    assert (record["action"], record["module"], record["actor"]) == ("module_settings", "AutoMod", actor)
+    assert record["changes"] == {"badwords": ["spam"], "antispam": {"enabled": True}}
+    assert record["version"] == result["version"]
+
+def test_rejected_automod_changes_leave_no_audit_record(dashboard):
+    result = webcog.ModwayDashboard.update_module_settings(dashboard, 5, "AutoMod", {"action": "explode"})
+    assert list(result["errors"]) == ["action"]
+    dashboard.audit.flush()
+    assert dashboard.audit.history(5)[0] == []
+
+def test_reloading_the_cog_does_not_leak_threads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, value in {"DASHBOARD_MODE": "standalone", "DASHBOARD_SNAPSHOT": "0", "DASHBOARD_LOOP_WATCHDOG": "0"}.items():
+        monkeypatch.setenv(name, value)
+    bot = types.SimpleNamespace(cogs={}, shard_id=None)
+
+    async def load_and_unload(module):
+        cog = module.ModwayDashboard(bot)
+        await cog.cog_load()
+        # Start the Discord client's refresh threads, as a page view would
+        cog.discord._refresher.submit(lambda: None).result()
+        await cog.cog_unload()
+
+    module = importlib.reload(webcog)
+    asyncio.run(load_and_unload(module))
+    shared = (module.get_settings_store(), module.get_job_queue(), module.get_scheduler(), module.get_telemetry())
+    before = threading.active_count()
+    for _ in range(3):
+        module = importlib.reload(webcog)
+        asyncio.run(load_and_unload(module))
+    assert (module.get_settings_store(), module.get_job_queue(), module.get_scheduler(), module.get_telemetry()) == shared
+    deadline = time.monotonic() + 5
+    while threading.active_count() > before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() <= before
+
+HERE = "100000000000000001"
+GONE = "100000000000000002"
+CHANNEL = "200000000000000001"
+
+class TargetGuild:
+    """Roles and channels of the guild a bundle is imported into"""
+
+    def __init__(self):
+        self.calls = []
+
+    def guild_roles(self, guild_id):
+        self.calls.append("roles")
+        return ApiResult([{"id": guild_id, "name": "@everyone", "position": 0},
+                          {"id": HERE, "name": "Member", "position": 1}], 200)
+
+    def guild_channels(self, guild_id):
+        self.calls.append("channels")
+        return ApiResult([{"id": CHANNEL, "name": "general"}], 200)
+
+def import_bundle(tmp_path, dashboard, records, **params):
+    path = tmp_path / "upload.jsonl.gz"
+    path.write_bytes(b"".join(write(iter([(namespace, guild_id, json.dumps(document))
+                                          for namespace, guild_id, document in records]))))
+    job = types.SimpleNamespace(id="1", params=dict(params, path=str(path)), guild_id="9", created_by=None,
+                                cancel_requested=False, progress=lambda *args, **kwargs: None)
+    return webcog.ModwayDashboard.import_settings(dashboard, job)
+
+def test_import_into_a_guild_drops_ids_it_does_not_have(tmp_path, dashboard):
+    dashboard.discord = TargetGuild()
+    dashboard.role_indexes = RoleIndexCache()
+    dashboard.store.put("autorole", 9, {"roles": [HERE], "delay": 0, "target": "all"})
+    result = import_bundle(tmp_path, dashboard, [
+        ("verification", "5", {"verified_role": GONE, "channel": CHANNEL}),
+        ("autorole", "5", {"roles": [GONE], "delay": 0, "target": "all"}),
+    ])
+    assert result == {"dry_run": False, "records": 1, "dropped": {"roles": [GONE], "channels": []}}
+    assert dashboard.store.get("verification", 9) == {"verified_role": None, "channel": CHANNEL}
+    # No role of the bundle's AutoRole setting exists here, so the server keeps its own
+    assert dashboard.store.get("autorole", 9) == {"roles": [HERE], "delay": 0, "target": "all"}
+    # Fetched once for both passes
+    assert dashboard.discord.calls == ["roles", "channels"]
+
+def test_bundle_without_references_needs_no_discord_call(tmp_path, dashboard):
+    dashboard.discord = TargetGuild()
+    result = import_bundle(tmp_path, dashboard, [("cog_settings", "5", {"AutoRole": False})], dry_run=True)
+    assert result == {"dry_run": True, "records": 1, "dropped": {"roles": [], "channels": []}}
+    assert dashboard.discord.calls == []
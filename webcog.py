@@ -1,9 +1,35 @@
 from discord.ext import commands
-from flask import Flask, redirect, request, session, url_for, jsonify
+import asyncio
+import logging
 import threading
 import os
-import requests
 import json
+import time
+import html
+import sys
+
+from dashboard import shared
+from dashboard.audit import AuditJournal
+from dashboard.autorole import MAX_ROLES, RoleIndexCache, normalize as normalize_autorole, parse_request as parse_autorole_request
+from dashboard.bundle import BundleError, BundleReader, export as export_bundle
+from dashboard.cogindex import CogIndex
+from dashboard.discord_api import DiscordClient
+from dashboard.fanout import gather, start as start_fanout
+from dashboard.icons import IconCache, snap_size
+from dashboard.jobs import AlreadyQueued, Cancelled, JobQueue
+from dashboard.loopwatch import LoopWatchdog
+from dashboard.mass_dm import MAX_CONTENT as MAX_DM_CONTENT, JobConflict
+from dashboard.ratelimit import RateLimiter, retry_after_header
+from dashboard.scheduler import Scheduler
+from dashboard.schema import Channel, ChannelList, Choice, Color, Group, Number, Role, RoleList, Schema, Text, TextList, Toggle
+from dashboard.server import DashboardServer
+from dashboard.shards import ShardRouter, ShardServer, parse_address
+from dashboard.snapshot import SnapshotManager
+from dashboard.store import SettingsStore, SettingsWatcher, VersionConflict
+from dashboard.telemetry import RESOLUTIONS as TELEMETRY_RESOLUTIONS, Telemetry
+from dashboard.warmup import CacheWarmer
+
+logger = logging.getLogger('discord_bot')
 
 # Discord OAuth2 Daten
 CLIENT_ID = "1397289097009168454"
@@ -11,38 +37,143 @@ CLIENT_SECRET = "M3cnDNfM88-HIp138E20_IXF9-1L3lz5"
 REDIRECT_URI = "http://fi1.bot-hosting.net:5379/discord-callback"
 SCOPE = "identify guilds"
 Token = os.getenv("Token")
+# REST base URL, overridable so the dashboard can run against a local stub API
+DISCORD_API = os.getenv("DISCORD_API_BASE", "https://discord.com/api")
+# Per-call REST timeout and the overall budget for a request's concurrent lookups
+DISCORD_TIMEOUT = float(os.getenv("DISCORD_API_TIMEOUT", 10))
+REQUEST_DEADLINE = float(os.getenv("DASHBOARD_REQUEST_DEADLINE", 10))
+# Stream page shells before Discord data arrives; set to 0 to send whole pages
+STREAM_PAGES = os.getenv("DASHBOARD_STREAMING", "1") != "0"
+# Prefetch a user's guilds, roles and settings in the background right after login
+WARM_ON_LOGIN = os.getenv("DASHBOARD_WARMUP", "1") != "0"
+# Token buckets for the write APIs (tokens per second, burst) and how many keys they track
+SESSION_WRITE_RATE = float(os.getenv("DASHBOARD_SESSION_WRITE_RATE", 1))
+SESSION_WRITE_BURST = float(os.getenv("DASHBOARD_SESSION_WRITE_BURST", 5))
+GUILD_WRITE_RATE = float(os.getenv("DASHBOARD_GUILD_WRITE_RATE", 2))
+GUILD_WRITE_BURST = float(os.getenv("DASHBOARD_GUILD_WRITE_BURST", 10))
+RATE_LIMIT_KEYS = int(os.getenv("DASHBOARD_RATE_LIMIT_KEYS", 10000))
+# Periodically snapshot guild, role and settings caches to disk and start warm from it
+WARM_START_SNAPSHOT = os.getenv("DASHBOARD_SNAPSHOT", "1") != "0"
+# Discord user IDs allowed on the owner overview, in addition to the bot's own owners
+OWNER_IDS = {owner.strip() for owner in os.getenv("DASHBOARD_OWNER_IDS", "").split(",") if owner.strip()}
 
 # Cog Management
 COG_SETTINGS_FILE = "data/cog_settings.json"
 AUTOROLE_FILE = "data/autorole.json"
+AUTOMOD_FILE = "data/automod.json"
+SETTINGS_DB_FILE = "data/dashboard.db"
+SNAPSHOT_FILE = "data/dashboard_snapshot.bin"
+AUDIT_DIR = "data/audit"
+ICON_CACHE_DIR = "data/icons"
+TELEMETRY_FILE = "data/telemetry.bin"
+JOBS_DB_FILE = "data/jobs.db"
+IMPORTS_DIR = "data/imports"
+# Largest settings bundle accepted for import, compressed
+MAX_IMPORT_BYTES = int(os.getenv("DASHBOARD_MAX_IMPORT_MB", 64)) * 1024 * 1024
+# How often the bot process writes usage counters to disk, in seconds
+TELEMETRY_SAVE_INTERVAL = float(os.getenv("DASHBOARD_TELEMETRY_SAVE_INTERVAL", 60))
+
+# Store namespaces and the legacy JSON files the bot process mirrors them to
+LEGACY_SETTINGS_FILES = {
+    "cog_settings": COG_SETTINGS_FILE,
+    "autorole": AUTOROLE_FILE,
+    "automod": AUTOMOD_FILE,
+}
+
+# "embedded" runs the web server inside the bot process, "external" leaves it to
+# separate worker processes started with e.g. gunicorn -w 4 "webcog:create_app()"
+DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "embedded")
+
+# With a multi-process sharded bot, every shard process listens here and standalone
+# dashboards list one endpoint per shard ID in DASHBOARD_SHARD_ENDPOINTS.
+# Both sides need the same DASHBOARD_SHARD_SECRET; the listener stays on loopback
+# unless DASHBOARD_SHARD_ALLOW_REMOTE=1
+SHARD_LISTEN = os.getenv("DASHBOARD_SHARD_LISTEN")
+SHARD_SECRET = os.getenv("DASHBOARD_SHARD_SECRET")
+SHARD_ALLOW_REMOTE = os.getenv("DASHBOARD_SHARD_ALLOW_REMOTE") == "1"
+
+# Watch the bot's event loop for blocking calls (threshold: DASHBOARD_LOOP_LAG_THRESHOLD_MS)
+LOOP_WATCHDOG = os.getenv("DASHBOARD_LOOP_WATCHDOG", "1") != "0"
+
+# Periodic cog work: how many per-guild runs may execute at once, and the timer resolution
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", 8))
+SCHEDULER_TICK = float(os.getenv("SCHEDULER_TICK_MS", 500)) / 1000
+
+# Long-running dashboard operations run as background jobs, this many at once per process
+JOB_WORKERS = int(os.getenv("DASHBOARD_JOB_WORKERS", 2))
+JOB_KINDS = {
+    "autorole.backfill": "Give AutoRole roles to existing members",
+    "dashboard.purge_guilds": "Remove settings of servers the bot left",
+    "dashboard.import_settings": "Import settings",
+}
+# /users/@me/guilds returns at most this many guilds without paging
+BOT_GUILDS_PAGE = 200
 
 def ensure_data_dir():
     if not os.path.exists("data"):
         os.makedirs("data")
 
+# The getters below keep their instances in dashboard.shared, so reloading this
+# cog hands out the same store, queue and scheduler instead of starting new ones
+
+def get_settings_store():
+    """Get the settings store shared by the bot and all dashboard workers"""
+    def build():
+        ensure_data_dir()
+        return SettingsStore(SETTINGS_DB_FILE, legacy_files=LEGACY_SETTINGS_FILES)
+    return shared.get("settings_store", build)
+
+def get_telemetry():
+    """Get the per-guild, per-cog usage counters; cogs call record(guild_id, cog_key) on them"""
+    def build():
+        ensure_data_dir()
+        telemetry = Telemetry(TELEMETRY_FILE)
+        telemetry.load()
+        return telemetry
+    return shared.get("telemetry", build)
+
+def get_cog_index():
+    """Get the in-memory cog enablement index; the dashboard's settings watcher keeps it in sync"""
+    def build():
+        index = CogIndex(get_settings_store(), AVAILABLE_COGS)
+        index.sync()
+        return index
+    return shared.get("cog_index", build)
+
+def cog_enabled(guild_id, cog):
+    """Whether a cog is enabled for a guild in the dashboard's cog settings.
+
+    Answered from the cog index, so event handlers on the bot's loop don't wait on SQLite.
+    """
+    return get_cog_index().is_enabled(guild_id, cog)
+
+def get_scheduler():
+    """Get the scheduler cogs register their periodic work with instead of running a tasks.loop each"""
+    return shared.get("scheduler", lambda: Scheduler(cog_enabled, SCHEDULER_CONCURRENCY, SCHEDULER_TICK))
+
+def get_job_queue():
+    """Get the persistent queue cogs and the dashboard run their long operations on"""
+    def build():
+        ensure_data_dir()
+        return JobQueue(JOBS_DB_FILE, workers=JOB_WORKERS)
+    return shared.get("job_queue", build)
+
+def get_module_settings(cog_key, guild_id):
+    """A guild's settings for a module with a settings schema, defaults filled in"""
+    schema = AVAILABLE_COGS[cog_key]["settings"]
+    return schema.resolve(get_settings_store().get(schema.namespace, guild_id))
+
 def load_cog_settings():
-    ensure_data_dir()
-    if os.path.exists(COG_SETTINGS_FILE):
-        with open(COG_SETTINGS_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    return dict(get_settings_store().load("cog_settings"))
 
 def save_cog_settings(data):
-    ensure_data_dir()
-    with open(COG_SETTINGS_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    get_settings_store().replace_all("cog_settings", data)
 
 def load_autorole_settings():
-    ensure_data_dir()
-    if os.path.exists(AUTOROLE_FILE):
-        with open(AUTOROLE_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    return dict(get_settings_store().load("autorole"))
 
 def save_autorole_settings(data):
-    ensure_data_dir()
-    with open(AUTOROLE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    get_settings_store().replace_all("autorole", data)
 
 # Available Cogs with enhanced styling information
 AVAILABLE_COGS = {
@@ -52,7 +183,25 @@ AVAILABLE_COGS = {
         "icon": "🛡️",
         "module": "automod",
         "color": "#e74c3c",
-        "category": "Moderation"
+        "category": "Moderation",
+        "settings": Schema("automod", {
+            "enabled": Toggle("Filter blocked words", default=True),
+            "badwords": TextList("Blocked words", max_items=500, max_length=50,
+                                 help="One word or phrase per line; messages containing them are removed"),
+            "action": Choice("Action on a blocked word", {"delete": "Delete only", "warn": "Warn", "timeout": "Timeout",
+                                                          "kick": "Kick", "ban": "Ban"}, default="timeout"),
+            "antispam": Group("Anti-spam", {
+                "enabled": Toggle("Enabled"),
+                "max_messages": Number("Messages allowed", 5, minimum=2, maximum=50),
+                "time_window": Number("Within seconds", 8, minimum=2, maximum=120),
+                "punishment": Choice("Punishment", {"warn": "Warn", "timeout": "Timeout", "kick": "Kick", "ban": "Ban"},
+                                     default="timeout"),
+                "timeout_duration": Number("Timeout minutes", 5, minimum=1, maximum=40320),
+            }),
+            "whitelist_roles": RoleList("Ignored roles"),
+            "whitelist_channels": ChannelList("Ignored channels"),
+            "log_channel": Channel("Log channel"),
+        })
     },
     "AutoRole": {
         "name": "AutoRole", 
@@ -68,7 +217,13 @@ AVAILABLE_COGS = {
         "icon": "🔢",
         "module": "counting",
         "color": "#f39c12",
-        "category": "Fun"
+        "category": "Fun",
+        "settings": Schema("counting", {
+            "channel": Channel("Counting channel"),
+            "allow_consecutive": Toggle("Allow counting twice in a row"),
+            "reset_on_fail": Toggle("Reset the count on a wrong number", default=True),
+            "react_on_success": Toggle("React to correct numbers", default=True),
+        })
     },
     "DM": {
         "name": "DM System",
@@ -84,7 +239,11 @@ AVAILABLE_COGS = {
         "icon": "🎨", 
         "module": "embedcolor",
         "color": "#3498db",
-        "category": "Customization"
+        "category": "Customization",
+        "settings": Schema("embedcolor", {
+            "color": Color("Embed color"),
+            "premium_role": Role("Role allowed to pick their own color"),
+        })
     },
     "Giveaway": {
         "name": "Giveaways",
@@ -100,7 +259,11 @@ AVAILABLE_COGS = {
         "icon": "📊",
         "module": "invitetracker",
         "color": "#1abc9c",
-        "category": "Analytics"
+        "category": "Analytics",
+        "settings": Schema("invitetracker", {
+            "log_channel": Channel("Join log channel"),
+            "fake_account_days": Number("Count invites of accounts younger than (days) as fake", 7, minimum=0, maximum=365),
+        })
     },
     "LevelSystem": {
         "name": "Level System",
@@ -108,7 +271,17 @@ AVAILABLE_COGS = {
         "icon": "⭐",
         "module": "levelsystem",
         "color": "#f1c40f",
-        "category": "Gamification"
+        "category": "Gamification",
+        "settings": Schema("levelsystem", {
+            "xp_min": Number("Minimum XP per message", 15, minimum=1, maximum=1000),
+            "xp_max": Number("Maximum XP per message", 25, minimum=1, maximum=1000),
+            "cooldown": Number("Seconds between XP awards", 60, minimum=0, maximum=3600),
+            "announce": Toggle("Announce level-ups", default=True),
+            "announce_channel": Channel("Level-up channel", help="Empty: the channel the member wrote in"),
+            "no_xp_channels": ChannelList("Channels without XP"),
+        }, constraints=[
+            lambda settings: "Minimum XP can't be above maximum XP" if settings["xp_min"] > settings["xp_max"] else None,
+        ])
     },
     "Moderation": {
         "name": "Moderation",
@@ -140,7 +313,12 @@ AVAILABLE_COGS = {
         "icon": "💡",
         "module": "suggestion",
         "color": "#f39c12",
-        "category": "Community"
+        "category": "Community",
+        "settings": Schema("suggestion", {
+            "channel": Channel("Suggestion channel"),
+            "reviewer_role": Role("Reviewer role"),
+            "anonymous": Toggle("Hide who made a suggestion"),
+        })
     },
     "Ticket": {
         "name": "Ticket System",
@@ -148,7 +326,15 @@ AVAILABLE_COGS = {
         "icon": "🎫",
         "module": "ticket",
         "color": "#3498db",
-        "category": "Support"
+        "category": "Support",
+        "settings": Schema("ticket", {
+            "category": Channel("Ticket category"),
+            "staff_roles": RoleList("Staff roles"),
+            "transcript_channel": Channel("Transcript channel"),
+            "max_open": Number("Open tickets per member", 1, minimum=1, maximum=10),
+            "welcome_message": Text("Message in new tickets", "Support will be with you shortly.",
+                                    max_length=1000, multiline=True),
+        })
     },
     "Verification": {
         "name": "Verification",
@@ -156,74 +342,477 @@ AVAILABLE_COGS = {
         "icon": "🔐",
         "module": "verification",
         "color": "#27ae60",
-        "category": "Security"
+        "category": "Security",
+        "settings": Schema("verification", {
+            "verified_role": Role("Role given after verification"),
+            "channel": Channel("Verification channel"),
+            "captcha_length": Number("Captcha length", 6, minimum=4, maximum=10),
+            "timeout_minutes": Number("Kick unverified members after (minutes, 0 = never)", 0, minimum=0, maximum=10080),
+        })
     }
 }
 
+def _check_cog_toggles(document):
+    if not isinstance(document, dict) or not all(
+            name in AVAILABLE_COGS and isinstance(enabled, bool) for name, enabled in document.items()):
+        raise ValueError("must map module names to true or false")
+    return document
+
+def _check_autorole(document):
+    config = normalize_autorole(document)
+    if config is None:
+        return None
+    settings, error = parse_autorole_request({"roleIds": config["roles"], "delay": config["delay"], "target": config["target"]})
+    if error:
+        raise ValueError(error)
+    return settings
+
+def _check_module_settings(schema):
+    def check(document):
+        clean, errors = schema.check(document)
+        if errors:
+            raise ValueError("; ".join(f"{path or 'settings'} {message}" for path, message in errors.items()))
+        error = schema.violation(schema.resolve(clean))
+        if error:
+            raise ValueError(error)
+        return clean
+    return check
+
+# Namespaces a settings bundle carries, each with its import check: document -> clean document, or ValueError
+BUNDLE_NAMESPACES = {"cog_settings": _check_cog_toggles, "autorole": _check_autorole}
+BUNDLE_NAMESPACES.update(
+    (info["settings"].namespace, _check_module_settings(info["settings"]))
+    for info in AVAILABLE_COGS.values() if "settings" in info
+)
+MODULE_SCHEMAS = {info["settings"].namespace: info["settings"] for info in AVAILABLE_COGS.values() if "settings" in info}
+
+def _drop_unknown_references(namespace, document, known_ids, dropped):
+    """A checked document without the role and channel IDs the importing guild doesn't have.
+
+    known_ids(kind) gives the guild's IDs of "role" or "channel"; the IDs taken
+    out are added to dropped[kind]. Returns None for an AutoRole setting with no
+    role left.
+    """
+    if namespace == "autorole":
+        known = known_ids("role")
+        dropped["role"].update(role_id for role_id in document["roles"] if role_id not in known)
+        roles = [role_id for role_id in document["roles"] if role_id in known]
+        return dict(document, roles=roles) if roles else None
+    schema = MODULE_SCHEMAS.get(namespace)
+    if schema is None:
+        return document
+    for kind in ("role", "channel"):
+        if schema.references(document, kind):
+            document, missing = schema.drop_references(document, kind, known_ids(kind))
+            dropped[kind].update(missing)
+    return document
+
 class ModwayDashboard(commands.Cog):
     def __init__(self, bot):
+        # Keep construction cheap: threads, sockets and the web server start in cog_load
         self.bot = bot
-        self.start_webserver()
+        self.store = get_settings_store()
+        self.discord = DiscordClient.from_env(DISCORD_API, Token, DISCORD_TIMEOUT)
+        self.warmer = CacheWarmer.from_env(self.discord, self.warm_guild_settings) if WARM_ON_LOGIN else None
+        self.session_writes = RateLimiter("session_writes", SESSION_WRITE_RATE, SESSION_WRITE_BURST, RATE_LIMIT_KEYS)
+        self.guild_writes = RateLimiter("guild_writes", GUILD_WRITE_RATE, GUILD_WRITE_BURST, RATE_LIMIT_KEYS)
+        self.snapshots = None
+        self.cog_index = get_cog_index()
+        self.indexed_bot_guilds = None
+        self.audit = AuditJournal.from_env(AUDIT_DIR)
+        self.role_indexes = RoleIndexCache()
+        self.icons = None
+        self.icons_lock = threading.Lock()
+        self.telemetry = get_telemetry()
+        self.jobs = get_job_queue()
+        self.loop_watchdog = None
+        self.settings_watcher = None
+        self.shard_server = None
+        self.web_server = None
+        self.loop = None
+        # Standalone dashboards in front of a sharded bot send guild calls to the owning shard
+        self.shard_router = ShardRouter.from_env() if bot is None else None
+
+    async def cog_load(self):
+        started = time.perf_counter()
+        self.loop = asyncio.get_running_loop()
+        if LOOP_WATCHDOG:
+            self.loop_watchdog = LoopWatchdog.from_env(self.loop, self.cog_source_files)
+            self.loop_watchdog.start()
+        self.start_snapshots()
+        # Only the bot process mirrors settings to JSON and reloads cogs;
+        # standalone dashboard workers just read and write the store
+        self.settings_watcher = SettingsWatcher(self.store, self.on_settings_changed)
+        self.settings_watcher.start()
+        get_scheduler().every("dashboard.save_telemetry", TELEMETRY_SAVE_INTERVAL, self.save_telemetry)
+        for kind, handler in self.job_handlers().items():
+            self.jobs.register(kind, handler)
+        if SHARD_LISTEN:
+            shard_ids = getattr(self.bot, "shard_ids", None)
+            if shard_ids is None and getattr(self.bot, "shard_id", None) is not None:
+                shard_ids = [self.bot.shard_id]
+            self.shard_server = ShardServer(self.shard_handlers(), SHARD_SECRET, shard_ids,
+                                            getattr(self.bot, "shard_count", None))
+            await self.shard_server.start(*parse_address(SHARD_LISTEN), allow_remote=SHARD_ALLOW_REMOTE)
+        if DASHBOARD_MODE == "embedded":
+            timings = await self.loop.run_in_executor(None, self.start_webserver)
+            logger.info(
+                f"Dashboard listening on port {self.web_server.port} in {timings['total_ms']} ms "
+                f"(routes {timings['build_app_ms']} ms, bind {timings['bind_ms']} ms)")
+        logger.info(f"Dashboard cog loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    async def cog_unload(self):
+        if self.web_server is not None:
+            # Drains in-flight requests, so run it off the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.web_server.stop)
+            self.web_server = None
+        if self.settings_watcher is not None:
+            self.settings_watcher.stop()
+            await asyncio.get_running_loop().run_in_executor(None, self.settings_watcher.join)
+            self.settings_watcher = None
+        if self.shard_server is not None:
+            await self.shard_server.close()
+            self.shard_server = None
+        if self.warmer is not None:
+            self.warmer.close()
+        self.discord.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.audit.close)
+        get_scheduler().cancel("dashboard.save_telemetry")
+        for kind in self.job_handlers():
+            self.jobs.unregister(kind)
+        if self.loop_watchdog is not None:
+            self.loop_watchdog.stop()
+            self.loop_watchdog = None
+        await asyncio.get_running_loop().run_in_executor(None, self.telemetry.save)
+        if self.snapshots is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.snapshots.stop)
+            self.snapshots = None
+
+    def start_snapshots(self):
+        """Seed the caches from the last warm-start snapshot and keep writing new ones"""
+        if not WARM_START_SNAPSHOT:
+            return
+        ensure_data_dir()
+        self.snapshots = SnapshotManager.from_env(self.discord, self.store, SNAPSHOT_FILE, list(LEGACY_SETTINGS_FILES))
+        self.snapshots.load()
+        self.snapshots.start()
+
+    def cog_source_files(self):
+        """{source file: cog name} of the loaded cogs, so the loop watchdog can blame a stall"""
+        files = {}
+        for name, cog in list(self.bot.cogs.items()):
+            module = sys.modules.get(type(cog).__module__)
+            path = getattr(module, "__file__", None)
+            if path:
+                files[os.path.abspath(path)] = name
+        return files
+
+    async def save_telemetry(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.telemetry.save)
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx):
+        if ctx.guild is not None and ctx.cog is not None and ctx.cog.qualified_name in AVAILABLE_COGS:
+            self.telemetry.record(ctx.guild.id, ctx.cog.qualified_name)
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        cog = getattr(command, "binding", None)
+        name = getattr(cog, "qualified_name", None)
+        if interaction.guild_id is not None and name in AVAILABLE_COGS:
+            self.telemetry.record(interaction.guild_id, name)
+
+    def get_icon_cache(self):
+        """Icon thumbnail cache, created on first use"""
+        with self.icons_lock:
+            if self.icons is None:
+                self.icons = IconCache.from_env(ICON_CACHE_DIR)
+            return self.icons
+
+    def shard_handlers(self):
+        """Operations this process serves to standalone dashboards for the guilds it owns"""
+        return {
+            "get_cog_status": self.get_cog_status,
+            "set_cog_status": self.set_cog_status,
+            "toggle_cog_status": self.toggle_cog_status,
+            "set_autorole": self.set_autorole,
+            "update_module_settings": self.update_module_settings,
+        }
+
+    def job_handlers(self):
+        """Background job kinds this process runs"""
+        return {
+            "dashboard.purge_guilds": self.purge_stale_guilds,
+            "dashboard.import_settings": self.import_settings,
+        }
+
+    def on_settings_changed(self, namespace):
+        """Mirror a changed store namespace to its JSON file and reload the cog that uses it"""
+        json_path = LEGACY_SETTINGS_FILES.get(namespace)
+        if json_path:
+            self.store.export_json(namespace, json_path)
+        if namespace == "cog_settings":
+            # Writes from dashboard workers reach cog_enabled() through the index
+            self.cog_index.sync()
+        if namespace == "autorole":
+            cog = self.bot.cogs.get("AutoRole")
+            if cog is not None and hasattr(cog, "reload_settings"):
+                self.loop.call_soon_threadsafe(cog.reload_settings)
 
     def get_cog_status(self, guild_id, cog_name):
         """Get the enabled/disabled status of a cog for a specific guild"""
-        settings = load_cog_settings()
-        return settings.get(str(guild_id), {}).get(cog_name, True)  # Default enabled
-
-    def set_cog_status(self, guild_id, cog_name, enabled):
-        """Set the enabled/disabled status of a cog for a specific guild"""
-        settings = load_cog_settings()
-        if str(guild_id) not in settings:
-            settings[str(guild_id)] = {}
-        settings[str(guild_id)][cog_name] = enabled
-        save_cog_settings(settings)
+        if self.shard_router is not None:
+            return self.shard_router.call(guild_id, "get_cog_status", cog_name=cog_name)
+        return self.store.get("cog_settings", guild_id, {}).get(cog_name, True)  # Default enabled
+
+    def get_cog_statuses(self, guild_id):
+        """Get the status of every available cog for a guild, in one shard round trip if sharded"""
+        if self.shard_router is not None:
+            futures = {name: self.shard_router.submit(guild_id, "get_cog_status", cog_name=name) for name in AVAILABLE_COGS}
+            return {name: future.result(timeout=self.shard_router.timeout) for name, future in futures.items()}
+        return {name: self.get_cog_status(guild_id, name) for name in AVAILABLE_COGS}
+
+    def warm_guild_settings(self, guild_id):
+        """Load a guild's settings ahead of its first page view"""
+        self.get_cog_statuses(guild_id)
+        self.store.get("autorole", guild_id)
+
+    def set_cog_status(self, guild_id, cog_name, enabled, expected_version=None, actor=None):
+        """Set the enabled/disabled status of a cog for a specific guild.
+
+        Returns {"enabled": ..., "version": ...}, or {"conflict": True, ...} with the
+        current state if expected_version was given and the guild's settings moved on.
+        """
+        if self.shard_router is not None:
+            return self.shard_router.call(guild_id, "set_cog_status", cog_name=cog_name, enabled=enabled,
+                                          expected_version=expected_version, actor=actor)
+        return self._write_cog_status(guild_id, cog_name, lambda current: enabled, expected_version, actor)
+
+    def toggle_cog_status(self, guild_id, cog_name, expected_version=None, actor=None):
+        """Flip a cog's status in one atomic read-modify-write; same result shape as set_cog_status"""
+        if self.shard_router is not None:
+            return self.shard_router.call(guild_id, "toggle_cog_status", cog_name=cog_name,
+                                          expected_version=expected_version, actor=actor)
+        return self._write_cog_status(guild_id, cog_name, lambda current: not current, expected_version, actor)
+
+    def _write_cog_status(self, guild_id, cog_name, new_status, expected_version, actor):
+        previous = {}
+        def apply(settings):
+            previous["enabled"] = settings.get(cog_name, True)
+            settings[cog_name] = new_status(previous["enabled"])
+            return settings
+        try:
+            settings, version = self.store.update_versioned("cog_settings", guild_id, apply, default={},
+                                                            expected_version=expected_version)
+        except VersionConflict as e:
+            return {"conflict": True, "enabled": self.get_cog_status(guild_id, cog_name), "version": e.current}
+        self.cog_index.set(guild_id, cog_name, settings[cog_name])
+        self.audit.append(guild_id, "cog_status", actor, cog=cog_name,
+                          old=previous["enabled"], new=settings[cog_name], version=version)
+        return {"enabled": settings[cog_name], "version": version}
+
+    def set_autorole(self, guild_id, settings, expected_version=None, actor=None):
+        """Set (or clear, if settings is empty) the AutoRole settings for a guild.
+
+        settings is {"roles": [...], "delay": seconds, "target": "all" | "humans" | "bots"}.
+        Returns {"version": ...}, or {"conflict": True, "settings": ..., "version": ...}
+        if expected_version was given and someone else saved in the meantime.
+        """
+        if self.shard_router is not None:
+            return self.shard_router.call(guild_id, "set_autorole", settings=settings,
+                                          expected_version=expected_version, actor=actor)
+        previous = {}
+        def apply(current):
+            previous["settings"] = current
+            # None leaves a tombstone, i.e. removes the setting
+            return settings or None
+        try:
+            _, version = self.store.update_versioned("autorole", guild_id, apply, expected_version=expected_version)
+        except VersionConflict as e:
+            return {"conflict": True, "settings": normalize_autorole(self.store.get("autorole", guild_id)),
+                    "version": e.current}
+        self.audit.append(guild_id, "autorole", actor, old=normalize_autorole(previous["settings"]),
+                          new=settings or None, version=version)
+        return {"version": version}
+
+    def get_settings_version(self, namespace, guild_id):
+        """Version of a guild's settings document, used as its ETag"""
+        return self.store.version(namespace, guild_id)
+    
+    def is_owner(self, user_id):
+        """Whether a Discord user may see the cross-guild owner overview"""
+        user_id = str(user_id)
+        if user_id in OWNER_IDS:
+            return True
+        if self.bot is None:
+            return False
+        owner_ids = set(getattr(self.bot, "owner_ids", None) or ())
+        if getattr(self.bot, "owner_id", None):
+            owner_ids.add(self.bot.owner_id)
+        return user_id in {str(owner) for owner in owner_ids}
+
+    def sync_cog_index(self):
+        """Bring the cog index up to date with the store and the bot's current guilds"""
+        self.cog_index.sync()
+        bot_guilds = self.discord.bot_guilds()
+        # The cached list object only changes when Discord returns a new one
+        if bot_guilds.ok and bot_guilds.data is not self.indexed_bot_guilds:
+            self.cog_index.track(guild["id"] for guild in bot_guilds.data)
+            self.indexed_bot_guilds = bot_guilds.data
     
+    def purge_stale_guilds(self, job):
+        """Job: delete the stored settings of guilds the bot is no longer in"""
+        bot_guilds = self.discord.bot_guilds(live=True)
+        if not bot_guilds.ok or not bot_guilds.data:
+            raise RuntimeError("Could not list the bot's servers")
+        if len(bot_guilds.data) >= BOT_GUILDS_PAGE:
+            # A partial list would make every guild past the first page look departed
+            raise RuntimeError(f"The bot is in {BOT_GUILDS_PAGE} or more servers, which Discord only lists page by page")
+        current = {guild["id"] for guild in bot_guilds.data}
+        stale = sorted(
+            (guild_id, namespace)
+            for namespace in self.store.counters()
+            for guild_id in self.store.load(namespace)
+            if guild_id not in current
+        )
+        dry_run = bool(job.params.get("dry_run"))
+        job.progress(0, len(stale))
+        removed = {}
+        for done, (guild_id, namespace) in enumerate(stale, 1):
+            if not dry_run:
+                # Already gone if an earlier attempt got this far
+                if self.store.get(namespace, guild_id) is not None:
+                    self.store.delete(namespace, guild_id)
+                if done == len(stale) or stale[done][0] != guild_id:
+                    self.audit.append(guild_id, "purge_settings", job.created_by, job=job.id)
+            removed[namespace] = removed.get(namespace, 0) + 1
+            job.progress(done, len(stale))
+        return {"dry_run": dry_run, "guilds": len({guild_id for guild_id, _ in stale}), "documents": removed}
+
+    def export_settings(self, guild_id=None):
+        """Compressed settings bundle of one guild, or of every guild, as a stream of chunks"""
+        return export_bundle(self.store, BUNDLE_NAMESPACES, guild_id)
+
+    def import_settings(self, job):
+        """Job: check an uploaded settings bundle record by record, then write it all in one transaction.
+
+        With a guild on the job, the bundle must hold a single guild and its
+        settings go to the job's guild instead. Role and channel IDs that guild
+        doesn't have (e.g. ones from the server the bundle was exported from)
+        are left out and listed in the result. Documents in the bundle replace
+        the stored ones; anything the bundle doesn't mention is left alone.
+        """
+        path = job.params["path"]
+        target = job.guild_id
+        known = {}
+        dropped = {"role": set(), "channel": set()}
+
+        def known_ids(kind):
+            # Fetched on first use, so a bundle of module toggles costs no Discord call
+            if kind not in known:
+                result = (self.discord.guild_roles if kind == "role" else self.discord.guild_channels)(target)
+                if not result.ok:
+                    raise RuntimeError(f"Could not fetch the server's {kind}s to check the bundle against: {result.error}")
+                if kind == "role":
+                    known[kind] = set(self.role_indexes.get(target, result.data).by_id)
+                else:
+                    known[kind] = {str(channel["id"]) for channel in result.data}
+            return known[kind]
+
+        def records():
+            with open(path, "rb") as f:
+                reader = BundleReader(f)
+                source = None
+                for line, namespace, guild_id, document in reader:
+                    check = BUNDLE_NAMESPACES.get(namespace)
+                    if check is None:
+                        raise BundleError(line, f"unknown settings namespace {namespace}")
+                    if target is not None:
+                        if source not in (None, guild_id):
+                            raise BundleError(line, "the bundle holds more than one server")
+                        source, guild_id = guild_id, target
+                    try:
+                        document = check(document)
+                    # OverflowError: an AutoRole delay of 1e400 or Infinity, which int() can't convert
+                    except (AttributeError, TypeError, ValueError, OverflowError) as e:
+                        raise BundleError(line, f"{namespace} of server {guild_id}: {e}")
+                    if target is not None and document is not None:
+                        document = _drop_unknown_references(namespace, document, known_ids, dropped)
+                        if document is None:
+                            # None of its roles exist here; keep the server's own setting
+                            continue
+                    yield namespace, guild_id, document
+
+        def counted(label):
+            for count, record in enumerate(records(), 1):
+                if count % 1000 == 0:
+                    job.progress(count, message=label)
+                yield record
+
+        dry_run = bool(job.params.get("dry_run"))
+        try:
+            # A first pass only checks, so a bad record is found before the store is locked for writing
+            total = sum(1 for _ in counted("Checking"))
+            written = 0
+            if not dry_run:
+                job.progress(0, total, message="Writing")
+                written = self.store.put_many(counted("Writing"))
+        except Exception as e:
+            # Kept for the next attempt only if the job is merely being handed back
+            if not isinstance(e, Cancelled) or job.cancel_requested:
+                os.remove(path)
+            raise
+        os.remove(path)
+        skipped = {"roles": sorted(dropped["role"]), "channels": sorted(dropped["channel"])}
+        if dry_run:
+            return {"dry_run": True, "records": total, "dropped": skipped}
+        job.progress(written, total, message="Done")
+        if target is not None:
+            self.audit.append(target, "import_settings", job.created_by, job=job.id, records=written, dropped=skipped)
+        else:
+            logger.info(f"Imported {written} settings records from a bundle (job {job.id})")
+        return {"dry_run": False, "records": written, "dropped": skipped}
+
+    def update_module_settings(self, guild_id, cog_key, changes, expected_version=None, actor=None):
+        """Validate and save (part of) a module's settings for a guild.
+
+        Returns {"settings": ..., "version": ...}, {"errors": {path: message}} if the
+        changes don't validate, or {"conflict": True, "settings": ..., "version": ...}
+        if expected_version was given and someone else saved in the meantime.
+        """
+        if self.shard_router is not None:
+            return self.shard_router.call(guild_id, "update_module_settings", cog_key=cog_key, changes=changes,
+                                          expected_version=expected_version, actor=actor)
+        schema = AVAILABLE_COGS[cog_key]["settings"]
+        clean, errors = schema.check(changes)
+        if errors:
+            return {"errors": errors}
+        def apply(current):
+            updated = schema.apply(current, clean)
+            error = schema.violation(schema.resolve(updated))
+            if error:
+                raise ValueError(error)
+            return updated
+        try:
+            stored, version = self.store.update_versioned(schema.namespace, guild_id, apply,
+                                                          expected_version=expected_version)
+        except VersionConflict as e:
+            return {"conflict": True, "settings": get_module_settings(cog_key, guild_id), "version": e.current}
+        except ValueError as e:
+            return {"errors": {"": str(e)}}
+        self.audit.append(guild_id, "module_settings", actor, module=cog_key, changes=clean, version=version)
+        return {"settings": schema.resolve(stored), "version": version}
+
     def load_automod_settings(self, guild_id):
         """Load AutoMod settings for a specific guild"""
-        automod_file = "data/automod.json"
-        ensure_data_dir()
-        
-        if os.path.exists(automod_file):
-            with open(automod_file, "r") as f:
-                data = json.load(f)
-                return data.get(str(guild_id), self.get_default_automod_settings())
-        
-        return self.get_default_automod_settings()
-    
-    def save_automod_settings(self, guild_id, settings):
-        """Save AutoMod settings for a specific guild"""
-        automod_file = "data/automod.json"
-        ensure_data_dir()
-        
-        data = {}
-        if os.path.exists(automod_file):
-            with open(automod_file, "r") as f:
-                data = json.load(f)
-        
-        data[str(guild_id)] = settings
-        
-        with open(automod_file, "w") as f:
-            json.dump(data, f, indent=4)
+        return get_module_settings("AutoMod", guild_id)
     
     def get_default_automod_settings(self):
         """Get default AutoMod settings"""
-        return {
-            "enabled": True,
-            "badwords": [],
-            "action": "timeout",
-            "antispam": {
-                "enabled": False,
-                "max_messages": 5,
-                "time_window": 8,
-                "punishment": "timeout",
-                "timeout_duration": 5
-            },
-            "whitelist_roles": [],
-            "whitelist_channels": [],
-            "log_channel": None
-        }
+        return AVAILABLE_COGS["AutoMod"]["settings"].defaults()
 
-    def generate_cog_cards(self, guild_id):
+    def generate_cog_cards(self, guild_id, statuses=None):
         """Generate enhanced HTML cards for all cogs with their status"""
         # Group cogs by category
         categories = {}
@@ -233,6 +822,8 @@ class ModwayDashboard(commands.Cog):
                 categories[category] = []
             categories[category].append((cog_key, cog_info))
         
+        if statuses is None:
+            statuses = self.get_cog_statuses(guild_id)
         cards_html = ""
         for category, cogs in categories.items():
             cards_html += f"""
@@ -245,17 +836,19 @@ class ModwayDashboard(commands.Cog):
             """
             
             for cog_key, cog_info in cogs:
-                is_enabled = self.get_cog_status(guild_id, cog_key)
+                is_enabled = statuses[cog_key]
                 status_class = "enabled" if is_enabled else "disabled"
                 status_text = "Enabled" if is_enabled else "Disabled"
                 toggle_class = "enabled" if is_enabled else ""
                 
-                # Add configuration button for AutoMod and AutoRole
+                # Add configuration buttons for the modules that have a config page
                 config_button = ""
-                if cog_key == "AutoMod" and is_enabled:
-                    config_button = f'<a href="/config/automod/{guild_id}" class="config-btn">⚙️ Configure</a>'
-                elif cog_key == "AutoRole" and is_enabled:
+                if cog_key == "AutoRole" and is_enabled:
                     config_button = f'<a href="/config/autorole/{guild_id}" class="config-btn">⚙️ Configure</a>'
+                elif cog_key == "DM" and is_enabled:
+                    config_button = f'<a href="/config/dm/{guild_id}" class="config-btn">📨 Mass DM</a>'
+                elif "settings" in cog_info and is_enabled:
+                    config_button = f'<a href="/config/{cog_info["module"]}/{guild_id}" class="config-btn">⚙️ Configure</a>'
                 
                 cards_html += f"""
                 <div class="cog-card {status_class}" style="--cog-color: {cog_info['color']}">
@@ -275,6 +868,7 @@ class ModwayDashboard(commands.Cog):
                             </div>
                         </div>
                         <p class="cog-description">{cog_info['description']}</p>
+                        <div class="cog-sparkline" data-cog="{cog_key}"></div>
                         <div class="cog-status">
                             <div class="status-indicator">
                                 <div class="status-dot {status_class}"></div>
@@ -294,9 +888,98 @@ class ModwayDashboard(commands.Cog):
         
         return cards_html
 
-    def start_webserver(self):
+    def build_app(self):
+        """Create the Flask app with all dashboard routes"""
+        # Imported here so loading the extension doesn't pay for flask
+        from flask import Flask, Response, redirect, request, session, jsonify, stream_with_context
+
         app = Flask("ModwayDashboard")
-        app.secret_key = os.urandom(24)
+        # Workers behind a load balancer must share the key or sessions break between them
+        app.secret_key = os.getenv("DASHBOARD_SECRET_KEY") or os.urandom(24)
+        
+        def set_title_script(title):
+            """Inline script that retitles a streamed page once its data is known"""
+            # Escape "</" so a guild name can't close the script tag
+            title_js = json.dumps(title).replace("</", "<\\/")
+            return f"<script>document.title = {title_js};</script>"
+        
+        def stale_notice(*results):
+            """Banner shown when a page is built from cached Discord data"""
+            ages = [r.age for r in results if not isinstance(r, Exception) and r.stale]
+            if not ages:
+                return ""
+            return (
+                '<div class="stale-notice" style="max-width: 1400px; margin: 0 auto 20px; padding: 12px 18px; '
+                'border-radius: 12px; background: rgba(240, 173, 78, 0.15); border: 1px solid rgba(240, 173, 78, 0.4); '
+                f'color: #f0ad4e;">⚠️ Discord is slow or unavailable right now, showing data from {int(max(ages))}s ago.</div>'
+            )
+        
+        def etag(version):
+            return f'"{version}"'
+        
+        def if_match_version():
+            """Version from the If-Match header; None if absent or "*", raises ValueError if malformed"""
+            header = request.headers.get("If-Match", "").strip()
+            if not header or header == "*":
+                return None
+            if header.startswith("W/"):
+                header = header[2:]
+            return int(header.strip('"'))
+        
+        def precondition_failed(version, body):
+            response = jsonify(body)
+            response.status_code = 412
+            response.headers["ETag"] = etag(version)
+            return response
+        
+        def role_json(role):
+            """The role fields the AutoRole page and typeahead need"""
+            return {
+                "id": str(role["id"]),
+                "name": role["name"],
+                "color": f"#{role['color']:06x}" if role.get("color") else "#99AAB5",
+                "position": role.get("position", 0)
+            }
+        
+        def audit_actor(user):
+            """Who made a change, as recorded in the audit journal"""
+            return {"id": str(user.get("id")), "name": user.get("username")}
+        
+        def write_limited(user, guild_id):
+            """429 response if this session or guild is over its write budget, else None.
+
+            Only call it after the permission check, or anyone could spend a guild's budget.
+            """
+            session_key = str(user.get("id"))
+            wait = self.session_writes.take(session_key)
+            if not wait:
+                wait = self.guild_writes.take(str(guild_id))
+                if wait:
+                    # The request doesn't go ahead, so it shouldn't cost the session anything
+                    self.session_writes.refund(session_key)
+            if not wait:
+                return None
+            response = jsonify({
+                "success": False,
+                "error": "Too many changes, please slow down",
+                "retry_after": round(wait, 2)
+            })
+            response.status_code = 429
+            response.headers["Retry-After"] = retry_after_header(wait)
+            return response
+        
+        def icon_url(kind, owner_id, icon_hash, display_px):
+            """Proxied thumbnail URL for a Discord icon shown at display_px CSS pixels"""
+            size = snap_size(display_px * 2)  # Sharp on high-DPI screens
+            if not icon_hash:
+                return f"/icons/embed/0/0.webp?size={size}"
+            return f"/icons/{kind}/{owner_id}/{icon_hash}.webp?size={size}"
+        
+        def stream_page(chunks):
+            """Send a page as its chunks are produced, so the shell reaches the browser first"""
+            if STREAM_PAGES:
+                return Response(stream_with_context(chunks), mimetype="text/html")
+            return "".join(chunks)
 
         @app.route("/")
         def home():
@@ -304,7 +987,10 @@ class ModwayDashboard(commands.Cog):
             if user:
                 username = user["username"]
                 discriminator = user["discriminator"]
-                avatar = f"https://cdn.discordapp.com/avatars/{user['id']}/{user['avatar']}.png" if user['avatar'] else "https://cdn.discordapp.com/embed/avatars/{int(discriminator) % 5}.png"
+                if user['avatar']:
+                    avatar = icon_url("avatars", user['id'], user['avatar'], 45)
+                else:
+                    avatar = f"/icons/embed/0/{int(discriminator) % 5}.webp?size={snap_size(90)}"
                 login_section = f"""
                     <div class="user-info">
                         <div class="user-details">
@@ -747,15 +1433,19 @@ class ModwayDashboard(commands.Cog):
                 "redirect_uri": REDIRECT_URI,
                 "scope": SCOPE
             }
-            headers = {"Content-Type": "application/x-www-form-urlencoded"}
-            r = requests.post("https://discord.com/api/oauth2/token", data=data, headers=headers)
-            r.raise_for_status()
-            token_data = r.json()
-            access_token = token_data["access_token"]
+            token_result = self.discord.exchange_code(data)
+            if not token_result.ok:
+                return "❌ Discord login failed, please try again in a moment."
+            access_token = token_result.data["access_token"]
 
-            user_data = requests.get("https://discord.com/api/users/@me", headers={"Authorization": f"Bearer {access_token}"}).json()
+            user_result = self.discord.current_user(access_token)
+            if not user_result.ok:
+                return "❌ Discord login failed, please try again in a moment."
+            user_data = user_result.data
             session["user"] = user_data
             session["access_token"] = access_token
+            if self.warmer is not None:
+                self.warmer.warm(user_data["id"], access_token)
             return redirect("/")
 
         @app.route("/logout")
@@ -774,56 +1464,29 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return redirect("/discord-login")
             
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if user_guilds_response.status_code != 200:
-                return "❌ Failed to fetch your servers."
-            
-            user_guilds = user_guilds_response.json()
-            
-            bot_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bot {Token}"}
-            )
-            
-            bot_guild_ids = []
-            if bot_guilds_response.status_code == 200:
-                bot_guild_ids = [guild["id"] for guild in bot_guilds_response.json()]
-            
-            manageable_guilds = [guild for guild in user_guilds if int(guild["permissions"]) & 0x20]
+            page_end = """
+                </div>
+              </body>
+            </html>
+            """
             
-            guild_cards = ""
-            for guild in manageable_guilds:
-                guild_icon = f"https://cdn.discordapp.com/icons/{guild['id']}/{guild['icon']}.png" if guild['icon'] else "https://cdn.discordapp.com/embed/avatars/0.png"
-                
-                if guild["id"] in bot_guild_ids:
-                    action_btn = f'<a href="/manage/{guild["id"]}" class="action-btn manage">🎛️ Manage Server</a>'
-                    status_badge = '<div class="status-badge connected">🟢 Connected</div>'
-                else:
-                    action_btn = f'<a href="/invite/{guild["id"]}" class="action-btn invite">➕ Add Bot</a>'
-                    status_badge = '<div class="status-badge disconnected">⚪ Not Connected</div>'
-                
-                guild_cards += f"""
-                <div class="guild-card">
-                    <div class="guild-header">
-                        <img src="{guild_icon}" class="guild-icon" loading="lazy">
-                        <div class="guild-info">
-                            <h3 class="guild-name">{guild['name']}</h3>
-                            <p class="guild-id">ID: {guild['id']}</p>
-                            {status_badge}
-                        </div>
-                    </div>
-                    <div class="guild-actions">
-                        {action_btn}
+            def empty_state(icon, text):
+                return f"""
+                    <div class="empty-state">
+                        <div class="empty-state-icon">{icon}</div>
+                        <div class="empty-state-text">{text}</div>
                     </div>
-                    <div class="guild-card-glow"></div>
-                </div>
                 """
             
-            return f"""
+            def render():
+                # Both guild lists are fetched while the page shell is already on its way
+                pending = start_fanout(
+                    lambda: self.discord.user_guilds(access_token),
+                    lambda: self.discord.bot_guilds(),
+                    timeout=REQUEST_DEADLINE
+                )
+                
+                yield f"""
             <!DOCTYPE html>
             <html lang="en">
               <head>
@@ -1100,16 +1763,57 @@ class ModwayDashboard(commands.Cog):
                 </div>
                 
                 <div class="guilds-container">
-                    {guild_cards if guild_cards else '''
-                    <div class="empty-state">
-                        <div class="empty-state-icon">🏰</div>
-                        <div class="empty-state-text">No manageable servers found</div>
+                """
+                
+                user_guilds_result = pending.result(0, return_exceptions=True)
+                if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                    yield empty_state("❌", "Failed to fetch your servers.")
+                    yield page_end
+                    return
+                
+                user_guilds = user_guilds_result.data
+                
+                bot_guilds_result = pending.result(1, return_exceptions=True)
+                bot_guild_ids = set()
+                if not isinstance(bot_guilds_result, Exception) and bot_guilds_result.ok:
+                    bot_guild_ids = {guild["id"] for guild in bot_guilds_result.data}
+                
+                yield stale_notice(user_guilds_result, bot_guilds_result)
+                
+                manageable_guilds = [guild for guild in user_guilds if int(guild["permissions"]) & 0x20]
+                
+                for guild in manageable_guilds:
+                    guild_icon = icon_url("icons", guild['id'], guild['icon'], 70)
+                    
+                    if guild["id"] in bot_guild_ids:
+                        action_btn = f'<a href="/manage/{guild["id"]}" class="action-btn manage">🎛️ Manage Server</a>'
+                        status_badge = '<div class="status-badge connected">🟢 Connected</div>'
+                    else:
+                        action_btn = f'<a href="/invite/{guild["id"]}" class="action-btn invite">➕ Add Bot</a>'
+                        status_badge = '<div class="status-badge disconnected">⚪ Not Connected</div>'
+                    
+                    yield f"""
+                    <div class="guild-card">
+                        <div class="guild-header">
+                            <img src="{guild_icon}" class="guild-icon" loading="lazy">
+                            <div class="guild-info">
+                                <h3 class="guild-name">{guild['name']}</h3>
+                                <p class="guild-id">ID: {guild['id']}</p>
+                                {status_badge}
+                            </div>
+                        </div>
+                        <div class="guild-actions">
+                            {action_btn}
+                        </div>
+                        <div class="guild-card-glow"></div>
                     </div>
-                    '''}
-                </div>
-              </body>
-            </html>
-            """
+                    """
+                
+                if not manageable_guilds:
+                    yield empty_state("🏰", "No manageable servers found")
+                yield page_end
+            
+            return stream_page(render())
         
         @app.route("/invite/<guild_id>")
         def invite_confirm(guild_id):
@@ -1121,20 +1825,16 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return redirect("/discord-login")
             
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
+            user_guilds_result = self.discord.user_guilds(access_token)
             
             guild_info = None
-            if user_guilds_response.status_code == 200:
-                guilds = user_guilds_response.json()
-                guild_info = next((g for g in guilds if g["id"] == guild_id), None)
+            if user_guilds_result.ok:
+                guild_info = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
             
             if not guild_info:
                 return "❌ Server not found."
             
-            guild_icon = f"https://cdn.discordapp.com/icons/{guild_info['id']}/{guild_info['icon']}.png" if guild_info['icon'] else "https://cdn.discordapp.com/embed/avatars/0.png"
+            guild_icon = icon_url("icons", guild_info['id'], guild_info['icon'], 120)
             invite_url = f"https://discord.com/api/oauth2/authorize?client_id={CLIENT_ID}&permissions=8&guild_id={guild_id}&response_type=code&redirect_uri={REDIRECT_URI}&scope=bot"
             
             return f"""
@@ -1410,28 +2110,22 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return redirect("/discord-login")
             
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            guild_info = None
-            if user_guilds_response.status_code == 200:
-                guilds = user_guilds_response.json()
-                guild_info = next((g for g in guilds if g["id"] == guild_id), None)
-            
-            guild_name = guild_info['name'] if guild_info else f"Server {guild_id}"
-            guild_icon = f"https://cdn.discordapp.com/icons/{guild_info['id']}/{guild_info['icon']}.png" if guild_info and guild_info['icon'] else "https://cdn.discordapp.com/embed/avatars/0.png"
-            
-            cog_cards = self.generate_cog_cards(guild_id)
-            
-            return f"""
+            def render():
+                # Guild info and cog statuses load while the page shell is already on its way
+                pending = start_fanout(
+                    lambda: self.discord.user_guilds(access_token),
+                    # Version first: a write landing in between then fails If-Match instead of being lost
+                    lambda: (self.get_settings_version("cog_settings", guild_id), self.get_cog_statuses(guild_id)),
+                    timeout=REQUEST_DEADLINE
+                )
+                
+                yield f"""
             <!DOCTYPE html>
             <html lang="en">
               <head>
                 <meta charset="UTF-8">
                 <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Modway Dashboard - Manage {guild_name}</title>
+                <title>Modway Dashboard - Manage Server</title>
                 <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
                 <style>
                   :root {{
@@ -1539,6 +2233,17 @@ class ModwayDashboard(commands.Cog):
                     font-size: 1.1em;
                   }}
                   
+                  .settings-backup {{
+                    margin-top: 8px;
+                    font-size: 0.9em !important;
+                  }}
+                  
+                  .settings-backup a, .settings-backup label {{
+                    color: var(--primary-color);
+                    text-decoration: none;
+                    cursor: pointer;
+                  }}
+                  
                   .management-section {{
                     max-width: 1400px;
                     margin: 0 auto;
@@ -1738,6 +2443,25 @@ class ModwayDashboard(commands.Cog):
                     justify-content: center;
                   }}
                   
+                  .cog-sparkline {{
+                    margin: -10px 0 15px;
+                    font-size: 0.75em;
+                    color: var(--text-secondary);
+                  }}
+                  
+                  .cog-sparkline svg {{
+                    display: block;
+                    width: 100%;
+                    height: 30px;
+                  }}
+                  
+                  .cog-sparkline polyline {{
+                    fill: none;
+                    stroke: var(--cog-color);
+                    stroke-width: 1.5;
+                    vector-effect: non-scaling-stroke;
+                  }}
+                  
                   .status-indicator {{
                     display: flex;
                     align-items: center;
@@ -1849,6 +2573,33 @@ class ModwayDashboard(commands.Cog):
                 <script>
                   let isToggling = false;
                   
+                  async function importSettings(input, guildId) {{
+                    const file = input.files[0];
+                    input.value = '';
+                    if (!file || !confirm(`Replace this server's settings with the ones in ${{file.name}}?`)) return;
+                    const response = await fetch(`/api/settings-import/${{guildId}}`, {{ method: 'POST', body: file }});
+                    const result = await response.json();
+                    if (!result.success) {{
+                      alert(result.error || 'Import failed');
+                      return;
+                    }}
+                    // The import runs in the background; reload once it has finished
+                    const poll = async () => {{
+                      const jobs = await (await fetch(`/api/jobs/${{guildId}}`)).json();
+                      const job = (jobs.jobs || []).find(job => job.id === result.job.id);
+                      if (job && (job.state === 'queued' || job.state === 'running')) {{
+                        setTimeout(poll, 1000);
+                      }} else if (job && job.state === 'succeeded') {{
+                        location.reload();
+                      }} else {{
+                        alert('Import failed: ' + ((job && job.error) || 'unknown error'));
+                      }}
+                    }};
+                    poll();
+                  }}
+                  // ETag of this server's settings as rendered; sent back so concurrent edits aren't lost
+                  let settingsVersion = null;
+                  
                   async function toggleCog(guildId, cogName) {{
                     if (isToggling) return;
                     isToggling = true;
@@ -1857,11 +2608,15 @@ class ModwayDashboard(commands.Cog):
                     loadingOverlay.style.display = 'flex';
                     
                     try {{
+                      const headers = {{
+                        'Content-Type': 'application/json',
+                      }};
+                      if (settingsVersion) {{
+                        headers['If-Match'] = settingsVersion;
+                      }}
                       const response = await fetch(`/api/toggle-cog/${{guildId}}/${{cogName}}`, {{
                         method: 'POST',
-                        headers: {{
-                          'Content-Type': 'application/json',
-                        }}
+                        headers: headers
                       }});
                       
                       if (response.ok) {{
@@ -1869,6 +2624,10 @@ class ModwayDashboard(commands.Cog):
                         setTimeout(() => {{
                           location.reload();
                         }}, 800);
+                      }} else if (response.status === 412) {{
+                        const error = await response.json();
+                        alert(error.error);
+                        location.reload();
                       }} else {{
                         const error = await response.json();
                         alert(`Failed to toggle cog: ${{error.error || 'Unknown error'}}`);
@@ -1883,19 +2642,57 @@ class ModwayDashboard(commands.Cog):
                     }}
                   }}
                   
+                  // Activity per module over the last 48 hours, drawn into each card
+                  async function loadSparklines(guildId) {{
+                    let usage;
+                    try {{
+                      const response = await fetch(`/api/telemetry/${{guildId}}?resolution=hour`);
+                      if (!response.ok) return;
+                      usage = await response.json();
+                    }} catch (error) {{
+                      return;
+                    }}
+                    document.querySelectorAll('.cog-sparkline').forEach(box => {{
+                      const counts = usage.cogs[box.dataset.cog];
+                      const total = counts ? counts.reduce((a, b) => a + b, 0) : 0;
+                      if (!total) return;
+                      const max = Math.max(...counts);
+                      const points = counts.map((count, i) =>
+                        `${{(i / (counts.length - 1) * 100).toFixed(1)}},${{(28 - count / max * 26).toFixed(1)}}`).join(' ');
+                      box.innerHTML = `<svg viewBox="0 0 100 30" preserveAspectRatio="none"><polyline points="${{points}}"/></svg>` +
+                        `<span>${{total}} events in the last ${{usage.buckets}}h</span>`;
+                    }});
+                  }}
+                  
                   // Add smooth scroll behavior
                   document.documentElement.style.scrollBehavior = 'smooth';
                 </script>
               </head>
               <body>
                 <a href="/servers" class="back-btn">← Back to Servers</a>
+                """
+                
+                user_guilds_result = pending.result(0, return_exceptions=True)
+                guild_info = None
+                if not isinstance(user_guilds_result, Exception) and user_guilds_result.ok:
+                    guild_info = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
                 
+                guild_name = guild_info['name'] if guild_info else f"Server {guild_id}"
+                guild_icon = icon_url("icons", guild_id, guild_info['icon'] if guild_info else None, 80)
+                
+                yield set_title_script(f"Modway Dashboard - Manage {guild_name}")
+                yield stale_notice(user_guilds_result)
+                yield f"""
                 <div class="header">
                   <div class="server-info">
                     <img src="{guild_icon}" class="server-icon" loading="lazy">
                     <div class="server-details">
                       <h1>{guild_name}</h1>
                       <p>Bot Feature Management</p>
+                      <p class="settings-backup">
+                        <a href="/api/settings-export/{guild_id}">⬇️ Export settings</a> ·
+                        <label>⬆️ Import settings <input type="file" accept=".gz" hidden onchange="importSettings(this, '{guild_id}')"></label>
+                      </p>
                     </div>
                   </div>
                 </div>
@@ -1906,7 +2703,17 @@ class ModwayDashboard(commands.Cog):
                     <p class="section-subtitle">Enable or disable specific bot functionalities for your server. Changes take effect immediately.</p>
                   </div>
                   
-                  {cog_cards}
+                """
+                
+                loaded = pending.result(1, return_exceptions=True)
+                if isinstance(loaded, Exception):
+                    yield '<p class="section-subtitle">❌ Failed to load the bot features for this server.</p>'
+                else:
+                    version, statuses = loaded
+                    yield f"<script>settingsVersion = {json.dumps(etag(version))};</script>"
+                    yield self.generate_cog_cards(guild_id, statuses)
+                    yield f"<script>loadSparklines('{guild_id}');</script>"
+                yield """
                 </div>
                 
                 <div class="loading-overlay">
@@ -1915,6 +2722,8 @@ class ModwayDashboard(commands.Cog):
               </body>
             </html>
             """
+            
+            return stream_page(render())
 
         # AutoRole Configuration Route
         @app.route("/config/autorole/<guild_id>")
@@ -1927,55 +2736,22 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return redirect("/discord-login")
             
-            # Verify permissions
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if user_guilds_response.status_code != 200:
-                return "❌ Failed to fetch your servers."
-            
-            user_guilds = user_guilds_response.json()
-            guild_info = next((g for g in user_guilds if g["id"] == guild_id), None)
-            
-            if not guild_info or not (int(guild_info["permissions"]) & 0x20):
-                return "❌ No permission to manage this server."
-            
-            # Load AutoRole settings
-            autorole_data = load_autorole_settings()
-            current_role_id = autorole_data.get(guild_id, None)
-            
-            # Get guild roles from bot
-            try:
-                roles_response = requests.get(
-                    f"https://discord.com/api/guilds/{guild_id}/roles",
-                    headers={"Authorization": f"Bot {Token}"}
+            def render():
+                # The permission check and the AutoRole setting load while the page shell goes out;
+                # the roles need the bot token, so they wait until the permission check has passed
+                pending = start_fanout(
+                    lambda: self.discord.user_guilds(access_token),
+                    lambda: self.store.get_versioned("autorole", guild_id),
+                    timeout=REQUEST_DEADLINE
                 )
-                roles = roles_response.json() if roles_response.status_code == 200 else []
-                # Sort roles by position (highest first)
-                roles = sorted(roles, key=lambda r: r.get("position", 0), reverse=True)
-            except:
-                roles = []
-            
-            guild_name = guild_info['name']
-            guild_icon = f"https://cdn.discordapp.com/icons/{guild_info['id']}/{guild_info['icon']}.png" if guild_info['icon'] else "https://cdn.discordapp.com/embed/avatars/0.png"
-            
-            # Generate role options for dropdown
-            role_options = '<option value="">No Auto Role</option>'
-            for role in roles:
-                if role['name'] != '@everyone':  # Skip @everyone role
-                    selected = "selected" if str(role['id']) == str(current_role_id) else ""
-                    color_hex = f"#{role['color']:06x}" if role['color'] else "#99AAB5"
-                    role_options += f'<option value="{role["id"]}" {selected} style="color: {color_hex};">{role["name"]}</option>'
-            
-            return f"""
+                
+                yield f"""
             <!DOCTYPE html>
             <html lang="en">
               <head>
                 <meta charset="UTF-8">
                 <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>AutoRole Configuration - {guild_name}</title>
+                <title>AutoRole Configuration</title>
                 <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
                 <style>
                   :root {{
@@ -2233,6 +3009,68 @@ class ModwayDashboard(commands.Cog):
                     color: #ff7b82;
                   }}
                   
+                  .role-chips {{
+                    display: flex;
+                    flex-wrap: wrap;
+                    gap: 8px;
+                    margin-bottom: 10px;
+                  }}
+                  
+                  .role-chip {{
+                    display: inline-flex;
+                    align-items: center;
+                    gap: 6px;
+                    padding: 6px 10px;
+                    background: var(--background-dark);
+                    border: 1px solid var(--border-color);
+                    border-radius: 16px;
+                    font-size: 0.9em;
+                  }}
+                  
+                  .role-chip button {{
+                    background: none;
+                    border: none;
+                    color: var(--text-secondary);
+                    cursor: pointer;
+                    font-size: 1.1em;
+                  }}
+                  
+                  .role-dot {{
+                    width: 10px;
+                    height: 10px;
+                    border-radius: 50%;
+                  }}
+                  
+                  .role-search {{
+                    position: relative;
+                  }}
+                  
+                  .role-suggestions {{
+                    display: none;
+                    position: absolute;
+                    left: 0;
+                    right: 0;
+                    top: 100%;
+                    max-height: 280px;
+                    overflow-y: auto;
+                    background: var(--background-card);
+                    border: 1px solid var(--border-color);
+                    border-radius: 8px;
+                    z-index: 10;
+                  }}
+                  
+                  .role-suggestion {{
+                    display: flex;
+                    align-items: center;
+                    gap: 8px;
+                    padding: 10px 15px;
+                    cursor: pointer;
+                  }}
+                  
+                  .role-suggestion:hover {{
+                    background: rgba(88, 101, 242, 0.15);
+                  }}
+                  
                   @media (max-width: 768px) {{
                     .header {{
                       flex-direction: column;
@@ -2247,6 +3085,28 @@ class ModwayDashboard(commands.Cog):
                 </style>
               </head>
               <body>
+                """
+                
+                # Verify permissions
+                user_guilds_result = pending.result(0, return_exceptions=True)
+                if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                    yield page_error("❌ Failed to fetch your servers.")
+                    return
+                
+                user_guilds = user_guilds_result.data
+                guild_info = next((g for g in user_guilds if g["id"] == guild_id), None)
+                
+                if not guild_info or not (int(guild_info["permissions"]) & 0x20):
+                    yield page_error("❌ No permission to manage this server.")
+                    return
+                roles_pending = start_fanout(lambda: self.discord.guild_roles(guild_id), timeout=REQUEST_DEADLINE)
+                
+                guild_name = guild_info['name']
+                guild_icon = icon_url("icons", guild_info['id'], guild_info['icon'], 50)
+                
+                yield set_title_script(f"AutoRole Configuration - {guild_name}")
+                yield stale_notice(user_guilds_result)
+                yield f"""
                 <div class="header">
                   <div class="header-info">
                     <img src="{guild_icon}" class="guild-icon" loading="lazy">
@@ -2267,12 +3127,53 @@ class ModwayDashboard(commands.Cog):
                       <div class="section-title">Role Assignment</div>
                     </div>
                     
+                """
+                
+                # Load AutoRole settings
+                current, autorole_version = None, None
+                autorole_setting = pending.result(1, return_exceptions=True)
+                if not isinstance(autorole_setting, Exception):
+                    stored, autorole_version = autorole_setting
+                    current = normalize_autorole(stored)
+                current = current or {"roles": [], "delay": 0, "target": "all"}
+                
+                # Names and colours of the selected roles; the rest is searched on demand
+                try:
+                    roles_result = roles_pending.result(0)
+                    role_index = self.role_indexes.get(guild_id, roles_result.data if roles_result.ok else [])
+                except Exception:
+                    role_index = self.role_indexes.get(guild_id, [])
+                selected_roles = [
+                    role_json(role_index.by_id.get(role_id) or {"id": role_id, "name": f"Unknown role {role_id}", "color": 0})
+                    for role_id in current["roles"]
+                ]
+                # Escape "</" so a role name can't close the script tag
+                selected_roles_js = json.dumps(selected_roles).replace("</", "<\\/")
+                target_options = "".join(
+                    f'<option value="{value}" {"selected" if current["target"] == value else ""}>{label}</option>'
+                    for value, label in (("all", "Everyone"), ("humans", "Humans only"), ("bots", "Bots only"))
+                )
+                
+                yield f"""
                     <div class="form-group">
-                      <label class="form-label" for="autorole_select">Role to assign to new members:</label>
-                      <select class="form-select" id="autorole_select">
-                        {role_options}
-                      </select>
-                      <div class="form-help">This role will be automatically assigned when new members join your server.</div>
+                      <label class="form-label" for="role_search">Roles to assign to new members (up to {MAX_ROLES}):</label>
+                      <div id="selected_roles" class="role-chips"></div>
+                      <div class="role-search">
+                        <input type="text" class="form-select" id="role_search" placeholder="Search {len(role_index)} roles..." autocomplete="off">
+                        <div id="role_suggestions" class="role-suggestions"></div>
+                      </div>
+                      <div class="form-help">These roles will be automatically assigned when new members join your server.</div>
+                    </div>
+                    
+                    <div class="form-group">
+                      <label class="form-label" for="autorole_target">Assign to:</label>
+                      <select class="form-select" id="autorole_target">{target_options}</select>
+                    </div>
+                    
+                    <div class="form-group">
+                      <label class="form-label" for="autorole_delay">Delay after joining (seconds):</label>
+                      <input type="number" class="form-select" id="autorole_delay" min="0" max="86400" value="{current['delay']}">
+                      <div class="form-help">0 assigns the roles immediately. A delay lets verification or anti-raid checks run first.</div>
                     </div>
                     
                     <div class="info-box">
@@ -2281,9 +3182,9 @@ class ModwayDashboard(commands.Cog):
                         <span>How AutoRole works</span>
                       </div>
                       <div class="info-box-content">
-                        <p>When new members join your server, they will automatically receive the selected role. This happens instantly when they join.</p>
+                        <p>When new members join your server, they will automatically receive the selected roles, either right away or after the configured delay.</p>
                         <br>
-                        <p>If you select "No Auto Role" option, no role will be assigned automatically.</p>
+                        <p>If no role is selected, no role will be assigned automatically.</p>
                       </div>
                     </div>
                     
@@ -2291,12 +3192,85 @@ class ModwayDashboard(commands.Cog):
                       <button id="save_button" class="btn btn-primary">💾 Save Settings</button>
                       <button id="reset_button" class="btn btn-secondary">🔄 Reset</button>
                     </div>
-                  </div>
+                    
+                    <div class="form-group" style="margin-top: 25px;">
+                      <label class="form-label">Existing members:</label>
+                      <button id="backfill_button" class="btn btn-secondary">👥 Give the saved roles to existing members</button>
+                      <div class="form-help">Runs in the background at the same pace as new joins. You can leave this page while it runs.</div>
+                      <div id="backfill_status" class="form-help"></div>
+                    </div>
+                  </div>
                 </div>
                 
                 <script>
-                  document.getElementById('save_button').addEventListener('click', async function() {
-                    const roleId = document.getElementById('autorole_select').value;
+                  // ETag of the AutoRole setting as loaded; a save made elsewhere since then is reported, not overwritten
+                  let settingsVersion = {json.dumps(etag(autorole_version)) if autorole_version is not None else "null"};
+                  let selectedRoles = {selected_roles_js};
+                  const maxRoles = {MAX_ROLES};
+                  
+                  function roleChip(role, removable) {{
+                    const chip = document.createElement(removable ? 'span' : 'div');
+                    chip.className = removable ? 'role-chip' : 'role-suggestion';
+                    const dot = document.createElement('span');
+                    dot.className = 'role-dot';
+                    dot.style.background = role.color;
+                    chip.appendChild(dot);
+                    chip.appendChild(document.createTextNode(role.name));
+                    return chip;
+                  }}
+                  
+                  function renderSelected() {{
+                    const container = document.getElementById('selected_roles');
+                    container.innerHTML = '';
+                    selectedRoles.forEach((role, i) => {{
+                      const chip = roleChip(role, true);
+                      const remove = document.createElement('button');
+                      remove.textContent = '×';
+                      remove.onclick = () => {{ selectedRoles.splice(i, 1); renderSelected(); }};
+                      chip.appendChild(remove);
+                      container.appendChild(chip);
+                    }});
+                  }}
+                  
+                  let searchTimer = null;
+                  let searchSeq = 0;
+                  async function searchRoles() {{
+                    const query = document.getElementById('role_search').value;
+                    const seq = ++searchSeq;
+                    const response = await fetch(`/api/autorole/roles/{guild_id}?q=${{encodeURIComponent(query)}}&limit=15`);
+                    if (!response.ok || seq !== searchSeq) return;
+                    const result = await response.json();
+                    const box = document.getElementById('role_suggestions');
+                    box.innerHTML = '';
+                    result.roles.filter(role => !selectedRoles.some(r => r.id === role.id)).forEach(role => {{
+                      const item = roleChip(role, false);
+                      item.onmousedown = (event) => {{
+                        event.preventDefault();
+                        if (selectedRoles.length >= maxRoles) {{
+                          alert(`At most ${{maxRoles}} roles can be assigned automatically`);
+                          return;
+                        }}
+                        selectedRoles.push(role);
+                        renderSelected();
+                        searchRoles();
+                      }};
+                      box.appendChild(item);
+                    }});
+                    box.style.display = box.children.length ? 'block' : 'none';
+                  }}
+                  
+                  const searchInput = document.getElementById('role_search');
+                  searchInput.addEventListener('input', () => {{
+                    clearTimeout(searchTimer);
+                    searchTimer = setTimeout(searchRoles, 120);
+                  }});
+                  searchInput.addEventListener('focus', searchRoles);
+                  searchInput.addEventListener('blur', () => {{
+                    document.getElementById('role_suggestions').style.display = 'none';
+                  }});
+                  renderSelected();
+                  
+                  document.getElementById('save_button').addEventListener('click', async function() {{
                     const statusMessage = document.getElementById('status-message');
                     
                     statusMessage.textContent = 'Saving settings...';
@@ -2306,40 +3280,86 @@ class ModwayDashboard(commands.Cog):
                     statusMessage.style.color = 'var(--text-primary)';
                     statusMessage.style.border = '1px solid var(--border-color)';
                     
-                    try {
-                      const response = await fetch('/api/autorole/save/{guild_id}', {
+                    try {{
+                      const headers = {{
+                        'Content-Type': 'application/json'
+                      }};
+                      if (settingsVersion) {{
+                        headers['If-Match'] = settingsVersion;
+                      }}
+                      const response = await fetch('/api/autorole/save/{guild_id}', {{
                         method: 'POST',
-                        headers: {
-                          'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({ roleId: roleId })
-                      });
+                        headers: headers,
+                        body: JSON.stringify({{
+                          roleIds: selectedRoles.map(role => role.id),
+                          delay: parseInt(document.getElementById('autorole_delay').value || '0', 10),
+                          target: document.getElementById('autorole_target').value
+                        }})
+                      }});
                       
                       const result = await response.json();
                       
-                      if (result.success) {
+                      if (result.success) {{
+                        settingsVersion = response.headers.get('ETag');
                         statusMessage.textContent = '✅ AutoRole settings saved successfully!';
                         statusMessage.className = 'status-message success';
-                      } else {
+                      }} else {{
                         statusMessage.textContent = '❌ ' + (result.error || 'An error occurred');
                         statusMessage.className = 'status-message error';
-                      }
-                    } catch (error) {
+                      }}
+                    }} catch (error) {{
                       console.error('Error:', error);
                       statusMessage.textContent = '❌ An error occurred while saving settings';
                       statusMessage.className = 'status-message error';
-                    }
-                  });
+                    }}
+                  }});
                   
-                  document.getElementById('reset_button').addEventListener('click', function() {
-                    if (confirm('Reset to the current saved settings?')) {
+                  document.getElementById('reset_button').addEventListener('click', function() {{
+                    if (confirm('Reset to the current saved settings?')) {{
                       location.reload();
-                    }
-                  });
+                    }}
+                  }});
+                  
+                  async function loadBackfill() {{
+                    const response = await fetch('/api/jobs/{guild_id}');
+                    if (!response.ok) return;
+                    const result = await response.json();
+                    const job = result.jobs.find(job => job.kind === 'autorole.backfill');
+                    const status = document.getElementById('backfill_status');
+                    if (!job) return;
+                    const active = job.state === 'queued' || job.state === 'running';
+                    const progress = job.total !== null ? `${{job.done}} / ${{job.total}} members` : '';
+                    status.textContent = `Last run: ${{job.state}} ${{progress}} ${{job.message || ''}} ${{job.error || ''}}`;
+                    document.getElementById('backfill_button').disabled = active;
+                    if (active) setTimeout(loadBackfill, 3000);
+                  }}
+                  
+                  document.getElementById('backfill_button').addEventListener('click', async function() {{
+                    if (!confirm('Give the saved AutoRole roles to every existing member who matches the target?')) return;
+                    const response = await fetch('/api/autorole/backfill/{guild_id}', {{ method: 'POST' }});
+                    const result = await response.json();
+                    if (!result.success) {{
+                      document.getElementById('backfill_status').textContent = '❌ ' + (result.error || 'An error occurred');
+                    }}
+                    loadBackfill();
+                  }});
+                  
+                  loadBackfill();
                 </script>
               </body>
             </html>
             """
+            
+            def page_error(message):
+                return f"""
+                <div class="config-container">
+                  <div class="status-message error" style="display: block;">{message}</div>
+                </div>
+              </body>
+            </html>
+            """
+            
+            return stream_page(render())
         
         @app.route("/api/autorole/save/<guild_id>", methods=["POST"])
         def save_autorole_config(guild_id):
@@ -2351,64 +3371,109 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return jsonify({"success": False, "error": "No access token"}), 401
             
-            # Verify permissions
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
+            try:
+                expected_version = if_match_version()
+            except ValueError:
+                return jsonify({"success": False, "error": "Malformed If-Match header"}), 400
+            
+            data = request.get_json(silent=True) or {}
+            settings, error = parse_autorole_request(data)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            
+            # Permission check and module status run concurrently; the role verification
+            # uses the bot token, so it only starts once the permission check has passed
+            user_guilds_result, autorole_enabled = gather(
+                lambda: self.discord.user_guilds(access_token),
+                lambda: self.get_cog_status(guild_id, "AutoRole"),
+                timeout=REQUEST_DEADLINE,
+                return_exceptions=True
             )
             
-            if user_guilds_response.status_code != 200:
+            # Verify permissions
+            if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
                 return jsonify({"success": False, "error": "Failed to fetch guilds"}), 403
             
-            user_guilds = user_guilds_response.json()
+            user_guilds = user_guilds_result.data
             guild = next((g for g in user_guilds if g["id"] == guild_id), None)
             
             if not guild or not (int(guild["permissions"]) & 0x20):
                 return jsonify({"success": False, "error": "No permission to manage this server"}), 403
             
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            if isinstance(autorole_enabled, Exception):
+                return jsonify({"success": False, "error": f"Failed to load settings: {str(autorole_enabled)}"}), 500
+            
             # Check if AutoRole module is enabled
-            if not self.get_cog_status(guild_id, "AutoRole"):
+            if not autorole_enabled:
                 return jsonify({"success": False, "error": "AutoRole module is disabled"}), 400
             
             # Save AutoRole settings
             try:
-                data = request.get_json()
-                role_id = data.get("roleId")
-                
-                autorole_settings = load_autorole_settings()
-                
-                if role_id:
-                    # Verify the role exists in the server
-                    roles_response = requests.get(
-                        f"https://discord.com/api/guilds/{guild_id}/roles",
-                        headers={"Authorization": f"Bot {Token}"}
-                    )
-                    
-                    if roles_response.status_code == 200:
-                        roles = roles_response.json()
-                        role_exists = any(r["id"] == role_id for r in roles)
+                roles_result = None
+                if settings:
+                    roles_result, = gather(lambda: self.discord.guild_roles(guild_id),
+                                           timeout=REQUEST_DEADLINE, return_exceptions=True)
+                if settings and not isinstance(roles_result, Exception):
+                    # Verify the roles exist in the server and can be assigned
+                    if roles_result.ok:
+                        role_index = self.role_indexes.get(guild_id, roles_result.data)
+                        missing = [r for r in settings["roles"] if r not in role_index.by_id]
                         
-                        if not role_exists:
-                            return jsonify({"success": False, "error": "Selected role does not exist in this server"}), 400
-                    
-                    autorole_settings[guild_id] = role_id
-                else:
-                    # Remove setting if role_id is empty
-                    if guild_id in autorole_settings:
-                        del autorole_settings[guild_id]
+                        if missing:
+                            return jsonify({"success": False, "error": "Selected role does not exist in this server", "missing": missing}), 400
                 
-                save_autorole_settings(autorole_settings)
-                
-                # Reload settings in autorole cog if it's loaded
-                for cog_name, cog in self.bot.cogs.items():
-                    if cog_name == "AutoRole" and hasattr(cog, "reload_settings"):
-                        cog.reload_settings()
-                        break
+                # No roles removes the setting. The bot process picks the change up
+                # through its settings watcher, rewrites data/autorole.json and reloads the cog
+                result = self.set_autorole(guild_id, settings, expected_version=expected_version, actor=audit_actor(user))
+                if result.get("conflict"):
+                    return precondition_failed(result["version"], {
+                        "success": False,
+                        "error": "AutoRole was changed by someone else in the meantime. Reload the page to see the current setting.",
+                        "settings": result["settings"]
+                    })
                 
-                return jsonify({"success": True, "message": "AutoRole settings saved successfully"})
+                response = jsonify({"success": True, "message": "AutoRole settings saved successfully"})
+                response.headers["ETag"] = etag(result["version"])
+                return response
             except Exception as e:
                 return jsonify({"success": False, "error": f"Failed to save settings: {str(e)}"}), 500
 
+        @app.route("/api/autorole/roles/<guild_id>")
+        def autorole_role_search(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"error": "No access token"}), 401
+            
+            user_guilds_result, = gather(lambda: self.discord.user_guilds(access_token),
+                                         timeout=REQUEST_DEADLINE, return_exceptions=True)
+            if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                return jsonify({"error": "Failed to fetch guilds"}), 403
+            guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+            if not guild or not (int(guild["permissions"]) & 0x20):
+                return jsonify({"error": "No permission to manage this server"}), 403
+            # The roles come from the bot token, so only ask once the permission check has passed
+            roles_result, = gather(lambda: self.discord.guild_roles(guild_id),
+                                   timeout=REQUEST_DEADLINE, return_exceptions=True)
+            if isinstance(roles_result, Exception) or not roles_result.ok:
+                return jsonify({"error": "Failed to fetch roles"}), 502
+            
+            try:
+                limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+            except ValueError:
+                return jsonify({"error": "limit must be a number"}), 400
+            
+            role_index = self.role_indexes.get(guild_id, roles_result.data)
+            matches = role_index.search(request.args.get("q", ""), limit)
+            return jsonify({"total": len(role_index), "roles": [role_json(role) for role in matches]})
+
         @app.route("/api/toggle-cog/<guild_id>/<cog_name>", methods=["POST"])
         def toggle_cog(guild_id, cog_name):
             user = session.get("user")
@@ -2420,38 +3485,1684 @@ class ModwayDashboard(commands.Cog):
             if not access_token:
                 return jsonify({"error": "No access token"}), 401
             
-            user_guilds_response = requests.get(
-                "https://discord.com/api/users/@me/guilds",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
+            user_guilds_result = self.discord.user_guilds(access_token)
             
-            if user_guilds_response.status_code != 200:
+            if not user_guilds_result.ok:
                 return jsonify({"error": "Failed to fetch guilds"}), 403
             
-            user_guilds = user_guilds_response.json()
+            user_guilds = user_guilds_result.data
             guild = next((g for g in user_guilds if g["id"] == guild_id), None)
             
             if not guild or not (int(guild["permissions"]) & 0x20):  # Manage Server permission
                 return jsonify({"error": "No permission to manage this server"}), 403
             
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
             if cog_name not in AVAILABLE_COGS:
                 return jsonify({"error": "Invalid cog name"}), 400
             
-            # Toggle the cog status
-            current_status = self.get_cog_status(guild_id, cog_name)
-            new_status = not current_status
-            self.set_cog_status(guild_id, cog_name, new_status)
+            try:
+                expected_version = if_match_version()
+            except ValueError:
+                return jsonify({"error": "Malformed If-Match header"}), 400
+            
+            # Read and flip happen in one store transaction, so concurrent toggles can't cancel out
+            result = self.toggle_cog_status(guild_id, cog_name, expected_version=expected_version,
+                                            actor=audit_actor(user))
+            if result.get("conflict"):
+                return precondition_failed(result["version"], {
+                    "success": False,
+                    "error": "This server's settings were changed by someone else in the meantime. Reloading to show the current state.",
+                    "cog_name": cog_name,
+                    "enabled": result["enabled"]
+                })
+            new_status = result["enabled"]
             
-            return jsonify({
+            response = jsonify({
                 "success": True,
                 "cog_name": cog_name,
                 "enabled": new_status,
                 "message": f"Successfully {'enabled' if new_status else 'disabled'} {AVAILABLE_COGS[cog_name]['name']}"
             })
+            response.headers["ETag"] = etag(result["version"])
+            return response
 
-        port = int(os.environ.get("PORT", 5379))
-        thread = threading.Thread(target=lambda: app.run(host="0.0.0.0", port=port))
-        thread.start()
+        def owner_required():
+            user = session.get("user")
+            if not user:
+                return jsonify({"error": "Not authenticated"}), 401
+            if not self.is_owner(user.get("id")):
+                return jsonify({"error": "Only bot owners can view this"}), 403
+            return None
+
+        @app.route("/owner/overview")
+        def owner_overview():
+            user = session.get("user")
+            if not user:
+                return redirect("/discord-login")
+            if not self.is_owner(user.get("id")):
+                return "❌ Only bot owners can view this page."
+            
+            self.sync_cog_index()
+            counts = self.cog_index.counts()
+            rows = ""
+            for cog_key, cog_info in AVAILABLE_COGS.items():
+                enabled = counts[cog_key]["enabled"]
+                disabled = counts[cog_key]["disabled"]
+                total = enabled + disabled
+                share = round(enabled / total * 100) if total else 0
+                rows += f"""
+                    <tr>
+                        <td>{cog_info['icon']} {cog_info['name']}</td>
+                        <td>{cog_info['category']}</td>
+                        <td><a href="/api/owner/cogs/{cog_key}?state=enabled">{enabled}</a></td>
+                        <td><a href="/api/owner/cogs/{cog_key}?state=disabled">{disabled}</a></td>
+                        <td>
+                            <div class="bar"><div class="bar-fill" style="width: {share}%; background: {cog_info['color']}"></div></div>
+                        </td>
+                    </tr>
+                """
+            
+            return f"""
+            <!DOCTYPE html>
+            <html lang="en">
+              <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>Modway Dashboard - Owner Overview</title>
+                <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+                <style>
+                  body {{
+                    font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
+                    background: #0d1117;
+                    color: #ffffff;
+                    margin: 0;
+                    padding: 40px 20px;
+                  }}
+                  
+                  .container {{
+                    max-width: 1000px;
+                    margin: 0 auto;
+                  }}
+                  
+                  h1 {{
+                    font-size: 2.5em;
+                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                    -webkit-background-clip: text;
+                    -webkit-text-fill-color: transparent;
+                    background-clip: text;
+                  }}
+                  
+                  .subtitle {{
+                    color: #8b949e;
+                    margin-bottom: 30px;
+                  }}
+                  
+                  table {{
+                    width: 100%;
+                    border-collapse: collapse;
+                    background: #161b22;
+                    border: 1px solid #30363d;
+                    border-radius: 12px;
+                    overflow: hidden;
+                  }}
+                  
+                  th, td {{
+                    padding: 14px 18px;
+                    text-align: left;
+                    border-bottom: 1px solid #30363d;
+                  }}
+                  
+                  th {{
+                    color: #8b949e;
+                    font-weight: 600;
+                  }}
+                  
+                  a {{
+                    color: #5865f2;
+                    text-decoration: none;
+                  }}
+                  
+                  .bar {{
+                    width: 160px;
+                    height: 8px;
+                    background: #30363d;
+                    border-radius: 4px;
+                    overflow: hidden;
+                  }}
+                  
+                  .bar-fill {{
+                    height: 100%;
+                  }}
+                </style>
+              </head>
+              <body>
+                <div class="container">
+                    <h1>Owner Overview</h1>
+                    <p class="subtitle">Module usage across {len(self.cog_index.guilds)} guilds · <a href="/">← Back to Dashboard</a></p>
+                    <table>
+                        <tr><th>Module</th><th>Category</th><th>Enabled</th><th>Disabled</th><th>Adoption</th></tr>
+                        {rows}
+                    </table>
+                    
+                    <h2>Background jobs</h2>
+                    <p class="subtitle">
+                        <a href="/api/owner/settings-export">Export all settings</a> ·
+                        <label><a>Import settings bundle</a> <input type="file" accept=".gz" hidden onchange="importAll(this)"></label>
+                    </p>
+                    <p class="subtitle">
+                        <button onclick="purgeGuilds(true)">Preview settings purge</button>
+                        <button onclick="purgeGuilds(false)">Remove settings of servers the bot left</button>
+                    </p>
+                    <table id="jobs">
+                        <tr><th>Job</th><th>Server</th><th>State</th><th>Progress</th><th>Outcome</th></tr>
+                    </table>
+                </div>
+                
+                <script>
+                  async function loadJobs() {{
+                    const response = await fetch('/api/owner/jobs');
+                    if (!response.ok) return;
+                    const result = await response.json();
+                    const table = document.getElementById('jobs');
+                    while (table.rows.length > 1) table.deleteRow(1);
+                    result.jobs.forEach(job => {{
+                      const row = table.insertRow();
+                      const outcome = job.error || (job.result ? JSON.stringify(job.result) : '');
+                      const progress = job.total !== null ? `${{job.done}} / ${{job.total}}` : '';
+                      [job.label, job.guild_id || '–', job.state, progress, outcome].forEach(text => {{
+                        row.insertCell().textContent = text;
+                      }});
+                      if (job.state === 'queued' || job.state === 'running') {{
+                        const cancel = document.createElement('a');
+                        cancel.href = '#';
+                        cancel.textContent = ' cancel';
+                        cancel.onclick = async (event) => {{
+                          event.preventDefault();
+                          await fetch(`/api/owner/jobs/${{job.id}}/cancel`, {{ method: 'POST' }});
+                          loadJobs();
+                        }};
+                        row.cells[2].appendChild(cancel);
+                      }}
+                    }});
+                    const active = result.jobs.some(job => job.state === 'queued' || job.state === 'running');
+                    setTimeout(loadJobs, active ? 2000 : 15000);
+                  }}
+                  
+                  async function importAll(input) {{
+                    const file = input.files[0];
+                    input.value = '';
+                    if (!file || !confirm(`Write every server's settings in ${{file.name}} to the store?`)) return;
+                    const response = await fetch('/api/owner/settings-import', {{ method: 'POST', body: file }});
+                    const result = await response.json();
+                    if (!result.success) alert(result.error || 'Import failed');
+                    loadJobs();
+                  }}
+                  
+                  async function purgeGuilds(dryRun) {{
+                    if (!dryRun && !confirm('Delete the stored settings of every server the bot is no longer in?')) return;
+                    const response = await fetch('/api/owner/jobs/purge-guilds', {{
+                      method: 'POST',
+                      headers: {{ 'Content-Type': 'application/json' }},
+                      body: JSON.stringify({{ dryRun: dryRun }})
+                    }});
+                    const result = await response.json();
+                    if (!result.success) alert(result.error || 'An error occurred');
+                    loadJobs();
+                  }}
+                  
+                  loadJobs();
+                </script>
+              </body>
+            </html>
+            """
+
+        @app.route("/api/owner/cogs")
+        def owner_cog_counts():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            self.sync_cog_index()
+            return jsonify({"guilds": len(self.cog_index.guilds), "cogs": self.cog_index.counts()})
+
+        @app.route("/api/owner/cogs/<cog_name>")
+        def owner_cog_guilds(cog_name):
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            if cog_name not in AVAILABLE_COGS:
+                return jsonify({"error": "Invalid cog name"}), 400
+            
+            state = request.args.get("state", "enabled")
+            if state not in ("enabled", "disabled"):
+                return jsonify({"error": "state must be enabled or disabled"}), 400
+            try:
+                after = int(request.args["after"]) if request.args.get("after") else None
+                limit = min(max(int(request.args.get("limit", 100)), 1), 1000)
+            except ValueError:
+                return jsonify({"error": "after and limit must be numbers"}), 400
+            
+            self.sync_cog_index()
+            total, guild_ids = self.cog_index.page(cog_name, state == "enabled", after, limit)
+            return jsonify({
+                "cog": cog_name,
+                "state": state,
+                "count": total,
+                "guilds": guild_ids,
+                # Pass as ?after= to get the next page
+                "next": guild_ids[-1] if len(guild_ids) == limit else None
+            })
+
+        def job_json(job):
+            return dict(job, label=JOB_KINDS.get(job["kind"], job["kind"]))
+        
+        def manage_permission(access_token, guild_id):
+            """Error response unless the user may manage the guild, else None"""
+            user_guilds_result = self.discord.user_guilds(access_token)
+            if not user_guilds_result.ok:
+                return jsonify({"success": False, "error": "Failed to fetch guilds"}), 403
+            guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+            if not guild or not (int(guild["permissions"]) & 0x20):
+                return jsonify({"success": False, "error": "No permission to manage this server"}), 403
+            return None
+        
+        @app.route("/api/jobs/<guild_id>")
+        def guild_jobs(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = manage_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            return jsonify({"success": True, "jobs": [job_json(job) for job in self.jobs.list(guild_id)]})
+        
+        @app.route("/api/jobs/<guild_id>/<job_id>/cancel", methods=["POST"])
+        def cancel_guild_job(guild_id, job_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = manage_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            job = self.jobs.get(job_id)
+            if job is None or job["guild_id"] != guild_id:
+                return jsonify({"success": False, "error": "Job not found"}), 404
+            job = self.jobs.cancel(job_id)
+            self.audit.append(guild_id, "cancel_job", audit_actor(user), job=job_id, kind=job["kind"])
+            return jsonify({"success": True, "job": job_json(job)})
+        
+        @app.route("/api/autorole/backfill/<guild_id>", methods=["POST"])
+        def autorole_backfill(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = manage_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            if not self.get_cog_status(guild_id, "AutoRole"):
+                return jsonify({"success": False, "error": "AutoRole module is disabled"}), 400
+            if normalize_autorole(self.store.get("autorole", guild_id)) is None:
+                return jsonify({"success": False, "error": "Save at least one AutoRole role first"}), 400
+            
+            try:
+                # The bot process owning the guild picks it up; this request only queues it
+                job = self.jobs.submit("autorole.backfill", guild_id=guild_id, created_by=audit_actor(user), unique=True)
+            except AlreadyQueued as e:
+                return jsonify({"success": False, "error": "Existing members are already being processed",
+                                "job": job_json(e.job)}), 409
+            self.audit.append(guild_id, "autorole_backfill", audit_actor(user), job=job["id"])
+            return jsonify({"success": True, "job": job_json(job)}), 202
+        
+        @app.route("/api/owner/jobs")
+        def owner_jobs():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            return jsonify({"stats": self.jobs.stats(), "jobs": [job_json(job) for job in self.jobs.list(limit=50)]})
+        
+        @app.route("/api/owner/jobs/purge-guilds", methods=["POST"])
+        def owner_purge_guilds():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            data = request.get_json(silent=True) or {}
+            try:
+                job = self.jobs.submit("dashboard.purge_guilds", {"dry_run": bool(data.get("dryRun"))},
+                                       created_by=audit_actor(session["user"]), unique=True)
+            except AlreadyQueued as e:
+                return jsonify({"error": "A purge is already queued or running", "job": job_json(e.job)}), 409
+            return jsonify({"success": True, "job": job_json(job)}), 202
+        
+        @app.route("/api/owner/jobs/<job_id>/cancel", methods=["POST"])
+        def owner_cancel_job(job_id):
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            job = self.jobs.cancel(job_id)
+            if job is None:
+                return jsonify({"error": "Job not found"}), 404
+            return jsonify({"success": True, "job": job_json(job)})
+        
+        def save_upload():
+            """Stream the request body to a file for an import job; returns (path, None) or (None, error response)"""
+            os.makedirs(IMPORTS_DIR, exist_ok=True)
+            path = os.path.join(IMPORTS_DIR, f"{os.urandom(8).hex()}.jsonl.gz")
+            size = 0
+            error = None
+            with open(path, "wb") as f:
+                while True:
+                    chunk = request.stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    if not size and not chunk.startswith(b"\x1f\x8b"):
+                        error = (jsonify({"success": False, "error": "Upload a .jsonl.gz settings bundle"}), 400)
+                        break
+                    size += len(chunk)
+                    if size > MAX_IMPORT_BYTES:
+                        error = (jsonify({"success": False, "error": "The bundle is too large"}), 413)
+                        break
+                    f.write(chunk)
+            if error is None and not size:
+                error = (jsonify({"success": False, "error": "The upload is empty"}), 400)
+            if error is not None:
+                os.remove(path)
+                return None, error
+            return path, None
+        
+        def submit_import(path, guild_id, user):
+            """Queue an import job for a saved upload; 202 with the job, or 409 if one is already queued"""
+            try:
+                job = self.jobs.submit("dashboard.import_settings",
+                                       {"path": path, "dry_run": request.args.get("dry_run") == "1"},
+                                       guild_id=guild_id, created_by=audit_actor(user), unique=True)
+            except AlreadyQueued as e:
+                os.remove(path)
+                return jsonify({"success": False, "error": "An import is already queued or running",
+                                "job": job_json(e.job)}), 409
+            return jsonify({"success": True, "job": job_json(job)}), 202
+        
+        def bundle_response(chunks, name):
+            response = Response(stream_with_context(chunks), mimetype="application/gzip")
+            response.headers["Content-Disposition"] = f'attachment; filename="{name}.jsonl.gz"'
+            return response
+        
+        @app.route("/api/settings-export/<guild_id>")
+        def export_guild_settings(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = manage_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            return bundle_response(self.export_settings(guild_id), f"modway-settings-{guild_id}")
+        
+        @app.route("/api/settings-import/<guild_id>", methods=["POST"])
+        def import_guild_settings(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = manage_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            path, error = save_upload()
+            if error is not None:
+                return error
+            return submit_import(path, guild_id, user)
+        
+        @app.route("/api/owner/settings-export")
+        def export_all_settings():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            return bundle_response(self.export_settings(), f"modway-settings-{time.strftime('%Y%m%d-%H%M%S')}")
+        
+        @app.route("/api/owner/settings-import", methods=["POST"])
+        def import_all_settings():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            path, error = save_upload()
+            if error is not None:
+                return error
+            return submit_import(path, None, session["user"])
+        
+        @app.route("/config/dm/<guild_id>")
+        def dm_config(guild_id):
+            user = session.get("user")
+            if not user:
+                return redirect("/discord-login")
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return redirect("/discord-login")
+            
+            def render():
+                pending = start_fanout(lambda: self.discord.user_guilds(access_token), timeout=REQUEST_DEADLINE)
+                
+                yield f"""
+            <!DOCTYPE html>
+            <html lang="en">
+              <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>DM System</title>
+                <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+                <style>
+                  :root {{
+                    --primary-color: #5865f2;
+                    --background-dark: #0d1117;
+                    --background-card: #161b22;
+                    --text-primary: #ffffff;
+                    --text-secondary: #8b949e;
+                    --border-color: #30363d;
+                    --success-color: #238636;
+                    --warning-color: #f85149;
+                    --gradient-primary: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                  }}
+                  
+                  * {{
+                    margin: 0;
+                    padding: 0;
+                    box-sizing: border-box;
+                  }}
+                  
+                  body {{
+                    font-family: 'Inter', sans-serif;
+                    background: var(--background-dark);
+                    color: var(--text-primary);
+                    min-height: 100vh;
+                    padding: 20px;
+                  }}
+                  
+                  .header {{
+                    display: flex;
+                    align-items: center;
+                    justify-content: space-between;
+                    margin-bottom: 30px;
+                    padding: 20px;
+                    background: var(--background-card);
+                    border-radius: 15px;
+                    border: 1px solid var(--border-color);
+                  }}
+                  
+                  .header-info {{
+                    display: flex;
+                    align-items: center;
+                    gap: 15px;
+                  }}
+                  
+                  .guild-icon {{
+                    width: 50px;
+                    height: 50px;
+                    border-radius: 12px;
+                    border: 2px solid var(--primary-color);
+                  }}
+                  
+                  .header-text h1 {{
+                    font-size: 1.8em;
+                    margin-bottom: 5px;
+                    background: var(--gradient-primary);
+                    -webkit-background-clip: text;
+                    -webkit-text-fill-color: transparent;
+                  }}
+                  
+                  .header-text p {{
+                    color: var(--text-secondary);
+                    font-size: 0.9em;
+                  }}
+                  
+                  .back-btn {{
+                    background: var(--background-dark);
+                    border: 1px solid var(--border-color);
+                    padding: 10px 20px;
+                    border-radius: 10px;
+                    color: var(--text-primary);
+                    text-decoration: none;
+                  }}
+                  
+                  .config-container {{
+                    max-width: 800px;
+                    margin: 0 auto;
+                    display: grid;
+                    gap: 25px;
+                  }}
+                  
+                  .config-section {{
+                    background: var(--background-card);
+                    border: 1px solid var(--border-color);
+                    border-radius: 15px;
+                    padding: 25px;
+                  }}
+                  
+                  .section-title {{
+                    font-size: 1.4em;
+                    font-weight: 600;
+                    margin-bottom: 20px;
+                    padding-bottom: 15px;
+                    border-bottom: 1px solid var(--border-color);
+                  }}
+                  
+                  .form-group {{
+                    margin-bottom: 20px;
+                  }}
+                  
+                  .form-label {{
+                    display: block;
+                    margin-bottom: 8px;
+                    font-weight: 500;
+                  }}
+                  
+                  .form-select {{
+                    width: 100%;
+                    padding: 12px 15px;
+                    background: var(--background-dark);
+                    border: 1px solid var(--border-color);
+                    border-radius: 8px;
+                    color: var(--text-primary);
+                    font-family: inherit;
+                  }}
+                  
+                  textarea.form-select {{
+                    min-height: 140px;
+                    resize: vertical;
+                  }}
+                  
+                  .form-help {{
+                    font-size: 0.85em;
+                    color: var(--text-secondary);
+                    margin-top: 5px;
+                  }}
+                  
+                  .btn {{
+                    padding: 12px 30px;
+                    border-radius: 10px;
+                    font-weight: 600;
+                    border: none;
+                    cursor: pointer;
+                    font-family: inherit;
+                    font-size: 1em;
+                  }}
+                  
+                  .btn-primary {{
+                    background: var(--success-color);
+                    color: white;
+                  }}
+                  
+                  .btn-secondary {{
+                    background: var(--background-dark);
+                    color: var(--text-primary);
+                    border: 1px solid var(--border-color);
+                    padding: 6px 14px;
+                    font-size: 0.85em;
+                  }}
+                  
+                  .status-message {{
+                    padding: 15px;
+                    border-radius: 10px;
+                    display: none;
+                  }}
+                  
+                  .status-message.success {{
+                    background: rgba(35, 134, 54, 0.2);
+                    border: 1px solid rgba(35, 134, 54, 0.3);
+                    color: #3fb950;
+                  }}
+                  
+                  .status-message.error {{
+                    background: rgba(218, 55, 61, 0.2);
+                    border: 1px solid rgba(218, 55, 61, 0.3);
+                    color: #ff7b82;
+                  }}
+                  
+                  .dm-job {{
+                    padding: 15px 0;
+                    border-bottom: 1px solid var(--border-color);
+                  }}
+                  
+                  .dm-job-header {{
+                    display: flex;
+                    justify-content: space-between;
+                    align-items: center;
+                    gap: 10px;
+                    margin-bottom: 8px;
+                  }}
+                  
+                  .dm-progress {{
+                    height: 8px;
+                    background: var(--background-dark);
+                    border-radius: 4px;
+                    overflow: hidden;
+                  }}
+                  
+                  .dm-progress-bar {{
+                    height: 100%;
+                    background: var(--gradient-primary);
+                    transition: width 0.5s ease;
+                  }}
+                  
+                  .dm-stats {{
+                    margin-top: 6px;
+                    font-size: 0.85em;
+                    color: var(--text-secondary);
+                  }}
+                </style>
+              </head>
+              <body>
+                """
+                
+                user_guilds_result = pending.result(0, return_exceptions=True)
+                if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                    yield page_error("❌ Failed to fetch your servers.")
+                    return
+                
+                guild_info = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+                if not guild_info or not (int(guild_info["permissions"]) & 0x20):
+                    yield page_error("❌ No permission to manage this server.")
+                    return
+                # The roles come from the bot token, so only ask once the permission check has passed
+                roles_pending = start_fanout(lambda: self.discord.guild_roles(guild_id), timeout=REQUEST_DEADLINE)
+                
+                guild_name = guild_info['name']
+                guild_icon = icon_url("icons", guild_info['id'], guild_info['icon'], 50)
+                
+                try:
+                    roles_result = roles_pending.result(0)
+                    role_index = self.role_indexes.get(guild_id, roles_result.data if roles_result.ok else [])
+                except Exception:
+                    role_index = self.role_indexes.get(guild_id, [])
+                role_options = "".join(
+                    f'<option value="{role["id"]}">{html.escape(role["name"])}</option>' for role in role_index.roles
+                )
+                
+                yield set_title_script(f"DM System - {guild_name}")
+                yield stale_notice(user_guilds_result)
+                yield f"""
+                <div class="header">
+                  <div class="header-info">
+                    <img src="{guild_icon}" class="guild-icon" loading="lazy">
+                    <div class="header-text">
+                      <h1>💌 DM System</h1>
+                      <p>Send an announcement to the members of {guild_name} by direct message</p>
+                    </div>
+                  </div>
+                  <a href="/manage/{guild_id}" class="back-btn">← Back to Dashboard</a>
+                </div>
+                
+                <div class="config-container">
+                  <div id="status-message" class="status-message"></div>
+                  
+                  <div class="config-section">
+                    <div class="section-title">📣 New Mass DM</div>
+                    <div class="form-group">
+                      <label class="form-label" for="dm_content">Message:</label>
+                      <textarea class="form-select" id="dm_content" maxlength="{MAX_DM_CONTENT}"></textarea>
+                      <div class="form-help">{{user}} is replaced by a mention of the member, {{server}} by the server name. Members with closed DMs are skipped.</div>
+                    </div>
+                    <div class="form-group">
+                      <label class="form-label" for="dm_role">Recipients:</label>
+                      <select class="form-select" id="dm_role">
+                        <option value="">All members</option>
+                        {role_options}
+                      </select>
+                    </div>
+                    <button id="send_button" class="btn btn-primary">📨 Send</button>
+                  </div>
+                  
+                  <div class="config-section">
+                    <div class="section-title">📊 Jobs</div>
+                    <div id="dm_jobs"><div class="form-help">Loading...</div></div>
+                  </div>
+                </div>
+                
+                <script>
+                  function formatEta(seconds) {{
+                    if (seconds === null) return '–';
+                    if (seconds < 60) return `${{seconds}}s`;
+                    if (seconds < 3600) return `${{Math.floor(seconds / 60)}}m ${{seconds % 60}}s`;
+                    return `${{Math.floor(seconds / 3600)}}h ${{Math.floor(seconds % 3600 / 60)}}m`;
+                  }}
+                  
+                  function showStatus(text, ok) {{
+                    const statusMessage = document.getElementById('status-message');
+                    statusMessage.textContent = text;
+                    statusMessage.className = 'status-message ' + (ok ? 'success' : 'error');
+                    statusMessage.style.display = 'block';
+                  }}
+                  
+                  async function jobAction(jobId, action) {{
+                    if (action === 'cancel' && !confirm('Cancel this mass DM? Members not yet messaged will not receive it.')) return;
+                    const response = await fetch(`/api/dm/{guild_id}/jobs/${{jobId}}/${{action}}`, {{ method: 'POST' }});
+                    const result = await response.json();
+                    if (!result.success) showStatus('❌ ' + (result.error || 'An error occurred'), false);
+                    loadJobs();
+                  }}
+                  
+                  function renderJob(job) {{
+                    const row = document.createElement('div');
+                    row.className = 'dm-job';
+                    const percent = job.total ? Math.round(job.done / job.total * 100) : 100;
+                    const header = document.createElement('div');
+                    header.className = 'dm-job-header';
+                    const title = document.createElement('span');
+                    title.textContent = `${{new Date(job.created_at * 1000).toLocaleString()}} · ${{job.state}} · ${{percent}}%`;
+                    header.appendChild(title);
+                    const actions = document.createElement('span');
+                    const available = {{running: ['pause', 'cancel'], queued: ['pause', 'cancel'], paused: ['resume', 'cancel']}}[job.state] || [];
+                    available.forEach(action => {{
+                      const button = document.createElement('button');
+                      button.className = 'btn btn-secondary';
+                      button.textContent = action;
+                      button.onclick = () => jobAction(job.id, action);
+                      actions.appendChild(button);
+                    }});
+                    header.appendChild(actions);
+                    row.appendChild(header);
+                    row.insertAdjacentHTML('beforeend', `<div class="dm-progress"><div class="dm-progress-bar" style="width: ${{percent}}%"></div></div>`);
+                    const stats = document.createElement('div');
+                    stats.className = 'dm-stats';
+                    stats.textContent = `${{job.sent}} sent · ${{job.closed}} closed DMs · ${{job.gone}} left · ${{job.failed}} failed · ` +
+                      `${{job.remaining}} remaining · ${{job.per_second}}/s · ETA ${{formatEta(job.eta_s)}}`;
+                    row.appendChild(stats);
+                    return row;
+                  }}
+                  
+                  async function loadJobs() {{
+                    const response = await fetch('/api/dm/{guild_id}/jobs');
+                    const result = await response.json();
+                    const container = document.getElementById('dm_jobs');
+                    container.innerHTML = '';
+                    if (!response.ok) {{
+                      container.innerHTML = '<div class="form-help"></div>';
+                      container.firstChild.textContent = result.error || 'Failed to load jobs';
+                      return;
+                    }}
+                    if (!result.jobs.length) {{
+                      container.innerHTML = '<div class="form-help">No mass DMs sent yet.</div>';
+                    }}
+                    result.jobs.forEach(job => container.appendChild(renderJob(job)));
+                    const active = result.jobs.some(job => job.state === 'running' || job.state === 'queued');
+                    setTimeout(loadJobs, active ? 2000 : 15000);
+                  }}
+                  
+                  document.getElementById('send_button').addEventListener('click', async function() {{
+                    const content = document.getElementById('dm_content').value.trim();
+                    if (!content) {{
+                      showStatus('❌ Enter a message first', false);
+                      return;
+                    }}
+                    if (!confirm('Send this message to every selected member?')) return;
+                    this.disabled = true;
+                    try {{
+                      const response = await fetch('/api/dm/{guild_id}/jobs', {{
+                        method: 'POST',
+                        headers: {{ 'Content-Type': 'application/json' }},
+                        body: JSON.stringify({{ content: content, roleId: document.getElementById('dm_role').value || null }})
+                      }});
+                      const result = await response.json();
+                      if (result.success) {{
+                        showStatus(`✅ Sending to ${{result.job.total}} members`, true);
+                        document.getElementById('dm_content').value = '';
+                      }} else {{
+                        showStatus('❌ ' + (result.error || 'An error occurred'), false);
+                      }}
+                    }} catch (error) {{
+                      showStatus('❌ An error occurred while starting the mass DM', false);
+                    }}
+                    this.disabled = false;
+                    loadJobs();
+                  }});
+                  
+                  loadJobs();
+                </script>
+              </body>
+            </html>
+            """
+            
+            def page_error(message):
+                return f"""
+                <div class="config-container">
+                  <div class="status-message error" style="display: block;">{message}</div>
+                </div>
+              </body>
+            </html>
+            """
+            
+            return stream_page(render())
+        
+        def dm_dispatcher():
+            """Mass-DM dispatcher of the DM cog in this process, or None"""
+            cog = self.bot.cogs.get("DM") if self.bot is not None else None
+            return getattr(cog, "dispatcher", None)
+        
+        def run_on_bot_loop(func, *args, timeout=REQUEST_DEADLINE):
+            """Call func (plain or async) on the bot's event loop and wait for the result"""
+            async def call():
+                result = func(*args)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                return result
+            return asyncio.run_coroutine_threadsafe(call(), self.loop).result(timeout)
+        
+        def dm_permission(access_token, guild_id):
+            """Error response unless the user may manage the guild, else None"""
+            user_guilds_result = self.discord.user_guilds(access_token)
+            if not user_guilds_result.ok:
+                return jsonify({"success": False, "error": "Failed to fetch guilds"}), 403
+            guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+            if not guild or not (int(guild["permissions"]) & 0x20):
+                return jsonify({"success": False, "error": "No permission to manage this server"}), 403
+            if dm_dispatcher() is None:
+                return jsonify({"success": False, "error": "The DM System is not running in this process"}), 503
+            return None
+        
+        @app.route("/api/dm/<guild_id>/jobs", methods=["GET", "POST"])
+        def dm_jobs(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            denied = dm_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            dispatcher = dm_dispatcher()
+            
+            if request.method == "GET":
+                return jsonify({"success": True, "jobs": dispatcher.progress(guild_id)})
+            
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            if not self.get_cog_status(guild_id, "DM"):
+                return jsonify({"success": False, "error": "DM System module is disabled"}), 400
+            
+            data = request.get_json(silent=True) or {}
+            content = (data.get("content") or "").strip()
+            role_id = data.get("roleId")
+            try:
+                # Listing a large guild's members can take a while on first use
+                job = run_on_bot_loop(self.bot.cogs["DM"].start_mass_dm, guild_id, content, role_id, audit_actor(user),
+                                      timeout=60)
+            except JobConflict as e:
+                return jsonify({"success": False, "error": str(e)}), 409
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            except Exception as e:
+                return jsonify({"success": False, "error": f"Failed to start mass DM: {str(e)}"}), 500
+            
+            self.audit.append(guild_id, "mass_dm", audit_actor(user), job=job["id"], recipients=job["total"],
+                              role=role_id, content=content)
+            return jsonify({"success": True, "job": job}), 202
+        
+        @app.route("/api/dm/<guild_id>/jobs/<job_id>/<action>", methods=["POST"])
+        def dm_job_action(guild_id, job_id, action):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            if action not in ("pause", "resume", "cancel"):
+                return jsonify({"success": False, "error": "Unknown action"}), 404
+            
+            denied = dm_permission(access_token, guild_id)
+            if denied is not None:
+                return denied
+            dispatcher = dm_dispatcher()
+            
+            job = dispatcher.jobs.get(job_id)
+            if job is None or job.guild_id != guild_id:
+                return jsonify({"success": False, "error": "Job not found"}), 404
+            if not run_on_bot_loop(getattr(dispatcher, action), job_id):
+                return jsonify({"success": False, "error": f"Job is {job.state} and can't be {action}d"}), 409
+            
+            if action == "cancel":
+                self.audit.append(guild_id, "mass_dm_cancel", audit_actor(user), job=job_id)
+            return jsonify({"success": True, "job": job.progress()})
+        
+        @app.route("/api/dm/metrics")
+        def dm_metrics():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            dispatcher = dm_dispatcher()
+            if dispatcher is None:
+                return jsonify({"error": "The DM System is not loaded in this process"}), 404
+            return jsonify(dispatcher.metrics())
+
+        CHANNEL_PREFIXES = {0: "#", 2: "🔊 ", 4: "📁 ", 5: "📢 ", 13: "🎙️ ", 15: "💬 "}
+        
+        def settings_module(module):
+            """(cog key, schema) of the module with a settings schema at this URL name, or None"""
+            for cog_key, cog_info in AVAILABLE_COGS.items():
+                if cog_info["module"] == module and "settings" in cog_info:
+                    return cog_key, cog_info["settings"]
+            return None
+        
+        def id_options(items, selected, label):
+            """<option>s for a role or channel picker; a saved ID that no longer exists stays selectable"""
+            selected = set(selected)
+            options = [
+                f'<option value="{item["id"]}"{" selected" if str(item["id"]) in selected else ""}>{html.escape(label(item))}</option>'
+                for item in items
+            ]
+            known = {str(item["id"]) for item in items}
+            options += [f'<option value="{gone}" selected>Unknown ({gone})</option>' for gone in sorted(selected - known)]
+            return "".join(options)
+        
+        def settings_form(description, values, roles, channels, prefix=""):
+            """Form fields for a schema description, each input tagged with its dotted path and type"""
+            role_label = lambda role: role["name"]
+            channel_label = lambda channel: CHANNEL_PREFIXES.get(channel.get("type"), "") + channel["name"]
+            parts = []
+            for name, field in description.items():
+                path = prefix + name
+                kind = field["type"]
+                value = values.get(name, field["default"])
+                label = html.escape(field["label"])
+                attrs = f'id="f_{path}" data-path="{path}" data-type="{kind}"'
+                if kind == "group":
+                    parts.append(f"""
+                    <fieldset class="form-group settings-group">
+                      <legend class="form-label">{label}</legend>
+                      {settings_form(field["fields"], value or {}, roles, channels, path + ".")}
+                    </fieldset>""")
+                    continue
+                if kind == "toggle":
+                    control = f'<label class="form-check"><input type="checkbox" {attrs}{" checked" if value else ""}> {label}</label>'
+                else:
+                    if kind == "number":
+                        bounds = "".join(f' {key}="{field[key]}"' for key in ("min", "max") if field[key] is not None)
+                        control = f'<input type="number" class="form-select" {attrs}{bounds} step="1" value="{value}">'
+                    elif kind == "choice":
+                        options = "".join(
+                            f'<option value="{html.escape(key)}"{" selected" if key == value else ""}>{html.escape(text)}</option>'
+                            for key, text in field["choices"].items()
+                        )
+                        control = f'<select class="form-select" {attrs}>{options}</select>'
+                    elif kind == "text" and field["multiline"]:
+                        control = f'<textarea class="form-select" {attrs} maxlength="{field["max_length"]}">{html.escape(value)}</textarea>'
+                    elif kind == "text":
+                        control = f'<input type="text" class="form-select" {attrs} maxlength="{field["max_length"]}" value="{html.escape(value)}">'
+                    elif kind == "text_list":
+                        control = f'<textarea class="form-select" {attrs}>{html.escape(chr(10).join(value))}</textarea>'
+                    elif kind == "color":
+                        control = f'<input type="color" class="form-color" {attrs} value="{html.escape(value)}">'
+                    elif kind in ("role", "channel"):
+                        items, item_label = (roles, role_label) if kind == "role" else (channels, channel_label)
+                        control = (f'<select class="form-select" {attrs}><option value="">None</option>'
+                                   f'{id_options(items, [value] if value else [], item_label)}</select>')
+                    else:
+                        items, item_label = (roles, role_label) if kind == "role_list" else (channels, channel_label)
+                        control = f'<select class="form-select" {attrs} multiple size="6">{id_options(items, value, item_label)}</select>'
+                    control = f'<label class="form-label" for="f_{path}">{label}</label>{control}'
+                help_text = f'<div class="form-help">{html.escape(field["help"])}</div>' if field["help"] else ""
+                parts.append(f"""
+                    <div class="form-group">
+                      {control}
+                      {help_text}
+                      <div class="field-error" data-error-for="{path}"></div>
+                    </div>""")
+            return "".join(parts)
+        
+        @app.route("/config/<module>/<guild_id>")
+        def module_config(module, guild_id):
+            user = session.get("user")
+            if not user:
+                return redirect("/discord-login")
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return redirect("/discord-login")
+            
+            found = settings_module(module)
+            if found is None:
+                return "❌ This module has no settings page.", 404
+            cog_key, schema = found
+            cog_info = AVAILABLE_COGS[cog_key]
+            
+            def render():
+                pending = start_fanout(
+                    lambda: self.discord.user_guilds(access_token),
+                    lambda: self.store.get_versioned(schema.namespace, guild_id),
+                    timeout=REQUEST_DEADLINE
+                )
+                
+                yield f"""
+            <!DOCTYPE html>
+            <html lang="en">
+              <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>{cog_info['name']}</title>
+                <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+                <style>
+                  :root {{
+                    --primary-color: #5865f2;
+                    --background-dark: #0d1117;
+                    --background-card: #161b22;
+                    --text-primary: #ffffff;
+                    --text-secondary: #8b949e;
+                    --border-color: #30363d;
+                    --success-color: #238636;
+                    --warning-color: #f85149;
+                    --gradient-primary: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                  }}
+                  
+                  * {{
+                    margin: 0;
+                    padding: 0;
+                    box-sizing: border-box;
+                  }}
+                  
+                  body {{
+                    font-family: 'Inter', sans-serif;
+                    background: var(--background-dark);
+                    color: var(--text-primary);
+                    min-height: 100vh;
+                    padding: 20px;
+                  }}
+                  
+                  .header {{
+                    display: flex;
+                    align-items: center;
+                    justify-content: space-between;
+                    margin-bottom: 30px;
+                    padding: 20px;
+                    background: var(--background-card);
+                    border-radius: 15px;
+                    border: 1px solid var(--border-color);
+                  }}
+                  
+                  .header-info {{
+                    display: flex;
+                    align-items: center;
+                    gap: 15px;
+                  }}
+                  
+                  .guild-icon {{
+                    width: 50px;
+                    height: 50px;
+                    border-radius: 12px;
+                    border: 2px solid var(--primary-color);
+                  }}
+                  
+                  .header-text h1 {{
+                    font-size: 1.8em;
+                    margin-bottom: 5px;
+                    background: var(--gradient-primary);
+                    -webkit-background-clip: text;
+                    -webkit-text-fill-color: transparent;
+                  }}
+                  
+                  .header-text p {{
+                    color: var(--text-secondary);
+                    font-size: 0.9em;
+                  }}
+                  
+                  .back-btn {{
+                    background: var(--background-dark);
+                    border: 1px solid var(--border-color);
+                    padding: 10px 20px;
+                    border-radius: 10px;
+                    color: var(--text-primary);
+                    text-decoration: none;
+                  }}
+                  
+                  .config-container {{
+                    max-width: 800px;
+                    margin: 0 auto;
+                    display: grid;
+                    gap: 25px;
+                  }}
+                  
+                  .config-section {{
+                    background: var(--background-card);
+                    border: 1px solid var(--border-color);
+                    border-radius: 15px;
+                    padding: 25px;
+                  }}
+                  
+                  .form-group {{
+                    margin-bottom: 20px;
+                  }}
+                  
+                  .settings-group {{
+                    border: 1px solid var(--border-color);
+                    border-radius: 10px;
+                    padding: 15px 20px 0;
+                  }}
+                  
+                  .form-label {{
+                    display: block;
+                    margin-bottom: 8px;
+                    font-weight: 500;
+                  }}
+                  
+                  .form-check {{
+                    display: flex;
+                    align-items: center;
+                    gap: 10px;
+                    font-weight: 500;
+                    cursor: pointer;
+                  }}
+                  
+                  .form-select {{
+                    width: 100%;
+                    padding: 12px 15px;
+                    background: var(--background-dark);
+                    border: 1px solid var(--border-color);
+                    border-radius: 8px;
+                    color: var(--text-primary);
+                    font-family: inherit;
+                  }}
+                  
+                  textarea.form-select {{
+                    min-height: 120px;
+                    resize: vertical;
+                  }}
+                  
+                  .form-color {{
+                    width: 60px;
+                    height: 36px;
+                    border: none;
+                    background: none;
+                  }}
+                  
+                  .form-help {{
+                    font-size: 0.85em;
+                    color: var(--text-secondary);
+                    margin-top: 5px;
+                  }}
+                  
+                  .field-error {{
+                    font-size: 0.85em;
+                    color: #ff7b82;
+                    margin-top: 5px;
+                  }}
+                  
+                  .btn {{
+                    padding: 12px 30px;
+                    border-radius: 10px;
+                    font-weight: 600;
+                    border: none;
+                    cursor: pointer;
+                    font-family: inherit;
+                    font-size: 1em;
+                  }}
+                  
+                  .btn-primary {{
+                    background: var(--success-color);
+                    color: white;
+                  }}
+                  
+                  .status-message {{
+                    padding: 15px;
+                    border-radius: 10px;
+                    display: none;
+                  }}
+                  
+                  .status-message.success {{
+                    background: rgba(35, 134, 54, 0.2);
+                    border: 1px solid rgba(35, 134, 54, 0.3);
+                    color: #3fb950;
+                  }}
+                  
+                  .status-message.error {{
+                    background: rgba(218, 55, 61, 0.2);
+                    border: 1px solid rgba(218, 55, 61, 0.3);
+                    color: #ff7b82;
+                  }}
+                </style>
+              </head>
+              <body>
+                """
+                
+                results = pending.results(return_exceptions=True)
+                user_guilds_result = results[0]
+                if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                    yield page_error("❌ Failed to fetch your servers.")
+                    return
+                
+                guild_info = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+                if not guild_info or not (int(guild_info["permissions"]) & 0x20):
+                    yield page_error("❌ No permission to manage this server.")
+                    return
+                
+                if isinstance(results[1], Exception):
+                    yield page_error("❌ Failed to load this module's settings.")
+                    return
+                stored, version = results[1]
+                
+                # Roles and channels come from the bot token, so only ask once the permission check has passed
+                calls = []
+                if schema.kinds & {"role", "role_list"}:
+                    calls.append(lambda: self.discord.guild_roles(guild_id))
+                if schema.kinds & {"channel", "channel_list"}:
+                    calls.append(lambda: self.discord.guild_channels(guild_id))
+                roles = channels = []
+                fetched = iter(gather(*calls, timeout=REQUEST_DEADLINE, return_exceptions=True))
+                if schema.kinds & {"role", "role_list"}:
+                    roles_result = next(fetched)
+                    if not isinstance(roles_result, Exception) and roles_result.ok:
+                        roles = self.role_indexes.get(guild_id, roles_result.data).roles
+                    else:
+                        roles = self.role_indexes.get(guild_id, []).roles
+                if schema.kinds & {"channel", "channel_list"}:
+                    channels_result = next(fetched)
+                    if not isinstance(channels_result, Exception) and channels_result.ok:
+                        channels = sorted(channels_result.data, key=lambda c: (c.get("type") == 4, c.get("position", 0)))
+                
+                guild_name = guild_info['name']
+                guild_icon = icon_url("icons", guild_info['id'], guild_info['icon'], 50)
+                disabled_notice = "" if self.get_cog_status(guild_id, cog_key) else (
+                    '<div class="status-message error" style="display: block;">'
+                    f"{cog_info['name']} is disabled for this server. Enable it on the dashboard to change its settings.</div>"
+                )
+                
+                yield set_title_script(f"{cog_info['name']} - {guild_name}")
+                yield stale_notice(user_guilds_result)
+                yield f"""
+                <div class="header">
+                  <div class="header-info">
+                    <img src="{guild_icon}" class="guild-icon" loading="lazy">
+                    <div class="header-text">
+                      <h1>{cog_info['icon']} {cog_info['name']}</h1>
+                      <p>{cog_info['description']}</p>
+                    </div>
+                  </div>
+                  <a href="/manage/{guild_id}" class="back-btn">← Back to Dashboard</a>
+                </div>
+                
+                <div class="config-container">
+                  {disabled_notice}
+                  <div id="status-message" class="status-message"></div>
+                  
+                  <div class="config-section">
+                    {settings_form(schema.describe(), schema.resolve(stored), roles, channels)}
+                    <button id="save_button" class="btn btn-primary">💾 Save Settings</button>
+                  </div>
+                </div>
+                
+                <script>
+                  let settingsVersion = {version};
+                  
+                  function showStatus(text, ok) {{
+                    const statusMessage = document.getElementById('status-message');
+                    statusMessage.textContent = text;
+                    statusMessage.className = 'status-message ' + (ok ? 'success' : 'error');
+                    statusMessage.style.display = 'block';
+                  }}
+                  
+                  function fieldValue(el) {{
+                    switch (el.dataset.type) {{
+                      case 'toggle': return el.checked;
+                      case 'number': return el.value === '' ? null : Number(el.value);
+                      case 'text_list': return el.value.split('\\n').map(item => item.trim()).filter(Boolean);
+                      case 'role_list':
+                      case 'channel_list': return Array.from(el.selectedOptions).map(option => option.value);
+                      case 'role':
+                      case 'channel': return el.value || null;
+                      default: return el.value;
+                    }}
+                  }}
+                  
+                  function collectSettings() {{
+                    const settings = {{}};
+                    document.querySelectorAll('[data-path]').forEach(el => {{
+                      const keys = el.dataset.path.split('.');
+                      let target = settings;
+                      keys.slice(0, -1).forEach(key => target = target[key] = target[key] || {{}});
+                      target[keys[keys.length - 1]] = fieldValue(el);
+                    }});
+                    return settings;
+                  }}
+                  
+                  document.getElementById('save_button').addEventListener('click', async function() {{
+                    document.querySelectorAll('.field-error').forEach(el => el.textContent = '');
+                    this.disabled = true;
+                    try {{
+                      const response = await fetch('/api/settings/{module}/{guild_id}', {{
+                        method: 'PATCH',
+                        headers: {{ 'Content-Type': 'application/json', 'If-Match': `"${{settingsVersion}}"` }},
+                        body: JSON.stringify(collectSettings())
+                      }});
+                      const result = await response.json();
+                      if (result.success) {{
+                        settingsVersion = Number(response.headers.get('ETag').replace(/"/g, ''));
+                        showStatus('✅ Settings saved', true);
+                      }} else if (response.status === 412) {{
+                        showStatus('⚠️ ' + result.error, false);
+                        setTimeout(() => location.reload(), 1500);
+                      }} else {{
+                        const general = [];
+                        Object.entries(result.errors || {{}}).forEach(([path, message]) => {{
+                          const target = document.querySelector(`[data-error-for="${{path}}"]`);
+                          if (target) target.textContent = message;
+                          else general.push(path ? `${{path}}: ${{message}}` : message);
+                        }});
+                        showStatus('❌ ' + (general.join('; ') || result.error || 'An error occurred'), false);
+                      }}
+                    }} catch (error) {{
+                      showStatus('❌ An error occurred while saving settings', false);
+                    }}
+                    this.disabled = false;
+                  }});
+                </script>
+              </body>
+            </html>
+            """
+            
+            def page_error(message):
+                return f"""
+                <div class="config-container">
+                  <div class="status-message error" style="display: block;">{message}</div>
+                </div>
+              </body>
+            </html>
+            """
+            
+            return stream_page(render())
+        
+        @app.route("/api/settings/<module>/<guild_id>", methods=["GET", "PATCH"])
+        def module_settings(module, guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"success": False, "error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"success": False, "error": "No access token"}), 401
+            
+            found = settings_module(module)
+            if found is None:
+                return jsonify({"success": False, "error": "This module has no settings"}), 404
+            cog_key, schema = found
+            
+            if request.method == "GET":
+                user_guilds_result = self.discord.user_guilds(access_token)
+                if not user_guilds_result.ok:
+                    return jsonify({"success": False, "error": "Failed to fetch guilds"}), 403
+                guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+                if not guild or not (int(guild["permissions"]) & 0x20):
+                    return jsonify({"success": False, "error": "No permission to manage this server"}), 403
+                stored, version = self.store.get_versioned(schema.namespace, guild_id)
+                response = jsonify({
+                    "success": True,
+                    "module": cog_key,
+                    "settings": schema.resolve(stored),
+                    "schema": schema.describe(),
+                    "version": version
+                })
+                response.headers["ETag"] = etag(version)
+                return response
+            
+            try:
+                expected_version = if_match_version()
+            except ValueError:
+                return jsonify({"success": False, "error": "Malformed If-Match header"}), 400
+            
+            changes = request.get_json(silent=True)
+            # Checked before any Discord calls, so a bad request costs nothing remote
+            clean, errors = schema.check(changes)
+            if errors:
+                return jsonify({"success": False, "error": "Invalid settings", "errors": errors}), 400
+            
+            role_ids = schema.references(clean, "role")
+            channel_ids = schema.references(clean, "channel")
+            # IDs already saved are let through, so a deleted role doesn't block saving the rest of the form
+            saved = schema.resolve(self.store.get(schema.namespace, guild_id))
+            role_ids -= schema.references(saved, "role")
+            channel_ids -= schema.references(saved, "channel")
+            user_guilds_result, = gather(lambda: self.discord.user_guilds(access_token),
+                                         timeout=REQUEST_DEADLINE, return_exceptions=True)
+            if isinstance(user_guilds_result, Exception) or not user_guilds_result.ok:
+                return jsonify({"success": False, "error": "Failed to fetch guilds"}), 403
+            guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+            if not guild or not (int(guild["permissions"]) & 0x20):
+                return jsonify({"success": False, "error": "No permission to manage this server"}), 403
+            
+            limited = write_limited(user, guild_id)
+            if limited is not None:
+                return limited
+            
+            if not self.get_cog_status(guild_id, cog_key):
+                return jsonify({"success": False, "error": f"{AVAILABLE_COGS[cog_key]['name']} module is disabled"}), 400
+            
+            # Roles and channels come from the bot token, so only ask once the permission check has passed
+            calls = []
+            if role_ids:
+                calls.append(lambda: self.discord.guild_roles(guild_id))
+            if channel_ids:
+                calls.append(lambda: self.discord.guild_channels(guild_id))
+            fetched = iter(gather(*calls, timeout=REQUEST_DEADLINE, return_exceptions=True))
+            if role_ids:
+                roles_result = next(fetched)
+                if isinstance(roles_result, Exception) or not roles_result.ok:
+                    return jsonify({"success": False, "error": "Failed to fetch roles"}), 502
+                known = self.role_indexes.get(guild_id, roles_result.data).by_id
+                missing = sorted(role_id for role_id in role_ids if role_id not in known)
+                if missing:
+                    return jsonify({"success": False, "error": f"Roles not found or not assignable: {', '.join(missing)}"}), 400
+            if channel_ids:
+                channels_result = next(fetched)
+                if isinstance(channels_result, Exception) or not channels_result.ok:
+                    return jsonify({"success": False, "error": "Failed to fetch channels"}), 502
+                known = {str(channel["id"]) for channel in channels_result.data}
+                missing = sorted(channel_id for channel_id in channel_ids if channel_id not in known)
+                if missing:
+                    return jsonify({"success": False, "error": f"Channels not found: {', '.join(missing)}"}), 400
+            
+            result = self.update_module_settings(guild_id, cog_key, clean, expected_version=expected_version,
+                                                 actor=audit_actor(user))
+            if result.get("errors"):
+                return jsonify({"success": False, "error": "Invalid settings", "errors": result["errors"]}), 400
+            if result.get("conflict"):
+                return precondition_failed(result["version"], {
+                    "success": False,
+                    "error": "These settings were changed by someone else in the meantime. Reloading to show the current state.",
+                    "settings": result["settings"]
+                })
+            
+            response = jsonify({"success": True, "settings": result["settings"], "version": result["version"]})
+            response.headers["ETag"] = etag(result["version"])
+            return response
+        
+        @app.route("/api/autorole/queue")
+        def autorole_queue_metrics():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            cog = self.bot.cogs.get("AutoRole") if self.bot is not None else None
+            if cog is None or not hasattr(cog, "queue"):
+                return jsonify({"error": "AutoRole is not loaded in this process"}), 404
+            return jsonify(cog.queue.metrics())
+
+        @app.route("/api/audit/<guild_id>")
+        def audit_history(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"error": "No access token"}), 401
+            
+            if not self.is_owner(user.get("id")):
+                user_guilds_result = self.discord.user_guilds(access_token)
+                if not user_guilds_result.ok:
+                    return jsonify({"error": "Failed to fetch guilds"}), 403
+                guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+                if not guild or not (int(guild["permissions"]) & 0x20):
+                    return jsonify({"error": "No permission to manage this server"}), 403
+            
+            try:
+                since = float(request.args["since"]) if request.args.get("since") else None
+                until = float(request.args["until"]) if request.args.get("until") else None
+                before = int(request.args["before"]) if request.args.get("before") else None
+                limit = min(max(int(request.args.get("limit", 50)), 1), 200)
+            except ValueError:
+                return jsonify({"error": "since, until, before and limit must be numbers"}), 400
+            
+            entries, next_cursor = self.audit.history(guild_id, since, until, before, limit)
+            return jsonify({
+                "guild_id": guild_id,
+                "entries": entries,
+                # Pass as ?before= to get the next (older) page
+                "next": next_cursor
+            })
+
+        @app.route("/icons/<kind>/<owner_id>/<icon_hash>.webp")
+        def icon_proxy(kind, owner_id, icon_hash):
+            # Only for logged-in pages; otherwise anyone could make us fetch arbitrary hashes from the CDN
+            if not session.get("user"):
+                return "", 401
+            try:
+                size = int(request.args.get("size", 128))
+            except ValueError:
+                size = 128
+            try:
+                icon = self.get_icon_cache().get(kind, owner_id, icon_hash, size)
+            except Exception as e:
+                logger.warning(f"Icon proxy failed for {kind}/{owner_id}/{icon_hash}: {e}")
+                icon = None
+            if icon is None:
+                if kind == "embed":
+                    return "", 404
+                # Deleted or unreachable icon: fall back to the default avatar
+                return redirect(f"/icons/embed/0/0.webp?size={snap_size(size)}")
+            data, content_type = icon
+            response = Response(data, mimetype=content_type)
+            # The icon hash changes whenever the image does
+            response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+            return response
+
+        @app.route("/api/telemetry/<guild_id>")
+        def guild_telemetry(guild_id):
+            user = session.get("user")
+            if not user:
+                return jsonify({"error": "Not authenticated"}), 401
+            
+            access_token = session.get("access_token")
+            if not access_token:
+                return jsonify({"error": "No access token"}), 401
+            
+            resolution = request.args.get("resolution", "hour")
+            if resolution not in TELEMETRY_RESOLUTIONS:
+                return jsonify({"error": f"resolution must be one of {', '.join(TELEMETRY_RESOLUTIONS)}"}), 400
+            
+            user_guilds_result = self.discord.user_guilds(access_token)
+            if not user_guilds_result.ok:
+                return jsonify({"error": "Failed to fetch guilds"}), 403
+            guild = next((g for g in user_guilds_result.data if g["id"] == guild_id), None)
+            if not guild or not (int(guild["permissions"]) & 0x20):
+                return jsonify({"error": "No permission to manage this server"}), 403
+            
+            if self.bot is None:
+                # Standalone workers see what the bot process last saved
+                self.telemetry.refresh()
+            return jsonify(self.telemetry.guild(guild_id, resolution))
+
+        @app.route("/api/health/loop")
+        def loop_health():
+            denied = owner_required()
+            if denied is not None:
+                return denied
+            if self.loop_watchdog is None:
+                return jsonify({"error": "The loop watchdog is not running in this process"}), 404
+            # Includes the captured stacks, hence owners only
+            return jsonify(self.loop_watchdog.stats(stacks=True))
+
+        @app.route("/api/health/discord")
+        def discord_health():
+            status = self.discord.status()
+            user = session.get("user")
+            if not user or not self.is_owner(user.get("id")):
+                # Uptime checks only get the breaker states; errors, audit, jobs and limits are for owners
+                return jsonify({"breakers": {name: breaker["state"] for name, breaker in status["breakers"].items()}})
+            if self.warmer is not None:
+                status["warmup"] = self.warmer.stats()
+            if self.snapshots is not None:
+                status["snapshot"] = self.snapshots.status()
+            status["audit"] = self.audit.stats()
+            if self.icons is not None:
+                status["icons"] = self.icons.stats()
+            status["telemetry"] = self.telemetry.stats()
+            if self.loop_watchdog is not None:
+                status["event_loop"] = self.loop_watchdog.stats()
+            if self.bot is not None:
+                status["scheduler"] = get_scheduler().stats()
+            status["jobs"] = self.jobs.stats()
+            status["write_rate_limits"] = {
+                "session": self.session_writes.stats(),
+                "guild": self.guild_writes.stats()
+            }
+            return jsonify(status)
+
+        return app
+
+    def start_webserver(self):
+        """Start serving the dashboard on a daemon thread; returns startup timings"""
+        port = int(os.environ.get("PORT", 5379))
+        drain_timeout = float(os.environ.get("DASHBOARD_DRAIN_TIMEOUT", 10))
+        self.web_server = DashboardServer(self.build_app, port=port, drain_timeout=drain_timeout)
+        return self.web_server.start()
+
+def create_app():
+    """Build the dashboard as a standalone WSGI app for separate worker processes"""
+    dashboard = ModwayDashboard(None)
+    dashboard.start_snapshots()
+    for kind, handler in dashboard.job_handlers().items():
+        dashboard.jobs.register(kind, handler)
+    return dashboard.build_app()
 
 async def setup(bot):
     await bot.add_cog(ModwayDashboard(bot))